@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧊 أرشيف المحادثات القديمة
+المحادثات الخاملة أكثر من AI_ARCHIVE_DAYS يوماً تُنقل إلى ملف مضغوط لكل شهر
+(~/ai_workspace_archive/YYYY-MM.jsonl.gz). كل محادثة عضو gzip مستقل يُلحق بنهاية
+الملف، والفهرس يحفظ موضعه وطوله فتُقرأ محادثة واحدة بدون فك الملف كله
+
+الاستخدام:
+    python3 ai_archive.py stats
+    python3 ai_archive.py run [days]
+"""
+
+import gzip
+import json
+import os
+import sys
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from ai_conversations import describe
+from ai_stats import file_lock
+from ai_text import snippet, tokenize
+
+INDEX_NAME = "index.json"
+SUFFIX = ".jsonl.gz"
+
+
+def archive_days():
+    """عمر الخمول (بالأيام) قبل الأرشفة؛ 0 يعطل الأرشفة"""
+    return float(os.getenv('AI_ARCHIVE_DAYS', 30))
+
+
+def _month(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m')
+
+
+def _members(data, start=0):
+    """(الموضع، الطول، النص) لكل عضو gzip كامل في data ابتداءً من start
+
+    يتوقف عند أول عضو تالف أو غير مكتمل (انقطاع أثناء الكتابة).
+    """
+    view = memoryview(data)
+    offset = start
+    while offset < len(data):
+        decoder = zlib.decompressobj(wbits=31)
+        chunks = []
+        position = offset
+        try:
+            while not decoder.eof and position < len(data):
+                chunks.append(decoder.decompress(view[position:position + 65536]))
+                position += 65536
+        except zlib.error:
+            return
+        if not decoder.eof:
+            return
+        length = min(position, len(data)) - offset - len(decoder.unused_data)
+        yield offset, length, b''.join(chunks)
+        offset += length
+
+
+class ConversationArchive:
+    """أرشيف مضغوط للإلحاق فقط مع فهرس مواضع للقراءة العشوائية
+
+    الفهرس: {'files': {اسم الملف: الحجم السليم}, 'conversations': {id: بيانات وصفية
+    + file/offset/length}}. يُعاد تحميله إذا غيّرته عملية أخرى، ويُعاد بناؤه من
+    الملفات إذا فُقد.
+    """
+
+    def __init__(self, directory=None, level=None):
+        self.directory = Path(directory or os.getenv('AI_ARCHIVE_DIR', Path.home() / "ai_workspace_archive"))
+        self.directory.mkdir(exist_ok=True)
+        self.level = level or int(os.getenv('AI_ARCHIVE_LEVEL', 9))
+        self.index_file = self.directory / INDEX_NAME
+        self.index = {'files': {}, 'conversations': {}}
+        self._index_stat = None
+        self._lock = threading.RLock()
+        with self._lock:
+            self._refresh()
+
+    # ---- الفهرس ----
+
+    @contextmanager
+    def _locked(self):
+        """قفل بين العمليات (الطرفية وخادما الويب يشتركون في الأرشيف)"""
+        with self._lock, file_lock(self.directory / ".lock"):
+            self._refresh()
+            yield
+
+    def _refresh(self):
+        """إعادة قراءة الفهرس إن تغير على القرص (أو بناؤه إن لم يوجد)"""
+        try:
+            stat = self.index_file.stat()
+        except OSError:
+            if self._index_stat is None and any(self.directory.glob(f"*{SUFFIX}")):
+                self._rebuild_index()
+            return
+        current = (stat.st_mtime_ns, stat.st_size)
+        if current == self._index_stat:
+            return
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                self.index = json.load(f)
+            self._index_stat = current
+        except (OSError, ValueError):
+            self._rebuild_index()
+
+    def _rebuild_index(self):
+        """مسح ملفات الأرشيف وبناء الفهرس (آخر نسخة من كل محادثة هي المعتمدة)"""
+        self.index = {'files': {}, 'conversations': {}}
+        for path in sorted(self.directory.glob(f"*{SUFFIX}")):
+            size = 0
+            for offset, length, raw in _members(path.read_bytes()):
+                record = json.loads(raw)
+                self.index['conversations'][record['id']] = dict(
+                    record['meta'], file=path.name, offset=offset, length=length
+                )
+                size = offset + length
+            self.index['files'][path.name] = size
+        self._write_index()
+
+    def _write_index(self):
+        tmp = self.index_file.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, ensure_ascii=False)
+        os.replace(tmp, self.index_file)
+        stat = self.index_file.stat()
+        self._index_stat = (stat.st_mtime_ns, stat.st_size)
+
+    # ---- الكتابة ----
+
+    def put_many(self, items):
+        """أرشفة [(id, المحادثة، وقت آخر تحديث)] بإلحاق عضو لكل محادثة ثم fsync
+
+        المحادثات تُجمع حسب شهر آخر تحديث؛ ما بعد الحجم السليم للملف (بقايا
+        كتابة منقطعة) يُقتطع قبل الإلحاق.
+        """
+        by_file = {}
+        for chat_id, conversation, updated in items:
+            by_file.setdefault(f"{_month(updated)}{SUFFIX}", []).append((chat_id, conversation, updated))
+
+        with self._locked():
+            for name, group in by_file.items():
+                path = self.directory / name
+                with open(path, 'ab') as f:
+                    size = self.index['files'].get(name, 0)
+                    if f.tell() > size:
+                        f.truncate(size)
+                    entries = {}
+                    for chat_id, conversation, updated in group:
+                        meta = dict(describe(conversation), updated=updated, archived=time.time())
+                        line = json.dumps({'id': chat_id, 'meta': meta, 'conversation': conversation},
+                                          ensure_ascii=False) + '\n'
+                        member = gzip.compress(line.encode('utf-8'), compresslevel=self.level, mtime=0)
+                        f.write(member)
+                        entries[chat_id] = dict(meta, file=name, offset=size, length=len(member))
+                        size += len(member)
+                    f.flush()
+                    os.fsync(f.fileno())
+                self.index['files'][name] = size
+                self.index['conversations'].update(entries)
+            self._write_index()
+
+    def put(self, chat_id, conversation, updated=None):
+        self.put_many([(chat_id, conversation, updated or time.time())])
+
+    def remove(self, chat_id):
+        """حذف المحادثة من الفهرس بعد استعادتها (بايتاتها تبقى في ملف الشهر)"""
+        with self._locked():
+            if self.index['conversations'].pop(chat_id, None) is not None:
+                self._write_index()
+
+    # ---- القراءة ----
+
+    def get(self, chat_id):
+        with self._lock:
+            self._refresh()
+            entry = self.index['conversations'].get(chat_id)
+            if entry is None:
+                raise KeyError(chat_id)
+            with open(self.directory / entry['file'], 'rb') as f:
+                f.seek(entry['offset'])
+                data = f.read(entry['length'])
+        return json.loads(gzip.decompress(data))['conversation']
+
+    def conversations(self):
+        """(id، المحادثة) لكل محادثة مؤرشفة، بقراءة كل ملف شهر مرة واحدة"""
+        with self._lock:
+            self._refresh()
+            by_file = {}
+            for chat_id, entry in self.index['conversations'].items():
+                by_file.setdefault(entry['file'], {})[entry['offset']] = chat_id
+        for name, offsets in sorted(by_file.items()):
+            try:
+                data = (self.directory / name).read_bytes()
+            except OSError:
+                continue
+            for offset, _, raw in _members(data):
+                if offsets.get(offset):
+                    yield offsets[offset], json.loads(raw)['conversation']
+
+    def meta(self, chat_id):
+        with self._lock:
+            self._refresh()
+            return self.index['conversations'].get(chat_id)
+
+    def __contains__(self, chat_id):
+        return self.meta(chat_id) is not None
+
+    def __len__(self):
+        with self._lock:
+            self._refresh()
+            return len(self.index['conversations'])
+
+    def keys(self):
+        with self._lock:
+            self._refresh()
+            return list(self.index['conversations'])
+
+    def total_messages(self):
+        with self._lock:
+            self._refresh()
+            return sum(meta['messages'] for meta in self.index['conversations'].values())
+
+    def search(self, query, limit=20):
+        """بحث خطي في المحادثات المؤرشفة (للواجهة json؛ SQLite تبقيها في فهرس البحث)"""
+        terms = tokenize(query)
+        if not terms:
+            return []
+        results = []
+        for chat_id, conversation in self.conversations():
+            for seq, message in enumerate(conversation.get('messages', [])):
+                tokens = tokenize(message.get('content', ''))
+                score = sum(1 for term in terms for token in tokens if token.startswith(term))
+                if score and all(any(token.startswith(term) for token in tokens) for term in terms):
+                    results.append({
+                        'conversation_id': chat_id, 'seq': seq, 'title': conversation.get('title'),
+                        'role': message['role'], 'model': message.get('model'),
+                        'timestamp': message.get('timestamp'),
+                        'snippet': snippet(message['content'], terms), 'score': score,
+                    })
+        results.sort(key=lambda result: result['score'], reverse=True)
+        return results[:limit]
+
+    def stats(self):
+        with self._lock:
+            self._refresh()
+            return {
+                'conversations': len(self.index['conversations']),
+                'messages': sum(meta['messages'] for meta in self.index['conversations'].values()),
+                'files': len(self.index['files']),
+                'bytes': sum(self.index['files'].values()),
+            }
+
+
+def start_archiver(store, days=None, interval=None):
+    """أرشفة المحادثات الخاملة في خيط خلفي عند الإقلاع ثم كل interval ثانية"""
+    days = archive_days() if days is None else days
+    if days <= 0 or getattr(store, 'archive', None) is None:
+        return None
+    interval = interval or float(os.getenv('AI_ARCHIVE_INTERVAL', 6 * 3600))
+
+    def run():
+        while True:
+            try:
+                store.archive_idle(days)
+            except Exception:
+                # الأرشفة تحسين للمساحة فقط؛ المحاولة تتكرر في الدورة القادمة
+                pass
+            time.sleep(interval)
+
+    thread = threading.Thread(target=run, name='archiver', daemon=True)
+    thread.start()
+    return thread
+
+
+def open_store(source=None):
+    """مخزن المحادثات حسب AI_WORKSPACE_STORAGE مع الأرشيف"""
+    from ai_conversations import ConversationStore
+    from ai_storage import SQLiteConversationStore, WorkspaceDB, storage_backend
+
+    archive = ConversationArchive()
+    if storage_backend() == 'sqlite':
+        return SQLiteConversationStore(WorkspaceDB(), source=source, archive=archive)
+    return ConversationStore(Path.home() / "ai_workspace_conversations", archive=archive)
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else 'stats'
+    store = open_store(source='archive')
+    if command == 'run':
+        days = float(sys.argv[2]) if len(sys.argv) > 2 else archive_days()
+        start = time.perf_counter()
+        moved = store.archive_idle(days)
+        print(f"✅ تمت أرشفة {moved} محادثة في {time.perf_counter() - start:.1f}s")
+    stats = store.archive.stats()
+    print(f"🧊 {store.archive.directory}")
+    print(f"  💬 المحادثات: {stats['conversations']}")
+    print(f"  📝 الرسائل: {stats['messages']}")
+    print(f"  📦 الملفات: {stats['files']} ({stats['bytes'] / 1024:.1f}KB)")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,589 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+⚡ وضع الخادم غير المتزامن (ASGI) لواجهتي الويب والهاتف
+نفس مسارات خادمي Flask، لكن كل الطلبات على حلقة أحداث واحدة: انتظار النموذج
+(ProviderEngine.achat/astream) والبحث لا يحجز خيطاً، فالاتصال المفتوح يكلف
+ذاكرته فقط بدل خيط كامل لكل طلب
+
+الاستخدام:
+    python3 ai_asgi.py [web|mobile] [--host 0.0.0.0] [--port 5000] [--builtin]
+    uvicorn --factory ai_asgi:web_app        # أو ai_asgi:mobile_app
+
+بدون uvicorn (أو مع --builtin) يعمل الخادم المدمج: asyncio و HTTP/1.1 مع keep-alive.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import re
+import secrets
+import sys
+from http import HTTPStatus
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qs, unquote
+
+from ai_engine import ProviderEngine
+from ai_router import AUTO_INFO, AUTO_MODEL
+from ai_storage import SQLiteConversationStore, WorkspaceDB, new_chat_id, storage_backend
+from ai_web_templates import MANIFEST_ASSET, MOBILE_INDEX, SERVICE_WORKER_ASSET, WEB_INDEX, asset_response
+
+try:
+    import uvicorn
+except ImportError:
+    uvicorn = None
+
+try:
+    import httpx
+except ImportError:  # البحث يعمل في خيط عبر workspace.search
+    httpx = None
+
+SESSION_COOKIE = 'ai_chat_id'
+MAX_BODY = 1 << 20
+SERPER_URL = "https://google.serper.dev/search"
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Request:
+    def __init__(self, scope, body):
+        self.method = scope['method']
+        self.path = scope['path']
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        self.query = {name: values[-1] for name, values in query.items()}
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1')
+                        for name, value in scope.get('headers', [])}
+        self.body = body
+        self.params = {}
+
+    @property
+    def cookies(self):
+        cookie = SimpleCookie()
+        try:
+            cookie.load(self.headers.get('cookie', ''))
+        except Exception:
+            return {}
+        return {name: morsel.value for name, morsel in cookie.items()}
+
+    def json(self):
+        try:
+            data = json.loads(self.body or b'{}')
+        except ValueError:
+            raise HTTPError(400, 'جسم JSON غير صالح')
+        if not isinstance(data, dict):
+            raise HTTPError(400, 'جسم JSON غير صالح')
+        return data
+
+
+class Response:
+    def __init__(self, body=b'', status=200, content_type='text/html; charset=utf-8', headers=None):
+        self.body = body.encode('utf-8') if isinstance(body, str) else body
+        self.status = status
+        self.headers = [('content-type', content_type)] + list(headers or [])
+
+    def _start(self, extra=()):
+        return {
+            'type': 'http.response.start',
+            'status': self.status,
+            # أسماء الترويسات في ASGI بحروف صغيرة
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                        for name, value in self.headers + list(extra)],
+        }
+
+    async def __call__(self, send, receive):
+        await send(self._start([('content-length', str(len(self.body)))]))
+        await send({'type': 'http.response.body', 'body': self.body})
+
+
+class StreamingResponse(Response):
+    """جسم من مولّد غير متزامن؛ يتوقف إن أغلق العميل الاتصال"""
+
+    def __init__(self, chunks, status=200, content_type='text/event-stream', headers=None):
+        super().__init__(b'', status, content_type, headers)
+        self.chunks = chunks
+
+    async def __call__(self, send, receive):
+        disconnected = asyncio.ensure_future(self._wait_disconnect(receive))
+        try:
+            await send(self._start())
+            async for chunk in self.chunks:
+                if disconnected.done():
+                    break
+                await send({'type': 'http.response.body', 'body': chunk.encode('utf-8'), 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            disconnected.cancel()
+            await self.chunks.aclose()
+
+    @staticmethod
+    async def _wait_disconnect(receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+
+def json_response(data, status=200, headers=None):
+    return Response(json.dumps(data, ensure_ascii=False), status, 'application/json', headers)
+
+
+def sse(event, data):
+    """إطار Server-Sent Events واحد"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def chat_options(data):
+    """معاملات الطلب الاختيارية من جسم JSON (ValueError إن كانت غير صالحة)"""
+    options = {}
+    if data.get('max_tokens') is not None:
+        options['max_tokens'] = max(1, min(int(data['max_tokens']), 8192))
+    if data.get('temperature') is not None:
+        options['temperature'] = max(0.0, min(float(data['temperature']), 2.0))
+    return options
+
+
+class WorkspaceApp:
+    """تطبيق ASGI بمسارات خادم Flask المقابل
+
+    kind='web': مساحة AIWorkspace ومسارات ai_workspace_web.py (مع 'auto' والبحث والملفات).
+    kind='mobile': مساحة AIWorkspacePro ومسارات ai_workspace_mobile.py (مع سياق المحادثة).
+    المساحة تُستخدم للنماذج والمفاتيح والسياق والسجل فقط؛ الاستدعاءات نفسها عبر محرك
+    غير متزامن خاص بحلقة الخادم.
+    """
+
+    def __init__(self, kind='web'):
+        if kind not in ('web', 'mobile'):
+            raise ValueError(f"تطبيق غير معروف: {kind}")
+        self.kind = kind
+        self.workspace = None
+        self.store = None
+        self.engine = None
+        self.secret = (os.getenv('AI_SESSION_SECRET') or secrets.token_hex(16)).encode('utf-8')
+        self._init_lock = None
+        self._http = None
+        self.routes = [(method, re.compile(pattern + '$'), handler) for method, pattern, handler in self.route_table()]
+
+    def route_table(self):
+        routes = [
+            ('GET', '/', self.index),
+            ('GET', '/api/models', self.models),
+            ('POST', '/api/chat', self.chat),
+            ('POST', '/api/chat/stream', self.chat_stream),
+            ('GET', '/api/conversations/search', self.search_conversations),
+            ('GET', r'/api/conversations/(?P<chat_id>[^/]+)/export', self.export_conversation),
+            ('GET', '/api/costs', self.costs),
+        ]
+        if self.kind == 'mobile':
+            routes += [
+                ('GET', '/manifest.json', self.manifest),
+                ('GET', '/sw.js', self.service_worker),
+            ]
+        else:
+            routes += [
+                ('POST', '/api/search', self.search),
+                ('POST', '/api/read', self.read_file),
+                ('POST', '/api/analyze', self.analyze),
+            ]
+        return routes
+
+    # ---- دورة الحياة ----
+
+    async def startup(self):
+        """تهيئة المساحة مرة واحدة (في خيط حتى لا تتوقف الحلقة أثناء الإقلاع)"""
+        if self.workspace is not None:
+            return
+        if self._init_lock is None:
+            self._init_lock = asyncio.Lock()
+        async with self._init_lock:
+            if self.workspace is None:
+                await asyncio.to_thread(self._init)
+
+    def _init(self):
+        if storage_backend() == 'sqlite':
+            from ai_archive import ConversationArchive
+            from ai_stats import UsageStats
+            db = WorkspaceDB()
+            self.store = SQLiteConversationStore(db, source=self.kind, archive=ConversationArchive(),
+                                                 usage=UsageStats(db=db))
+        if self.kind == 'mobile':
+            from ai_workspace_pro import AIWorkspacePro
+            workspace = AIWorkspacePro()
+        else:
+            from ai_workspace import AIWorkspace
+            workspace = AIWorkspace()
+        keys = {'openai': workspace.openai_key, 'google': workspace.google_key,
+                'anthropic': workspace.anthropic_key}
+        self.engine = ProviderEngine(keys, workspace.models, router=getattr(workspace, 'router', None),
+                                     ledger=workspace.ledger, metrics=workspace.call_metrics)
+        self.workspace = workspace
+
+    async def shutdown(self):
+        if self.engine is not None:
+            for adapter in self.engine.adapters.values():
+                await adapter.aclose()
+        if self._http is not None:
+            await self._http.aclose()
+        router = getattr(self.workspace, 'router', None)
+        if router is not None:
+            router.close()
+        if self.workspace is not None:
+            self.workspace.call_metrics.close()
+
+    # ---- ASGI ----
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            while True:
+                message = await receive()
+                if message['type'] == 'lifespan.startup':
+                    await self.startup()
+                    await send({'type': 'lifespan.startup.complete'})
+                elif message['type'] == 'lifespan.shutdown':
+                    await self.shutdown()
+                    await send({'type': 'lifespan.shutdown.complete'})
+                    return
+        if scope['type'] != 'http':
+            return
+
+        body = b''
+        more = True
+        while more:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body += message.get('body', b'')
+            more = message.get('more_body', False)
+            if len(body) > MAX_BODY:
+                await json_response({'error': 'الطلب أكبر من المسموح'}, 413)(send, receive)
+                return
+
+        request = Request(scope, body)
+        try:
+            await self.startup()
+            response = await self.dispatch(request)
+        except HTTPError as e:
+            response = json_response({'error': str(e)}, e.status)
+        except Exception as e:
+            response = json_response({'error': f"❌ خطأ: {str(e)}"}, 500)
+        await response(send, receive)
+
+    async def dispatch(self, request):
+        allowed = False
+        for method, pattern, handler in self.routes:
+            match = pattern.match(request.path)
+            if match:
+                if method == request.method:
+                    request.params = match.groupdict()
+                    return await handler(request)
+                allowed = True
+        if allowed:
+            raise HTTPError(405, 'طريقة غير مسموحة')
+        raise HTTPError(404, 'غير موجود')
+
+    # ---- الجلسة ----
+
+    def _sign(self, value):
+        return hmac.new(self.secret, value.encode('utf-8'), hashlib.sha256).hexdigest()[:32]
+
+    def session(self, request):
+        """(معرف محادثة الجلسة، ترويسات Set-Cookie إن كانت جديدة) في كوكي موقّع"""
+        chat_id, _, signature = request.cookies.get(SESSION_COOKIE, '').rpartition('.')
+        if chat_id and hmac.compare_digest(signature, self._sign(chat_id)):
+            return chat_id, []
+        chat_id = new_chat_id()
+        cookie = f"{SESSION_COOKIE}={chat_id}.{self._sign(chat_id)}; Path=/; HttpOnly; SameSite=Lax"
+        return chat_id, [('set-cookie', cookie)]
+
+    # ---- الدردشة ----
+
+    def chat_request(self, request):
+        """(السؤال، النموذج، المعاملات) من الطلب أو HTTPError 400"""
+        data = request.json()
+        try:
+            model_id = self.workspace.resolve_model(data.get('model'))
+            options = chat_options(data)
+        except Exception as e:
+            raise HTTPError(400, f"❌ {e}")
+        return data.get('message') or '', model_id, options
+
+    async def messages_for(self, model_id, message, chat_id, options):
+        """رسائل الطلب كما يبنيها خادم Flask المقابل (الهاتف: مع سياق المحادثة)"""
+        if self.kind == 'web':
+            return [{'role': 'user', 'content': message}], options
+        conversation = await asyncio.to_thread(self.store.get, chat_id) if self.store is not None else None
+        history = conversation['messages'] if conversation else []
+        # البناء قد يستدعي نموذج التلخيص مرة لكل عدة أدوار، فيعمل في خيط
+        _, messages, max_tokens, _ = await asyncio.to_thread(
+            self.workspace.prepare_messages, model_id, message, False, history, None, options.get('max_tokens')
+        )
+        if max_tokens is not None:
+            options = dict(options, max_tokens=max_tokens)
+        return messages, options
+
+    async def remember(self, chat_id, message, response, model_id):
+        if self.store is not None and response:
+            await asyncio.to_thread(self.store.record_exchange, chat_id, message, response, model_id)
+
+    async def chat(self, request):
+        message, model_id, options = self.chat_request(request)
+        chat_id, cookies = self.session(request)
+        try:
+            messages, options = await self.messages_for(model_id, message, chat_id, options)
+            result = await self.engine.achat(model_id, messages, conversation_id=chat_id, **options)
+            response = result['text']
+        except Exception as e:
+            response = f"❌ خطأ: {str(e)}"
+        else:
+            await self.remember(chat_id, message, response, model_id)
+        return json_response({'response': response, 'model': model_id}, headers=cookies)
+
+    async def chat_stream(self, request):
+        message, model_id, options = self.chat_request(request)
+        chat_id, cookies = self.session(request)
+
+        async def events():
+            parts = []
+            try:
+                messages, params = await self.messages_for(model_id, message, chat_id, options)
+                async for chunk in self.engine.astream(model_id, messages, conversation_id=chat_id, **params):
+                    parts.append(chunk)
+                    yield sse('token', {'text': chunk})
+            except Exception as e:
+                yield sse('error', {'error': f"❌ خطأ: {str(e)}"})
+                return
+            await self.remember(chat_id, message, ''.join(parts), model_id)
+            yield sse('done', {'model': model_id})
+
+        # بدون تخزين مؤقت في الوسطاء (nginx) حتى تصل القطع فوراً
+        headers = cookies + [('cache-control', 'no-cache'), ('x-accel-buffering', 'no')]
+        return StreamingResponse(events(), headers=headers)
+
+    # ---- بقية المسارات ----
+
+    @staticmethod
+    def static_response(request, asset):
+        """أصل ثابت مجهز مسبقاً بالضغط الذي يقبله المتصفح، أو 304 إن لم يتغير"""
+        status, body, headers = asset_response(
+            asset, request.headers.get('if-none-match'), request.headers.get('accept-encoding')
+        )
+        return Response(body, status, asset['content_type'], headers)
+
+    async def index(self, request):
+        return self.static_response(request, MOBILE_INDEX if self.kind == 'mobile' else WEB_INDEX)
+
+    async def manifest(self, request):
+        return self.static_response(request, MANIFEST_ASSET)
+
+    async def service_worker(self, request):
+        return self.static_response(request, SERVICE_WORKER_ASSET)
+
+    async def models(self, request):
+        if self.kind == 'mobile':
+            return json_response({'models': self.workspace.models})
+        # 'auto' يختار أسرع نموذج سليم حسب الأزمنة المقاسة
+        return json_response({'models': {AUTO_MODEL: AUTO_INFO, **self.workspace.models}})
+
+    async def search_conversations(self, request):
+        query = request.query.get('q', '').strip()
+        try:
+            limit = max(1, min(int(request.query.get('limit', 20)), 100))
+        except ValueError:
+            return json_response({'results': [], 'error': 'قيمة limit غير صالحة'}, 400)
+        if self.store is None:
+            return json_response({'results': [], 'error': 'البحث يتطلب التخزين في SQLite'}, 503)
+        return json_response({'results': await asyncio.to_thread(self.store.search, query, limit)})
+
+    async def export_conversation(self, request):
+        # المحادثات المؤرشفة تُقرأ من الأرشيف المضغوط بشفافية
+        if self.store is None:
+            return json_response({'error': 'التصدير يتطلب التخزين في SQLite'}, 503)
+        chat_id = unquote(request.params['chat_id'])
+        conversation = await asyncio.to_thread(self.store.get, chat_id)
+        if conversation is None:
+            return json_response({'error': 'محادثة غير موجودة'}, 404)
+        disposition = ('content-disposition', f'attachment; filename="{chat_id}.json"')
+        return json_response(dict(conversation, id=chat_id), headers=[disposition])
+
+    async def costs(self, request):
+        # ?days=7&by=model|day|conversation من سجل التكلفة المشترك
+        by = request.query.get('by', 'model')
+        try:
+            days = min(max(int(request.query.get('days', 7)), 1), 366)
+            rows = await asyncio.to_thread(self.workspace.ledger.aggregate, days, by)
+        except ValueError as e:
+            return json_response({'error': str(e)}, 400)
+        return json_response({'days': days, 'by': by, 'total': sum(row['cost'] for row in rows), 'rows': rows})
+
+    async def search(self, request):
+        query = request.json().get('query') or ''
+        results = await self.web_search(query)
+        return json_response({'results': results or 'لم يتم العثور على نتائج'})
+
+    async def web_search(self, query):
+        """Serper عبر httpx غير المتزامن إن وُجد، وإلا بحث المساحة في خيط"""
+        workspace = self.workspace
+        if httpx is None or 'serper' not in workspace.search_engines:
+            return await asyncio.to_thread(workspace.search, query)
+        if self._http is None:
+            self._http = httpx.AsyncClient(timeout=10)
+        try:
+            response = await self._http.post(
+                SERPER_URL, headers={'X-API-KEY': workspace.serper_key}, json={'q': query}
+            )
+            results = workspace.serper_results(response.json())
+        except Exception:
+            results = []
+        return "\n".join(results) if results else None
+
+    async def read_file(self, request):
+        path = request.json().get('path')
+        return json_response({'content': await asyncio.to_thread(self.workspace.read_file, path)})
+
+    async def analyze(self, request):
+        data = request.json()
+        try:
+            model_id = self.workspace.resolve_model(data.get('model'))
+        except Exception as e:
+            raise HTTPError(400, f"❌ {e}")
+        content = await asyncio.to_thread(self.workspace.read_file, data.get('path'))
+        if content.startswith("❌"):
+            return json_response({'analysis': content})
+        messages = [{'role': 'user', 'content': self.workspace.analysis_prompt(content)}]
+        try:
+            analysis = (await self.engine.achat(model_id, messages))['text']
+        except Exception as e:
+            analysis = f"❌ خطأ: {str(e)}"
+        return json_response({'analysis': analysis})
+
+
+def web_app():
+    return WorkspaceApp('web')
+
+
+def mobile_app():
+    return WorkspaceApp('mobile')
+
+
+async def serve(app, host='0.0.0.0', port=5000, backlog=1024):
+    """خادم HTTP/1.1 مدمج (asyncio فقط) لتشغيل تطبيق ASGI بدون uvicorn"""
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+                lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, target, version = lines[0].split(' ', 2)
+                except ValueError:
+                    return
+                headers = []
+                for line in lines[1:]:
+                    if line:
+                        name, _, value = line.partition(':')
+                        headers.append((name.strip().lower().encode('latin-1'), value.strip().encode('latin-1')))
+                fields = dict(headers)
+                length = int(fields.get(b'content-length', 0) or 0)
+                if length > MAX_BODY:
+                    writer.write(b'HTTP/1.1 413 Payload Too Large\r\ncontent-length: 0\r\nconnection: close\r\n\r\n')
+                    return
+                body = await reader.readexactly(length) if length else b''
+                keep_alive = version == 'HTTP/1.1' and fields.get(b'connection', b'').lower() != b'close'
+                path, _, query = target.partition('?')
+                scope = {
+                    'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': version[5:],
+                    'method': method.upper(), 'scheme': 'http', 'path': unquote(path),
+                    'raw_path': path.encode('latin-1'), 'query_string': query.encode('latin-1'),
+                    'headers': headers, 'client': writer.get_extra_info('peername'), 'server': (host, port),
+                }
+                finished = asyncio.Event()
+                state = {'received': False, 'chunked': False}
+
+                async def receive():
+                    if not state['received']:
+                        state['received'] = True
+                        return {'type': 'http.request', 'body': body, 'more_body': False}
+                    await finished.wait()
+                    return {'type': 'http.disconnect'}
+
+                async def send(message):
+                    if writer.is_closing():
+                        raise ConnectionResetError("العميل أغلق الاتصال")
+                    if message['type'] == 'http.response.start':
+                        status = message['status']
+                        response_headers = message.get('headers', [])
+                        state['chunked'] = all(name.lower() != b'content-length' for name, _ in response_headers)
+                        out = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n".encode('latin-1')]
+                        out += [name + b': ' + value + b'\r\n' for name, value in response_headers]
+                        if state['chunked']:
+                            out.append(b'transfer-encoding: chunked\r\n')
+                        out.append(b'connection: keep-alive\r\n\r\n' if keep_alive else b'connection: close\r\n\r\n')
+                        writer.write(b''.join(out))
+                    elif message['type'] == 'http.response.body':
+                        data = message.get('body', b'')
+                        if state['chunked']:
+                            if data:
+                                writer.write(b'%x\r\n%s\r\n' % (len(data), data))
+                            if not message.get('more_body'):
+                                writer.write(b'0\r\n\r\n')
+                        else:
+                            writer.write(data)
+                        await writer.drain()
+
+                try:
+                    await app(scope, receive, send)
+                finally:
+                    finished.set()
+                if not keep_alive:
+                    return
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    if hasattr(app, 'startup'):
+        await app.startup()
+    server = await asyncio.start_server(handle, host, port, backlog=backlog, limit=64 * 1024)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if hasattr(app, 'shutdown'):
+            await app.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='وضع الخادم غير المتزامن لواجهتي الويب والهاتف')
+    parser.add_argument('app', nargs='?', choices=('web', 'mobile'), default='web')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--builtin', action='store_true', help='الخادم المدمج حتى لو كان uvicorn مثبتاً')
+    args = parser.parse_args()
+
+    app = WorkspaceApp(args.app)
+    server = 'المدمج' if uvicorn is None or args.builtin else 'uvicorn'
+    print("\n" + "="*60)
+    print(f"⚡ {args.app} - وضع ASGI ({server})")
+    print("="*60)
+    print(f"\n🔗 http://localhost:{args.port}")
+    print("\n💡 للإيقاف: اضغط Ctrl+C\n")
+    sys.stdout.flush()
+
+    if server == 'uvicorn':
+        uvicorn.run(app, host=args.host, port=args.port, log_level='warning')
+        return
+    try:
+        asyncio.run(serve(app, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
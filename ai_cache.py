@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+💾 ذاكرة الردود الدائمة
+تخزين ردود النماذج على القرص (SQLite) بمفتاح من النموذج والرسائل والمعاملات،
+مع طبقة دلالية اختيارية تطابق الأسئلة المتقاربة
+"""
+
+import atexit
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+
+from ai_text import tokenize
+
+
+def normalize_messages(messages):
+    """توحيد الرسائل قبل حساب المفتاح (NFC ونهايات الأسطر والمسافات الزائدة)"""
+    normalized = []
+    for message in messages:
+        content = unicodedata.normalize('NFC', message['content']).replace('\r\n', '\n')
+        content = '\n'.join(line.rstrip() for line in content.split('\n')).strip()
+        normalized.append({'role': message['role'].lower(), 'content': content})
+    return normalized
+
+
+class ResponseCache:
+    """ذاكرة ردود SQLite مع مدة صلاحية وحد أقصى يُطرد بعده الأقدم استخداماً (LRU)
+
+    القراءة لا تكتب على القرص: وقت آخر استخدام والعدادات تُجمع في الذاكرة
+    ويكتبها خيط خلفي دفعة واحدة (أو set و stats و close).
+    """
+
+    def __init__(self, path=None, ttl=None, max_entries=None, flush_every=None, flush_interval=None):
+        self.path = Path(path or os.getenv('AI_CACHE_DB', Path.home() / "ai_workspace_cache.db"))
+        self.ttl = ttl or float(os.getenv('AI_CACHE_TTL', 7 * 24 * 3600))
+        self.max_entries = max_entries or int(os.getenv('AI_CACHE_MAX_ENTRIES', 5000))
+        self.flush_every = flush_every or int(os.getenv('AI_CACHE_FLUSH_EVERY', 50))
+        self.flush_interval = flush_interval or float(os.getenv('AI_CACHE_FLUSH_INTERVAL', 5.0))
+        self.session = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+        self.pending = self._empty_pending()
+        self._pending_reads = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS responses_last_access ON responses(last_access);
+            CREATE TABLE IF NOT EXISTS counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+        """)
+        self._db.commit()
+        atexit.register(self.close)
+
+    @staticmethod
+    def _empty_pending():
+        return {'access': {}, 'expired': set(), 'counters': {}}
+
+    @staticmethod
+    def make_key(model_id, messages, max_tokens=None, temperature=None):
+        """مفتاح محتوى (sha256) للنموذج والرسائل الموحدة والمعاملات"""
+        payload = json.dumps(
+            {
+                'model': model_id,
+                'messages': normalize_messages(messages),
+                'max_tokens': max_tokens,
+                'temperature': temperature,
+            },
+            ensure_ascii=False,
+            sort_keys=True,
+            separators=(',', ':'),
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _count(self, name, amount=1):
+        """زيادة عداد الجلسة والعداد المعلق حتى الكتابة التالية (تحت القفل)"""
+        self.session[name] += amount
+        counters = self.pending['counters']
+        counters[name] = counters.get(name, 0) + amount
+
+    def get(self, key):
+        """الرد المخزن أو None إذا لم يوجد أو انتهت صلاحيته"""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self.pending['expired'].add(key)
+                    self.pending['access'].pop(key, None)
+                self._count('misses')
+                response = None
+            else:
+                self.pending['access'][key] = now
+                self._count('hits')
+                response = row[0]
+
+            self._pending_reads += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='response-cache', daemon=True)
+                self._thread.start()
+            if self._pending_reads >= self.flush_every:
+                self._wake.set()
+            return response
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except sqlite3.Error:
+                # المعلق أُعيد للانتظار؛ المحاولة في الدورة القادمة
+                pass
+
+    def _flush(self):
+        """كتابة أوقات الاستخدام والمنتهيات والعدادات المعلقة (تحت القفل، بدون commit)"""
+        pending, self.pending = self.pending, self._empty_pending()
+        self._pending_reads = 0
+        try:
+            self._db.executemany(
+                "UPDATE responses SET last_access = MAX(last_access, ?) WHERE key = ?",
+                [(when, key) for key, when in pending['access'].items()]
+            )
+            self._db.executemany(
+                "DELETE FROM responses WHERE key = ? AND created < ?",
+                [(key, time.time() - self.ttl) for key in pending['expired']]
+            )
+            self._db.executemany(
+                "INSERT INTO counters(name, value) VALUES(?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                list(pending['counters'].items())
+            )
+        except sqlite3.Error:
+            self._db.rollback()
+            for key, when in pending['access'].items():
+                self.pending['access'].setdefault(key, when)
+            self.pending['expired'] |= pending['expired']
+            for name, amount in pending['counters'].items():
+                self.pending['counters'][name] = self.pending['counters'].get(name, 0) + amount
+            raise
+
+    def flush(self):
+        """كتابة ما جُمع من القراءات في معاملة واحدة"""
+        with self._lock:
+            if not any(self.pending.values()):
+                return
+            self._flush()
+            self._db.commit()
+
+    def set(self, key, model_id, response):
+        """تخزين رد ثم طرد الأقدم استخداماً إذا تجاوزنا الحد"""
+        now = time.time()
+        with self._lock:
+            # أوقات الاستخدام المعلقة أولاً حتى يطرد LRU الأقدم فعلاً
+            self._flush()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses(key, model, response, created, last_access) "
+                "VALUES(?, ?, ?, ?, ?)",
+                (key, model_id, response, now, now)
+            )
+            self._count('stores')
+
+            (size,) = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()
+            overflow = size - self.max_entries
+            if overflow > 0:
+                self._db.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY last_access LIMIT ?)",
+                    (overflow,)
+                )
+                self._count('evictions', overflow)
+            self._flush()
+            self._db.commit()
+
+    def stats(self):
+        """عدادات الجلسة والعدادات الدائمة وعدد العناصر"""
+        self.flush()
+        with self._lock:
+            totals = dict(self._db.execute("SELECT name, value FROM counters").fetchall())
+            (size,) = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()
+        return {'session': dict(self.session), 'total': totals, 'entries': size}
+
+    def clear(self):
+        """حذف جميع الردود المخزنة"""
+        with self._lock:
+            self.pending['access'].clear()
+            self.pending['expired'].clear()
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+    def close(self):
+        """إيقاف الخيط الخلفي وكتابة المعلق ثم إغلاق القاعدة"""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._wake.set()
+        try:
+            self.flush()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._db.close()
+
+
+def local_embedding(text, dim=1024):
+    """تضمين محلي خفيف: كلمات النص الموحد ومقاطعها الثلاثية في متجه مجزأ (hashing)"""
+    vector = {}
+    for word in tokenize(text):
+        features = [(word, 1.0)]
+        padded = f"#{word}#"
+        features += [(padded[i:i + 3], 0.5) for i in range(len(padded) - 2)]
+        for feature, weight in features:
+            index = zlib.crc32(feature.encode('utf-8')) % dim
+            vector[index] = vector.get(index, 0.0) + weight
+
+    norm = math.sqrt(sum(value * value for value in vector.values())) or 1.0
+    return {index: value / norm for index, value in vector.items()}
+
+
+def cosine(a, b):
+    """تشابه جيب التمام بين متجهين مُطبَّعين"""
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(value * b.get(index, 0.0) for index, value in a.items())
+
+
+class SemanticCache:
+    """ذاكرة دلالية: رد مخزن لسؤال مشابه بما يكفي لنفس النموذج"""
+
+    def __init__(self, path=None, threshold=None, max_per_model=None, embedder=None, audit_size=1000):
+        self.path = Path(path or os.getenv('AI_CACHE_DB', Path.home() / "ai_workspace_cache.db"))
+        self.threshold = threshold or float(os.getenv('AI_SEMANTIC_THRESHOLD', 0.9))
+        self.max_per_model = max_per_model or int(os.getenv('AI_SEMANTIC_MAX_PER_MODEL', 500))
+        self.embedder = embedder or local_embedding
+        self.audit_size = audit_size
+        self.session = {'hits': 0, 'misses': 0, 'near_misses': 0, 'stores': 0, 'evictions': 0}
+        self._index = {}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS semantic (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                namespace TEXT NOT NULL,
+                prompt TEXT NOT NULL,
+                response TEXT NOT NULL,
+                vector TEXT NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS semantic_namespace ON semantic(namespace, last_access);
+            CREATE TABLE IF NOT EXISTS semantic_audit (
+                ts REAL NOT NULL,
+                namespace TEXT NOT NULL,
+                similarity REAL NOT NULL,
+                prompt TEXT NOT NULL,
+                matched_prompt TEXT NOT NULL
+            );
+        """)
+        self._db.commit()
+
+    @staticmethod
+    def namespace(model_id, **params):
+        """مساحة البحث: النموذج ومعاملات الطلب"""
+        return model_id + ''.join(f"|{name}={params[name]}" for name in sorted(params))
+
+    def _entries(self, namespace):
+        """فهرس النموذج في الذاكرة (يُحمَّل من القرص أول مرة، الأحدث استخداماً في النهاية)"""
+        entries = self._index.get(namespace)
+        if entries is None:
+            entries = self._index[namespace] = OrderedDict()
+            rows = self._db.execute(
+                "SELECT id, prompt, vector FROM semantic WHERE namespace = ? ORDER BY last_access",
+                (namespace,)
+            )
+            for row_id, prompt, vector in rows:
+                entries[row_id] = (prompt, {int(k): v for k, v in json.loads(vector).items()})
+        return entries
+
+    def lookup(self, namespace, prompt):
+        """أقرب رد مخزن فوق عتبة التشابه أو None"""
+        query = self.embedder(prompt)
+        with self._lock:
+            entries = self._entries(namespace)
+            best_id, best_score = None, 0.0
+            for row_id, (_, vector) in entries.items():
+                score = cosine(query, vector)
+                if score > best_score:
+                    best_id, best_score = row_id, score
+
+            if best_id is None or best_score < self.threshold:
+                self.session['misses'] += 1
+                if best_id is not None and best_score >= self.threshold - 0.1:
+                    self.session['near_misses'] += 1
+                return None
+
+            (response,) = self._db.execute("SELECT response FROM semantic WHERE id = ?", (best_id,)).fetchone()
+            entries.move_to_end(best_id)
+            self._db.execute("UPDATE semantic SET last_access = ? WHERE id = ?", (time.time(), best_id))
+            self._audit(namespace, best_score, prompt, entries[best_id][0])
+            self._db.commit()
+            self.session['hits'] += 1
+            return response
+
+    def _audit(self, namespace, similarity, prompt, matched_prompt):
+        """تسجيل الإصابة لمراجعة الإصابات الخاطئة لاحقاً (تحت القفل)"""
+        self._db.execute(
+            "INSERT INTO semantic_audit(ts, namespace, similarity, prompt, matched_prompt) VALUES(?, ?, ?, ?, ?)",
+            (time.time(), namespace, similarity, prompt, matched_prompt)
+        )
+        self._db.execute(
+            "DELETE FROM semantic_audit WHERE rowid NOT IN "
+            "(SELECT rowid FROM semantic_audit ORDER BY ts DESC LIMIT ?)",
+            (self.audit_size,)
+        )
+
+    def add(self, namespace, prompt, response):
+        """إضافة سؤال ورده للفهرس مع طرد الأقدم استخداماً عند الامتلاء"""
+        vector = self.embedder(prompt)
+        with self._lock:
+            entries = self._entries(namespace)
+            cursor = self._db.execute(
+                "INSERT INTO semantic(namespace, prompt, response, vector, last_access) VALUES(?, ?, ?, ?, ?)",
+                (namespace, prompt, response, json.dumps(vector), time.time())
+            )
+            entries[cursor.lastrowid] = (prompt, vector)
+            self.session['stores'] += 1
+
+            while len(entries) > self.max_per_model:
+                row_id, _ = entries.popitem(last=False)
+                self._db.execute("DELETE FROM semantic WHERE id = ?", (row_id,))
+                self.session['evictions'] += 1
+            self._db.commit()
+
+    def audit(self, limit=20):
+        """آخر الإصابات الدلالية مع درجة التشابه للمراجعة"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT ts, namespace, similarity, prompt, matched_prompt FROM semantic_audit "
+                "ORDER BY ts DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [
+            dict(zip(('ts', 'namespace', 'similarity', 'prompt', 'matched_prompt'), row))
+            for row in rows
+        ]
+
+    def stats(self):
+        """عدادات الجلسة وحجم الفهرس"""
+        with self._lock:
+            (size,) = self._db.execute("SELECT COUNT(*) FROM semantic").fetchone()
+        return {'session': dict(self.session), 'entries': size, 'threshold': self.threshold}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
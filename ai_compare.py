@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+📊 عرض المقارنة المباشر
+يعرض ردود عدة نماذج في أقسام متجاورة أثناء وصولها مع زمن أول رمز والزمن الكلي
+"""
+
+import shutil
+import sys
+import textwrap
+import threading
+import time
+
+
+class CompareView:
+    """قسم مستقل لكل نموذج يُحدَّث مع كل قطعة تصل"""
+
+    def __init__(self, names, out=None, refresh=0.1):
+        self.names = names
+        self.order = list(names)
+        self.out = out or sys.stdout
+        self.refresh = refresh
+        self.live = self.out.isatty()
+        self.buffers = {model_id: [] for model_id in self.order}
+        self.first_token = {}
+        self.start = time.perf_counter()
+        self._lines_drawn = 0
+        self._last_draw = 0
+        self._lock = threading.Lock()
+
+    def on_token(self, model_id, chunk):
+        """استقبال قطعة جديدة من نموذج"""
+        with self._lock:
+            self.buffers[model_id].append(chunk)
+            self.first_token.setdefault(model_id, time.perf_counter() - self.start)
+            if self.live and time.perf_counter() - self._last_draw >= self.refresh:
+                self._draw()
+
+    def _draw(self):
+        """إعادة رسم جميع الأقسام في مكانها"""
+        size = shutil.get_terminal_size()
+        width = max(size.columns - 4, 20)
+        height = max((size.lines - 2) // len(self.order) - 1, 2)
+
+        lines = []
+        for model_id in self.order:
+            ttft = self.first_token.get(model_id)
+            status = f"⏱ {ttft:.2f}ث" if ttft is not None else "⏳"
+            lines.append(f"🤖 {self.names[model_id]} {status}")
+            text = ''.join(self.buffers[model_id]).replace('\n', ' ')
+            body = textwrap.wrap(text, width) or ['']
+            lines.extend('  ' + line for line in body[-height:])
+
+        if self._lines_drawn:
+            self.out.write(f"\033[{self._lines_drawn}F\033[J")
+        self.out.write('\n'.join(lines) + '\n')
+        self.out.flush()
+        self._lines_drawn = len(lines)
+        self._last_draw = time.perf_counter()
+
+    def finish(self, results):
+        """عرض الردود كاملة وجدول الأزمنة"""
+        with self._lock:
+            if self._lines_drawn:
+                self.out.write(f"\033[{self._lines_drawn}F\033[J")
+                self._lines_drawn = 0
+
+        wall = time.perf_counter() - self.start
+        for model_id in self.order:
+            result = results[model_id]
+            print(f"🤖 {self.names[model_id]}:", file=self.out)
+            print(result['text'] or '—', file=self.out)
+            if result['error']:
+                print(f"❌ {result['error']}", file=self.out)
+            print("-" * 70, file=self.out)
+
+        print(f"{'النموذج':<28}{'أول رمز':>10}{'الكلي':>10}{'الأحرف':>10}", file=self.out)
+        for model_id in self.order:
+            result = results[model_id]
+            ttft = f"{result['ttft']:.2f}ث" if result['ttft'] is not None else '—'
+            print(
+                f"{self.names[model_id]:<28}{ttft:>10}{result['latency']:>9.2f}ث{len(result['text']):>10}",
+                file=self.out
+            )
+        print(f"\n⏱ الزمن الكلي للمقارنة: {wall:.2f}ث", file=self.out)
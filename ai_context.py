@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧵 تجميع سياق المحادثة ضمن ميزانية توكنات
+آخر الأدوار تُرسل كما هي، والأقدم تُطوى في ملخص متدحرج: كل مجموعة أدوار تُلخص
+مرة واحدة فوق ملخص ما قبلها، ويُخزن الملخص حسب محتواه فيُعاد استخدامه لاحقاً
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+# تكلفة تقريبية لكل رسالة (الدور والفواصل) فوق نصها
+MESSAGE_OVERHEAD = 4
+
+# نوافذ السياق المعروفة؛ غيرها يفترض DEFAULT_WINDOW (أو حقل 'context' في تعريف النموذج)
+CONTEXT_WINDOWS = {
+    'gpt-4': 8192,
+    'gpt-3.5-turbo': 16385,
+    'gemini-pro': 30720,
+    'abab5.5-chat': 16384,
+    'abab5.5s-chat': 8192,
+    'command-r': 128000,
+}
+DEFAULT_WINDOW = 128000
+
+SUMMARY_HEADER = "ملخص ما سبق في هذه المحادثة:"
+
+
+def estimate_tokens(text):
+    """تقدير محلي لعدد التوكنات: ~4 أحرف لاتينية أو ~2.5 حرف عربي لكل توكن"""
+    ascii_chars = len(text.encode('ascii', 'ignore'))
+    return ascii_chars // 4 + (len(text) - ascii_chars) * 2 // 5 + 1
+
+
+def message_tokens(message):
+    return estimate_tokens(message['content']) + MESSAGE_OVERHEAD
+
+
+def truncate_tokens(text, tokens, keep='start'):
+    """قص النص ليقارب tokens توكن (من البداية أو النهاية)"""
+    estimate = estimate_tokens(text)
+    if estimate <= tokens:
+        return text
+    size = max(0, len(text) * tokens // estimate)
+    return text[:size] + ' …' if keep == 'start' else '… ' + text[len(text) - size:]
+
+
+def context_budget(model_id, info=None, max_tokens=2000):
+    """ميزانية السياق: الأصغر بين AI_CONTEXT_BUDGET ونافذة النموذج بعد حجز الرد"""
+    window = (info or {}).get('context') or CONTEXT_WINDOWS.get(model_id, DEFAULT_WINDOW)
+    cap = int(os.getenv('AI_CONTEXT_BUDGET', 6000))
+    return max(0, min(cap, window - (max_tokens or 0)))
+
+
+def split_turns(history):
+    """تقسيم الرسائل إلى أدوار: رسالة المستخدم وما يليها من ردود (بالدور والنص فقط)"""
+    turns = []
+    for message in history:
+        if message.get('role') not in ('user', 'assistant') or not message.get('content'):
+            continue
+        clean = {'role': message['role'], 'content': message['content']}
+        if clean['role'] == 'user' or not turns:
+            turns.append([clean])
+        else:
+            turns[-1].append(clean)
+    return turns
+
+
+def summary_prompt(previous, messages, max_tokens):
+    """طلب تلخيص مجموعة أدوار فوق الملخص السابق"""
+    transcript = "\n".join(
+        f"{'المستخدم' if m['role'] == 'user' else 'المساعد'}: {truncate_tokens(m['content'], 1000)}"
+        for m in messages
+    )
+    earlier = f"الملخص السابق:\n{previous}\n\n" if previous else ""
+    return (
+        f"لخّص المحادثة التالية في أقل من {max_tokens} توكن، مع الإبقاء على الحقائق والقرارات "
+        f"والأسماء والأرقام المهمة، بدون مقدمات.\n\n{earlier}الأدوار الجديدة:\n{transcript}"
+    )
+
+
+def local_summary(previous, messages, max_tokens):
+    """ملخص محلي بلا نموذج: بداية كل رسالة، مع قص الأقدم عند تجاوز الحد"""
+    lines = [previous] if previous else []
+    for message in messages:
+        who = '👤' if message['role'] == 'user' else '🤖'
+        lines.append(f"{who} {truncate_tokens(' '.join(message['content'].split()), 40)}")
+    return truncate_tokens("\n".join(lines), max_tokens, keep='end')
+
+
+class ContextBuilder:
+    """بناء قائمة الرسائل لسؤال جديد من تاريخ المحادثة
+
+    summarize(prompt, max_tokens) -> نص: استدعاء نموذج سريع للتلخيص؛ إن لم يُمرر
+    أو فشل يُستخدم local_summary. الأدوار تُطوى في مجموعات من fold_turns دور
+    ليبقى حد الملخص ثابتاً بين الأسئلة فلا يُعاد حسابه.
+    """
+
+    def __init__(self, summarize=None, summary_tokens=None, fold_turns=None, path=None, max_entries=500):
+        self.summarize = summarize
+        self.summary_tokens = summary_tokens or int(os.getenv('AI_CONTEXT_SUMMARY_TOKENS', 400))
+        self.fold_turns = fold_turns or int(os.getenv('AI_CONTEXT_FOLD_TURNS', 4))
+        self.path = Path(path or os.getenv('AI_CONTEXT_SUMMARIES', Path.home() / "ai_workspace_summaries.json"))
+        self.max_entries = max_entries
+        self.summaries = OrderedDict()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self.load()
+
+    def build(self, history, prompt, budget, system=None):
+        """[system؟، الملخص؟، آخر الأدوار كما هي، السؤال] بما لا يتجاوز budget
+
+        الاستثناء الوحيد: آخر دور يُرسل كاملاً ولو تجاوز وحده الميزانية.
+        """
+        head = [{'role': 'system', 'content': system}] if system else []
+        question = {'role': 'user', 'content': prompt}
+        remaining = budget - message_tokens(question) - sum(message_tokens(m) for m in head)
+
+        turns = split_turns(history)
+        sizes = [sum(message_tokens(m) for m in turn) for turn in turns]
+        if sum(sizes) <= remaining:
+            return head + [m for turn in turns for m in turn] + [question]
+
+        # أحدث الأدوار التي تتسع مع حجز مساحة الملخص وعنوانه، ثم تقريب الحد للأسفل
+        # لمضاعف fold_turns حتى يبقى ثابتاً بين الأسئلة؛ آخر دور يبقى كما هو دائماً
+        limit = remaining - self.summary_tokens - estimate_tokens(SUMMARY_HEADER) - MESSAGE_OVERHEAD
+        kept = 0
+        tail = 0
+        while kept < len(turns) and tail + sizes[len(turns) - kept - 1] <= limit:
+            tail += sizes[len(turns) - kept - 1]
+            kept += 1
+        boundary = (len(turns) - max(kept, 1)) // self.fold_turns * self.fold_turns
+
+        # التقريب للأسفل يترك حتى fold_turns-1 دور زائد: تُطوى المجموعة التالية أيضاً،
+        # وإن لم يبق إلا أقل من مجموعة يُحذف أقدم الأدوار الباقية
+        tail = sum(sizes[boundary:])
+        while tail > limit and boundary + self.fold_turns < len(turns):
+            tail -= sum(sizes[boundary:boundary + self.fold_turns])
+            boundary += self.fold_turns
+        start = boundary
+        while tail > limit and start < len(turns) - 1:
+            tail -= sizes[start]
+            start += 1
+
+        messages = list(head)
+        summary = self.fit_summary(self.summary_for(turns[:boundary]), remaining - tail)
+        if summary:
+            messages.append({'role': 'system', 'content': summary})
+        return messages + [m for turn in turns[start:] for m in turn] + [question]
+
+    @staticmethod
+    def fit_summary(summary, space):
+        """رسالة الملخص بعنوانه مقصوصة (من البداية) لتتسع في space توكن، أو None"""
+        while summary:
+            content = f"{SUMMARY_HEADER}\n{summary}"
+            excess = estimate_tokens(content) + MESSAGE_OVERHEAD - space
+            if excess <= 0:
+                return content
+            target = estimate_tokens(summary) - excess - 2
+            summary = truncate_tokens(summary, target, keep='end') if target > 0 else ''
+        return None
+
+    def summary_for(self, turns):
+        """الملخص المتدحرج لأدوار مطوية (طولها مضاعف fold_turns)، مع التخزين حسب المحتوى
+
+        مفتاح كل مجموعة يشمل مفتاح ما قبلها، فيُستأنف من أطول بادئة مخزنة ويُلخص
+        الباقي في استدعاء واحد.
+        """
+        keys = []
+        chunks = []
+        key = ''
+        for start in range(0, len(turns), self.fold_turns):
+            messages = [m for turn in turns[start:start + self.fold_turns] for m in turn]
+            key = hashlib.sha1(
+                (key + json.dumps(messages, ensure_ascii=False, sort_keys=True)).encode('utf-8')
+            ).hexdigest()
+            keys.append(key)
+            chunks.append(messages)
+
+        previous = ''
+        done = 0
+        with self._lock:
+            for i in range(len(keys) - 1, -1, -1):
+                if keys[i] in self.summaries:
+                    previous = self.summaries[keys[i]]
+                    self.summaries.move_to_end(keys[i])
+                    done = i + 1
+                    break
+        if done == len(keys):
+            return previous
+        return self._summarize(previous, [m for chunk in chunks[done:] for m in chunk], keys[-1])
+
+    def _summarize(self, previous, messages, key):
+        if self.summarize is not None:
+            try:
+                text = self.summarize(summary_prompt(previous, messages, self.summary_tokens), self.summary_tokens)
+            except Exception:
+                text = None
+            if text:
+                text = truncate_tokens(text.strip(), self.summary_tokens)
+                with self._lock:
+                    self.summaries[key] = text
+                    while len(self.summaries) > self.max_entries:
+                        self.summaries.popitem(last=False)
+                self.save()
+                return text
+        # الملخص المحلي رخيص فلا يُخزن (يُجرب النموذج مرة أخرى لاحقاً)
+        return local_summary(previous, messages, self.summary_tokens)
+
+    def load(self):
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.summaries = OrderedDict(json.load(f))
+        except (OSError, ValueError):
+            self.summaries = OrderedDict()
+
+    def save(self):
+        try:
+            with self._save_lock:
+                with self._lock:
+                    data = json.dumps(self.summaries, ensure_ascii=False)
+                tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+                tmp.write_text(data, encoding='utf-8')
+                os.replace(tmp, self.path)
+        except OSError:
+            pass
@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🗂️ مخزن المحادثات المفهرس
+فهرس صغير للبيانات الوصفية (العنوان والوقت وعدد الرسائل والنماذج) يُقرأ عند الإقلاع،
+ونصوص المحادثات تُحمَّل عند الطلب مع حد أقصى للمحادثات المقيمة في الذاكرة (LRU)
+
+كل محادثة = لقطة <id>.json (نفس صيغة الملفات القديمة) + سجل إلحاق <id>.jsonl
+تُضاف إليه كل رسالة فور إنتاجها، ويُدمج السجل في اللقطة دورياً (compaction)
+والمحادثات الخاملة تُنقل إلى الأرشيف المضغوط (ai_archive) وتُقرأ منه بشفافية
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from ai_text import snippet, tokenize
+
+INDEX_NAME = "_index.json"
+
+
+def describe(conversation):
+    """البيانات الوصفية لمحادثة"""
+    messages = conversation.get('messages', [])
+    models = sorted({m['model'] for m in messages if m.get('model')})
+    return {
+        'title': conversation.get('title', 'محادثة'),
+        'timestamp': conversation.get('timestamp'),
+        'messages': len(messages),
+        'models': models,
+    }
+
+
+def _stat(path):
+    """(mtime, size) أو None إن لم يوجد الملف"""
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return [stat.st_mtime, stat.st_size]
+
+
+def _updated(meta):
+    """وقت آخر كتابة في ملفات المحادثة (من الفهرس)"""
+    return max((stat[0] for stat in (meta.get('snapshot'), meta.get('journal')) if stat), default=0.0)
+
+
+class ConversationStore:
+    """محادثات ~/ai_workspace_conversations بواجهة قريبة من القاموس
+
+    store[chat_id] يحمّل المحادثة عند أول وصول؛ len() و in و meta() تعمل من
+    الفهرس فقط. الرسائل تُلحق بالسجل فوراً (flush) ويُجمع fsync كل
+    fsync_every سجلات أو fsync_interval ثانية. المحادثات المؤرشفة (archive) تُقرأ
+    منه وتُستعاد للمجلد عند أول تعديل.
+    """
+
+    def __init__(self, directory, max_resident=None, fsync_every=None, fsync_interval=None, compact_every=None,
+                 archive=None):
+        self.directory = Path(directory)
+        self.archive = archive
+        self.directory.mkdir(exist_ok=True)
+        self.max_resident = max_resident or int(os.getenv('AI_CONVERSATIONS_RESIDENT', 8))
+        self.fsync_every = fsync_every or int(os.getenv('AI_JOURNAL_FSYNC_EVERY', 8))
+        self.fsync_interval = fsync_interval or float(os.getenv('AI_JOURNAL_FSYNC_INTERVAL', 1.0))
+        self.compact_every = compact_every or int(os.getenv('AI_JOURNAL_COMPACT_EVERY', 200))
+        self.index_file = self.directory / INDEX_NAME
+        self.index = {}
+        self._resident = OrderedDict()
+        # حالة سجل كل محادثة محملة: عدد السجلات والحجم السليم والملف المفتوح
+        self._journals = {}
+        self._index_dirty = False
+        self._lock = threading.RLock()
+        self._load_index()
+
+    # ---- الفهرس ----
+
+    def _load_index(self):
+        """قراءة الفهرس ثم مطابقته مع الملفات (stat فقط، ولا يُفتح إلا ما تغير)"""
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+
+        files = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name == INDEX_NAME:
+                    continue
+                if entry.name.endswith('.json'):
+                    chat_id, kind = entry.name[:-5], 'snapshot'
+                elif entry.name.endswith('.jsonl'):
+                    chat_id, kind = entry.name[:-6], 'journal'
+                else:
+                    continue
+                stat = entry.stat()
+                files.setdefault(chat_id, {'snapshot': None, 'journal': None})[kind] = [stat.st_mtime, stat.st_size]
+
+        changed = False
+        for chat_id, stats in files.items():
+            meta = self.index.get(chat_id)
+            if meta and meta.get('snapshot') == stats['snapshot'] and meta.get('journal') == stats['journal']:
+                continue
+            try:
+                conversation, _, _ = self._read(chat_id)
+            except (OSError, ValueError, KeyError):
+                continue
+            self.index[chat_id] = dict(describe(conversation), **stats)
+            changed = True
+
+        for chat_id in set(self.index) - set(files):
+            del self.index[chat_id]
+            changed = True
+        if changed:
+            self._write_index()
+
+    def _write_index(self):
+        """كتابة الفهرس بشكل ذري"""
+        tmp = self.index_file.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, ensure_ascii=False)
+        os.replace(tmp, self.index_file)
+        self._index_dirty = False
+
+    def _refresh_stats(self, chat_id):
+        """تحديث حجم ووقت ملفات المحادثة في الفهرس بعد الكتابة"""
+        meta = self.index[chat_id]
+        meta['snapshot'] = _stat(self._path(chat_id))
+        meta['journal'] = _stat(self._journal_path(chat_id))
+        self._index_dirty = True
+
+    def _path(self, chat_id):
+        return self.directory / f"{chat_id}.json"
+
+    def _journal_path(self, chat_id):
+        return self.directory / f"{chat_id}.jsonl"
+
+    def _read(self, chat_id):
+        """اللقطة (أو الملف القديم) ثم إعادة تشغيل السجل
+
+        يُرجع (المحادثة، عدد سجلات السجل، الحجم السليم منه). السطر الأخير
+        غير المكتمل (انقطاع أثناء الكتابة) يُتجاهل ويُقتطع عند أول إلحاق.
+        """
+        conversation = None
+        snapshot = self._path(chat_id)
+        if snapshot.exists():
+            with open(snapshot, 'r', encoding='utf-8') as f:
+                conversation = json.load(f)
+
+        records = 0
+        valid_size = 0
+        journal = self._journal_path(chat_id)
+        if journal.exists():
+            with open(journal, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    records += 1
+                    valid_size += len(line)
+                    if record['op'] == 'meta':
+                        if conversation is None:
+                            conversation = dict(record['data'], messages=[])
+                    elif record['op'] == 'message':
+                        messages = conversation.setdefault('messages', [])
+                        # الرسائل المدمجة في اللقطة سابقاً لا تُكرر
+                        if record['seq'] >= len(messages):
+                            messages.append(record['data'])
+
+        if conversation is None:
+            raise KeyError(chat_id)
+        return conversation, records, valid_size
+
+    # ---- الذاكرة المقيمة ----
+
+    def _touch(self, chat_id, conversation):
+        """وضع المحادثة في آخر LRU وطرد الأقدم (مع إغلاق سجله)"""
+        self._resident[chat_id] = conversation
+        self._resident.move_to_end(chat_id)
+        while len(self._resident) > self.max_resident:
+            old_id = next(iter(self._resident))
+            self._close_journal(old_id)
+            self._resident.pop(old_id, None)
+
+    def __getitem__(self, chat_id):
+        with self._lock:
+            conversation = self._resident.get(chat_id)
+            if conversation is None:
+                if chat_id not in self.index:
+                    if self.archive is None:
+                        raise KeyError(chat_id)
+                    # قراءة فقط: تبقى في الأرشيف ما لم تُعدّل
+                    return self.archive.get(chat_id)
+                conversation, records, valid_size = self._read(chat_id)
+                self._journals[chat_id] = {'file': None, 'records': records, 'size': valid_size,
+                                           'pending': 0, 'synced': time.monotonic()}
+            self._touch(chat_id, conversation)
+            return conversation
+
+    def __setitem__(self, chat_id, conversation):
+        """إنشاء محادثة: يُكتب سجل meta ثم الرسائل الموجودة"""
+        with self._lock:
+            self.index[chat_id] = describe(conversation)
+            self._journals[chat_id] = {'file': None, 'records': 0, 'size': 0,
+                                       'pending': 0, 'synced': time.monotonic()}
+            self._touch(chat_id, conversation)
+            meta = {key: value for key, value in conversation.items() if key != 'messages'}
+            self._append(chat_id, {'op': 'meta', 'data': meta})
+            for seq, message in enumerate(conversation.get('messages', [])):
+                self._append(chat_id, {'op': 'message', 'seq': seq, 'data': message})
+
+    def get(self, chat_id, default=None):
+        try:
+            return self[chat_id]
+        except KeyError:
+            return default
+
+    def __contains__(self, chat_id):
+        return chat_id in self.index or (self.archive is not None and chat_id in self.archive)
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        if self.archive is None:
+            return list(self.index)
+        return [chat_id for chat_id in self.archive.keys() if chat_id not in self.index] + list(self.index)
+
+    def resident(self):
+        """معرفات المحادثات المحملة حالياً"""
+        return list(self._resident)
+
+    # ---- السجل ----
+
+    def _journal_file(self, chat_id):
+        """ملف السجل مفتوحاً للإلحاق (بعد اقتطاع أي سطر غير مكتمل)"""
+        state = self._journals[chat_id]
+        if state['file'] is None:
+            f = open(self._journal_path(chat_id), 'ab')
+            if f.tell() > state['size']:
+                f.truncate(state['size'])
+            state['file'] = f
+        return state['file']
+
+    def _append(self, chat_id, record):
+        state = self._journals[chat_id]
+        line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+        f = self._journal_file(chat_id)
+        f.write(line)
+        f.flush()
+        state['records'] += 1
+        state['size'] += len(line)
+        state['pending'] += 1
+        if state['pending'] >= self.fsync_every or time.monotonic() - state['synced'] >= self.fsync_interval:
+            self._sync(chat_id)
+
+    def _sync(self, chat_id):
+        state = self._journals.get(chat_id)
+        if state and state['file'] is not None and state['pending']:
+            os.fsync(state['file'].fileno())
+            state['pending'] = 0
+            state['synced'] = time.monotonic()
+
+    def _close_journal(self, chat_id):
+        self._sync(chat_id)
+        state = self._journals.pop(chat_id, None)
+        if state and state['file'] is not None:
+            state['file'].close()
+        if chat_id in self.index:
+            self._refresh_stats(chat_id)
+
+    # ---- التعديل والحفظ ----
+
+    def _restore(self, chat_id):
+        """إعادة محادثة مؤرشفة إلى المجلد (لقطة كاملة) قبل تعديلها"""
+        if chat_id in self.index or self.archive is None or chat_id not in self.archive:
+            return
+        conversation = self.archive.get(chat_id)
+        self.index[chat_id] = describe(conversation)
+        self._journals[chat_id] = {'file': None, 'records': 0, 'size': 0,
+                                   'pending': 0, 'synced': time.monotonic()}
+        self._touch(chat_id, conversation)
+        self.compact(chat_id)
+        self.archive.remove(chat_id)
+
+    def archive_idle(self, days, batch=50):
+        """نقل المحادثات التي لم تُكتب منذ days يوماً إلى الأرشيف
+
+        الأرشيف يُثبَّت على القرص قبل حذف الملفات، فالانقطاع بينهما يترك نسخة
+        مكررة فقط (النسخة في المجلد هي المعتمدة).
+        """
+        if self.archive is None:
+            return 0
+        cutoff = time.time() - days * 86400
+        with self._lock:
+            idle = [chat_id for chat_id, meta in self.index.items()
+                    if chat_id not in self._resident and _updated(meta) < cutoff]
+        moved = 0
+        for start in range(0, len(idle), batch):
+            with self._lock:
+                items = []
+                for chat_id in idle[start:start + batch]:
+                    meta = self.index.get(chat_id)
+                    if meta is None or chat_id in self._resident:
+                        continue
+                    try:
+                        conversation, _, _ = self._read(chat_id)
+                    except (OSError, ValueError, KeyError):
+                        continue
+                    items.append((chat_id, conversation, _updated(meta)))
+                self.archive.put_many(items)
+                for chat_id, _, _ in items:
+                    for path in (self._path(chat_id), self._journal_path(chat_id)):
+                        try:
+                            path.unlink()
+                        except FileNotFoundError:
+                            pass
+                    del self.index[chat_id]
+                self._write_index()
+                moved += len(items)
+        return moved
+
+    def append_message(self, chat_id, message):
+        """إلحاق رسالة بالسجل وبالمحادثة وتحديث بياناتها الوصفية"""
+        with self._lock:
+            self._restore(chat_id)
+            conversation = self[chat_id]
+            messages = conversation.setdefault('messages', [])
+            self._append(chat_id, {'op': 'message', 'seq': len(messages), 'data': message})
+            messages.append(message)
+
+            meta = self.index[chat_id]
+            meta['messages'] = len(messages)
+            if message.get('model') and message['model'] not in meta['models']:
+                meta['models'] = sorted(meta['models'] + [message['model']])
+            self._index_dirty = True
+
+            if self._journals[chat_id]['records'] >= self.compact_every:
+                self.compact(chat_id)
+
+    def append_messages(self, chat_id, messages):
+        for message in messages:
+            self.append_message(chat_id, message)
+
+    def compact(self, chat_id):
+        """دمج السجل في لقطة جديدة (كتابة ذرية) ثم تفريغ السجل"""
+        with self._lock:
+            conversation = self[chat_id]
+            path = self._path(chat_id)
+            tmp = path.with_suffix('.tmp')
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(conversation, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+
+            # لو انقطع التنفيذ هنا فالسجل القديم يُعاد تشغيله بلا تكرار (seq)
+            state = self._journals[chat_id]
+            if state['file'] is not None:
+                state['file'].close()
+            with open(self._journal_path(chat_id), 'wb') as f:
+                os.fsync(f.fileno())
+            state.update(file=None, records=0, size=0, pending=0, synced=time.monotonic())
+            self._refresh_stats(chat_id)
+            self._write_index()
+
+    def save(self, chat_id, conversation=None):
+        """تثبيت السجل على القرص وتحديث الفهرس
+
+        الرسائل تُكتب فور إلحاقها، لذا الحفظ لا يعيد كتابة المحادثة. إن مُرّرت
+        محادثة مختلفة عن المحملة (أو غير موجودة) تُكتب كلقطة كاملة.
+        """
+        with self._lock:
+            self._restore(chat_id)
+            if conversation is not None and self._resident.get(chat_id) is not conversation:
+                self.index[chat_id] = describe(conversation)
+                self._journals.setdefault(chat_id, {'file': None, 'records': 0, 'size': 0,
+                                                    'pending': 0, 'synced': time.monotonic()})
+                self._touch(chat_id, conversation)
+                self.compact(chat_id)
+                return
+            if chat_id not in self._journals:
+                return
+            self._sync(chat_id)
+            self._refresh_stats(chat_id)
+            self._write_index()
+
+    def flush(self):
+        """تثبيت كل السجلات المفتوحة وكتابة الفهرس"""
+        with self._lock:
+            for chat_id in list(self._journals):
+                self._sync(chat_id)
+                self._refresh_stats(chat_id)
+            if self._index_dirty:
+                self._write_index()
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            for chat_id in list(self._journals):
+                self._close_journal(chat_id)
+
+    # ---- الاستعلام من الفهرس ----
+
+    def meta(self, chat_id):
+        meta = self.index.get(chat_id)
+        if meta is None and self.archive is not None:
+            return self.archive.meta(chat_id)
+        return meta
+
+    def recent(self, limit=20):
+        """أحدث المحادثات (بيانات وصفية فقط؛ المؤرشفة خاملة فلا تظهر هنا)"""
+        rows = sorted(self.index.items(), key=lambda item: item[1].get('timestamp') or '', reverse=True)
+        return [dict(meta, id=chat_id) for chat_id, meta in rows[:limit]]
+
+    def total_messages(self):
+        total = sum(meta['messages'] for meta in self.index.values())
+        if self.archive is not None:
+            total += self.archive.total_messages()
+        return total
+
+    def search(self, query, limit=20):
+        """بحث خطي في كل المحادثات (بدون فهرس؛ الواجهة SQLite أسرع بكثير)"""
+        terms = tokenize(query)
+        if not terms:
+            return []
+        results = []
+        for chat_id in list(self.index):
+            try:
+                conversation, _, _ = self._read(chat_id)
+            except (OSError, ValueError, KeyError):
+                continue
+            for seq, message in enumerate(conversation.get('messages', [])):
+                tokens = tokenize(message.get('content', ''))
+                score = sum(1 for term in terms for token in tokens if token.startswith(term))
+                if score and all(any(token.startswith(term) for token in tokens) for term in terms):
+                    results.append({
+                        'conversation_id': chat_id, 'seq': seq, 'title': conversation.get('title'),
+                        'role': message['role'], 'model': message.get('model'),
+                        'timestamp': message.get('timestamp'),
+                        'snippet': snippet(message['content'], terms), 'score': score,
+                    })
+        if self.archive is not None:
+            results.extend(self.archive.search(query, limit))
+        results.sort(key=lambda result: result['score'], reverse=True)
+        return results[:limit]
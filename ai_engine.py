@@ -0,0 +1,773 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+⚡ محرك المزودين غير المتزامن
+واجهة asyncio موحدة لجميع مزودي النماذج مع محول لكل نوع عميل
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import timedelta
+
+from ai_context import estimate_tokens
+from ai_flight import AsyncSingleFlight, flight_key
+from ai_lazy import STARTUP, timed_import
+
+# أقل مقدمة (بالتوكن) تستحق التعليم للتخزين لدى المزود
+PROMPT_CACHE_MIN_TOKENS = int(os.getenv('AI_PROMPT_CACHE_MIN_TOKENS', 1024))
+
+
+def make_usage(prompt_tokens, completion_tokens, cached_tokens=None):
+    """توحيد حقول الاستخدام من المزودين
+
+    prompt_tokens يشمل المقروء من ذاكرة المزود، و cached_tokens هو ذلك الجزء.
+    """
+    if prompt_tokens is None and completion_tokens is None:
+        return None
+    usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens}
+    if cached_tokens is not None:
+        usage['cached_tokens'] = cached_tokens
+    return usage
+
+
+class ProviderAdapter:
+    """محول أساسي لمزود واحد - يُنشئ العميل غير المتزامن عند أول استدعاء"""
+
+    client_type = None
+    key_name = None
+
+    def __init__(self, keys):
+        self.keys = keys
+        self._client = None
+
+    @property
+    def api_key(self):
+        return self.keys.get(self.key_name or self.client_type)
+
+    def build_client(self):
+        """إنشاء العميل غير المتزامن"""
+        raise NotImplementedError
+
+    @property
+    def client(self):
+        if self._client is None:
+            start = time.perf_counter()
+            self._client = self.build_client()
+            STARTUP.record('client', f"{self.client_type} (async)", time.perf_counter() - start)
+        return self._client
+
+    async def achat(self, model_id, messages, **params):
+        """إرسال رسائل للنموذج وإرجاع النتيجة"""
+        raise NotImplementedError
+
+    async def astream(self, model_id, messages, **params):
+        """بث الرد قطعة قطعة (الافتراضي: الرد كاملاً دفعة واحدة)
+
+        قد تكون آخر قطعة قاموس {'usage': ...} يلتقطه المحرك ولا يمرره.
+        """
+        result = await self.achat(model_id, messages, **params)
+        yield result['text']
+        if result.get('usage'):
+            yield {'usage': result['usage']}
+
+    async def aclose(self):
+        """إغلاق العميل وتحرير الاتصالات"""
+        close = getattr(self._client, 'close', None)
+        if close is not None:
+            result = close()
+            if asyncio.iscoroutine(result):
+                await result
+        self._client = None
+
+
+class OpenAIAdapter(ProviderAdapter):
+    """محول OpenAI وكل الواجهات المتوافقة معه"""
+
+    client_type = 'openai'
+    base_url = None
+    # طلب حقل الاستخدام في آخر قطعة من البث (غير مدعوم في كل الواجهات المتوافقة)
+    stream_usage = True
+
+    def build_client(self):
+        AsyncOpenAI = timed_import('openai').AsyncOpenAI
+        if self.base_url:
+            return AsyncOpenAI(api_key=self.api_key, base_url=self.base_url)
+        return AsyncOpenAI(api_key=self.api_key)
+
+    @staticmethod
+    def _request(model_id, messages, params):
+        # OpenAI يخزن البادئات الطويلة تلقائياً؛ الرسائل مرتبة من الأثبت (system) للأحدث
+        return {
+            'model': model_id,
+            'messages': messages,
+            'max_tokens': params.get('max_tokens', 2000),
+            'temperature': params.get('temperature', 0.7),
+        }
+
+    @staticmethod
+    def _usage(usage):
+        details = getattr(usage, 'prompt_tokens_details', None)
+        return make_usage(usage.prompt_tokens, usage.completion_tokens, getattr(details, 'cached_tokens', None))
+
+    async def achat(self, model_id, messages, **params):
+        response = await self.client.chat.completions.create(**self._request(model_id, messages, params))
+        usage = getattr(response, 'usage', None)
+        return {
+            'text': response.choices[0].message.content,
+            'model': model_id,
+            'client': self.client_type,
+            'usage': usage and self._usage(usage),
+        }
+
+    async def astream(self, model_id, messages, **params):
+        request = self._request(model_id, messages, params)
+        if self.stream_usage:
+            request['stream_options'] = {'include_usage': True}
+        stream = await self.client.chat.completions.create(stream=True, **request)
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            if getattr(chunk, 'usage', None):
+                yield {'usage': self._usage(chunk.usage)}
+
+
+class GroqAdapter(OpenAIAdapter):
+    """محول Groq (واجهة متوافقة مع OpenAI)"""
+
+    client_type = 'groq'
+    base_url = "https://api.groq.com/openai/v1"
+    stream_usage = False
+
+
+class CohereAdapter(OpenAIAdapter):
+    """محول Cohere عبر واجهة التوافق مع OpenAI"""
+
+    client_type = 'cohere'
+    base_url = "https://api.cohere.ai/compatibility/v1"
+    stream_usage = False
+
+
+class GoogleAdapter(ProviderAdapter):
+    """محول Google Gemini"""
+
+    client_type = 'google'
+
+    def __init__(self, keys):
+        super().__init__(keys)
+        # ذاكرة Gemini الصريحة للتعليمات الكبيرة: (نموذج، بصمة) -> (المحتوى المخزن، انتهاء)
+        self._caches = {}
+        self.cache_min_tokens = int(os.getenv('AI_GEMINI_CACHE_MIN_TOKENS', 32768))
+        self.cache_ttl = int(os.getenv('AI_GEMINI_CACHE_TTL', 3600))
+
+    def build_client(self):
+        try:
+            genai = timed_import('google.generativeai')
+        except ImportError:
+            raise Exception("مكتبة google-generativeai غير مثبتة")
+        genai.configure(api_key=self.api_key)
+        return genai
+
+    @staticmethod
+    def to_contents(messages):
+        """تحويل الرسائل لصيغة Gemini"""
+        system = "\n\n".join(m['content'] for m in messages if m['role'] == 'system')
+        contents = [
+            {'role': 'model' if m['role'] == 'assistant' else 'user', 'parts': [m['content']]}
+            for m in messages if m['role'] != 'system'
+        ]
+        return system or None, contents
+
+    def _model(self, model_id, system):
+        if system:
+            return self.client.GenerativeModel(model_id, system_instruction=system)
+        return self.client.GenerativeModel(model_id)
+
+    async def _amodel(self, model_id, system):
+        """النموذج مع التعليمات من ذاكرة Gemini إن كانت كبيرة كفاية (وإلا عادي)"""
+        if system and estimate_tokens(system) >= self.cache_min_tokens:
+            cached = await self._cached_content(model_id, system)
+            if cached is not None:
+                return self.client.GenerativeModel.from_cached_content(cached_content=cached)
+        return self._model(model_id, system)
+
+    async def _cached_content(self, model_id, system):
+        key = (model_id, hashlib.sha1(system.encode('utf-8')).hexdigest())
+        now = time.time()
+        entry = self._caches.get(key)
+        if entry and entry[1] > now:
+            return entry[0]
+        try:
+            content = await asyncio.to_thread(
+                self.client.caching.CachedContent.create,
+                model=f"models/{model_id}", system_instruction=system, ttl=timedelta(seconds=self.cache_ttl),
+            )
+            expires = now + self.cache_ttl - 60
+        except Exception:
+            # نموذج أو إصدار مكتبة لا يدعم التخزين: لا إعادة محاولة قبل انتهاء المدة
+            content = None
+            expires = now + self.cache_ttl
+        self._caches[key] = (content, expires)
+        return content
+
+    @staticmethod
+    def _config(params):
+        config = {}
+        if 'max_tokens' in params:
+            config['max_output_tokens'] = params['max_tokens']
+        if 'temperature' in params:
+            config['temperature'] = params['temperature']
+        return config or None
+
+    async def achat(self, model_id, messages, **params):
+        system, contents = self.to_contents(messages)
+        model = await self._amodel(model_id, system)
+        response = await model.generate_content_async(contents, generation_config=self._config(params))
+        return {
+            'text': response.text,
+            'model': model_id,
+            'client': self.client_type,
+            'usage': self._usage(response),
+        }
+
+    @staticmethod
+    def _usage(response):
+        metadata = getattr(response, 'usage_metadata', None)
+        if metadata is None:
+            return None
+        return make_usage(metadata.prompt_token_count, metadata.candidates_token_count,
+                          getattr(metadata, 'cached_content_token_count', None))
+
+    async def astream(self, model_id, messages, **params):
+        system, contents = self.to_contents(messages)
+        model = await self._amodel(model_id, system)
+        response = await model.generate_content_async(
+            contents, generation_config=self._config(params), stream=True
+        )
+        usage = None
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+            # كل قطعة تحمل العدد التراكمي، والأخيرة هي الكاملة
+            usage = self._usage(chunk) or usage
+        if usage:
+            yield {'usage': usage}
+
+    async def aclose(self):
+        # مكتبة Google تستخدم إعداداً عاماً ولا تحتاج إغلاقاً
+        self._client = None
+
+
+class AnthropicAdapter(ProviderAdapter):
+    """محول Anthropic Claude"""
+
+    client_type = 'anthropic'
+
+    def build_client(self):
+        return timed_import('anthropic').AsyncAnthropic(api_key=self.api_key)
+
+    @staticmethod
+    def _cached_block(text):
+        return [{'type': 'text', 'text': text, 'cache_control': {'type': 'ephemeral'}}]
+
+    @classmethod
+    def _request(cls, model_id, messages, params):
+        """الطلب مع نقاط تخزين المقدمة: التعليمات، ثم آخر الأدوار السابقة للسؤال
+
+        المقدمة لا تُعلَّم إلا إن بلغت PROMPT_CACHE_MIN_TOKENS (أقل منها لا يُخزن).
+        """
+        systems = [m['content'] for m in messages if m['role'] == 'system']
+        history = [m for m in messages if m['role'] != 'system']
+        request = {
+            'model': model_id,
+            'max_tokens': params.get('max_tokens', 2000),
+            'messages': history,
+        }
+        prefix = sum(estimate_tokens(text) for text in systems)
+        if systems and estimate_tokens(systems[0]) >= PROMPT_CACHE_MIN_TOKENS:
+            # أول تعليمات (ملف أو توجيه ثابت) كتلة مستقلة حتى لا يُبطل تغيّرُ الملخص بعدها تخزينَها
+            request['system'] = cls._cached_block(systems[0]) + [{'type': 'text', 'text': t} for t in systems[1:]]
+        elif systems:
+            request['system'] = "\n\n".join(systems)
+        if len(history) > 1 and all(isinstance(m['content'], str) for m in history[:-1]):
+            prefix += sum(estimate_tokens(m['content']) for m in history[:-1])
+            if prefix >= PROMPT_CACHE_MIN_TOKENS:
+                last = history[-2]
+                request['messages'] = history[:-2] + [
+                    {'role': last['role'], 'content': cls._cached_block(last['content'])}, history[-1]
+                ]
+        if 'temperature' in params:
+            request['temperature'] = params['temperature']
+        return request
+
+    @staticmethod
+    def _usage(usage):
+        """input_tokens لا يشمل المقروء من الذاكرة ولا المكتوب فيها؛ نجمعها"""
+        read = getattr(usage, 'cache_read_input_tokens', None) or 0
+        written = getattr(usage, 'cache_creation_input_tokens', None) or 0
+        return make_usage(usage.input_tokens + read + written, usage.output_tokens, read)
+
+    async def achat(self, model_id, messages, **params):
+        response = await self.client.messages.create(**self._request(model_id, messages, params))
+        return {
+            'text': response.content[0].text,
+            'model': model_id,
+            'client': self.client_type,
+            'usage': self._usage(response.usage),
+        }
+
+    async def astream(self, model_id, messages, **params):
+        async with self.client.messages.stream(**self._request(model_id, messages, params)) as stream:
+            async for text in stream.text_stream:
+                yield text
+            final = await stream.get_final_message()
+            yield {'usage': self._usage(final.usage)}
+
+
+class MiniMaxAdapter(ProviderAdapter):
+    """محول MiniMax عبر REST"""
+
+    client_type = 'minimax'
+
+    def build_client(self):
+        from ai_transport import get_transport
+        return get_transport()
+
+    def _post(self, messages, **params):
+        headers = {
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json'
+        }
+        data = {
+            'model': 'minimax-m2',
+            'messages': messages,
+            'max_tokens': params.get('max_tokens', 2000),
+            'temperature': params.get('temperature', 0.7)
+        }
+        response = self.client.post(
+            f"https://api.minimax.io/v1/text/chatcompletion?GroupId={self.keys.get('minimax_group_id')}",
+            headers=headers,
+            json=data,
+            timeout=30
+        )
+        return response.json()
+
+    async def achat(self, model_id, messages, **params):
+        data = await asyncio.to_thread(self._post, messages, **params)
+        usage = data.get('usage') or {}
+        return {
+            'text': data['choices'][0]['message']['content'],
+            'model': model_id,
+            'client': self.client_type,
+            'usage': make_usage(usage.get('prompt_tokens'), usage.get('completion_tokens')),
+        }
+
+    async def aclose(self):
+        self._client = None
+
+
+class EchoAdapter(ProviderAdapter):
+    """نموذج وهمي يعيد السؤال بعد AI_ECHO_DELAY ثانية (لقياس الخوادم بدون مفاتيح أو تكلفة)"""
+
+    client_type = 'echo'
+
+    def build_client(self):
+        return None
+
+    @staticmethod
+    def delay():
+        return float(os.getenv('AI_ECHO_DELAY', 1.0))
+
+    async def achat(self, model_id, messages, **params):
+        await asyncio.sleep(self.delay())
+        text = messages[-1]['content']
+        return {
+            'text': text,
+            'model': model_id,
+            'client': self.client_type,
+            'usage': make_usage(estimate_tokens(text), estimate_tokens(text)),
+        }
+
+    @staticmethod
+    def words(text):
+        """قطع البث: كلمة لكل قطعة"""
+        return [word if i == 0 else ' ' + word for i, word in enumerate(text.split(' '))]
+
+    async def astream(self, model_id, messages, **params):
+        words = self.words(messages[-1]['content'])
+        for word in words:
+            await asyncio.sleep(self.delay() / len(words))
+            yield word
+
+
+# يُضاف لقائمة النماذج عند تعيين AI_ECHO_MODEL (انظر ai_asgi.py و bench_server.py)
+ECHO_MODEL = 'echo'
+ECHO_INFO = {'name': 'Echo', 'client': 'echo', 'desc': '🧪 للقياس فقط', 'tier': 'fast'}
+
+ADAPTERS = {
+    adapter.client_type: adapter
+    for adapter in (OpenAIAdapter, GroqAdapter, CohereAdapter, GoogleAdapter, AnthropicAdapter, MiniMaxAdapter,
+                    EchoAdapter)
+}
+
+
+class ProviderEngine:
+    """محرك غير متزامن يوزع الطلبات على محول كل مزود"""
+
+    def __init__(self, keys, models, timeout=60, hedge_delay=2.0, router=None, metrics=None, ledger=None):
+        self.keys = keys
+        self.models = models
+        self.timeout = timeout
+        self.default_hedge_delay = hedge_delay
+        # LatencyRouter اختياري يستقبل كل عينة زمن وكل خطأ
+        self.router = router
+        # CallMetrics اختياري يستقبل قياسات كل استدعاء
+        self.metrics = metrics
+        # Ledger اختياري يسجل توكنات وتكلفة كل استدعاء
+        self.ledger = ledger
+        # الطلبات المتطابقة المتزامنة تشترك في استدعاء واحد للمزود
+        self.flights = AsyncSingleFlight()
+        self.adapters = {}
+        self.samples = {}
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def adapter_for(self, client_type):
+        """الحصول على محول نوع العميل (يُنشأ مرة واحدة)"""
+        adapter = self.adapters.get(client_type)
+        if adapter is None:
+            if client_type not in ADAPTERS:
+                raise Exception(f"نوع العميل غير مدعوم: {client_type}")
+            adapter = self.adapters[client_type] = ADAPTERS[client_type](self.keys)
+        return adapter
+
+    async def achat(self, model_id, messages, **params):
+        """دردشة غير متزامنة مع نموذج محدد (طلب مطابق جارٍ يُنتظر بدل تكراره)"""
+        if model_id not in self.models:
+            raise ValueError(f"النموذج {model_id} غير متوفر")
+
+        key = flight_key(model_id, messages, params)
+        result, shared = await self.flights.call(key, lambda: self._achat(model_id, messages, **params))
+        if shared:
+            self.observe_coalesced(model_id)
+        return dict(result)
+
+    async def _achat(self, model_id, messages, **params):
+        adapter = self.adapter_for(self.models[model_id]['client'])
+        timeout = params.pop('timeout', self.timeout)
+        queued_at = params.pop('queued_at', None)
+        conversation_id = params.pop('conversation_id', None)
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(adapter.achat(model_id, messages, **params), timeout)
+        except Exception:
+            self.observe_error(model_id)
+            raise
+        latency = time.perf_counter() - start
+        self.observe(model_id, 'latency', latency)
+        self.record_call(model_id, messages, result['text'], result.get('usage'), queued_at, start, latency,
+                         conversation_id=conversation_id)
+        return result
+
+    async def astream(self, model_id, messages, **params):
+        """بث الرد من نموذج محدد قطعة قطعة
+
+        المنضم لبث مطابق جارٍ يستلم القطع التي وصلت حتى الآن ثم يتابع معه.
+        """
+        if model_id not in self.models:
+            raise ValueError(f"النموذج {model_id} غير متوفر")
+
+        key = flight_key(model_id, messages, params)
+        chunks, shared = self.flights.stream(key, lambda: self._astream(model_id, messages, **params))
+        if shared:
+            self.observe_coalesced(model_id)
+        try:
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            await chunks.aclose()
+
+    async def _astream(self, model_id, messages, **params):
+        adapter = self.adapter_for(self.models[model_id]['client'])
+        queued_at = params.pop('queued_at', None)
+        conversation_id = params.pop('conversation_id', None)
+        start = time.perf_counter()
+        ttft = None
+        usage = None
+        size = 0
+        chunks = 0
+        stream = adapter.astream(model_id, messages, **params)
+        try:
+            async for chunk in stream:
+                if isinstance(chunk, dict):
+                    usage = chunk.get('usage') or usage
+                    continue
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                    self.observe(model_id, 'ttft', ttft)
+                size += len(chunk.encode('utf-8'))
+                chunks += 1
+                yield chunk
+        except Exception:
+            self.observe_error(model_id)
+            raise
+        finally:
+            # عند ترك البث مبكراً يُغلق اتصال المزود الآن لا عند جمع القمامة
+            await stream.aclose()
+        latency = time.perf_counter() - start
+        self.observe(model_id, 'latency', latency)
+        self.record_call(model_id, messages, size, usage, queued_at, start, latency, ttft, streamed=chunks > 1,
+                         conversation_id=conversation_id)
+
+    # ---- عينات الأزمنة ----
+
+    def observe(self, model_id, kind, seconds):
+        """تسجيل عينة زمن (latency أو ttft) لنموذج"""
+        model_samples = self.samples.setdefault(model_id, {})
+        model_samples.setdefault(kind, deque(maxlen=200)).append(seconds)
+        if self.router:
+            self.router.record(model_id, **{kind: seconds})
+
+    def observe_coalesced(self, model_id):
+        """طلب انضم لاستدعاء مطابق جارٍ: لا زمن ولا تكلفة له، فقط عدّاد"""
+        if self.metrics:
+            self.metrics.record_coalesced(model_id)
+
+    def observe_error(self, model_id):
+        """تسجيل فشل استدعاء (يشمل انتهاء المهلة) في الموجّه والقياسات"""
+        if self.router:
+            self.router.record(model_id, error=True)
+        if self.metrics:
+            self.metrics.record_error(model_id)
+
+    def record_call(self, model_id, messages, response, usage, queued_at, start, latency, ttft=None,
+                    streamed=False, conversation_id=None):
+        """تسجيل قياسات استدعاء ناجح: الأحجام والتوكنات والانتظار والأزمنة والمعدل
+
+        response: نص الرد أو حجمه بالبايت (في البث).
+        """
+        usage = usage or {}
+        if self.ledger:
+            try:
+                self.ledger.record_chat(model_id, messages, response, usage, latency, conversation_id)
+            except OSError:
+                # السجل محاسبي فقط؛ فشل الكتابة لا يُفشل الرد
+                pass
+        if not self.metrics:
+            return
+        completion_tokens = usage.get('completion_tokens')
+        # معدل التوليد بعد أول قطعة في البث الفعلي، وعلى الزمن الكلي إن وصل الرد دفعة واحدة
+        generation = latency - ttft if streamed else latency
+        self.metrics.record(
+            model_id,
+            request_bytes=len(json.dumps(messages, ensure_ascii=False).encode('utf-8')),
+            response_bytes=response if isinstance(response, int) else len(response.encode('utf-8')),
+            prompt_tokens=usage.get('prompt_tokens'),
+            cached_tokens=usage.get('cached_tokens'),
+            completion_tokens=completion_tokens,
+            queue_wait=start - queued_at if queued_at is not None else None,
+            ttft=ttft,
+            latency=latency,
+            tokens_per_sec=completion_tokens / generation if completion_tokens and generation > 0 else None,
+        )
+
+    def percentile(self, model_id, kind='latency', q=0.9):
+        """النسبة المئوية q من العينات المسجلة أو None إن لم توجد"""
+        values = sorted(self.samples.get(model_id, {}).get(kind, ()))
+        if not values:
+            return None
+        return values[min(int(q * len(values)), len(values) - 1)]
+
+    def hedge_delay(self, model_id, kind='latency'):
+        """مدة الانتظار قبل إطلاق النموذج التالي في السباق (p90 الملاحظ)"""
+        p90 = self.percentile(model_id, kind, 0.9)
+        return p90 if p90 is not None else self.default_hedge_delay
+
+    async def afanout(self, model_ids, messages, deadline=None, on_token=None, **params):
+        """إرسال نفس الرسائل لعدة نماذج بالتوازي مع مهلة لكل نموذج
+
+        on_token(model_id, chunk) يُستدعى مع كل قطعة تصل. يُرجع قاموساً لكل
+        نموذج فيه النص (ولو جزئياً) وزمن أول قطعة والزمن الكلي والخطأ إن وجد.
+        """
+        deadline = deadline or self.timeout
+
+        async def run_one(model_id):
+            result = {'model': model_id, 'text': '', 'ttft': None, 'latency': None, 'error': None}
+            parts = []
+            start = time.perf_counter()
+
+            async def consume():
+                async for chunk in self.astream(model_id, messages, **params):
+                    if result['ttft'] is None:
+                        result['ttft'] = time.perf_counter() - start
+                    parts.append(chunk)
+                    if on_token:
+                        on_token(model_id, chunk)
+
+            try:
+                await asyncio.wait_for(consume(), deadline)
+            except asyncio.TimeoutError:
+                result['error'] = f"تجاوز المهلة ({deadline:.0f} ث)"
+            except Exception as e:
+                result['error'] = str(e)
+
+            result['latency'] = time.perf_counter() - start
+            result['text'] = ''.join(parts)
+            return result
+
+        results = await asyncio.gather(*(run_one(model_id) for model_id in model_ids))
+        return {result['model']: result for result in results}
+
+    async def arace(self, model_ids, messages, hedge=True, first_token=False, **params):
+        """سباق بين نماذج متكافئة وإرجاع أول رد ثم إلغاء الباقي
+
+        hedge=False يطلق الجميع معاً، وhedge=True يطلق النموذج التالي فقط إذا
+        تأخر السابق أكثر من p90 الملاحظ له. first_token=True يجعل الفائز أول
+        من يرسل قطعة، ثم يُكمل بث رده.
+        """
+        queue = list(model_ids)
+        kind = 'ttft' if first_token else 'latency'
+        tasks = {}
+        launched = []
+        errors = {}
+        start = time.perf_counter()
+
+        async def attempt(model_id):
+            if not first_token:
+                result = await self.achat(model_id, messages, **params)
+                return result['text'], None
+            stream = self.astream(model_id, messages, **params)
+            try:
+                chunk = await asyncio.wait_for(stream.__anext__(), self.timeout)
+            except StopAsyncIteration:
+                chunk = ''
+            except BaseException:
+                # المهلة أو الإلغاء أو الخطأ: إغلاق البث حتى لا يبقى اتصال المزود مفتوحاً
+                await stream.aclose()
+                raise
+            return chunk, stream
+
+        def launch():
+            model_id = queue.pop(0)
+            launched.append(model_id)
+            tasks[asyncio.ensure_future(attempt(model_id))] = model_id
+            return model_id
+
+        last = launch()
+        if not hedge:
+            while queue:
+                launch()
+
+        winner = None
+        while tasks and winner is None:
+            timeout = self.hedge_delay(last, kind) if hedge and queue else None
+            done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                last = launch()
+                continue
+
+            for task in done:
+                model_id = tasks.pop(task)
+                if task.exception() is not None:
+                    errors[model_id] = str(task.exception())
+                elif winner is None:
+                    winner = model_id
+                    text, stream = task.result()
+                else:
+                    _, extra = task.result()
+                    if extra is not None:
+                        await extra.aclose()
+
+            if winner is None and hedge and queue and not tasks:
+                last = launch()
+
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            # خاسر أنهى أول قطعة قبل الإلغاء يرجع بثاً مفتوحاً
+            for result in await asyncio.gather(*tasks, return_exceptions=True):
+                if isinstance(result, tuple) and result[1] is not None:
+                    await result[1].aclose()
+
+        if winner is None:
+            raise Exception("فشلت جميع نماذج السباق: " + "; ".join(f"{m}: {e}" for m, e in errors.items()))
+
+        first_latency = time.perf_counter() - start
+        if stream is not None:
+            parts = [text]
+            try:
+                async for chunk in stream:
+                    parts.append(chunk)
+            finally:
+                await stream.aclose()
+            text = ''.join(parts)
+
+        return {
+            'text': text,
+            'model': winner,
+            'client': self.models[winner]['client'],
+            'race': {
+                'candidates': list(model_ids),
+                'launched': launched,
+                'winner': winner,
+                'mode': 'hedge' if hedge else 'all',
+                'first_token': first_token,
+                'win_latency': first_latency,
+                'latency': time.perf_counter() - start,
+                'errors': errors,
+            },
+        }
+
+    # ---- الجسر المتزامن ----
+
+    def _ensure_loop(self):
+        """تشغيل حلقة الأحداث في خيط خلفي (مرة واحدة)"""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name='provider-engine', daemon=True
+                )
+                self._thread.start()
+        return self._loop
+
+    def run(self, coro):
+        """تنفيذ coroutine على حلقة المحرك وانتظار النتيجة"""
+        loop = self._ensure_loop()
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("لا يمكن الانتظار المتزامن من داخل حلقة المحرك")
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    def chat(self, model_id, messages, **params):
+        """نسخة متزامنة من achat (queued_at لقياس انتظار الطلب قبل بدء تنفيذه على الحلقة)"""
+        params.setdefault('queued_at', time.perf_counter())
+        return self.run(self.achat(model_id, messages, **params))
+
+    def race(self, model_ids, messages, hedge=True, first_token=False, **params):
+        """نسخة متزامنة من arace"""
+        return self.run(self.arace(model_ids, messages, hedge, first_token, **params))
+
+    def fanout(self, model_ids, messages, deadline=None, on_token=None, **params):
+        """نسخة متزامنة من afanout"""
+        params.setdefault('queued_at', time.perf_counter())
+        return self.run(self.afanout(model_ids, messages, deadline, on_token, **params))
+
+    def close(self):
+        """إغلاق المحولات وإيقاف الحلقة"""
+        if self._loop is None:
+            return
+
+        async def _close_all():
+            for adapter in self.adapters.values():
+                await adapter.aclose()
+
+        self.run(_close_all())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop = None
+        self._thread = None
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🛫 دمج الطلبات المتطابقة المتزامنة (single-flight)
+الطلبات التي تصل بنفس المفتاح (النموذج والرسائل والمعاملات) أثناء تنفيذ طلب
+مطابق تنتظر نتيجته بدل استدعاء جديد للمزود. في البث يبدأ المنضم من أول قطعة
+(المخزنة حتى لحظة انضمامه) ثم يتابع القطع الجديدة مع الباقين.
+
+SingleFlight للخيوط (خادما Flask)، و AsyncSingleFlight لحلقة asyncio (المحرك).
+AI_SINGLE_FLIGHT=0 يعطّل الدمج.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+
+from ai_cache import normalize_messages
+
+ENABLED = os.getenv('AI_SINGLE_FLIGHT', '1') != '0'
+
+# معاملات لا تغير الرد فلا تدخل في المفتاح
+IGNORED_PARAMS = ('timeout', 'queued_at', 'conversation_id')
+
+
+def flight_key(model_id, messages, params=None):
+    """مفتاح الطلب: النموذج والرسائل الموحدة (كمفتاح ذاكرة الردود) ومعاملات التوليد"""
+    try:
+        messages = normalize_messages(messages)
+    except (KeyError, TypeError, AttributeError):
+        pass  # محتوى غير نصي (صور): يُقارن كما هو
+    payload = json.dumps(
+        {
+            'model': model_id,
+            'messages': messages,
+            'params': {name: value for name, value in (params or {}).items() if name not in IGNORED_PARAMS},
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(',', ':'),
+        default=repr,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class SingleFlight:
+    """دمج للخيوط: call لطلب كامل و stream لطلب مبثوث"""
+
+    def __init__(self, enabled=None):
+        self.enabled = ENABLED if enabled is None else enabled
+        # flights: استدعاءات فعلية للمزود، coalesced: طلبات انضمت لاستدعاء جارٍ
+        self.stats = {'flights': 0, 'coalesced': 0}
+        self._calls = {}
+        self._streams = {}
+        self._lock = threading.Lock()
+
+    def call(self, key, fn):
+        """(نتيجة fn()، هل كانت مشتركة) مع استدعاء واحد لكل مفتاح جارٍ؛ الاستثناء يصل للجميع"""
+        if not self.enabled:
+            return fn(), False
+        with self._lock:
+            flight = self._calls.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._calls[key] = {'done': threading.Event(), 'result': None, 'error': None}
+                self.stats['flights'] += 1
+            else:
+                self.stats['coalesced'] += 1
+
+        if not leader:
+            flight['done'].wait()
+            if flight['error'] is not None:
+                raise flight['error']
+            return flight['result'], True
+
+        try:
+            flight['result'] = fn()
+        except Exception as e:
+            flight['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            flight['done'].set()
+        return flight['result'], False
+
+    def stream(self, key, fn):
+        """(مولّد قطع، هل كان مشتركاً) لمولّد fn() واحد لكل مفتاح جارٍ
+
+        المولّد الأصلي يُستهلك في خيط منفصل ويتوقف (ويُغلق) إن انصرف كل المشتركين.
+        """
+        if not self.enabled:
+            return fn(), False
+        with self._lock:
+            flight = self._streams.get(key)
+            shared = flight is not None
+            if shared:
+                flight['subscribers'] += 1
+                self.stats['coalesced'] += 1
+            else:
+                flight = self._streams[key] = {
+                    'chunks': [], 'done': False, 'error': None, 'subscribers': 1,
+                    'changed': threading.Condition(),
+                }
+                self.stats['flights'] += 1
+                threading.Thread(target=self._produce, args=(key, flight, fn), daemon=True).start()
+        return self._follow(flight), shared
+
+    def _produce(self, key, flight, fn):
+        changed = flight['changed']
+        try:
+            chunks = fn()
+            try:
+                for chunk in chunks:
+                    with changed:
+                        if not flight['subscribers']:
+                            break
+                        flight['chunks'].append(chunk)
+                        changed.notify_all()
+            finally:
+                chunks.close()
+        except Exception as e:
+            flight['error'] = e
+        finally:
+            # لا ينضم أحد بعد هذه النقطة لبث انتهى
+            with self._lock:
+                if self._streams.get(key) is flight:
+                    del self._streams[key]
+            with changed:
+                flight['done'] = True
+                changed.notify_all()
+
+    @staticmethod
+    def _follow(flight):
+        changed = flight['changed']
+        chunks = flight['chunks']
+        position = 0
+        try:
+            while True:
+                with changed:
+                    while position == len(chunks) and not flight['done']:
+                        changed.wait()
+                    new = chunks[position:]
+                    finished = flight['done']
+                position += len(new)
+                yield from new
+                if finished and position == len(chunks):
+                    if flight['error'] is not None:
+                        raise flight['error']
+                    return
+        finally:
+            with changed:
+                flight['subscribers'] -= 1
+
+
+class AsyncSingleFlight:
+    """دمج لحلقة asyncio واحدة؛ الاستدعاء يُلغى إن ألغاه كل المنتظرين (خاسرو السباق مثلاً)"""
+
+    def __init__(self, enabled=None):
+        self.enabled = ENABLED if enabled is None else enabled
+        self.stats = {'flights': 0, 'coalesced': 0}
+        self._calls = {}
+        self._streams = {}
+
+    async def call(self, key, fn):
+        """(نتيجة await fn()، هل كانت مشتركة)"""
+        if not self.enabled:
+            return await fn(), False
+        flight = self._calls.get(key)
+        shared = flight is not None
+        if shared:
+            flight['waiters'] += 1
+            self.stats['coalesced'] += 1
+        else:
+            task = asyncio.ensure_future(fn())
+            flight = self._calls[key] = {'task': task, 'waiters': 1}
+            self.stats['flights'] += 1
+            task.add_done_callback(lambda _: self._forget(self._calls, key, flight))
+
+        try:
+            return await asyncio.shield(flight['task']), shared
+        except asyncio.CancelledError:
+            flight['waiters'] -= 1
+            if not flight['waiters'] and not flight['task'].done():
+                self._forget(self._calls, key, flight)
+                flight['task'].cancel()
+            raise
+
+    def stream(self, key, fn):
+        """(مولّد غير متزامن، هل كان مشتركاً) لمولّد fn() واحد لكل مفتاح جارٍ"""
+        if not self.enabled:
+            return fn(), False
+        flight = self._streams.get(key)
+        shared = flight is not None
+        if shared:
+            flight['subscribers'] += 1
+            self.stats['coalesced'] += 1
+        else:
+            flight = self._streams[key] = {
+                'chunks': [], 'done': False, 'error': None, 'subscribers': 1, 'changed': asyncio.Event(),
+            }
+            self.stats['flights'] += 1
+            flight['task'] = asyncio.ensure_future(self._produce(key, flight, fn))
+        return self._follow(key, flight), shared
+
+    @staticmethod
+    def _forget(flights, key, flight):
+        if flights.get(key) is flight:
+            del flights[key]
+
+    def _wake(self, flight):
+        flight['changed'].set()
+        flight['changed'] = asyncio.Event()
+
+    async def _produce(self, key, flight, fn):
+        chunks = fn()
+        try:
+            async for chunk in chunks:
+                flight['chunks'].append(chunk)
+                self._wake(flight)
+        except Exception as e:
+            flight['error'] = e
+        finally:
+            self._forget(self._streams, key, flight)
+            flight['done'] = True
+            self._wake(flight)
+            await chunks.aclose()
+
+    async def _follow(self, key, flight):
+        chunks = flight['chunks']
+        position = 0
+        try:
+            while True:
+                while position < len(chunks):
+                    position += 1
+                    yield chunks[position - 1]
+                if flight['done']:
+                    if flight['error'] is not None:
+                        raise flight['error']
+                    return
+                await flight['changed'].wait()
+        finally:
+            flight['subscribers'] -= 1
+            if not flight['subscribers'] and not flight['done']:
+                self._forget(self._streams, key, flight)
+                flight['task'].cancel()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+💤 التحميل الكسول لمكتبات المزودين
+استيراد المكتبات وإنشاء العملاء عند أول استخدام فقط مع تقرير بتكلفة كل منها
+"""
+
+import importlib
+import importlib.util
+import threading
+import time
+
+
+class StartupReport:
+    """سجل زمن كل استيراد وإنشاء عميل أثناء التشغيل"""
+
+    def __init__(self):
+        self.entries = []
+        self._lock = threading.Lock()
+
+    def record(self, kind, name, seconds):
+        with self._lock:
+            self.entries.append({'kind': kind, 'name': name, 'seconds': seconds})
+
+    def total(self, kind=None):
+        return sum(entry['seconds'] for entry in self.entries if kind is None or entry['kind'] == kind)
+
+    def print_report(self):
+        """طباعة جدول التكلفة مرتباً من الأبطأ"""
+        print("\n" + "="*60)
+        print("⏱️ تكلفة التحميل:")
+        print("="*60)
+        if not self.entries:
+            print("لم يتم تحميل أي مكتبة أو عميل بعد")
+            return
+        for entry in sorted(self.entries, key=lambda e: e['seconds'], reverse=True):
+            label = 'استيراد' if entry['kind'] == 'import' else 'عميل'
+            print(f"  {label:<8} {entry['name']:<30} {entry['seconds'] * 1000:8.1f} ms")
+        print("-"*60)
+        print(f"  الإجمالي: {self.total() * 1000:.1f} ms")
+
+
+STARTUP = StartupReport()
+
+
+def timed_import(name):
+    """استيراد وحدة مع تسجيل زمنها في التقرير (مرة واحدة لكل وحدة)"""
+    import sys
+    if name in sys.modules:
+        return sys.modules[name]
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    STARTUP.record('import', name, time.perf_counter() - start)
+    return module
+
+
+def module_available(name):
+    """هل الوحدة مثبتة؟ (بدون استيرادها)"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+class LazyModule:
+    """وكيل لوحدة لا تُستورد إلا عند أول وصول لخاصية منها"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = timed_import(self._name)
+        return getattr(self._module, attr)
+
+
+class LazyClients:
+    """قاموس عملاء يُنشأ كل عميل فيه عند أول طلب"""
+
+    def __init__(self):
+        self._factories = {}
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, factory):
+        """تسجيل دالة إنشاء العميل بدون استدعائها"""
+        self._factories[name] = factory
+
+    def __contains__(self, name):
+        return name in self._factories
+
+    def __getitem__(self, name):
+        client = self._clients.get(name)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(name)
+                if client is None:
+                    start = time.perf_counter()
+                    client = self._clients[name] = self._factories[name]()
+                    STARTUP.record('client', name, time.perf_counter() - start)
+        return client
+
+    def get(self, name, default=None):
+        return self[name] if name in self._factories else default
+
+    def loaded(self):
+        """أسماء العملاء التي أُنشئت فعلاً"""
+        return list(self._clients)
+
+    def registered(self):
+        """أسماء كل العملاء المسجلة (أُنشئت أم لا)"""
+        return list(self._factories)
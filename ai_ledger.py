@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+💰 سجل التوكنات والتكلفة
+سطر ثابت الحجم (struct) لكل استدعاء في ملف يومي ~/ai_workspace_ledger/YYYY-MM-DD.bin:
+الوقت والنموذج والمحادثة والتوكنات والوحدات (صور/أحرف صوت) والتكلفة والزمن.
+أسماء النماذج والمحادثات تُخزن كبصمة 64 بت مع ملف أسماء صغير، فالكتابة
+إلحاق بضع عشرات من البايتات بدون تنسيق بين العمليات
+
+الاستخدام:
+    python3 ai_ledger.py [days] [day|model|conversation]
+"""
+
+import hashlib
+import json
+import os
+import struct
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from ai_context import estimate_tokens
+
+# الوقت، النموذج، المحادثة، النوع، توكنات السؤال/الرد/المخزنة، الوحدات، التكلفة، الزمن
+ROW = struct.Struct('<dQQBIIIfdf')
+KINDS = ('chat', 'image', 'audio', 'vision')
+NAMES_FILE = "names.jsonl"
+
+# دولار لكل مليون توكن: (السؤال، الرد، السؤال المخزن)؛ الصور لكل صورة، والصوت لكل مليون حرف.
+# المفتاح الأطول الذي يبدأ به معرف النموذج هو المعتمد؛ AI_PRICES_FILE يضيف أو يغير الأسعار.
+PRICES = {
+    'gpt-4o-mini': (0.15, 0.60, 0.075),
+    'gpt-4o': (2.50, 10.00, 1.25),
+    'gpt-4-turbo': (10.00, 30.00, None),
+    'gpt-4': (30.00, 60.00, None),
+    'gpt-3.5-turbo': (0.50, 1.50, None),
+    'gemini-1.5-flash': (0.075, 0.30, 0.01875),
+    'gemini-1.5-pro': (1.25, 5.00, 0.3125),
+    'gemini-pro': (0.50, 1.50, None),
+    'claude-3-haiku': (0.25, 1.25, 0.03),
+    'claude-3-5-sonnet': (3.00, 15.00, 0.30),
+    'claude-3-opus': (15.00, 75.00, 1.50),
+    'llama-3.1-8b-instant': (0.05, 0.08, None),
+    'llama-3.1-70b-versatile': (0.59, 0.79, None),
+    'command-r': (0.15, 0.60, None),
+    'minimax-m2': (0.30, 1.20, None),
+    'dall-e-3:hd': 0.08,
+    'dall-e-3': 0.04,
+    'dall-e-2': 0.02,
+    'tts-1-hd': 30.00,
+    'tts-1': 15.00,
+}
+
+
+def name_id(name):
+    """بصمة 64 بت ثابتة لاسم (0 = بلا اسم)"""
+    if not name:
+        return 0
+    return int.from_bytes(hashlib.blake2b(name.encode('utf-8'), digest_size=8).digest(), 'little') or 1
+
+
+def load_prices():
+    prices = dict(PRICES)
+    path = os.getenv('AI_PRICES_FILE')
+    if path:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                prices.update({key: tuple(value) if isinstance(value, list) else value
+                               for key, value in json.load(f).items()})
+        except (OSError, ValueError):
+            pass
+    return prices
+
+
+class Ledger:
+    """سجل إلحاق يومي مع تجميع حسب اليوم أو النموذج أو المحادثة"""
+
+    def __init__(self, directory=None, prices=None):
+        self.directory = Path(directory or os.getenv('AI_LEDGER_DIR', Path.home() / "ai_workspace_ledger"))
+        self.directory.mkdir(exist_ok=True)
+        self.prices = prices or load_prices()
+        self.names = {}
+        self._file = None
+        self._names_file = None
+        self._day = None
+        self._lock = threading.Lock()
+        self._load_names()
+
+    # ---- الأسعار ----
+
+    def price(self, model_id):
+        key = max((key for key in self.prices if model_id.startswith(key)), key=len, default=None)
+        return self.prices.get(key)
+
+    def cost(self, model_id, kind='chat', prompt_tokens=0, completion_tokens=0, cached_tokens=0, units=0):
+        """التكلفة بالدولار (0 لنموذج بلا سعر معروف)"""
+        price = self.price(model_id)
+        if price is None:
+            return 0.0
+        if kind == 'image':
+            return units * price
+        if kind == 'audio':
+            return units * price / 1e6
+        prompt_price, completion_price, cached_price = price
+        cached = min(cached_tokens or 0, prompt_tokens or 0)
+        if cached_price is None:
+            cached_price = prompt_price
+        return ((prompt_tokens or 0) - cached) * prompt_price / 1e6 + cached * cached_price / 1e6 \
+            + (completion_tokens or 0) * completion_price / 1e6
+
+    # ---- الأسماء ----
+
+    def _load_names(self):
+        try:
+            with open(self.directory / NAMES_FILE, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.names[record['id']] = record['name']
+        except OSError:
+            pass
+
+    def _intern(self, name):
+        """بصمة الاسم مع تسجيله في ملف الأسماء عند أول ظهور (التكرار بين العمليات لا يضر)"""
+        key = name_id(name)
+        if key and key not in self.names:
+            self.names[key] = name
+            if self._names_file is None:
+                # يبقى مفتوحاً: كل محادثة جديدة تضيف اسماً، وفتح الملف لكل سطر أغلى من كتابته
+                self._names_file = open(self.directory / NAMES_FILE, 'a', encoding='utf-8', buffering=1)
+            self._names_file.write(json.dumps({'id': key, 'name': name}, ensure_ascii=False) + '\n')
+        return key
+
+    # ---- الكتابة ----
+
+    def record(self, model_id, kind='chat', prompt_tokens=0, completion_tokens=0, cached_tokens=0, units=0,
+               latency=0.0, conversation_id=None, when=None):
+        """إلحاق سطر واحد وإرجاع تكلفته"""
+        when = when or time.time()
+        cost = self.cost(model_id, kind, prompt_tokens, completion_tokens, cached_tokens, units)
+        with self._lock:
+            row = ROW.pack(
+                when, self._intern(model_id), self._intern(conversation_id), KINDS.index(kind),
+                prompt_tokens or 0, completion_tokens or 0, cached_tokens or 0, units or 0, cost, latency or 0.0,
+            )
+            day = datetime.fromtimestamp(when).strftime('%Y-%m-%d')
+            if day != self._day:
+                if self._file is not None:
+                    self._file.close()
+                # O_APPEND: كتابة السطر كاملاً في نهاية الملف حتى مع عدة عمليات
+                self._file = open(self.directory / f"{day}.bin", 'ab', buffering=0)
+                self._day = day
+                size = self._file.seek(0, os.SEEK_END)
+                if size % ROW.size:
+                    # بقايا سطر منقطع تزيح كل ما يُلحق بعدها
+                    self._file.truncate(size - size % ROW.size)
+            self._file.write(row)
+        return cost
+
+    def record_chat(self, model_id, messages, response, usage=None, latency=0.0, conversation_id=None):
+        """سطر دردشة؛ التوكنات تُقدّر محلياً إن لم يرجعها المزود (البث مثلاً)
+
+        response: نص الرد أو حجمه بالبايت.
+        """
+        usage = usage or {}
+        prompt_tokens = usage.get('prompt_tokens')
+        if prompt_tokens is None:
+            prompt_tokens = sum(estimate_tokens(m['content']) for m in messages if isinstance(m.get('content'), str))
+        completion_tokens = usage.get('completion_tokens')
+        if completion_tokens is None:
+            completion_tokens = response // 4 if isinstance(response, int) else estimate_tokens(response or '')
+        return self.record(model_id, 'chat', prompt_tokens, completion_tokens, usage.get('cached_tokens') or 0,
+                           latency=latency, conversation_id=conversation_id)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                self._day = None
+            if self._names_file is not None:
+                self._names_file.close()
+                self._names_file = None
+
+    # ---- الاستعلام ----
+
+    def rows(self, days=7):
+        """أسطر آخر days يوماً (السطر الأخير غير المكتمل يُتجاهل)"""
+        today = date.today()
+        for offset in range(days - 1, -1, -1):
+            path = self.directory / f"{today - timedelta(days=offset)}.bin"
+            try:
+                data = path.read_bytes()
+            except OSError:
+                continue
+            usable = len(data) - len(data) % ROW.size
+            yield from ROW.iter_unpack(memoryview(data)[:usable])
+
+    def aggregate(self, days=7, by='model'):
+        """مجاميع حسب 'day' أو 'model' أو 'conversation' مرتبة من الأعلى تكلفة"""
+        if by not in ('day', 'model', 'conversation'):
+            raise ValueError(f"تجميع غير مدعوم: {by}")
+        groups = {}
+        for when, model, conversation, kind, prompt, completion, cached, units, cost, latency in self.rows(days):
+            if by == 'day':
+                key = datetime.fromtimestamp(when).strftime('%Y-%m-%d')
+            else:
+                key = model if by == 'model' else conversation
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = {'calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0,
+                                       'cached_tokens': 0, 'units': 0.0, 'cost': 0.0, 'latency': 0.0}
+            group['calls'] += 1
+            group['prompt_tokens'] += prompt
+            group['completion_tokens'] += completion
+            group['cached_tokens'] += cached
+            group['units'] += units
+            group['cost'] += cost
+            group['latency'] += latency
+
+        if by != 'day' and any(key not in self.names for key in groups):
+            self._load_names()
+        results = []
+        for key, group in groups.items():
+            name = key if by == 'day' else self.names.get(key, '—' if not key else f"#{key:x}")
+            group['avg_latency'] = group.pop('latency') / group['calls']
+            results.append(dict(group, key=name))
+        results.sort(key=lambda group: group['key'] if by == 'day' else -group['cost'])
+        return results
+
+    def total(self, days=7):
+        return sum(row[8] for row in self.rows(days))
+
+
+def format_cost(cost):
+    return f"${cost:.4f}" if cost < 1 else f"${cost:.2f}"
+
+
+def print_costs(ledger, days=7, by='model', limit=15):
+    """جدول التكلفة للطرفية"""
+    rows = ledger.aggregate(days, by)
+    print(f"💰 التكلفة خلال {days} يوم حسب {by}: {format_cost(sum(r['cost'] for r in rows))}")
+    print(f"  {'':<32}{'استدعاء':>9}{'توكن داخل':>12}{'مخزن':>9}{'توكن خارج':>11}{'التكلفة':>11}{'الزمن':>8}")
+    for row in rows[:limit]:
+        print(f"  {str(row['key'])[:31]:<32}{row['calls']:>9}{row['prompt_tokens']:>12}{row['cached_tokens']:>9}"
+              f"{row['completion_tokens']:>11}{format_cost(row['cost']):>11}{row['avg_latency']:>7.1f}s")
+
+
+def main():
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 7
+    by = sys.argv[2] if len(sys.argv) > 2 else 'model'
+    print_costs(Ledger(), days, by)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+📈 قياسات كل استدعاء
+مدرجات تكرارية بحدود ثابتة لكل نموذج: الحجم بالبايت والتوكنات وزمن الانتظار
+وزمن أول قطعة والزمن الكلي والتوكنات في الثانية، مع النسب المئوية p50/p95/p99
+"""
+
+import atexit
+import json
+import os
+import threading
+from bisect import bisect_left
+from pathlib import Path
+
+from ai_stats import file_lock
+
+
+def _geometric(start, factor, count):
+    return [round(start * factor ** i, 6) for i in range(count)]
+
+
+# حدود الخانات (العليا) لكل نوع مقياس؛ ما يتجاوز آخر حد يذهب لخانة الفائض
+SECONDS_BOUNDS = _geometric(0.005, 1.5, 28)      # 5ms .. ~300s
+BYTES_BOUNDS = _geometric(64, 2, 18)             # 64B .. 8MB
+TOKENS_BOUNDS = _geometric(1, 2, 18)             # 1 .. 131072
+RATE_BOUNDS = _geometric(1, 1.5, 20)             # 1 .. ~2200 توكن/ث
+
+METRICS = {
+    'request_bytes': BYTES_BOUNDS,
+    'response_bytes': BYTES_BOUNDS,
+    'prompt_tokens': TOKENS_BOUNDS,
+    'cached_tokens': TOKENS_BOUNDS,
+    'completion_tokens': TOKENS_BOUNDS,
+    'queue_wait': SECONDS_BOUNDS,
+    'ttft': SECONDS_BOUNDS,
+    'latency': SECONDS_BOUNDS,
+    'tokens_per_sec': RATE_BOUNDS,
+}
+
+LABELS = {
+    'latency': 'الزمن الكلي',
+    'ttft': 'أول قطعة',
+    'queue_wait': 'الانتظار',
+    'tokens_per_sec': 'توكن/ث',
+    'prompt_tokens': 'توكنات السؤال',
+    'cached_tokens': 'توكنات مخزنة',
+    'completion_tokens': 'توكنات الرد',
+    'request_bytes': 'حجم الطلب',
+    'response_bytes': 'حجم الرد',
+}
+
+
+def new_histogram():
+    # المفاتيح نصية لتبقى كما هي بعد JSON
+    return {'count': 0, 'sum': 0.0, 'max': 0.0, 'buckets': {}}
+
+
+def new_model():
+    return {'calls': 0, 'errors': 0, 'histograms': {}}
+
+
+def merge_models(totals, deltas):
+    """جمع عدادات deltas وخاناتها فوق totals (بنسخ، فلا تُشارك القواميس)"""
+    for model_id, delta in deltas.items():
+        model = totals.setdefault(model_id, new_model())
+        for name in ('calls', 'errors', 'coalesced'):
+            if delta.get(name):
+                model[name] = model.get(name, 0) + delta[name]
+        for metric, hist in delta['histograms'].items():
+            target = model['histograms'].setdefault(metric, new_histogram())
+            target['count'] += hist['count']
+            target['sum'] += hist['sum']
+            target['max'] = max(target['max'], hist['max'])
+            for index, count in hist['buckets'].items():
+                target['buckets'][index] = target['buckets'].get(index, 0) + count
+    return totals
+
+
+def observe(hist, bounds, value):
+    """إضافة قيمة لخانتها"""
+    index = str(bisect_left(bounds, value))
+    hist['buckets'][index] = hist['buckets'].get(index, 0) + 1
+    hist['count'] += 1
+    hist['sum'] += value
+    hist['max'] = max(hist['max'], value)
+
+
+def percentile(hist, bounds, q):
+    """تقدير النسبة المئوية q بالاستيفاء الخطي داخل الخانة"""
+    if not hist['count']:
+        return None
+    rank = q * hist['count']
+    seen = 0
+    for index in sorted(hist['buckets'], key=int):
+        count = hist['buckets'][index]
+        if seen + count >= rank:
+            i = int(index)
+            if i >= len(bounds):
+                return hist['max']
+            low = bounds[i - 1] if i else 0.0
+            high = min(bounds[i], hist['max'])
+            return low + (high - low) * (rank - seen) / count
+        seen += count
+    return hist['max']
+
+
+def format_value(metric, value):
+    if value is None:
+        return '—'
+    if metric in ('queue_wait', 'ttft', 'latency'):
+        return f"{value * 1000:.0f}ms" if value < 1 else f"{value:.2f}s"
+    if metric.endswith('_bytes'):
+        return f"{value / 1024:.1f}KB" if value >= 1024 else f"{value:.0f}B"
+    return f"{value:.0f}"
+
+
+class CallMetrics:
+    """مدرجات كل نموذج، تُحفظ في ملف بجانب ai_workspace_stats.json
+
+    القياسات منذ آخر حفظ تبقى في pending وتُجمع مع ما على القرص عند الحفظ،
+    فلا تمحو عملية (عامل ai_serve.py) قياسات أخرى. يحفظها خيط خلفي كل
+    flush_interval ثانية وعند الخروج.
+    """
+
+    def __init__(self, path, flush_interval=None):
+        self.path = Path(path)
+        self.models = {}
+        self.pending = {}
+        self._lock = threading.Lock()
+        # حفظ واحد في كل مرة
+        self._save_lock = threading.Lock()
+        self.flush_interval = flush_interval or float(os.getenv('AI_METRICS_FLUSH_INTERVAL', 30.0))
+        self._stop = threading.Event()
+        self._thread = None
+        self.load()
+        atexit.register(self.close)
+
+    def _tables(self, model_id):
+        """(تحت القفل) جدول النموذج في العرض وفي المعلق؛ يبدأ خيط الحفظ عند أول قياس"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='call-metrics', daemon=True)
+            self._thread.start()
+        return [table.setdefault(model_id, new_model()) for table in (self.models, self.pending)]
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.save()
+            except OSError:
+                # القياسات أُعيدت للمعلق؛ المحاولة في الدورة القادمة
+                pass
+
+    def close(self):
+        """إيقاف الخيط الخلفي وحفظ ما تبقى"""
+        self._stop.set()
+        try:
+            self.save()
+        except OSError:
+            pass
+
+    def record(self, model_id, **values):
+        """تسجيل قياسات استدعاء واحد (القيم None تُتجاهل)"""
+        with self._lock:
+            for model in self._tables(model_id):
+                model['calls'] += 1
+                for metric, value in values.items():
+                    if value is None:
+                        continue
+                    hist = model['histograms'].setdefault(metric, new_histogram())
+                    observe(hist, METRICS[metric], value)
+
+    def record_error(self, model_id):
+        with self._lock:
+            for model in self._tables(model_id):
+                model['errors'] += 1
+
+    def record_coalesced(self, model_id):
+        """طلب انضم لاستدعاء مطابق جارٍ (لا يُحسب في calls)"""
+        with self._lock:
+            for model in self._tables(model_id):
+                model['coalesced'] = model.get('coalesced', 0) + 1
+
+    def coalesced(self, model_id):
+        with self._lock:
+            return self.models.get(model_id, {}).get('coalesced', 0)
+
+    def summary(self, model_id, quantiles=(0.5, 0.95, 0.99)):
+        """{metric: {'count', 'mean', 'p50', 'p95', 'p99'}} لنموذج"""
+        with self._lock:
+            model = self.models.get(model_id)
+            if not model:
+                return {}
+            result = {}
+            for metric, hist in model['histograms'].items():
+                row = {'count': hist['count'], 'mean': hist['sum'] / hist['count'] if hist['count'] else None}
+                for q in quantiles:
+                    row[f"p{round(q * 100)}"] = percentile(hist, METRICS[metric], q)
+                result[metric] = row
+            return result
+
+    def cache_ratio(self, model_id):
+        """نسبة توكنات السؤال المقروءة من ذاكرة المزود (None إن لم يُبلغ عنها)"""
+        with self._lock:
+            histograms = self.models.get(model_id, {}).get('histograms', {})
+            prompt = histograms.get('prompt_tokens', {}).get('sum')
+            cached = histograms.get('cached_tokens', {}).get('sum')
+        if not prompt or cached is None:
+            return None
+        return cached / prompt
+
+    def load(self):
+        self.models = self._read()
+
+    def _read(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self):
+        """دمج القياسات المعلقة مع ما على القرص (تحت قفل الملف) ثم استبدال ذري"""
+        with self._save_lock:
+            with self._lock:
+                deltas, self.pending = self.pending, {}
+            try:
+                with file_lock(self.path.with_name(self.path.name + '.lock')):
+                    totals = merge_models(self._read(), deltas)
+                    if deltas:
+                        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+                        with open(tmp, 'w', encoding='utf-8') as f:
+                            json.dump(totals, f, separators=(',', ':'))
+                            f.flush()
+                            os.fsync(f.fileno())
+                        os.replace(tmp, self.path)
+            except OSError:
+                with self._lock:
+                    self.pending = merge_models(deltas, self.pending)
+                raise
+            with self._lock:
+                # ما سُجل أثناء الكتابة يبقى معلقاً ويُضاف للعرض المحلي
+                self.models = merge_models(totals, self.pending)
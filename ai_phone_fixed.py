@@ -15,6 +15,8 @@ import shutil
 
 # استيراد المشروع المحسن
 from ai_workspace_fixed import AIWorkspaceFixed
+from ai_profile import PROFILER, profile_startup
+from ai_router import AUTO_INFO, AUTO_MODEL
 
 class AIPhoneFixed(AIWorkspaceFixed):
     """📱 تطبيق الهاتف المحسن"""
@@ -22,9 +24,10 @@ class AIPhoneFixed(AIWorkspaceFixed):
     def __init__(self):
         """تهيئة تطبيق الهاتف المحسن"""
         super().__init__()
-        self.screen_width = shutil.get_terminal_size().columns
-        self.screen_height = shutil.get_terminal_size().lines
-        self.setup_phone_theme()
+        with PROFILER.phase('phone_theme'):
+            self.screen_width = shutil.get_terminal_size().columns
+            self.screen_height = shutil.get_terminal_size().lines
+            self.setup_phone_theme()
 
     def setup_phone_theme(self):
         """إعداد ثيم الهاتف المحسن"""
@@ -129,6 +132,7 @@ class AIPhoneFixed(AIWorkspaceFixed):
         print(f"  5️⃣ {self.icons['stats']} الإحصائيات")
         print(f"  6️⃣ {self.icons['files']} تحليل الملفات")
         print(f"  7️⃣ {self.icons['settings']} الإعدادات")
+        print(f"  8️⃣ {self.icons['files']} البحث في المحادثات")
 
         print(f"\n{self.colors['dark']}0. خروج{self.colors['end']}")
 
@@ -173,6 +177,8 @@ class AIPhoneFixed(AIWorkspaceFixed):
         for i, (model_id, info) in enumerate(self.models.items(), 1):
             print(f"{i}. {info['name']} - {info['desc']}")
             model_list.append((model_id, info))
+        model_list.append((AUTO_MODEL, AUTO_INFO))
+        print(f"{len(model_list)}. {AUTO_INFO['name']} - {AUTO_INFO['desc']}")
 
         print("\n0. عودة")
         choice = self.get_user_choice(len(model_list))
@@ -207,6 +213,10 @@ class AIPhoneFixed(AIWorkspaceFixed):
                     self.show_mobile_help()
                     continue
 
+                elif user_input.lower().startswith('find '):
+                    self.find_conversations(user_input[5:].strip())
+                    continue
+
                 elif user_input.lower() == 'clear':
                     self.clear_screen()
                     self.print_header(f"دردشة: {selected_model_info['name']}", self.icons['chat'])
@@ -218,6 +228,8 @@ class AIPhoneFixed(AIWorkspaceFixed):
 
                     try:
                         response = self.chat_with_model(selected_model_id, user_input)
+                        if selected_model_id == AUTO_MODEL:
+                            print(f"{self.colors['dark']}🧭 {self.models[self.last_model]['name']}{self.colors['end']}")
                         print(f"\n{response}\n")
                     except Exception as e:
                         print(f"\n{self.colors['danger']}❌ خطأ: {e}{self.colors['end']}\n")
@@ -313,7 +325,8 @@ class AIPhoneFixed(AIWorkspaceFixed):
         self.show_usage_stats()
 
         # إحصائيات إضافية
-        total_messages = sum(len(chat.get('messages', [])) for chat in self.conversations.values())
+        # من الفهرس بدون تحميل المحادثات
+        total_messages = self.conversations.total_messages()
 
         print(f"\n{self.colors['bold']}{self.colors['primary']}📊 إحصائيات إضافية:{self.colors['end']}")
         print(f"  💬 إجمالي المحادثات: {len(self.conversations)}")
@@ -322,6 +335,19 @@ class AIPhoneFixed(AIWorkspaceFixed):
 
         input("\nاضغط Enter للعودة...")
 
+    def find_screen(self):
+        """شاشة البحث في المحادثات المحفوظة"""
+        self.clear_screen()
+        self.print_header("البحث في المحادثات", self.icons['search'])
+
+        try:
+            query = input(f"{self.colors['bold']}🔎 ابحث عن: {self.colors['end']}").strip()
+            if query:
+                self.find_conversations(query)
+            input("\nاضغط Enter للعودة...")
+        except (EOFError, KeyboardInterrupt):
+            print("\n")
+
     def files_screen(self):
         """شاشة تحليل الملفات المحسنة"""
         self.clear_screen()
@@ -345,9 +371,11 @@ class AIPhoneFixed(AIWorkspaceFixed):
                 print(f"{self.colors['info']}الاستخدام: {first_model_name}{self.colors['end']}")
 
                 try:
+                    # محتوى الملف أولاً كمقدمة ثابتة تُخزن لدى المزود عند تكرار التحليل
                     analysis = self.chat_with_model(
                         first_model_id,
-                        f"حلل هذا النص وقدم ملخصاً مفيداً:\n\n{text[:1500]}"
+                        "حلل هذا النص وقدم ملخصاً مفيداً.",
+                        system=f"النص المطلوب تحليله:\n\n{text[:1500]}"
                     )
                     print(f"\n{self.colors['success']}✅ التحليل:{self.colors['end']}")
                     print(analysis)
@@ -405,6 +433,7 @@ class AIPhoneFixed(AIWorkspaceFixed):
   - اكتب سؤالك وانتظر الرد
   - 'exit' للخروج
   - 'clear' لمسح الشاشة
+  - 'find كلمة' للبحث في المحادثات المحفوظة
 
 {self.colors['cyan']}🎨 توليد الصور:{self.colors['end']}
   - اكتب وصفاً واضحاً
@@ -479,6 +508,9 @@ class AIPhoneFixed(AIWorkspaceFixed):
                 elif choice == '7':
                     self.settings_screen()
 
+                elif choice == '8':
+                    self.find_screen()
+
                 else:
                     print(f"\n{self.colors['warning']}⚠️ خيار غير صحيح{self.colors['end']}")
                     time.sleep(1)
@@ -493,6 +525,10 @@ class AIPhoneFixed(AIWorkspaceFixed):
 
 def main():
     """الدالة الرئيسية"""
+    if '--profile-startup' in sys.argv:
+        profile_startup(AIPhoneFixed)
+        return
+
     try:
         app = AIPhoneFixed()
         app.run()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+⏱️ قياس زمن الإقلاع
+وضع --profile-startup: زمن كل مرحلة وتفصيل زمن الاستيراد وذروة الذاكرة
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+from ai_lazy import STARTUP
+
+MARKER = '@@AI_PROFILE@@'
+
+
+class StartupProfiler:
+    """تسجيل زمن مراحل التهيئة (load_keys, init_models, ...)"""
+
+    def __init__(self):
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append({'name': name, 'seconds': time.perf_counter() - start})
+
+
+PROFILER = StartupProfiler()
+
+
+def peak_rss_kb():
+    """ذروة استهلاك الذاكرة للعملية بالكيلوبايت"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS يُرجع البايت، ولينكس الكيلوبايت
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+def parse_importtime(stderr, top=15):
+    """تحليل مخرجات python -X importtime إلى الوحدات الأعلى مستوى وزمنها التراكمي"""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, self_us, cumulative_us, name = [part for part in line.replace('import time:', '|').split('|')]
+        if name.startswith('  '):
+            continue
+        imports.append({'module': name.strip(), 'seconds': int(cumulative_us) / 1e6, 'self': int(self_us) / 1e6})
+
+    total = sum(entry['seconds'] for entry in imports)
+    imports.sort(key=lambda entry: entry['seconds'], reverse=True)
+    return total, imports[:top]
+
+
+def run_profile(script, extra_args=()):
+    """تشغيل نقطة الدخول في عملية ابن مع -X importtime وجمع التقرير"""
+    env = dict(os.environ, AI_PROFILE_CHILD='1')
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', script, '--profile-startup', *extra_args],
+        stdin=subprocess.DEVNULL, capture_output=True, text=True, env=env
+    )
+    wall = time.perf_counter() - start
+
+    report = None
+    for line in proc.stdout.splitlines():
+        if line.startswith(MARKER):
+            report = json.loads(line[len(MARKER):])
+    if report is None:
+        raise RuntimeError(f"فشل قياس {script}:\n{proc.stderr[-2000:]}")
+
+    import_total, imports = parse_importtime(proc.stderr)
+    report.update(script=os.path.basename(script), process_wall=wall, import_total=import_total, imports=imports)
+    return report
+
+
+def print_table(report):
+    """عرض التقرير كجدول"""
+    print("\n" + "="*60)
+    print(f"⏱️ زمن الإقلاع: {report['script']}")
+    print("="*60)
+    print(f"  {'زمن العملية الكلي':<32}{report['process_wall'] * 1000:10.1f} ms")
+    print(f"  {'الاستيراد (الإجمالي)':<32}{report['import_total'] * 1000:10.1f} ms")
+    for phase in report['phases']:
+        print(f"  {phase['name']:<32}{phase['seconds'] * 1000:10.1f} ms")
+    if report['rss_kb']:
+        print(f"  {'ذروة الذاكرة (RSS)':<32}{report['rss_kb'] / 1024:10.1f} MB")
+
+    print("\n📦 أبطأ الاستيرادات:")
+    for entry in report['imports']:
+        print(f"  {entry['module']:<32}{entry['seconds'] * 1000:10.1f} ms")
+
+    if report['lazy']:
+        print("\n💤 تحميل كسول أثناء الإقلاع:")
+        for entry in report['lazy']:
+            print(f"  {entry['kind']:<8}{entry['name']:<24}{entry['seconds'] * 1000:10.1f} ms")
+
+
+def profile_startup(build):
+    """نقطة دخول --profile-startup
+
+    في العملية الابن: يبني التطبيق عبر build() ويطبع التقرير كسطر JSON.
+    في العملية الأب: يشغّل الابن ويطبع جدولاً (أو JSON مع --json).
+    """
+    if os.getenv('AI_PROFILE_CHILD'):
+        with PROFILER.phase('total_init'):
+            build()
+        report = {'phases': PROFILER.phases, 'rss_kb': peak_rss_kb(), 'lazy': STARTUP.entries}
+        print(MARKER + json.dumps(report, ensure_ascii=False), flush=True)
+        return report
+
+    report = run_profile(sys.argv[0])
+    if '--json' in sys.argv:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_table(report)
+    return report
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧭 موجّه النماذج حسب الزمن
+يتتبع زمن الاستجابة وزمن أول قطعة ونسبة الأخطاء لكل نموذج بمتوسط متناقص مع الزمن،
+ويختار أسرع نموذج سليم يحقق مستوى القدرة المطلوب (النموذج 'auto')
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from ai_stats import file_lock
+
+AUTO_MODEL = 'auto'
+AUTO_INFO = {'name': '🧭 تلقائي', 'desc': 'أسرع نموذج سليم حالياً', 'speed': 'حسب القياس'}
+
+# مستويات القدرة من الأدنى للأعلى
+TIERS = ('fast', 'standard', 'advanced')
+
+MODEL_TIERS = {
+    'gpt-4o-mini': 'fast',
+    'gpt-3.5-turbo': 'fast',
+    'gemini-1.5-flash': 'fast',
+    'claude-3-haiku': 'fast',
+    'claude-3-haiku-20240307': 'fast',
+    'llama-3.1-8b-instant': 'fast',
+    'gpt-4o': 'advanced',
+    'gpt-4': 'advanced',
+    'gpt-4-turbo': 'advanced',
+    'gemini-1.5-pro': 'advanced',
+    'claude-3-opus': 'advanced',
+    'claude-3-opus-20240229': 'advanced',
+    'claude-3-5-sonnet-20241022': 'advanced',
+}
+
+
+def model_tier(model_id, info=None):
+    """مستوى قدرة النموذج: حقل 'tier' في تعريفه أو الجدول أعلاه أو 'standard'"""
+    return (info or {}).get('tier') or MODEL_TIERS.get(model_id, 'standard')
+
+
+class LatencyRouter:
+    """متوسطات متناقصة (نصف عمر half_life ثانية) للزمن والأخطاء لكل نموذج
+
+    كل مقياس يُخزن كـ [القيمة، الوزن، وقت آخر تحديث]؛ يتناقص الوزن القديم
+    بمرور الوقت فتطغى العينات الحديثة عندما يتباطأ مزود خلال اليوم.
+    العينات تُسجل في الذاكرة ويحفظها خيط خلفي كل flush_interval ثانية وعند الخروج.
+    """
+
+    def __init__(self, models, half_life=None, max_error_rate=None, prior=None, path=None, flush_interval=None):
+        self.models = models
+        self.half_life = half_life or float(os.getenv('AI_ROUTER_HALF_LIFE', 1800))
+        self.max_error_rate = max_error_rate or float(os.getenv('AI_ROUTER_MAX_ERROR_RATE', 0.5))
+        # الزمن المفترض لنموذج بلا عينات كافية (يسمح بتجربته)
+        self.prior = prior or float(os.getenv('AI_ROUTER_PRIOR', 3.0))
+        # عينة واحدة تبقى معتبرة حتى يمر نصف عمر كامل
+        self.min_weight = 0.5
+        self.path = Path(path or os.getenv('AI_ROUTER_FILE', Path.home() / "ai_workspace_router.json"))
+        self.stats = {}
+        # عينات هذه العملية منذ آخر حفظ؛ تُدمج مع ما على القرص عند الحفظ
+        self.pending = {}
+        self._lock = threading.Lock()
+        # حفظ واحد في كل مرة (عدة خيوط في خادمي الويب)
+        self._save_lock = threading.Lock()
+        self.flush_interval = flush_interval or float(os.getenv('AI_ROUTER_FLUSH_INTERVAL', 30.0))
+        self._stop = threading.Event()
+        self._thread = None
+        self.load()
+        atexit.register(self.close)
+
+    def _decayed(self, stat, now):
+        """وزن المقياس بعد التناقص حتى الآن"""
+        return stat[1] * 0.5 ** ((now - stat[2]) / self.half_life)
+
+    def _add(self, table, model_id, kind, value, now):
+        stat = table.setdefault(model_id, {}).get(kind)
+        if stat is None:
+            table[model_id][kind] = [value, 1.0, now]
+            return
+        weight = self._decayed(stat, now)
+        stat[0] = (stat[0] * weight + value) / (weight + 1.0)
+        stat[1] = weight + 1.0
+        stat[2] = now
+
+    def _combine(self, a, b, now):
+        """متوسط مقياسين بعد تناقص وزن كل منهما حتى now، والوزن مجموعهما"""
+        wa = self._decayed(a, now)
+        wb = self._decayed(b, now)
+        if wa + wb <= 0:
+            return [b[0], 0.0, now]
+        return [(a[0] * wa + b[0] * wb) / (wa + wb), wa + wb, now]
+
+    def record(self, model_id, latency=None, ttft=None, error=False):
+        """تسجيل نتيجة استدعاء: الأزمنة عند النجاح، وكل استدعاء يُحسب في نسبة الأخطاء"""
+        now = time.time()
+        with self._lock:
+            for table in (self.stats, self.pending):
+                if latency is not None:
+                    self._add(table, model_id, 'latency', latency, now)
+                if ttft is not None:
+                    self._add(table, model_id, 'ttft', ttft, now)
+                if latency is not None or error:
+                    self._add(table, model_id, 'errors', 1.0 if error else 0.0, now)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='latency-router', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.save()
+
+    def close(self):
+        """إيقاف الخيط الخلفي وحفظ ما تبقى"""
+        self._stop.set()
+        self.save()
+
+    def _value(self, model_id, kind, now):
+        """قيمة المقياس أو None إن لم يبق وزن كافٍ من العينات"""
+        stat = self.stats.get(model_id, {}).get(kind)
+        if stat is None or self._decayed(stat, now) < self.min_weight:
+            return None
+        return stat[0]
+
+    def error_rate(self, model_id):
+        value = self._value(model_id, 'errors', time.time())
+        return value or 0.0
+
+    def healthy(self, model_id):
+        """النموذج سليم إن كانت نسبة أخطائه الحديثة تحت الحد (الأخطاء القديمة تتلاشى)"""
+        return self.error_rate(model_id) < self.max_error_rate
+
+    def expected(self, model_id, kind='latency'):
+        """الزمن المتوقع مع عقوبة على نسبة الأخطاء"""
+        now = time.time()
+        with self._lock:
+            value = self._value(model_id, kind, now)
+            if value is None and kind == 'ttft':
+                value = self._value(model_id, 'latency', now)
+            errors = self._value(model_id, 'errors', now) or 0.0
+        return (self.prior if value is None else value) * (1.0 + errors)
+
+    def ranking(self, tier='standard', kind='latency', exclude=()):
+        """النماذج السليمة التي تحقق المستوى مرتبة من الأسرع"""
+        minimum = TIERS.index(tier) if tier in TIERS else 0
+        candidates = [
+            model_id for model_id, info in self.models.items()
+            if model_id not in exclude
+            and TIERS.index(model_tier(model_id, info)) >= minimum
+            and self.healthy(model_id)
+        ]
+        return sorted(candidates, key=lambda model_id: self.expected(model_id, kind))
+
+    def choose(self, tier='standard', kind='latency', exclude=()):
+        """أسرع نموذج سليم للمستوى المطلوب (ثم أي مستوى إن لم يوجد)"""
+        ranked = self.ranking(tier, kind, exclude)
+        if not ranked:
+            ranked = self.ranking('fast', kind, exclude)
+        if not ranked:
+            raise Exception("لا يوجد نموذج سليم متاح للاختيار التلقائي")
+        return ranked[0]
+
+    def snapshot(self):
+        """حالة كل نموذج للعرض: المستوى والأزمنة ونسبة الأخطاء"""
+        now = time.time()
+        rows = []
+        with self._lock:
+            for model_id, info in self.models.items():
+                errors = self._value(model_id, 'errors', now)
+                rows.append({
+                    'model': model_id,
+                    'tier': model_tier(model_id, info),
+                    'latency': self._value(model_id, 'latency', now),
+                    'ttft': self._value(model_id, 'ttft', now),
+                    'error_rate': errors or 0.0,
+                    'healthy': (errors or 0.0) < self.max_error_rate,
+                })
+        return rows
+
+    def load(self):
+        """تحميل المتوسطات المحفوظة (التناقص يُطبق حسب وقت كل عينة)"""
+        self.stats = self._read()
+
+    def _read(self):
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _merge(self, totals, deltas, now):
+        for model_id, kinds in deltas.items():
+            target = totals.setdefault(model_id, {})
+            for kind, stat in kinds.items():
+                target[kind] = self._combine(target[kind], stat, now) if kind in target else list(stat)
+        return totals
+
+    def save(self):
+        """دمج عينات هذه العملية مع ما حفظته العمليات الأخرى (عمال ai_serve.py) ثم الحفظ
+
+        لكل مقياس يُؤخذ المتوسط الموزون للطرفين بعد التناقص ويُجمع الوزنان، فيستفيد
+        كل عامل من أزمنة الآخرين بدون أن يُحسب أي عينة مرتين.
+        """
+        with self._save_lock:
+            with self._lock:
+                deltas, self.pending = self.pending, {}
+            now = time.time()
+            if not deltas:
+                # لا جديد هنا، لكن عمليات أخرى ربما حفظت
+                totals = self._read()
+                with self._lock:
+                    self.stats = self._merge(totals, self.pending, now)
+                return
+            try:
+                with file_lock(self.path.with_name(self.path.name + '.lock')):
+                    totals = self._merge(self._read(), deltas, now)
+                    # استبدال ذري: القارئ لا يرى ملفاً نصف مكتوب
+                    tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+                    tmp.write_text(json.dumps(totals), encoding='utf-8')
+                    os.replace(tmp, self.path)
+            except OSError:
+                with self._lock:
+                    self.pending = self._merge(deltas, self.pending, now)
+                return
+            with self._lock:
+                # ما سُجل أثناء الكتابة يبقى معلقاً ويُضاف للعرض المحلي
+                self.stats = self._merge(totals, self.pending, now)
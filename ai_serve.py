@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🏭 وضع الإنتاج لخادمي Flask: إحماء عند الإقلاع وعدة عمال (prefork)
+
+العملية الرئيسية تستورد التطبيق ومكتبات المزودين مرة واحدة ثم تتفرع (fork)،
+فيتشارك العمال هذه الذاكرة للقراءة فقط. كل عامل يبني المساحة والعملاء ويفتح
+اتصال TLS مسبقاً مع كل مزود (الاتصالات وقواعد SQLite لا تُورث عبر fork)،
+ولا يبدأ الاستماع على المنفذ إلا بعد أن يبلغ كل العمال أنهم جاهزون.
+الذاكرة المشتركة بين العمال على القرص: ذاكرة الردود وسجل التكلفة والإحصائيات والموجّه.
+
+الاستخدام:
+    python3 ai_serve.py web|mobile [--workers 4] [--host 0.0.0.0] [--port 5000] [--ready-file PATH]
+"""
+
+import argparse
+import gc
+import importlib
+import json
+import os
+import selectors
+import signal
+import socket
+import sys
+import time
+
+from ai_lazy import STARTUP, module_available, timed_import
+from ai_transport import get_transport
+
+APPS = {'web': 'ai_workspace_web', 'mobile': 'ai_workspace_mobile'}
+# تُستورد قبل التفرع إن كانت مثبتة (الجزء الأغلى من الإقلاع البارد)
+SDK_MODULES = ('openai', 'anthropic', 'google.generativeai', 'requests')
+# مضيفو البحث الذين يُفتح لهم اتصال مسبق عبر طبقة النقل المشتركة
+SEARCH_HOSTS = {'serper': 'https://google.serper.dev', 'tavily': 'https://api.tavily.com'}
+
+
+def preload(app_name):
+    """استيراد التطبيق ومكتبات المزودين في العملية الرئيسية"""
+    start = time.perf_counter()
+    module = importlib.import_module(APPS[app_name])
+    for name in SDK_MODULES:
+        if module_available(name):
+            timed_import(name)
+    return module, time.perf_counter() - start
+
+
+def preconnect(client):
+    """مصافحة TCP+TLS عبر مجمع اتصالات العميل نفسه فيُعاد استخدامها في أول طلب
+
+    عملاء openai و anthropic يحملون httpx.Client في _client؛ أي رد (حتى 404)
+    يعني أن الاتصال فُتح وبقي في المجمع. يرجع False إن لم يكن ذلك متاحاً.
+    """
+    http = getattr(client, '_client', None)
+    base_url = getattr(client, 'base_url', None)
+    if http is None or base_url is None or not hasattr(http, 'request'):
+        return False
+    try:
+        http.request('HEAD', str(base_url), timeout=5)
+    except Exception:
+        return False
+    return True
+
+
+def warm(module):
+    """بناء المساحة والعملاء والاتصالات المسبقة في هذه العملية؛ يرجع تقرير الإحماء"""
+    start = time.perf_counter()
+    module.init_workspace()
+    workspace = module.workspace
+
+    preconnected = []
+    for name in workspace.clients.registered():
+        try:
+            client = workspace.clients[name]
+        except Exception as e:
+            print(f"⚠️ [{os.getpid()}] تعذر إنشاء عميل {name}: {e}", file=sys.stderr)
+            continue
+        if preconnect(client):
+            preconnected.append(name)
+
+    transport = get_transport()
+    for engine, url in SEARCH_HOSTS.items():
+        if engine in getattr(workspace, 'search_engines', {}):
+            try:
+                transport.request('HEAD', url, timeout=5)
+                preconnected.append(engine)
+            except Exception:
+                pass
+
+    module.warm_info = {
+        'pid': os.getpid(),
+        'warm_seconds': round(time.perf_counter() - start, 3),
+        'clients': workspace.clients.loaded(),
+        'preconnected': preconnected,
+    }
+    return module.warm_info
+
+
+def serve_socket(module, sock, host, port):
+    """خادم werkzeug متعدد الخيوط على منفذ مفتوح مسبقاً"""
+    from werkzeug.serving import make_server
+    server = make_server(host, port, module.app, threaded=True, fd=sock.fileno())
+    server.serve_forever()
+
+
+def run_worker(module, sock, host, port, ready_w, go_r):
+    """جسم العامل: إحماء، إبلاغ، انتظار إشارة البدء، ثم الخدمة"""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        info = warm(module)
+    except Exception as e:
+        os.write(ready_w, (json.dumps({'pid': os.getpid(), 'error': str(e)}, ensure_ascii=False) + '\n').encode())
+        os._exit(1)
+    os.write(ready_w, (json.dumps(info, ensure_ascii=False) + '\n').encode())
+    if not os.read(go_r, 1):
+        os._exit(0)
+    try:
+        serve_socket(module, sock, host, port)
+    finally:
+        os._exit(0)
+
+
+class PreforkServer:
+    """العملية الرئيسية: تفرع العمال وإعادة تشغيل من يسقط وإعلان الجاهزية"""
+
+    def __init__(self, module, host, port, workers, ready_file=None, backlog=1024):
+        self.module = module
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.ready_file = ready_file
+        self.backlog = backlog
+        self.children = {}
+        self.ready = {}
+        self.listening = False
+        self.stopping = False
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            os.close(self.ready_r)
+            os.close(self.go_w)
+            run_worker(self.module, self.sock, self.host, self.port, self.ready_w, self.go_r)
+        self.children[pid] = time.time()
+        return pid
+
+    def stop(self, *_):
+        self.stopping = True
+
+    def announce(self):
+        """الاستماع على المنفذ وإطلاق العمال بعد جاهزية الجميع"""
+        self.sock.listen(self.backlog)
+        self.listening = True
+        os.write(self.go_w, b'.' * len(self.ready))
+        if self.ready_file:
+            with open(self.ready_file, 'w', encoding='utf-8') as f:
+                json.dump({'pid': os.getpid(), 'port': self.port, 'workers': list(self.ready.values())}, f,
+                          ensure_ascii=False)
+        slowest = max(info['warm_seconds'] for info in self.ready.values())
+        print(f"✅ جاهز: {len(self.ready)} عامل على http://{self.host}:{self.port} (أبطأ إحماء {slowest:.2f}s)")
+        sys.stdout.flush()
+
+    def on_message(self, line):
+        info = json.loads(line)
+        if 'error' in info:
+            print(f"❌ [{info['pid']}] فشل الإحماء: {info['error']}", file=sys.stderr)
+            if not self.listening:
+                # خطأ إعداد (مفتاح، مكتبة) سيتكرر مع كل عامل جديد
+                self.stopping = True
+            return
+        self.ready[info['pid']] = info
+        if self.listening:
+            os.write(self.go_w, b'.')
+        elif len(self.ready) == self.workers:
+            self.announce()
+
+    def reap(self):
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            self.children.pop(pid, None)
+            self.ready.pop(pid, None)
+            if not self.stopping:
+                print(f"⚠️ العامل {pid} توقف (الحالة {status})، تشغيل بديل", file=sys.stderr)
+                self.spawn()
+
+    def run(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        # الربط الآن يكشف المنفذ المشغول مبكراً؛ الاستماع بعد الإحماء فقط
+        self.sock.bind((self.host, self.port))
+        self.ready_r, self.ready_w = os.pipe()
+        self.go_r, self.go_w = os.pipe()
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        # ما بُني حتى الآن يبقى ثابتاً: بدون هذا يلمس جامع القمامة كل الكائنات
+        # في كل عامل فتُنسخ صفحات الذاكرة المشتركة
+        gc.freeze()
+        for _ in range(self.workers):
+            self.spawn()
+
+        selector = selectors.DefaultSelector()
+        selector.register(self.ready_r, selectors.EVENT_READ)
+        pending = b''
+        try:
+            while not self.stopping:
+                if selector.select(timeout=0.5):
+                    data = os.read(self.ready_r, 65536)
+                    pending += data
+                    *lines, pending = pending.split(b'\n')
+                    for line in lines:
+                        self.on_message(line)
+                self.reap()
+        finally:
+            self.shutdown()
+        return 0 if self.listening else 1
+
+    def shutdown(self):
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.time() + 10
+        while self.children and time.time() < deadline:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid:
+                self.children.pop(pid, None)
+            else:
+                time.sleep(0.05)
+        for pid in self.children:
+            os.kill(pid, signal.SIGKILL)
+        if self.ready_file and os.path.exists(self.ready_file):
+            os.remove(self.ready_file)
+        self.sock.close()
+
+
+def serve_inline(module, host, port, ready_file=None):
+    """بدون fork (Windows): إحماء في العملية نفسها ثم الخدمة"""
+    info = warm(module)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(1024)
+    if ready_file:
+        with open(ready_file, 'w', encoding='utf-8') as f:
+            json.dump({'pid': os.getpid(), 'port': port, 'workers': [info]}, f, ensure_ascii=False)
+    print(f"✅ جاهز على http://{host}:{port} (إحماء {info['warm_seconds']:.2f}s)")
+    serve_socket(module, sock, host, port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='تشغيل خادمي Flask للإنتاج مع إحماء وعدة عمال')
+    parser.add_argument('app', choices=sorted(APPS))
+    parser.add_argument('--workers', type=int, default=int(os.getenv('AI_WORKERS', os.cpu_count() or 1)))
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--ready-file', help='ملف يُكتب عند جاهزية كل العمال ويُحذف عند الإيقاف')
+    args = parser.parse_args()
+
+    print("\n" + "="*60)
+    print(f"🏭 {args.app} - وضع الإنتاج")
+    print("="*60)
+    module, seconds = preload(args.app)
+    print(f"📦 الاستيراد المسبق: {seconds * 1000:.0f} ms "
+          f"({', '.join(e['name'] for e in STARTUP.entries if e['kind'] == 'import') or 'بدون مكتبات مزودين'})")
+    sys.stdout.flush()
+
+    if not hasattr(os, 'fork'):
+        serve_inline(module, args.host, args.port, args.ready_file)
+        return 0
+    print(f"🔥 إحماء {args.workers} عامل...")
+    sys.stdout.flush()
+    return PreforkServer(module, args.host, args.port, max(args.workers, 1), args.ready_file).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+📊 إحصائيات الاستخدام بكتابة مؤجلة
+العدادات تُجمع في الذاكرة ويكتبها خيط خلفي كل flush_interval ثانية أو بعد
+flush_every استدعاء. الكتابة تدمج الفروق مع ما على القرص (تحت قفل الملف)
+فلا تمسح عملية كتابات أخرى، ثم تستبدل الملف بشكل ذري
+"""
+
+import atexit
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: القفل داخل العملية فقط
+    fcntl = None
+
+
+@contextmanager
+def file_lock(path):
+    """قفل حصري بين العمليات على ملف جانبي"""
+    if fcntl is None:
+        yield
+        return
+    with open(path, 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _merge(totals, deltas):
+    """إضافة فروق العدادات إلى المجاميع (آخر استخدام = الأحدث)"""
+    for model_id, delta in deltas.items():
+        row = totals.setdefault(model_id, {'count': 0, 'last_used': None})
+        row['count'] += delta['count']
+        if delta['last_used'] and (row.get('last_used') or '') < delta['last_used']:
+            row['last_used'] = delta['last_used']
+    return totals
+
+
+class UsageStats:
+    """{model_id: {'count', 'last_used'}} للقراءة، و increment() بدون أي قرص
+
+    التخزين: WorkspaceDB إن مُررت (معاملة واحدة لكل دفعة)، وإلا ملف JSON.
+    """
+
+    def __init__(self, path=None, db=None, flush_every=None, flush_interval=None):
+        self.path = Path(path or Path.home() / "ai_workspace_stats.json")
+        self.db = db
+        self.flush_every = flush_every or int(os.getenv('AI_STATS_FLUSH_EVERY', 20))
+        self.flush_interval = flush_interval or float(os.getenv('AI_STATS_FLUSH_INTERVAL', 5.0))
+        self.totals = self._read()
+        self.pending = {}
+        self._pending_calls = 0
+        self._lock = threading.Lock()
+        # كتابة واحدة في كل مرة (الخيط الخلفي أو flush صريح)
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        atexit.register(self.close)
+
+    # ---- القراءة ----
+
+    def _read(self):
+        if self.db is not None:
+            return self.db.usage_stats()
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def snapshot(self):
+        """المجاميع المعروفة + ما لم يُكتب بعد"""
+        with self._lock:
+            totals = {model_id: dict(row) for model_id, row in self.totals.items()}
+            return _merge(totals, self.pending)
+
+    def __getitem__(self, model_id):
+        return self.snapshot()[model_id]
+
+    def get(self, model_id, default=None):
+        return self.snapshot().get(model_id, default)
+
+    def __contains__(self, model_id):
+        with self._lock:
+            return model_id in self.totals or model_id in self.pending
+
+    def __len__(self):
+        return len(self.snapshot())
+
+    def items(self):
+        return self.snapshot().items()
+
+    # ---- الكتابة ----
+
+    def increment(self, model_id, count=1, when=None):
+        """زيادة عداد نموذج في الذاكرة؛ الكتابة يتولاها الخيط الخلفي"""
+        when = when or datetime.now().isoformat()
+        with self._lock:
+            _merge(self.pending, {model_id: {'count': count, 'last_used': when}})
+            self._pending_calls += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='usage-stats', daemon=True)
+                self._thread.start()
+            if self._pending_calls >= self.flush_every:
+                self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                # الفروق أُعيدت للانتظار؛ المحاولة في الدورة القادمة
+                pass
+
+    def flush(self):
+        """كتابة الفروق المعلقة ودمجها مع ما كتبته العمليات الأخرى"""
+        with self._flush_lock:
+            with self._lock:
+                deltas, self.pending = self.pending, {}
+                self._pending_calls = 0
+            if not deltas:
+                return
+            try:
+                totals = self._write(deltas)
+            except Exception:
+                with self._lock:
+                    self.pending = _merge(deltas, self.pending)
+                raise
+            with self._lock:
+                self.totals = totals
+
+    def _write(self, deltas):
+        if self.db is not None:
+            self.db.increment_usage_many(
+                [(model_id, delta['count'], delta['last_used']) for model_id, delta in deltas.items()]
+            )
+            return self.db.usage_stats()
+
+        with file_lock(self.path.with_name(self.path.name + '.lock')):
+            totals = _merge(self._read(), deltas)
+            tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            with open(tmp, 'w') as f:
+                json.dump(totals, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        return totals
+
+    def close(self):
+        """إيقاف الخيط الخلفي وكتابة ما تبقى"""
+        self._stop.set()
+        self._wake.set()
+        try:
+            self.flush()
+        except Exception:
+            pass
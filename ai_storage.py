@@ -0,0 +1,554 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🗄️ قاعدة بيانات مساحة العمل
+ملف SQLite واحد (وضع WAL) للمحادثات والرسائل وإحصائيات الاستخدام، تقرأ وتكتب فيه
+الطرفية وتطبيق الهاتف وخادما الويب معاً بدون أن يمسح أحدهم كتابات الآخر
+
+الاستخدام:
+    python3 ai_storage.py migrate [--force]   # نقل الملفات القديمة (JSON) مرة واحدة
+    python3 ai_storage.py stats
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from ai_text import normalize_arabic, snippet, tokenize
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    timestamp TEXT,
+    source TEXT,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS conversations_updated ON conversations(updated);
+CREATE TABLE IF NOT EXISTS messages (
+    conversation_id TEXT NOT NULL REFERENCES conversations(id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    model TEXT,
+    timestamp TEXT,
+    extra TEXT,
+    PRIMARY KEY (conversation_id, seq)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS usage_stats (
+    model TEXT PRIMARY KEY,
+    count INTEGER NOT NULL DEFAULT 0,
+    last_used TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+-- فهرس البحث: النص الموحد مفهرس، والأصل محفوظ فيه ليبقى قابلاً للبحث بعد الأرشفة
+CREATE VIRTUAL TABLE IF NOT EXISTS message_search USING fts5(
+    body,
+    conversation_id UNINDEXED, seq UNINDEXED, title UNINDEXED, role UNINDEXED,
+    model UNINDEXED, timestamp UNINDEXED, content UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+# استعلامات ثابتة: يعيد sqlite3 استخدام الجمل المُحضّرة من ذاكرته
+INSERT_CONVERSATION = (
+    "INSERT INTO conversations(id, title, timestamp, source, message_count, updated) VALUES(?, ?, ?, ?, 0, ?) "
+    "ON CONFLICT(id) DO UPDATE SET title = excluded.title, timestamp = excluded.timestamp"
+)
+INSERT_MESSAGE = (
+    "INSERT OR IGNORE INTO messages(conversation_id, seq, role, content, model, timestamp, extra) "
+    "VALUES(?, ?, ?, ?, ?, ?, ?)"
+)
+NEXT_SEQ = "SELECT COALESCE(MAX(seq) + 1, 0) FROM messages WHERE conversation_id = ?"
+UPDATE_COUNT = (
+    "UPDATE conversations SET message_count = (SELECT COUNT(*) FROM messages WHERE conversation_id = ?), "
+    "updated = ? WHERE id = ?"
+)
+INSERT_SEARCH = (
+    "INSERT INTO message_search(body, conversation_id, seq, title, role, model, timestamp, content) "
+    "VALUES(normalize_arabic(?), ?, ?, ?, ?, ?, ?, ?)"
+)
+REBUILD_SEARCH = (
+    "INSERT INTO message_search(body, conversation_id, seq, title, role, model, timestamp, content) "
+    "SELECT normalize_arabic(m.content), m.conversation_id, m.seq, c.title, m.role, m.model, m.timestamp, m.content "
+    "FROM messages m JOIN conversations c ON c.id = m.conversation_id"
+)
+INCREMENT_USAGE = (
+    "INSERT INTO usage_stats(model, count, last_used) VALUES(?, ?, ?) "
+    "ON CONFLICT(model) DO UPDATE SET count = count + excluded.count, "
+    "last_used = MAX(COALESCE(last_used, ''), COALESCE(excluded.last_used, ''))"
+)
+
+MESSAGE_FIELDS = ('role', 'content', 'model', 'timestamp')
+
+
+def storage_backend():
+    """الواجهة الخلفية للتخزين: sqlite (الافتراضي) أو json"""
+    return os.getenv('AI_WORKSPACE_STORAGE', 'sqlite').lower()
+
+
+def _message_row(chat_id, seq, message):
+    extra = {key: value for key, value in message.items() if key not in MESSAGE_FIELDS}
+    return (
+        chat_id, seq, message['role'], message['content'], message.get('model'), message.get('timestamp'),
+        json.dumps(extra, ensure_ascii=False) if extra else None,
+    )
+
+
+def _search_row(chat_id, seq, message, title):
+    return (
+        message['content'], chat_id, seq, title, message['role'], message.get('model'),
+        message.get('timestamp'), message['content'],
+    )
+
+
+def _row_message(row):
+    role, content, model, timestamp, extra = row
+    message = {'role': role, 'content': content}
+    if model:
+        message['model'] = model
+    if timestamp:
+        message['timestamp'] = timestamp
+    if extra:
+        message.update(json.loads(extra))
+    return message
+
+
+class WorkspaceDB:
+    """اتصال SQLite لكل خيط مع WAL ومهلة انتظار للأقفال"""
+
+    def __init__(self, path=None):
+        self.path = Path(path or os.getenv('AI_WORKSPACE_DB', Path.home() / "ai_workspace.db"))
+        self._local = threading.local()
+        self.connect().executescript(SCHEMA)
+        if self.get_meta('search_index') is None:
+            self.rebuild_search()
+
+    def connect(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(str(self.path), timeout=10, isolation_level=None, cached_statements=64)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("PRAGMA foreign_keys=ON")
+            db.create_function('normalize_arabic', 1, normalize_arabic, deterministic=True)
+            self._local.db = db
+        return db
+
+    @contextmanager
+    def transaction(self):
+        """معاملة كتابة (BEGIN IMMEDIATE يحجز القفل مبكراً فلا تتعارض العمليات)"""
+        db = self.connect()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def close(self):
+        db = getattr(self._local, 'db', None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+    # ---- المحادثات ----
+
+    def upsert_conversation(self, chat_id, conversation, source=None):
+        """إنشاء المحادثة أو تحديث عنوانها ثم إضافة رسائلها غير الموجودة"""
+        title = conversation.get('title', 'محادثة')
+        with self.transaction() as db:
+            db.execute(INSERT_CONVERSATION, (chat_id, title, conversation.get('timestamp'), source, time.time()))
+            existing = {seq for (seq,) in db.execute("SELECT seq FROM messages WHERE conversation_id = ?", (chat_id,))}
+            new = [(seq, m) for seq, m in enumerate(conversation.get('messages', [])) if seq not in existing]
+            db.executemany(INSERT_MESSAGE, [_message_row(chat_id, seq, m) for seq, m in new])
+            db.executemany(INSERT_SEARCH, [_search_row(chat_id, seq, m, title) for seq, m in new])
+            db.execute(UPDATE_COUNT, (chat_id, time.time(), chat_id))
+
+    def append_messages(self, chat_id, messages):
+        """إلحاق رسائل دفعة واحدة بعد آخر رسالة مخزنة (ولو كتبها تطبيق آخر)"""
+        with self.transaction() as db:
+            (seq,) = db.execute(NEXT_SEQ, (chat_id,)).fetchone()
+            (title,) = db.execute("SELECT title FROM conversations WHERE id = ?", (chat_id,)).fetchone() or ('',)
+            db.executemany(INSERT_MESSAGE, [_message_row(chat_id, seq + i, m) for i, m in enumerate(messages)])
+            db.executemany(INSERT_SEARCH, [_search_row(chat_id, seq + i, m, title) for i, m in enumerate(messages)])
+            db.execute(UPDATE_COUNT, (chat_id, time.time(), chat_id))
+
+    def load_conversation(self, chat_id):
+        db = self.connect()
+        row = db.execute("SELECT title, timestamp FROM conversations WHERE id = ?", (chat_id,)).fetchone()
+        if row is None:
+            return None
+        messages = db.execute(
+            "SELECT role, content, model, timestamp, extra FROM messages WHERE conversation_id = ? ORDER BY seq",
+            (chat_id,)
+        )
+        return {'title': row[0], 'timestamp': row[1], 'messages': [_row_message(m) for m in messages]}
+
+    def restore_conversation(self, chat_id, conversation, source=None):
+        """إعادة محادثة من الأرشيف (صفوف البحث لم تُحذف عند الأرشفة فلا تُكرر)"""
+        now = time.time()
+        with self.transaction() as db:
+            db.execute(INSERT_CONVERSATION, (chat_id, conversation.get('title', 'محادثة'),
+                                             conversation.get('timestamp'), source, now))
+            db.executemany(INSERT_MESSAGE, [
+                _message_row(chat_id, seq, m) for seq, m in enumerate(conversation.get('messages', []))
+            ])
+            db.execute(UPDATE_COUNT, (chat_id, now, chat_id))
+
+    def conversation_meta(self, chat_id):
+        db = self.connect()
+        row = db.execute(
+            "SELECT title, timestamp, message_count FROM conversations WHERE id = ?", (chat_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        models = [m for (m,) in db.execute(
+            "SELECT DISTINCT model FROM messages WHERE conversation_id = ? AND model IS NOT NULL ORDER BY model",
+            (chat_id,)
+        )]
+        return {'title': row[0], 'timestamp': row[1], 'messages': row[2], 'models': models}
+
+    def has_conversation(self, chat_id):
+        return self.connect().execute("SELECT 1 FROM conversations WHERE id = ?", (chat_id,)).fetchone() is not None
+
+    def conversation_ids(self):
+        return [chat_id for (chat_id,) in self.connect().execute("SELECT id FROM conversations ORDER BY updated")]
+
+    def count_conversations(self):
+        return self.connect().execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+
+    def count_messages(self):
+        return self.connect().execute("SELECT COALESCE(SUM(message_count), 0) FROM conversations").fetchone()[0]
+
+    def recent(self, limit=20):
+        rows = self.connect().execute(
+            "SELECT id, title, timestamp, message_count FROM conversations ORDER BY updated DESC LIMIT ?", (limit,)
+        )
+        return [{'id': r[0], 'title': r[1], 'timestamp': r[2], 'messages': r[3]} for r in rows]
+
+    # ---- البحث ----
+
+    def rebuild_search(self):
+        """إعادة بناء فهرس البحث من جدول الرسائل (مرة واحدة للقواعد الأقدم من الفهرس)
+
+        صفوف المحادثات المؤرشفة (غير الموجودة في جدول المحادثات) تبقى كما هي.
+        """
+        with self.transaction() as db:
+            db.execute("DELETE FROM message_search WHERE conversation_id IN (SELECT id FROM conversations)")
+            db.execute(REBUILD_SEARCH)
+            db.execute("INSERT OR REPLACE INTO meta(key, value) VALUES('search_index', ?)", (datetime.now().isoformat(),))
+
+    def search(self, query, limit=20):
+        """أفضل الرسائل مطابقة (ترتيب bm25) مع مقتطف من النص الأصلي"""
+        terms = tokenize(query)
+        if not terms:
+            return []
+        # كل كلمة مطلوبة، وآخرها كبادئة لدعم البحث أثناء الكتابة
+        match = ' '.join(f'"{term}"' for term in terms[:-1]) + f' "{terms[-1]}"*'
+        rows = self.connect().execute(
+            "SELECT conversation_id, seq, title, role, model, timestamp, content, bm25(message_search) "
+            "FROM message_search WHERE message_search MATCH ? ORDER BY bm25(message_search) LIMIT ?",
+            (match, limit)
+        )
+        return [
+            {
+                'conversation_id': chat_id, 'seq': seq, 'title': title, 'role': role, 'model': model,
+                'timestamp': timestamp, 'snippet': snippet(content, terms), 'score': -score,
+            }
+            for chat_id, seq, title, role, model, timestamp, content, score in rows
+        ]
+
+    # ---- الإحصائيات ----
+
+    def increment_usage(self, model_id, count=1, when=None):
+        with self.transaction() as db:
+            db.execute(INCREMENT_USAGE, (model_id, count, when or datetime.now().isoformat()))
+
+    def increment_usage_many(self, rows):
+        """[(model, count, last_used)] في معاملة واحدة (من UsageStats)"""
+        with self.transaction() as db:
+            db.executemany(INCREMENT_USAGE, rows)
+
+    def usage_stats(self):
+        rows = self.connect().execute("SELECT model, count, last_used FROM usage_stats")
+        return {model: {'count': count, 'last_used': last_used} for model, count, last_used in rows}
+
+    # ---- بيانات عامة ----
+
+    def get_meta(self, key, default=None):
+        row = self.connect().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        with self.transaction() as db:
+            db.execute("INSERT OR REPLACE INTO meta(key, value) VALUES(?, ?)", (key, value))
+
+
+class SQLiteConversationStore:
+    """نفس واجهة ConversationStore فوق WorkspaceDB
+
+    الرسائل تُكتب فور إلحاقها بترقيم يحدده SQLite، فلا يمسح تطبيقان رسائل
+    بعضهما. النصوص المحملة تبقى في LRU صغير للمحادثات النشطة. المحادثات
+    المؤرشفة (archive) تُقرأ منه وتُستعاد للقاعدة عند أول تعديل.
+    """
+
+    def __init__(self, db, max_resident=None, source=None, archive=None, usage=None):
+        self.db = db
+        self.source = source
+        self.archive = archive
+        # UsageStats اختياري: العدادات تُكتب مؤجلة بدل معاملة لكل رسالة
+        self.usage = usage
+        self.max_resident = max_resident or int(os.getenv('AI_CONVERSATIONS_RESIDENT', 8))
+        self._resident = OrderedDict()
+        self._lock = threading.RLock()
+
+    def _touch(self, chat_id, conversation):
+        self._resident[chat_id] = conversation
+        self._resident.move_to_end(chat_id)
+        while len(self._resident) > self.max_resident:
+            self._resident.popitem(last=False)
+
+    def __getitem__(self, chat_id):
+        with self._lock:
+            conversation = self._resident.get(chat_id)
+            if conversation is None:
+                conversation = self.db.load_conversation(chat_id)
+                if conversation is None:
+                    if self.archive is None:
+                        raise KeyError(chat_id)
+                    return self.archive.get(chat_id)
+            self._touch(chat_id, conversation)
+            return conversation
+
+    def __setitem__(self, chat_id, conversation):
+        with self._lock:
+            self.db.upsert_conversation(chat_id, conversation, self.source)
+            self._touch(chat_id, conversation)
+
+    def get(self, chat_id, default=None):
+        try:
+            return self[chat_id]
+        except KeyError:
+            return default
+
+    def __contains__(self, chat_id):
+        return (chat_id in self._resident or self.db.has_conversation(chat_id)
+                or (self.archive is not None and chat_id in self.archive))
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        ids = self.db.conversation_ids()
+        if self.archive is None:
+            return ids
+        hot = set(ids)
+        return [chat_id for chat_id in self.archive.keys() if chat_id not in hot] + ids
+
+    def resident(self):
+        return list(self._resident)
+
+    def append_message(self, chat_id, message):
+        self.append_messages(chat_id, [message])
+
+    def _restore(self, chat_id):
+        """إعادة محادثة مؤرشفة إلى القاعدة قبل تعديلها"""
+        if self.archive is None or self.db.has_conversation(chat_id) or chat_id not in self.archive:
+            return
+        self.db.restore_conversation(chat_id, self.archive.get(chat_id), self.source)
+        self.archive.remove(chat_id)
+
+    def archive_idle(self, days, batch=50):
+        """نقل المحادثات التي لم تُحدَّث منذ days يوماً إلى الأرشيف
+
+        القراءة والأرشفة والحذف في معاملة واحدة، فلا تضيع رسالة تلحقها عملية
+        أخرى في نفس اللحظة. صفوف فهرس البحث تبقى لتظل المحادثة قابلة للبحث.
+        """
+        if self.archive is None:
+            return 0
+        cutoff = time.time() - days * 86400
+        moved = 0
+        while True:
+            with self._lock, self.db.transaction() as conn:
+                rows = conn.execute(
+                    "SELECT id, updated FROM conversations WHERE updated < ? ORDER BY updated LIMIT ?",
+                    (cutoff, batch)
+                ).fetchall()
+                items = [(chat_id, self.db.load_conversation(chat_id), updated) for chat_id, updated in rows
+                         if chat_id not in self._resident]
+                if items:
+                    self.archive.put_many(items)
+                    conn.executemany("DELETE FROM conversations WHERE id = ?", [(item[0],) for item in items])
+            moved += len(items)
+            if len(rows) < batch or not items:
+                return moved
+
+    def append_messages(self, chat_id, messages):
+        """إلحاق الرسائل في معاملة واحدة (بدون تحميل المحادثة)"""
+        with self._lock:
+            self._restore(chat_id)
+            self.db.append_messages(chat_id, messages)
+            conversation = self._resident.get(chat_id)
+            if conversation is not None:
+                conversation.setdefault('messages', []).extend(messages)
+
+    def save(self, chat_id, conversation=None):
+        """الرسائل محفوظة عند إلحاقها؛ تمرير محادثة كاملة يضيف ما ينقصها فقط"""
+        if conversation is not None:
+            with self._lock:
+                self._restore(chat_id)
+                self.db.upsert_conversation(chat_id, conversation, self.source)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.db.close()
+
+    def meta(self, chat_id):
+        meta = self.db.conversation_meta(chat_id)
+        if meta is None and self.archive is not None:
+            return self.archive.meta(chat_id)
+        return meta
+
+    def recent(self, limit=20):
+        return self.db.recent(limit)
+
+    def total_messages(self):
+        total = self.db.count_messages()
+        if self.archive is not None:
+            total += self.archive.total_messages()
+        return total
+
+    def search(self, query, limit=20):
+        return self.db.search(query, limit)
+
+    def record_exchange(self, chat_id, prompt, response, model_id):
+        """تسجيل سؤال ورده (من خوادم الويب) مع إنشاء المحادثة عند أول رسالة"""
+        now = datetime.now()
+        if chat_id not in self:
+            self[chat_id] = {'title': prompt[:40], 'timestamp': now.strftime("%Y-%m-%d %H:%M"), 'messages': []}
+        self.append_messages(chat_id, [
+            {'role': 'user', 'content': prompt, 'timestamp': now.isoformat()},
+            {'role': 'assistant', 'content': response, 'model': model_id, 'timestamp': datetime.now().isoformat()},
+        ])
+        if self.usage is not None:
+            self.usage.increment(model_id)
+        else:
+            self.db.increment_usage(model_id)
+
+
+def new_chat_id():
+    """معرف محادثة فريد حتى مع عدة عمليات في نفس الثانية"""
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.urandom(3).hex()}"
+
+
+def migrate_json(db, conversations_dir=None, stats_file=None, force=False, batch=200):
+    """نقل المحادثات والإحصائيات من ملفات JSON (مرة واحدة ما لم يُطلب force)
+
+    الملفات القديمة لا تُحذف. يُرجع (عدد المحادثات، عدد الرسائل) المنقولة.
+    """
+    from ai_conversations import ConversationStore
+
+    if db.get_meta('migrated_json') and not force:
+        return 0, 0
+
+    conversations_dir = Path(conversations_dir or Path.home() / "ai_workspace_conversations")
+    stats_file = Path(stats_file or Path.home() / "ai_workspace_stats.json")
+    conversations = messages = 0
+
+    if conversations_dir.exists():
+        store = ConversationStore(conversations_dir, max_resident=1)
+        pending = []
+        for chat_id in store.keys():
+            try:
+                conversation = store[chat_id]
+            except (OSError, ValueError, KeyError):
+                continue
+            pending.append((chat_id, conversation))
+            if len(pending) >= batch:
+                messages += _insert_batch(db, pending)
+                conversations += len(pending)
+                pending = []
+        messages += _insert_batch(db, pending)
+        conversations += len(pending)
+        store.close()
+
+    if stats_file.exists() and not db.get_meta('migrated_stats'):
+        try:
+            with open(stats_file, 'r') as f:
+                stats = json.load(f)
+        except (OSError, ValueError):
+            stats = {}
+        with db.transaction() as conn:
+            conn.executemany(INCREMENT_USAGE, [
+                (model_id, data.get('count', 0), data.get('last_used')) for model_id, data in stats.items()
+            ])
+        db.set_meta('migrated_stats', datetime.now().isoformat())
+
+    db.set_meta('migrated_json', datetime.now().isoformat())
+    return conversations, messages
+
+
+def _insert_batch(db, pending):
+    """إدخال مجموعة محادثات في معاملة واحدة"""
+    if not pending:
+        return 0
+    now = time.time()
+    rows = []
+    search_rows = []
+    with db.transaction() as conn:
+        conn.executemany(INSERT_CONVERSATION, [
+            (chat_id, c.get('title', 'محادثة'), c.get('timestamp'), 'json', now) for chat_id, c in pending
+        ])
+        for chat_id, conversation in pending:
+            # عند إعادة النقل (--force) لا تُكرر الرسائل الموجودة
+            existing = {seq for (seq,) in conn.execute(
+                "SELECT seq FROM messages WHERE conversation_id = ?", (chat_id,)
+            )}
+            title = conversation.get('title', 'محادثة')
+            for seq, message in enumerate(conversation.get('messages', [])):
+                if seq not in existing:
+                    rows.append(_message_row(chat_id, seq, message))
+                    search_rows.append(_search_row(chat_id, seq, message, title))
+        conn.executemany(INSERT_MESSAGE, rows)
+        conn.executemany(INSERT_SEARCH, search_rows)
+        conn.executemany(UPDATE_COUNT, [(chat_id, now, chat_id) for chat_id, _ in pending])
+    return len(rows)
+
+
+def main():
+    db = WorkspaceDB()
+    command = sys.argv[1] if len(sys.argv) > 1 else 'stats'
+    if command == 'migrate':
+        conversations, messages = migrate_json(db, force='--force' in sys.argv)
+        if conversations or messages:
+            print(f"✅ تم نقل {conversations} محادثة و {messages} رسالة إلى {db.path}")
+        else:
+            print("ℹ️ لا يوجد ما يُنقل (تم النقل سابقاً؟ استخدم --force)")
+    else:
+        print(f"🗄️ {db.path}")
+        print(f"  💬 المحادثات: {db.count_conversations()}")
+        print(f"  📝 الرسائل: {db.count_messages()}")
+        for model_id, stats in sorted(db.usage_stats().items(), key=lambda item: -item[1]['count']):
+            print(f"  🤖 {model_id:<30} {stats['count']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🔤 أدوات توحيد النص العربي
+إزالة التشكيل والتطويل وتوحيد أشكال الألف والتاء المربوطة قبل المقارنة والفهرسة
+"""
+
+import re
+import unicodedata
+
+# التشكيل وعلامات القرآن والألف الخنجرية
+DIACRITICS = re.compile('[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED]')
+TATWEEL = '\u0640'
+LETTER_FOLDS = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',  # أ إ آ ٱ ← ا
+    'ة': 'ه',  # ة ← ه
+    'ى': 'ي',  # ى ← ي
+    'ؤ': 'و', 'ئ': 'ي',  # ؤ ← و ، ئ ← ي
+})
+# كل ما ليس حرفاً أو رقماً يُعامل كفاصل
+NON_WORD = re.compile(r'[^\w]+', re.UNICODE)
+
+
+def normalize_arabic(text):
+    """توحيد النص: NFKC، إزالة التشكيل والتطويل، توحيد الحروف، حروف صغيرة"""
+    text = unicodedata.normalize('NFKC', text)
+    text = DIACRITICS.sub('', text).replace(TATWEEL, '')
+    return text.translate(LETTER_FOLDS).lower()
+
+
+def tokenize(text):
+    """تقسيم النص الموحد إلى كلمات بدون علامات الترقيم"""
+    return [token for token in NON_WORD.split(normalize_arabic(text)) if token and token != '_']
+
+
+def snippet(text, terms, words=16, mark=('«', '»')):
+    """مقتطف من النص الأصلي حول أول كلمة مطابقة مع تمييز الكلمات المطابقة
+
+    المطابقة على النص الموحد (كلمة تبدأ بأحد المصطلحات) والعرض بالنص الأصلي.
+    """
+    terms = [term for term in terms if term]
+    original = text.split()
+    hits = [
+        i for i, word in enumerate(original)
+        if any(token.startswith(term) for token in tokenize(word) for term in terms)
+    ]
+    if not original:
+        return ''
+    start = max(0, (hits[0] if hits else 0) - words // 3)
+    end = min(len(original), start + words)
+    hit_set = set(hits)
+    parts = [
+        f"{mark[0]}{word}{mark[1]}" if i in hit_set else word
+        for i, word in enumerate(original[start:end], start)
+    ]
+    return ('… ' if start else '') + ' '.join(parts) + (' …' if end < len(original) else '')
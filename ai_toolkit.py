@@ -12,6 +12,10 @@ import time
 from datetime import datetime
 from typing import Dict, List, Optional
 
+from ai_transport import get_transport
+from ai_engine import ProviderEngine
+from ai_compare import CompareView
+
 # ألوان النص
 class Colors:
     HEADER = '\033[95m'
@@ -161,6 +165,11 @@ class AIToolkit:
                 print_error(f"{name.replace('_', ' ').title()}: {info['status']}")
 
         print(f"\n{Colors.CYAN}الإجمالي: {available_count}/{len(self.apis)} APIs متاحة{Colors.END}")
+
+        # إحصائيات إعادة استخدام الاتصالات
+        for host, stats in get_transport().stats().items():
+            print_info(f"{host}: {stats['requests']} طلب، {stats['connections']} اتصال، {stats['reused']} إعادة استخدام")
+
         return available_count
 
     def chat_with_ai(self):
@@ -198,9 +207,6 @@ class AIToolkit:
         print(f"{Colors.GREEN}OpenAI: {Colors.END}", end="")
 
         try:
-            import urllib.request
-            import json
-
             api_key = os.getenv('OPENAI_API_KEY')
             url = "https://api.openai.com/v1/chat/completions"
             headers = {
@@ -213,11 +219,11 @@ class AIToolkit:
                 "max_tokens": 150
             }
 
-            req = urllib.request.Request(url, data=json.dumps(data).encode('utf-8'), headers=headers)
-            with urllib.request.urlopen(req, timeout=30) as response:
-                result = json.loads(response.read().decode())
-                reply = result["choices"][0]["message"]["content"]
-                print(reply)
+            response = get_transport().post(url, json=data, headers=headers, timeout=30)
+            response.raise_for_status()
+            result = response.json()
+            reply = result["choices"][0]["message"]["content"]
+            print(reply)
         except Exception as e:
             print_error(f"خطأ: {str(e)[:50]}")
 
@@ -228,9 +234,6 @@ class AIToolkit:
         print(f"{Colors.CYAN}Gemini: {Colors.END}", end="")
 
         try:
-            import urllib.request
-            import json
-
             api_key = os.getenv('GEMINI_API_KEY')
             url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-pro:generateContent?key={api_key}"
             data = {
@@ -239,11 +242,11 @@ class AIToolkit:
                 }]
             }
 
-            req = urllib.request.Request(url, data=json.dumps(data).encode('utf-8'))
-            with urllib.request.urlopen(req, timeout=30) as response:
-                result = json.loads(response.read().decode())
-                reply = result["candidates"][0]["content"]["parts"][0]["text"]
-                print(reply)
+            response = get_transport().post(url, json=data, timeout=30)
+            response.raise_for_status()
+            result = response.json()
+            reply = result["candidates"][0]["content"]["parts"][0]["text"]
+            print(reply)
         except Exception as e:
             print_error(f"خطأ: {str(e)[:50]}")
 
@@ -254,9 +257,6 @@ class AIToolkit:
         print(f"{Colors.PURPLE}Claude: {Colors.END}", end="")
 
         try:
-            import urllib.request
-            import json
-
             api_key = os.getenv('ANTHROPIC_API_KEY')
             url = "https://api.anthropic.com/v1/messages"
             headers = {
@@ -270,33 +270,48 @@ class AIToolkit:
                 'messages': [{'role': 'user', 'content': message}]
             }
 
-            req = urllib.request.Request(url, data=json.dumps(data).encode('utf-8'), headers=headers)
-            with urllib.request.urlopen(req, timeout=30) as response:
-                result = json.loads(response.read().decode())
-                reply = result["content"][0]["text"]
-                print(reply)
+            response = get_transport().post(url, json=data, headers=headers, timeout=30)
+            response.raise_for_status()
+            result = response.json()
+            reply = result["content"][0]["text"]
+            print(reply)
         except Exception as e:
             print_error(f"خطأ: {str(e)[:50]}")
 
     def _chat_all_models(self, message):
-        """دردشة مع جميع النماذج"""
+        """دردشة مع جميع النماذج بالتوازي"""
         print_info("مقارنة جميع النماذج...")
         print(f"{Colors.BOLD}السؤال: {message}{Colors.END}\n")
 
+        models = {}
         if self.apis.get('openai', {}).get('available'):
-            print(f"{Colors.GREEN}=== OpenAI ==={Colors.END}")
-            self._chat_openai(message)
-            print()
-
+            models['gpt-3.5-turbo'] = {'name': 'OpenAI', 'client': 'openai'}
         if self.apis.get('gemini', {}).get('available'):
-            print(f"{Colors.CYAN}=== Gemini ==={Colors.END}")
-            self._chat_gemini(message)
-            print()
-
+            models['gemini-pro'] = {'name': 'Gemini', 'client': 'google'}
         if self.apis.get('anthropic', {}).get('available'):
-            print(f"{Colors.PURPLE}=== Claude ==={Colors.END}")
-            self._chat_anthropic(message)
-            print()
+            models['claude-3-haiku-20240307'] = {'name': 'Claude', 'client': 'anthropic'}
+
+        if not models:
+            print_error("لا توجد نماذج متاحة للمقارنة")
+            return
+
+        keys = {
+            'openai': os.getenv('OPENAI_API_KEY'),
+            'google': os.getenv('GEMINI_API_KEY'),
+            'anthropic': os.getenv('ANTHROPIC_API_KEY'),
+        }
+        engine = ProviderEngine(keys, models, timeout=30)
+        view = CompareView({model_id: info['name'] for model_id, info in models.items()})
+        try:
+            results = engine.fanout(
+                list(models),
+                [{'role': 'user', 'content': message}],
+                on_token=view.on_token,
+                max_tokens=150
+            )
+            view.finish(results)
+        finally:
+            engine.close()
 
     def search_the_web(self):
         """البحث في الويب"""
@@ -324,9 +339,6 @@ class AIToolkit:
         """بحث مع Serper"""
         print_info("جاري البحث مع Serper...")
         try:
-            import urllib.request
-            import json
-
             api_key = os.getenv('SERPER_API_KEY')
             url = "https://google.serper.dev/search"
             headers = {
@@ -335,14 +347,14 @@ class AIToolkit:
             }
             data = {'q': query, 'num': 5}
 
-            req = urllib.request.Request(url, data=json.dumps(data).encode('utf-8'), headers=headers)
-            with urllib.request.urlopen(req, timeout=15) as response:
-                result = json.loads(response.read().decode())
-                print(f"\n{Colors.BOLD}نتائج البحث عن: {query}{Colors.END}\n")
-                for i, item in enumerate(result.get('organic', [])[:5], 1):
-                    print(f"{Colors.CYAN}{i}. {item.get('title', 'بدون عنوان')}{Colors.END}")
-                    print(f"   {item.get('snippet', 'بدون وصف')}")
-                    print(f"   {Colors.BLUE}{item.get('link', '')}{Colors.END}\n")
+            response = get_transport().post(url, json=data, headers=headers, timeout=15)
+            response.raise_for_status()
+            result = response.json()
+            print(f"\n{Colors.BOLD}نتائج البحث عن: {query}{Colors.END}\n")
+            for i, item in enumerate(result.get('organic', [])[:5], 1):
+                print(f"{Colors.CYAN}{i}. {item.get('title', 'بدون عنوان')}{Colors.END}")
+                print(f"   {item.get('snippet', 'بدون وصف')}")
+                print(f"   {Colors.BLUE}{item.get('link', '')}{Colors.END}\n")
         except Exception as e:
             print_error(f"خطأ في البحث: {str(e)[:50]}")
 
@@ -350,9 +362,6 @@ class AIToolkit:
         """بحث مع Tavily"""
         print_info("جاري البحث مع Tavily...")
         try:
-            import urllib.request
-            import json
-
             api_key = os.getenv('TAVILY_API_KEY')
             url = "https://api.tavily.com/search"
             headers = {'Content-Type': 'application/json'}
@@ -363,20 +372,20 @@ class AIToolkit:
                 'include_answer': True
             }
 
-            req = urllib.request.Request(url, data=json.dumps(data).encode('utf-8'), headers=headers)
-            with urllib.request.urlopen(req, timeout=15) as response:
-                result = json.loads(response.read().decode())
-                print(f"\n{Colors.BOLD}نتائج البحث عن: {query}{Colors.END}\n")
+            response = get_transport().post(url, json=data, headers=headers, timeout=15)
+            response.raise_for_status()
+            result = response.json()
+            print(f"\n{Colors.BOLD}نتائج البحث عن: {query}{Colors.END}\n")
 
-                if result.get('answer'):
-                    print(f"{Colors.GREEN}الإجابة:{Colors.END}")
-                    print(f"{result['answer']}\n")
+            if result.get('answer'):
+                print(f"{Colors.GREEN}الإجابة:{Colors.END}")
+                print(f"{result['answer']}\n")
 
-                print(f"{Colors.CYAN}المصادر:{Colors.END}")
-                for i, item in enumerate(result.get('results', [])[:5], 1):
-                    print(f"{i}. {item.get('title', 'بدون عنوان')}")
-                    print(f"   {item.get('url', '')}")
-                    print()
+            print(f"{Colors.CYAN}المصادر:{Colors.END}")
+            for i, item in enumerate(result.get('results', [])[:5], 1):
+                print(f"{i}. {item.get('title', 'بدون عنوان')}")
+                print(f"   {item.get('url', '')}")
+                print()
         except Exception as e:
             print_error(f"خطأ في البحث: {str(e)[:50]}")
 
@@ -395,9 +404,6 @@ class AIToolkit:
 
         print_info("جاري تحويل النص إلى كلام...")
         try:
-            import urllib.request
-            import json
-
             api_key = os.getenv('ELEVENLABS_API_KEY')
             url = "https://api.elevenlabs.io/v1/text-to-speech/21m00Tcm4TlvDq8ikWAM"
             headers = {
@@ -413,14 +419,14 @@ class AIToolkit:
                 }
             }
 
-            req = urllib.request.Request(url, data=json.dumps(data).encode('utf-8'), headers=headers)
-            with urllib.request.urlopen(req, timeout=30) as response:
-                audio = response.read()
-                filename = f"audio_{int(time.time())}.mp3"
-                with open(filename, 'wb') as f:
-                    f.write(audio)
-                print_success(f"تم حفظ الملف: {filename}")
-                print_info(f"استخدم 'mpv {filename}' للاستماع")
+            response = get_transport().post(url, json=data, headers=headers, timeout=30)
+            response.raise_for_status()
+            audio = response.content
+            filename = f"audio_{int(time.time())}.mp3"
+            with open(filename, 'wb') as f:
+                f.write(audio)
+            print_success(f"تم حفظ الملف: {filename}")
+            print_info(f"استخدم 'mpv {filename}' للاستماع")
         except Exception as e:
             print_error(f"خطأ في التحويل: {str(e)[:50]}")
 
@@ -439,9 +445,6 @@ class AIToolkit:
 
         print_info("جاري تحليل النص...")
         try:
-            import urllib.request
-            import json
-
             api_key = os.getenv('HUGGINGFACE_API_KEY')
             url = "https://api-inference.huggingface.co/models/distilbert-base-uncased-finetuned-sst-2-english"
             headers = {
@@ -450,15 +453,15 @@ class AIToolkit:
             }
             data = [text]
 
-            req = urllib.request.Request(url, data=json.dumps(data).encode('utf-8'), headers=headers)
-            with urllib.request.urlopen(req, timeout=30) as response:
-                result = json.loads(response.read().decode())
-                print(f"\n{Colors.BOLD}تحليل المشاعر:{Colors.END}")
-                for item in result[0]:
-                    label = item['label']
-                    score = item['score']
-                    emoji = "😊" if label == "POSITIVE" else "😔"
-                    print(f"{emoji} {label}: {score:.2%}")
+            response = get_transport().post(url, json=data, headers=headers, timeout=30)
+            response.raise_for_status()
+            result = response.json()
+            print(f"\n{Colors.BOLD}تحليل المشاعر:{Colors.END}")
+            for item in result[0]:
+                label = item['label']
+                score = item['score']
+                emoji = "😊" if label == "POSITIVE" else "😔"
+                print(f"{emoji} {label}: {score:.2%}")
         except Exception as e:
             print_error(f"خطأ في التحليل: {str(e)[:50]}")
 
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🔌 طبقة نقل HTTP مشتركة
+جلسة keep-alive واحدة لكل مضيف مع تجميع الاتصالات وإحصائيات إعادة الاستخدام
+
+كل جلسة تخدم مضيفاً واحداً، فحجمها يحدده pool_maxsize (AI_HTTP_POOL_MAXSIZE):
+أقصى عدد اتصالات مفتوحة يُعاد استخدامها مع ذلك المضيف من عدة خيوط.
+"""
+
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+class HTTPTransport:
+    """جلسات HTTP مجمّعة لكل مضيف لتجنب مصافحة TCP+TLS في كل طلب"""
+
+    def __init__(self, pool_maxsize=None, idle_timeout=None):
+        self.pool_maxsize = pool_maxsize or int(os.getenv('AI_HTTP_POOL_MAXSIZE', 10))
+        self.idle_timeout = idle_timeout or float(os.getenv('AI_HTTP_IDLE_TIMEOUT', 90))
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _new_session(self):
+        """إنشاء جلسة requests بحجم التجميع المطلوب (مجمع واحد: الجلسة لمضيف واحد)"""
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def _acquire(self, url, active):
+        """مدخل جلسة مضيف الرابط (تُنشأ عند الحاجة)؛ active يحجزها من الإغلاق"""
+        host = urlsplit(url).netloc
+        now = time.monotonic()
+
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._sessions.get(host)
+            if entry is None:
+                entry = self._sessions[host] = {'session': self._new_session(), 'last_used': now, 'active': 0}
+                stats = self._stats.setdefault(
+                    host, {'requests': 0, 'sessions': 0, 'evictions': 0, 'closed_connections': 0}
+                )
+                stats['sessions'] += 1
+            entry['last_used'] = now
+            entry['active'] += active
+            self._stats[host]['requests'] += 1
+            return entry
+
+    def _release(self, entry):
+        with self._lock:
+            entry['active'] -= 1
+            entry['last_used'] = time.monotonic()
+
+    def session_for(self, url):
+        """الجلسة الخاصة بمضيف الرابط (تُنشأ عند الحاجة)"""
+        return self._acquire(url, 0)['session']
+
+    def _evict_idle(self, now):
+        """إغلاق الجلسات الخاملة (يُستدعى تحت القفل)؛ الجلسة التي عليها طلب أو بث جارٍ لا تُغلق"""
+        for host, entry in list(self._sessions.items()):
+            if not entry['active'] and now - entry['last_used'] > self.idle_timeout:
+                self._stats[host]['closed_connections'] += self._count_connections(entry['session'])
+                entry['session'].close()
+                del self._sessions[host]
+                self._stats[host]['evictions'] += 1
+
+    @staticmethod
+    def _count_connections(session):
+        """عدد الاتصالات التي فتحتها الجلسة منذ إنشائها"""
+        count = 0
+        for adapter in set(session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is not None:
+                    count += pool.num_connections
+        return count
+
+    def request(self, method, url, **kwargs):
+        """تنفيذ طلب عبر جلسة المضيف
+
+        مع stream=True تبقى الجلسة محجوزة حتى يُغلق الرد (response.close أو with).
+        """
+        entry = self._acquire(url, 1)
+        try:
+            response = entry['session'].request(method, url, **kwargs)
+        except BaseException:
+            self._release(entry)
+            raise
+        if not kwargs.get('stream'):
+            self._release(entry)
+            return response
+
+        close = response.close
+        released = []
+
+        def close_and_release():
+            try:
+                close()
+            finally:
+                if not released:
+                    released.append(True)
+                    self._release(entry)
+
+        response.close = close_and_release
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def evict_idle(self):
+        """إغلاق الجلسات الخاملة يدوياً"""
+        with self._lock:
+            self._evict_idle(time.monotonic())
+
+    def stats(self):
+        """إحصائيات إعادة استخدام الاتصالات لكل مضيف"""
+        with self._lock:
+            result = {
+                host: dict(stats, connections=stats['closed_connections'])
+                for host, stats in self._stats.items()
+            }
+            for host, entry in self._sessions.items():
+                result[host]['connections'] += self._count_connections(entry['session'])
+
+        for stats in result.values():
+            stats['reused'] = max(stats['requests'] - stats['connections'], 0)
+        return result
+
+    def close(self):
+        """إغلاق جميع الجلسات"""
+        with self._lock:
+            for entry in self._sessions.values():
+                entry['session'].close()
+            self._sessions.clear()
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport():
+    """طبقة النقل المشتركة على مستوى العملية"""
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = HTTPTransport()
+    return _transport
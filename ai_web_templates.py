@@ -0,0 +1,1289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🎨 قوالب واجهتي الويب والهاتف
+مشتركة بين خادمي Flask ووضع ASGI (ai_asgi.py) فلا يحتاج أحدهما الآخر.
+الصفحات ثابتة، فتُجهز مرة واحدة عند الاستيراد مضغوطة (gzip وbrotli إن وُجدت
+المكتبة) مع ETag قوي لكل نسخة، وتُخدم عبر asset_response مع 304.
+"""
+
+import gzip
+import hashlib
+
+try:
+    import brotli
+except ImportError:  # gzip فقط
+    brotli = None
+
+# واجهة الويب (ai_workspace_web.py)
+WEB_HTML = '''
+<!DOCTYPE html>
+<html dir="rtl" lang="ar">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>🤖 مساحة عمل الذكاء الاصطناعي</title>
+    <style>
+        * {
+            margin: 0;
+            padding: 0;
+            box-sizing: border-box;
+        }
+
+        body {
+            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            min-height: 100vh;
+            padding: 20px;
+        }
+
+        .container {
+            max-width: 1200px;
+            margin: 0 auto;
+            background: white;
+            border-radius: 20px;
+            box-shadow: 0 20px 60px rgba(0,0,0,0.3);
+            overflow: hidden;
+        }
+
+        .header {
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            color: white;
+            padding: 30px;
+            text-align: center;
+        }
+
+        .header h1 {
+            font-size: 2.5em;
+            margin-bottom: 10px;
+        }
+
+        .header p {
+            font-size: 1.2em;
+            opacity: 0.9;
+        }
+
+        .main-content {
+            display: grid;
+            grid-template-columns: 300px 1fr;
+            gap: 0;
+            min-height: 600px;
+        }
+
+        .sidebar {
+            background: #f8f9fa;
+            padding: 20px;
+            border-left: 1px solid #dee2e6;
+        }
+
+        .model-selector {
+            margin-bottom: 30px;
+        }
+
+        .model-selector h3 {
+            margin-bottom: 15px;
+            color: #495057;
+        }
+
+        .model-btn {
+            width: 100%;
+            padding: 12px;
+            margin: 8px 0;
+            border: 2px solid #dee2e6;
+            background: white;
+            border-radius: 10px;
+            cursor: pointer;
+            transition: all 0.3s;
+            text-align: right;
+        }
+
+        .model-btn:hover {
+            border-color: #667eea;
+            background: #f8f9ff;
+        }
+
+        .model-btn.active {
+            border-color: #667eea;
+            background: #667eea;
+            color: white;
+        }
+
+        .tools {
+            margin-top: 20px;
+        }
+
+        .tools h3 {
+            margin-bottom: 15px;
+            color: #495057;
+        }
+
+        .tool-btn {
+            width: 100%;
+            padding: 10px;
+            margin: 5px 0;
+            border: none;
+            background: #667eea;
+            color: white;
+            border-radius: 8px;
+            cursor: pointer;
+            transition: all 0.3s;
+        }
+
+        .tool-btn:hover {
+            background: #5568d3;
+            transform: translateY(-2px);
+        }
+
+        .chat-area {
+            display: flex;
+            flex-direction: column;
+            height: 600px;
+        }
+
+        .messages {
+            flex: 1;
+            padding: 20px;
+            overflow-y: auto;
+            background: #ffffff;
+        }
+
+        .message {
+            margin: 15px 0;
+            padding: 15px;
+            border-radius: 15px;
+            max-width: 80%;
+            animation: slideIn 0.3s;
+        }
+
+        @keyframes slideIn {
+            from {
+                opacity: 0;
+                transform: translateY(10px);
+            }
+            to {
+                opacity: 1;
+                transform: translateY(0);
+            }
+        }
+
+        .message.user {
+            background: #667eea;
+            color: white;
+            margin-right: auto;
+            border-bottom-right-radius: 5px;
+        }
+
+        .message.ai {
+            background: #f1f3f5;
+            color: #212529;
+            margin-left: auto;
+            border-bottom-left-radius: 5px;
+        }
+
+        .message.system {
+            background: #fff3cd;
+            color: #856404;
+            text-align: center;
+            margin: 10px auto;
+        }
+
+        .input-area {
+            padding: 20px;
+            background: #f8f9fa;
+            border-top: 1px solid #dee2e6;
+        }
+
+        .input-group {
+            display: flex;
+            gap: 10px;
+        }
+
+        #userInput {
+            flex: 1;
+            padding: 15px;
+            border: 2px solid #dee2e6;
+            border-radius: 10px;
+            font-size: 16px;
+            font-family: inherit;
+        }
+
+        #userInput:focus {
+            outline: none;
+            border-color: #667eea;
+        }
+
+        .send-btn {
+            padding: 15px 30px;
+            background: #667eea;
+            color: white;
+            border: none;
+            border-radius: 10px;
+            cursor: pointer;
+            font-size: 16px;
+            transition: all 0.3s;
+        }
+
+        .send-btn:hover {
+            background: #5568d3;
+            transform: scale(1.05);
+        }
+
+        .send-btn:disabled {
+            background: #adb5bd;
+            cursor: not-allowed;
+        }
+
+        .loading {
+            display: none;
+            text-align: center;
+            padding: 10px;
+            color: #667eea;
+        }
+
+        .loading.active {
+            display: block;
+        }
+
+        .modal {
+            display: none;
+            position: fixed;
+            top: 0;
+            left: 0;
+            width: 100%;
+            height: 100%;
+            background: rgba(0,0,0,0.5);
+            z-index: 1000;
+            align-items: center;
+            justify-content: center;
+        }
+
+        .modal.active {
+            display: flex;
+        }
+
+        .modal-content {
+            background: white;
+            padding: 30px;
+            border-radius: 15px;
+            max-width: 500px;
+            width: 90%;
+        }
+
+        .modal-content h2 {
+            margin-bottom: 20px;
+            color: #495057;
+        }
+
+        .modal-content input,
+        .modal-content textarea {
+            width: 100%;
+            padding: 10px;
+            margin: 10px 0;
+            border: 2px solid #dee2e6;
+            border-radius: 8px;
+        }
+
+        .modal-content button {
+            padding: 10px 20px;
+            margin: 5px;
+            border: none;
+            border-radius: 8px;
+            cursor: pointer;
+        }
+
+        .modal-content .btn-primary {
+            background: #667eea;
+            color: white;
+        }
+
+        .modal-content .btn-secondary {
+            background: #6c757d;
+            color: white;
+        }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>🤖 مساحة عمل الذكاء الاصطناعي</h1>
+            <p>دردشة، بحث، تحليل كود، وأكثر - كل شيء في مكان واحد</p>
+        </div>
+
+        <div class="main-content">
+            <div class="sidebar">
+                <div class="model-selector">
+                    <h3>🎯 اختر النموذج</h3>
+                    <div id="modelsList"></div>
+                </div>
+
+                <div class="tools">
+                    <h3>🛠️ الأدوات</h3>
+                    <button class="tool-btn" onclick="openSearchModal()">🔍 بحث</button>
+                    <button class="tool-btn" onclick="openFileModal()">📄 قراءة ملف</button>
+                    <button class="tool-btn" onclick="openAnalyzeModal()">📊 تحليل كود</button>
+                    <button class="tool-btn" onclick="clearChat()">🗑️ مسح المحادثة</button>
+                </div>
+            </div>
+
+            <div class="chat-area">
+                <div class="messages" id="messages">
+                    <div class="message system">
+                        مرحباً! اختر نموذج AI من القائمة وابدأ المحادثة 🚀
+                    </div>
+                </div>
+
+                <div class="loading" id="loading">
+                    ⏳ جاري المعالجة...
+                </div>
+
+                <div class="input-area">
+                    <div class="input-group">
+                        <input
+                            type="text"
+                            id="userInput"
+                            placeholder="اكتب رسالتك هنا..."
+                            onkeypress="if(event.key==='Enter') sendMessage()"
+                        >
+                        <button class="send-btn" onclick="sendMessage()" id="sendBtn">
+                            إرسال 📤
+                        </button>
+                    </div>
+                </div>
+            </div>
+        </div>
+    </div>
+
+    <!-- Search Modal -->
+    <div class="modal" id="searchModal">
+        <div class="modal-content">
+            <h2>🔍 البحث في الإنترنت</h2>
+            <input type="text" id="searchQuery" placeholder="ما تريد البحث عنه؟">
+            <button class="btn-primary" onclick="performSearch()">بحث</button>
+            <button class="btn-secondary" onclick="closeModal('searchModal')">إلغاء</button>
+        </div>
+    </div>
+
+    <!-- File Modal -->
+    <div class="modal" id="fileModal">
+        <div class="modal-content">
+            <h2>📄 قراءة ملف</h2>
+            <input type="text" id="filePath" placeholder="مسار الملف">
+            <button class="btn-primary" onclick="readFile()">قراءة</button>
+            <button class="btn-secondary" onclick="closeModal('fileModal')">إلغاء</button>
+        </div>
+    </div>
+
+    <!-- Analyze Modal -->
+    <div class="modal" id="analyzeModal">
+        <div class="modal-content">
+            <h2>📊 تحليل كود</h2>
+            <input type="text" id="analyzePath" placeholder="مسار ملف الكود">
+            <button class="btn-primary" onclick="analyzeCode()">تحليل</button>
+            <button class="btn-secondary" onclick="closeModal('analyzeModal')">إلغاء</button>
+        </div>
+    </div>
+
+    <script>
+        let currentModel = null;
+
+        // Load models on page load
+        window.onload = function() {
+            loadModels();
+        };
+
+        function loadModels() {
+            fetch('/api/models')
+                .then(r => r.json())
+                .then(data => {
+                    const list = document.getElementById('modelsList');
+                    list.innerHTML = '';
+
+                    Object.keys(data.models).forEach(modelId => {
+                        const model = data.models[modelId];
+                        const btn = document.createElement('button');
+                        btn.className = 'model-btn';
+                        btn.innerHTML = `
+                            <strong>${model.name}</strong><br>
+                            <small>${model.desc}</small>
+                        `;
+                        btn.onclick = () => selectModel(modelId, btn);
+                        list.appendChild(btn);
+                    });
+                });
+        }
+
+        function selectModel(modelId, btn) {
+            // Remove active class from all
+            document.querySelectorAll('.model-btn').forEach(b => {
+                b.classList.remove('active');
+            });
+
+            // Add active class to selected
+            btn.classList.add('active');
+            currentModel = modelId;
+
+            addMessage('system', `تم اختيار: ${btn.querySelector('strong').textContent}`);
+        }
+
+        function sendMessage() {
+            if (!currentModel) {
+                alert('اختر نموذج AI أولاً!');
+                return;
+            }
+
+            const input = document.getElementById('userInput');
+            const message = input.value.trim();
+
+            if (!message) return;
+
+            // Add user message
+            addMessage('user', message);
+            input.value = '';
+
+            // Show loading
+            setLoading(true);
+
+            // Stream from server: الرد يظهر قطعة قطعة
+            const model = currentModel;
+            let div = null;
+            streamChat({model: model, message: message}, text => {
+                if (!div) {
+                    setLoading(false);
+                    div = addMessage('ai', '');
+                }
+                div.textContent += text;
+                const messages = document.getElementById('messages');
+                messages.scrollTop = messages.scrollHeight;
+            })
+            .then(data => {
+                setLoading(false);
+                if (model === 'auto' && data.model) {
+                    addMessage('system', `🧭 ${data.model}`);
+                }
+            })
+            .catch(err => {
+                setLoading(false);
+                addMessage('system', err.message.startsWith('❌') ? err.message : '❌ حدث خطأ: ' + err.message);
+            });
+        }
+
+        // قراءة أحداث SSE من /api/chat/stream وتمرير كل قطعة نص فور وصولها
+        async function streamChat(body, onToken) {
+            const r = await fetch('/api/chat/stream', {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify(body)
+            });
+            if (!r.ok || !r.body) {
+                const data = await r.json().catch(() => ({}));
+                throw new Error(data.error || r.status);
+            }
+            const reader = r.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let result = {};
+            while (true) {
+                const {value, done} = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, {stream: true});
+                let end;
+                while ((end = buffer.indexOf('\\n\\n')) >= 0) {
+                    const frame = buffer.slice(0, end);
+                    buffer = buffer.slice(end + 2);
+                    let event = 'message', data = '';
+                    for (const line of frame.split('\\n')) {
+                        if (line.startsWith('event: ')) event = line.slice(7);
+                        else if (line.startsWith('data: ')) data += line.slice(6);
+                    }
+                    const payload = JSON.parse(data);
+                    if (event === 'token') onToken(payload.text);
+                    else if (event === 'error') throw new Error(payload.error);
+                    else if (event === 'done') result = payload;
+                }
+            }
+            return result;
+        }
+
+        function addMessage(type, text) {
+            const messages = document.getElementById('messages');
+            const div = document.createElement('div');
+            div.className = `message ${type}`;
+            div.textContent = text;
+            messages.appendChild(div);
+            messages.scrollTop = messages.scrollHeight;
+            return div;
+        }
+
+        function setLoading(show) {
+            document.getElementById('loading').classList.toggle('active', show);
+            document.getElementById('sendBtn').disabled = show;
+        }
+
+        function clearChat() {
+            const messages = document.getElementById('messages');
+            messages.innerHTML = '<div class="message system">تم مسح المحادثة ✨</div>';
+        }
+
+        function openSearchModal() {
+            document.getElementById('searchModal').classList.add('active');
+        }
+
+        function openFileModal() {
+            document.getElementById('fileModal').classList.add('active');
+        }
+
+        function openAnalyzeModal() {
+            document.getElementById('analyzeModal').classList.add('active');
+        }
+
+        function closeModal(id) {
+            document.getElementById(id).classList.remove('active');
+        }
+
+        function performSearch() {
+            const query = document.getElementById('searchQuery').value;
+            if (!query) return;
+
+            closeModal('searchModal');
+            setLoading(true);
+
+            fetch('/api/search', {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify({query: query})
+            })
+            .then(r => r.json())
+            .then(data => {
+                setLoading(false);
+                addMessage('system', '🔍 نتائج البحث:');
+                addMessage('ai', data.results);
+            });
+        }
+
+        function readFile() {
+            const path = document.getElementById('filePath').value;
+            if (!path) return;
+
+            closeModal('fileModal');
+            setLoading(true);
+
+            fetch('/api/read', {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify({path: path})
+            })
+            .then(r => r.json())
+            .then(data => {
+                setLoading(false);
+                addMessage('system', '📄 محتوى الملف:');
+                addMessage('ai', data.content);
+            });
+        }
+
+        function analyzeCode() {
+            const path = document.getElementById('analyzePath').value;
+            if (!path) return;
+
+            if (!currentModel) {
+                alert('اختر نموذج AI أولاً!');
+                return;
+            }
+
+            closeModal('analyzeModal');
+            setLoading(true);
+
+            fetch('/api/analyze', {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify({
+                    model: currentModel,
+                    path: path
+                })
+            })
+            .then(r => r.json())
+            .then(data => {
+                setLoading(false);
+                addMessage('system', '📊 تحليل الكود:');
+                addMessage('ai', data.analysis);
+            });
+        }
+    </script>
+</body>
+</html>
+'''
+
+# واجهة الهاتف - PWA Ready (ai_workspace_mobile.py)
+MOBILE_HTML = '''
+<!DOCTYPE html>
+<html dir="rtl" lang="ar">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0, maximum-scale=1.0, user-scalable=no">
+    <meta name="mobile-web-app-capable" content="yes">
+    <meta name="apple-mobile-web-app-capable" content="yes">
+    <meta name="apple-mobile-web-app-status-bar-style" content="black-translucent">
+    <meta name="theme-color" content="#667eea">
+    <title>🤖 AI Workspace Pro</title>
+
+    <!-- PWA Manifest -->
+    <link rel="manifest" href="/manifest.json">
+    <link rel="icon" href="data:image/svg+xml,<svg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 100 100'><text y='.9em' font-size='90'>🤖</text></svg>">
+
+    <style>
+        * {
+            margin: 0;
+            padding: 0;
+            box-sizing: border-box;
+            -webkit-tap-highlight-color: transparent;
+        }
+
+        body {
+            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            min-height: 100vh;
+            padding: 0;
+            overflow-x: hidden;
+        }
+
+        .app-container {
+            max-width: 100vw;
+            margin: 0 auto;
+            background: white;
+            min-height: 100vh;
+            display: flex;
+            flex-direction: column;
+        }
+
+        .header {
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            color: white;
+            padding: 15px;
+            text-align: center;
+            box-shadow: 0 2px 10px rgba(0,0,0,0.1);
+            position: sticky;
+            top: 0;
+            z-index: 100;
+        }
+
+        .header h1 {
+            font-size: 1.5em;
+            margin-bottom: 5px;
+        }
+
+        .header p {
+            font-size: 0.9em;
+            opacity: 0.9;
+        }
+
+        .model-selector {
+            background: #f8f9fa;
+            padding: 10px;
+            overflow-x: auto;
+            white-space: nowrap;
+            -webkit-overflow-scrolling: touch;
+        }
+
+        .model-btn {
+            display: inline-block;
+            padding: 8px 15px;
+            margin: 5px;
+            border: 2px solid #dee2e6;
+            background: white;
+            border-radius: 20px;
+            cursor: pointer;
+            transition: all 0.3s;
+            font-size: 0.9em;
+        }
+
+        .model-btn.active {
+            border-color: #667eea;
+            background: #667eea;
+            color: white;
+        }
+
+        .messages {
+            flex: 1;
+            padding: 15px;
+            overflow-y: auto;
+            background: #ffffff;
+            -webkit-overflow-scrolling: touch;
+        }
+
+        .message {
+            margin: 10px 0;
+            padding: 12px 15px;
+            border-radius: 15px;
+            max-width: 85%;
+            word-wrap: break-word;
+            animation: slideIn 0.3s;
+        }
+
+        @keyframes slideIn {
+            from {
+                opacity: 0;
+                transform: translateY(10px);
+            }
+            to {
+                opacity: 1;
+                transform: translateY(0);
+            }
+        }
+
+        .message.user {
+            background: #667eea;
+            color: white;
+            margin-right: auto;
+            border-bottom-right-radius: 5px;
+        }
+
+        .message.ai {
+            background: #f1f3f5;
+            color: #212529;
+            margin-left: auto;
+            border-bottom-left-radius: 5px;
+        }
+
+        .message.system {
+            background: #fff3cd;
+            color: #856404;
+            text-align: center;
+            margin: 10px auto;
+            font-size: 0.9em;
+        }
+
+        .input-area {
+            padding: 10px;
+            background: #f8f9fa;
+            border-top: 1px solid #dee2e6;
+            position: sticky;
+            bottom: 0;
+        }
+
+        .input-group {
+            display: flex;
+            gap: 8px;
+        }
+
+        #userInput {
+            flex: 1;
+            padding: 12px;
+            border: 2px solid #dee2e6;
+            border-radius: 25px;
+            font-size: 16px;
+            font-family: inherit;
+        }
+
+        #userInput:focus {
+            outline: none;
+            border-color: #667eea;
+        }
+
+        .send-btn {
+            width: 50px;
+            height: 50px;
+            background: #667eea;
+            color: white;
+            border: none;
+            border-radius: 50%;
+            cursor: pointer;
+            font-size: 20px;
+            display: flex;
+            align-items: center;
+            justify-content: center;
+            transition: all 0.3s;
+        }
+
+        .send-btn:active {
+            transform: scale(0.95);
+        }
+
+        .send-btn:disabled {
+            background: #adb5bd;
+        }
+
+        .loading {
+            display: none;
+            text-align: center;
+            padding: 10px;
+            color: #667eea;
+        }
+
+        .loading.active {
+            display: block;
+        }
+
+        .tools-btn {
+            position: fixed;
+            bottom: 80px;
+            left: 20px;
+            width: 60px;
+            height: 60px;
+            background: #667eea;
+            color: white;
+            border: none;
+            border-radius: 50%;
+            font-size: 24px;
+            box-shadow: 0 4px 12px rgba(102, 126, 234, 0.4);
+            cursor: pointer;
+            z-index: 50;
+            transition: all 0.3s;
+        }
+
+        .tools-btn:active {
+            transform: scale(0.9);
+        }
+
+        .tools-menu {
+            position: fixed;
+            bottom: 0;
+            left: 0;
+            right: 0;
+            background: white;
+            border-radius: 20px 20px 0 0;
+            box-shadow: 0 -4px 20px rgba(0,0,0,0.1);
+            transform: translateY(100%);
+            transition: transform 0.3s;
+            z-index: 60;
+            max-height: 60vh;
+            overflow-y: auto;
+        }
+
+        .tools-menu.active {
+            transform: translateY(0);
+        }
+
+        .tools-menu h3 {
+            padding: 20px;
+            background: #f8f9fa;
+            border-radius: 20px 20px 0 0;
+            margin: 0;
+        }
+
+        .tool-item {
+            padding: 15px 20px;
+            border-bottom: 1px solid #f1f3f5;
+            cursor: pointer;
+            transition: background 0.2s;
+        }
+
+        .tool-item:active {
+            background: #f8f9fa;
+        }
+
+        @media (min-width: 768px) {
+            .app-container {
+                max-width: 768px;
+                border-radius: 20px;
+                margin: 20px auto;
+                min-height: calc(100vh - 40px);
+            }
+
+            .header {
+                border-radius: 20px 20px 0 0;
+            }
+        }
+
+        .install-prompt {
+            display: none;
+            position: fixed;
+            bottom: 80px;
+            left: 50%;
+            transform: translateX(-50%);
+            background: white;
+            padding: 15px 20px;
+            border-radius: 15px;
+            box-shadow: 0 4px 12px rgba(0,0,0,0.15);
+            z-index: 70;
+            max-width: 90%;
+        }
+
+        .install-prompt.active {
+            display: block;
+        }
+
+        .install-btn {
+            background: #667eea;
+            color: white;
+            border: none;
+            padding: 10px 20px;
+            border-radius: 8px;
+            margin: 5px;
+            cursor: pointer;
+        }
+    </style>
+</head>
+<body>
+    <div class="app-container">
+        <div class="header">
+            <h1>🤖 AI Workspace Pro</h1>
+            <p>مساحة عمل ذكية متقدمة</p>
+        </div>
+
+        <div class="model-selector" id="modelSelector">
+            <!-- Models will be loaded here -->
+        </div>
+
+        <div class="messages" id="messages">
+            <div class="message system">
+                مرحباً! اختر نموذج AI وابدأ المحادثة 🚀
+            </div>
+        </div>
+
+        <div class="loading" id="loading">
+            ⏳ جاري المعالجة...
+        </div>
+
+        <div class="input-area">
+            <div class="input-group">
+                <input
+                    type="text"
+                    id="userInput"
+                    placeholder="اكتب رسالتك هنا..."
+                    onkeypress="if(event.key==='Enter') sendMessage()"
+                >
+                <button class="send-btn" onclick="sendMessage()" id="sendBtn">
+                    ➤
+                </button>
+            </div>
+        </div>
+    </div>
+
+    <button class="tools-btn" onclick="toggleTools()">🛠️</button>
+
+    <div class="tools-menu" id="toolsMenu">
+        <h3>🛠️ الأدوات</h3>
+        <div class="tool-item" onclick="toolAction('search')">🔍 بحث في الإنترنت</div>
+        <div class="tool-item" onclick="toolAction('image')">🎨 توليد صورة</div>
+        <div class="tool-item" onclick="toolAction('voice')">🔊 تحويل لصوت</div>
+        <div class="tool-item" onclick="toolAction('compare')">📊 مقارنة نماذج</div>
+        <div class="tool-item" onclick="clearChat()">🗑️ مسح المحادثة</div>
+        <div class="tool-item" onclick="toggleTools()">❌ إغلاق</div>
+    </div>
+
+    <div class="install-prompt" id="installPrompt">
+        <p>📱 أضف التطبيق للشاشة الرئيسية؟</p>
+        <button class="install-btn" onclick="installApp()">تثبيت</button>
+        <button class="install-btn" style="background:#6c757d" onclick="hideInstallPrompt()">لاحقاً</button>
+    </div>
+
+    <script>
+        let currentModel = null;
+        let deferredPrompt = null;
+
+        // PWA Install
+        window.addEventListener('beforeinstallprompt', (e) => {
+            e.preventDefault();
+            deferredPrompt = e;
+            document.getElementById('installPrompt').classList.add('active');
+        });
+
+        function installApp() {
+            if (deferredPrompt) {
+                deferredPrompt.prompt();
+                deferredPrompt.userChoice.then((choiceResult) => {
+                    deferredPrompt = null;
+                    hideInstallPrompt();
+                });
+            }
+        }
+
+        function hideInstallPrompt() {
+            document.getElementById('installPrompt').classList.remove('active');
+        }
+
+        // Load models on start
+        window.onload = function() {
+            loadModels();
+        };
+
+        function loadModels() {
+            fetch('/api/models')
+                .then(r => r.json())
+                .then(data => {
+                    const selector = document.getElementById('modelSelector');
+                    selector.innerHTML = '';
+
+                    Object.keys(data.models).forEach(modelId => {
+                        const model = data.models[modelId];
+                        const btn = document.createElement('button');
+                        btn.className = 'model-btn';
+                        btn.textContent = model.name;
+                        btn.onclick = () => selectModel(modelId, btn);
+                        selector.appendChild(btn);
+                    });
+                });
+        }
+
+        function selectModel(modelId, btn) {
+            document.querySelectorAll('.model-btn').forEach(b => {
+                b.classList.remove('active');
+            });
+
+            btn.classList.add('active');
+            currentModel = modelId;
+
+            addMessage('system', `تم اختيار: ${btn.textContent}`);
+        }
+
+        function sendMessage() {
+            if (!currentModel) {
+                alert('اختر نموذج AI أولاً!');
+                return;
+            }
+
+            const input = document.getElementById('userInput');
+            const message = input.value.trim();
+
+            if (!message) return;
+
+            addMessage('user', message);
+            input.value = '';
+            setLoading(true);
+
+            // الرد يظهر قطعة قطعة بدل انتظار النص كاملاً
+            let div = null;
+            streamChat({model: currentModel, message: message}, text => {
+                if (!div) {
+                    setLoading(false);
+                    div = addMessage('ai', '');
+                }
+                div.textContent += text;
+                const messages = document.getElementById('messages');
+                messages.scrollTop = messages.scrollHeight;
+            })
+            .then(() => setLoading(false))
+            .catch(err => {
+                setLoading(false);
+                addMessage('system', err.message.startsWith('❌') ? err.message : '❌ حدث خطأ');
+            });
+        }
+
+        // قراءة أحداث SSE من /api/chat/stream وتمرير كل قطعة نص فور وصولها
+        async function streamChat(body, onToken) {
+            const r = await fetch('/api/chat/stream', {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify(body)
+            });
+            if (!r.ok || !r.body) {
+                const data = await r.json().catch(() => ({}));
+                throw new Error(data.error || r.status);
+            }
+            const reader = r.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let result = {};
+            while (true) {
+                const {value, done} = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, {stream: true});
+                let end;
+                while ((end = buffer.indexOf('\\n\\n')) >= 0) {
+                    const frame = buffer.slice(0, end);
+                    buffer = buffer.slice(end + 2);
+                    let event = 'message', data = '';
+                    for (const line of frame.split('\\n')) {
+                        if (line.startsWith('event: ')) event = line.slice(7);
+                        else if (line.startsWith('data: ')) data += line.slice(6);
+                    }
+                    const payload = JSON.parse(data);
+                    if (event === 'token') onToken(payload.text);
+                    else if (event === 'error') throw new Error(payload.error);
+                    else if (event === 'done') result = payload;
+                }
+            }
+            return result;
+        }
+
+        function addMessage(type, text) {
+            const messages = document.getElementById('messages');
+            const div = document.createElement('div');
+            div.className = `message ${type}`;
+            div.textContent = text;
+            messages.appendChild(div);
+            messages.scrollTop = messages.scrollHeight;
+            return div;
+        }
+
+        function setLoading(show) {
+            document.getElementById('loading').classList.toggle('active', show);
+            document.getElementById('sendBtn').disabled = show;
+        }
+
+        function toggleTools() {
+            document.getElementById('toolsMenu').classList.toggle('active');
+        }
+
+        function clearChat() {
+            document.getElementById('messages').innerHTML = '<div class="message system">تم مسح المحادثة ✨</div>';
+            toggleTools();
+        }
+
+        function toolAction(action) {
+            toggleTools();
+
+            if (action === 'search') {
+                const query = prompt('🔍 ما تريد البحث عنه؟');
+                if (query) {
+                    addMessage('user', `/search ${query}`);
+                    // Handle search...
+                }
+            } else if (action === 'image') {
+                const prompt = prompt('🎨 صف الصورة التي تريدها:');
+                if (prompt) {
+                    addMessage('user', `/image ${prompt}`);
+                    // Handle image generation...
+                }
+            } else if (action === 'voice') {
+                const text = prompt('📝 النص المراد تحويله لصوت:');
+                if (text) {
+                    addMessage('user', `/voice ${text}`);
+                    // Handle TTS...
+                }
+            } else if (action === 'compare') {
+                const question = prompt('❓ السؤال للمقارنة:');
+                if (question) {
+                    addMessage('user', `/compare ${question}`);
+                    // Handle comparison...
+                }
+            }
+        }
+
+        // Service Worker Registration
+        if ('serviceWorker' in navigator) {
+            navigator.serviceWorker.register('/sw.js');
+        }
+    </script>
+</body>
+</html>
+'''
+
+# Manifest JSON
+MANIFEST = '''{
+  "name": "AI Workspace Pro",
+  "short_name": "AI Workspace",
+  "description": "مساحة عمل ذكية متقدمة",
+  "start_url": "/",
+  "display": "standalone",
+  "background_color": "#667eea",
+  "theme_color": "#667eea",
+  "orientation": "portrait",
+  "icons": [
+    {
+      "src": "data:image/svg+xml,<svg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 100 100'><text y='.9em' font-size='90'>🤖</text></svg>",
+      "sizes": "512x512",
+      "type": "image/svg+xml"
+    }
+  ]
+}'''
+
+# Service Worker
+# التنقل من الشبكة أولاً (طلب شرطي يرجع 304 إن لم تتغير الصفحة) والنسخة المخزنة
+# للعمل بدون اتصال فقط؛ تغيير اسم الذاكرة يحذف ذاكرة الإصدارات السابقة عند التفعيل
+SERVICE_WORKER = '''
+const CACHE = 'ai-workspace-v2';
+
+self.addEventListener('install', (e) => {
+  e.waitUntil(
+    caches.open(CACHE).then((cache) => cache.addAll(['/'])).then(() => self.skipWaiting())
+  );
+});
+
+self.addEventListener('activate', (e) => {
+  e.waitUntil(
+    caches.keys()
+      .then((names) => Promise.all(names.filter((name) => name !== CACHE).map((name) => caches.delete(name))))
+      .then(() => self.clients.claim())
+  );
+});
+
+self.addEventListener('fetch', (e) => {
+  // بقية الطلبات (الواجهة البرمجية) تذهب للشبكة كما هي
+  if (e.request.mode !== 'navigate') {
+    return;
+  }
+  e.respondWith(
+    fetch(e.request)
+      .then((response) => {
+        if (response.ok) {
+          const copy = response.clone();
+          caches.open(CACHE).then((cache) => cache.put('/', copy));
+        }
+        return response;
+      })
+      .catch(() => caches.match('/'))
+  );
+});
+'''
+
+
+# ---- الأصول الثابتة المجهزة مسبقاً ----
+
+# الصفحة وعامل الخدمة يُتحقق منهما مع كل زيارة (304 رخيص) حتى يظهر التحديث فوراً،
+# وعامل الخدمة نفسه يطلب الصفحة من الشبكة أولاً فلا تحجب نسخته المخزنة هذا التحقق
+REVALIDATE = 'no-cache'
+MANIFEST_CACHE = 'public, max-age=86400'
+
+
+def compile_asset(text, content_type, cache_control=REVALIDATE):
+    """نسخ الأصل (بدون ضغط، gzip، br) مع ETag قوي لكل نسخة"""
+    body = text.encode('utf-8')
+    digest = hashlib.sha256(body).hexdigest()[:32]
+    variants = {'identity': body, 'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(body, quality=11)
+    return {
+        'content_type': content_type,
+        'cache_control': cache_control,
+        'variants': {
+            encoding: {'body': data, 'etag': f'"{digest}-{encoding}"'}
+            for encoding, data in variants.items()
+            # الضغط لا يفيد الأصول الصغيرة جداً
+            if encoding == 'identity' or len(data) < len(body)
+        },
+    }
+
+
+def accepted_encodings(header):
+    """الترميزات المقبولة من Accept-Encoding (q=0 يعني مرفوض)"""
+    accepted = set()
+    for part in (header or '').split(','):
+        name, _, params = part.strip().partition(';')
+        quality = params.strip()
+        if quality.startswith('q='):
+            try:
+                if float(quality[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        if name:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def asset_response(asset, if_none_match=None, accept_encoding=None):
+    """(الحالة، الجسم، الترويسات بدون Content-Type) لطلب أصل ثابت"""
+    accepted = accepted_encodings(accept_encoding)
+    encoding = next(
+        (name for name in ('br', 'gzip') if name in asset['variants'] and (name in accepted or '*' in accepted)),
+        'identity',
+    )
+    variant = asset['variants'][encoding]
+    headers = [
+        ('ETag', variant['etag']),
+        ('Cache-Control', asset['cache_control']),
+        ('Vary', 'Accept-Encoding'),
+    ]
+    # If-None-Match يُقارن مقارنة ضعيفة (الوسطاء قد يضيفون W/)
+    tags = {tag.strip().removeprefix('W/') for tag in (if_none_match or '').split(',')}
+    if variant['etag'] in tags or '*' in tags:
+        return 304, b'', headers
+    if encoding != 'identity':
+        headers.append(('Content-Encoding', encoding))
+    return 200, variant['body'], headers
+
+
+WEB_INDEX = compile_asset(WEB_HTML, 'text/html; charset=utf-8')
+MOBILE_INDEX = compile_asset(MOBILE_HTML, 'text/html; charset=utf-8')
+MANIFEST_ASSET = compile_asset(MANIFEST, 'application/json', MANIFEST_CACHE)
+SERVICE_WORKER_ASSET = compile_asset(SERVICE_WORKER, 'application/javascript')
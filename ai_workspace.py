@@ -7,10 +7,15 @@
 
 import os
 import sys
-from openai import OpenAI
-import google.generativeai as genai
-from anthropic import Anthropic
-import requests
+from ai_lazy import STARTUP, LazyClients, timed_import
+from ai_transport import get_transport
+from ai_profile import PROFILER
+from ai_router import AUTO_MODEL, LatencyRouter
+from ai_engine import ECHO_INFO, ECHO_MODEL, AnthropicAdapter, EchoAdapter, GoogleAdapter, OpenAIAdapter
+from ai_flight import SingleFlight, flight_key
+from ai_ledger import Ledger
+from ai_metrics import CallMetrics
+import time
 import json
 from pathlib import Path
 
@@ -22,17 +27,27 @@ class AIWorkspace:
         print("🚀 جاري تحميل مساحة العمل...")
 
         # تحميل المفاتيح
-        self.load_keys()
+        with PROFILER.phase('load_keys'):
+            self.load_keys()
 
         # تهيئة النماذج
-        self.init_models()
+        with PROFILER.phase('init_models'):
+            self.init_models()
 
         # تهيئة أدوات البحث
-        self.init_search()
+        with PROFILER.phase('init_search'):
+            self.init_search()
 
         # المحادثة الحالية
         self.conversation = []
         self.current_model = None
+        self.last_model = None
+        # سجل التوكنات والتكلفة لكل استدعاء
+        self.ledger = Ledger()
+        # الطلبات المتطابقة المتزامنة (خيوط خادم الويب) تشترك في استدعاء واحد
+        self.flights = SingleFlight()
+        # قياسات الاستدعاءات (هنا: الطلبات المنضمة) في ملف الطرفية نفسه
+        self.call_metrics = CallMetrics(Path.home() / "ai_workspace_metrics.json")
 
         print("✅ تم التحميل بنجاح!\n")
 
@@ -49,8 +64,11 @@ class AIWorkspace:
         self.models = {}
 
         # OpenAI Models
+        # العملاء تُنشأ عند أول استخدام فقط
+        self.clients = LazyClients()
+
         if self.openai_key:
-            self.openai_client = OpenAI(api_key=self.openai_key)
+            self.clients.register('openai', lambda: timed_import('openai').OpenAI(api_key=self.openai_key))
             self.models.update({
                 'gpt-4': {'name': 'GPT-4', 'client': 'openai', 'desc': 'الأقوى والأذكى'},
                 'gpt-4-turbo': {'name': 'GPT-4 Turbo', 'client': 'openai', 'desc': 'سريع وقوي'},
@@ -59,7 +77,7 @@ class AIWorkspace:
 
         # Google Models
         if self.google_key:
-            genai.configure(api_key=self.google_key)
+            self.clients.register('google', self._google_client)
             self.models.update({
                 'gemini-pro': {'name': 'Gemini Pro', 'client': 'google', 'desc': 'قوي ومتعدد الوسائط'},
                 'gemini-1.5-pro': {'name': 'Gemini 1.5 Pro', 'client': 'google', 'desc': 'الأحدث والأقوى'},
@@ -67,13 +85,35 @@ class AIWorkspace:
 
         # Anthropic Models
         if self.anthropic_key:
-            self.claude_client = Anthropic(api_key=self.anthropic_key)
+            self.clients.register('anthropic', lambda: timed_import('anthropic').Anthropic(api_key=self.anthropic_key))
             self.models.update({
                 'claude-3-opus': {'name': 'Claude 3 Opus', 'client': 'anthropic', 'desc': 'الأذكى'},
                 'claude-3-sonnet': {'name': 'Claude 3.5 Sonnet', 'client': 'anthropic', 'desc': 'متوازن'},
                 'claude-3-haiku': {'name': 'Claude 3 Haiku', 'client': 'anthropic', 'desc': 'سريع'},
             })
 
+        # نموذج وهمي لقياس الخوادم (bench_server.py)
+        if os.getenv('AI_ECHO_MODEL'):
+            self.models[ECHO_MODEL] = dict(ECHO_INFO)
+
+        # الموجّه يتعلم زمن كل نموذج لاختيار 'auto'
+        self.router = LatencyRouter(self.models)
+        self.auto_tier = os.getenv('AI_AUTO_TIER', 'standard')
+
+    def _google_client(self):
+        """إعداد مكتبة Google عند أول استخدام"""
+        genai = timed_import('google.generativeai')
+        genai.configure(api_key=self.google_key)
+        return genai
+
+    @property
+    def openai_client(self):
+        return self.clients['openai']
+
+    @property
+    def claude_client(self):
+        return self.clients['anthropic']
+
     def init_search(self):
         """تهيئة محركات البحث"""
         self.search_engines = {}
@@ -112,6 +152,12 @@ class AIWorkspace:
                     print(f"\n✅ تم اختيار: {self.models[self.current_model]['name']}\n")
                     return
 
+            # الاختيار التلقائي حسب الأزمنة المقاسة
+            elif choice == AUTO_MODEL:
+                self.current_model = AUTO_MODEL
+                print("\n✅ تم اختيار: 🧭 تلقائي\n")
+                return
+
             # إذا كتب ID
             elif choice in self.models:
                 self.current_model = choice
@@ -120,9 +166,24 @@ class AIWorkspace:
 
             print("❌ اختيار غير صحيح، حاول مرة أخرى")
 
-    def chat(self, message, use_search=False):
-        """الدردشة مع النموذج المختار"""
-        if not self.current_model:
+    def resolve_model(self, model=None):
+        """معرف النموذج للطلب: model أو النموذج الحالي، و'auto' يختار أسرع نموذج سليم"""
+        model_id = model or self.current_model
+        if not model_id:
+            raise Exception("لم يتم اختيار نموذج")
+        if model_id == AUTO_MODEL:
+            return self.router.choose(self.auto_tier)
+        if model_id not in self.models:
+            raise Exception(f"النموذج {model_id} غير متوفر")
+        return model_id
+
+    def chat(self, message, use_search=False, conversation_id=None, model=None, max_tokens=None, temperature=None):
+        """الدردشة مع النموذج المختار (conversation_id لسجل التكلفة)
+
+        model/max_tokens/temperature لهذا الطلب فقط؛ بدون model يُستخدم النموذج
+        الحالي ويُحدَّث last_model للوضع التفاعلي. مع model لا تُلمس أي حالة مشتركة.
+        """
+        if not (model or self.current_model):
             print("❌ لم يتم اختيار نموذج! استخدم select_model() أولاً")
             return None
 
@@ -132,35 +193,160 @@ class AIWorkspace:
             if search_results:
                 message = f"{message}\n\nنتائج البحث:\n{search_results}"
 
-        model_info = self.models[self.current_model]
-        client_type = model_info['client']
+        try:
+            model_id = self.resolve_model(model)
+        except Exception as e:
+            return f"❌ خطأ: {str(e)}"
+        if model is None:
+            self.last_model = model_id
+        messages = [{"role": "user", "content": message}]
+        params = self.request_params(max_tokens, temperature)
+        try:
+            text, shared = self.flights.call(
+                flight_key(model_id, messages, params),
+                lambda: self._complete(model_id, message, messages, params, conversation_id),
+            )
+        except Exception as e:
+            return f"❌ خطأ: {str(e)}"
+        if shared:
+            self.call_metrics.record_coalesced(model_id)
+        return text
+
+    def _complete(self, model_id, message, messages, params, conversation_id=None):
+        """استدعاء المزود الفعلي مع تسجيل الزمن والتكلفة (الأخطاء تُرفع)"""
+        client_type = self.models[model_id]['client']
+        text = None
+        usage = None
+        start = time.perf_counter()
 
         try:
             # OpenAI
             if client_type == 'openai':
                 response = self.openai_client.chat.completions.create(
-                    model=self.current_model,
-                    messages=[{"role": "user", "content": message}]
+                    model=model_id,
+                    messages=messages,
+                    **params
                 )
-                return response.choices[0].message.content
+                text = response.choices[0].message.content
+                usage = OpenAIAdapter._usage(response.usage)
 
             # Google Gemini
             elif client_type == 'google':
-                model = genai.GenerativeModel(self.current_model)
-                response = model.generate_content(message)
-                return response.text
+                gemini = self.clients['google'].GenerativeModel(model_id)
+                response = gemini.generate_content(message, generation_config=GoogleAdapter._config(params))
+                text = response.text
+                usage = GoogleAdapter._usage(response)
 
             # Anthropic Claude
             elif client_type == 'anthropic':
                 response = self.claude_client.messages.create(
-                    model=self.current_model,
-                    max_tokens=4096,
-                    messages=[{"role": "user", "content": message}]
+                    **AnthropicAdapter._request(model_id, messages, dict({'max_tokens': 4096}, **params))
                 )
-                return response.content[0].text
+                text = response.content[0].text
+                usage = AnthropicAdapter._usage(response.usage)
+
+            elif client_type == 'echo':
+                time.sleep(EchoAdapter.delay())
+                text = message
+
+        except Exception:
+            self.router.record(model_id, error=True)
+            raise
+
+        latency = time.perf_counter() - start
+        self.router.record(model_id, latency=latency)
+        self.ledger.record_chat(model_id, messages, text, usage, latency, conversation_id)
+        return text
+
+    def chat_stream(self, message, conversation_id=None, model=None, max_tokens=None, temperature=None):
+        """مولّد قطع الرد فور وصولها (لنقطة SSE)؛ الأخطاء تُرفع كاستثناء
+
+        model يُفضل أن يكون معرفاً محلولاً مسبقاً (resolve_model) ليعرف المستدعي النموذج الفعلي.
+        """
+        model_id = self.resolve_model(model)
+        if model is None:
+            self.last_model = model_id
+        messages = [{"role": "user", "content": message}]
+        params = self.request_params(max_tokens, temperature)
+        # المنضم لبث مطابق جارٍ يبدأ بالقطع التي وصلت ثم يتابع معه
+        chunks, shared = self.flights.stream(
+            flight_key(model_id, messages, params),
+            lambda: self._stream_chunks(model_id, message, messages, params, conversation_id),
+        )
+        if shared:
+            self.call_metrics.record_coalesced(model_id)
+        yield from chunks
+
+    def _stream_chunks(self, model_id, message, messages, params, conversation_id=None):
+        """بث المزود الفعلي مع تسجيل الزمن والتكلفة (حتى لو توقف قبل النهاية)"""
+        client_type = self.models[model_id]['client']
+        parts = []
+        ttft = None
+        start = time.perf_counter()
 
-        except Exception as e:
-            return f"❌ خطأ: {str(e)}"
+        try:
+            # OpenAI
+            if client_type == 'openai':
+                stream = self.openai_client.chat.completions.create(
+                    model=model_id, messages=messages, stream=True, **params
+                )
+                chunks = (c.choices[0].delta.content for c in stream if c.choices and c.choices[0].delta.content)
+
+            # Google Gemini
+            elif client_type == 'google':
+                gemini = self.clients['google'].GenerativeModel(model_id)
+                response = gemini.generate_content(
+                    message, generation_config=GoogleAdapter._config(params), stream=True
+                )
+                chunks = (c.text for c in response if c.text)
+
+            # Anthropic Claude
+            elif client_type == 'anthropic':
+                chunks = self._claude_chunks(model_id, messages, dict({'max_tokens': 4096}, **params))
+
+            elif client_type == 'echo':
+                chunks = self._echo_chunks(message)
+
+            else:
+                raise Exception(f"نوع العميل غير مدعوم: {client_type}")
+
+            for chunk in chunks:
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                parts.append(chunk)
+                yield chunk
+
+        except Exception:
+            self.router.record(model_id, error=True)
+            raise
+        else:
+            self.router.record(model_id, latency=time.perf_counter() - start, ttft=ttft)
+        finally:
+            # يشمل إغلاق المستمع للاتصال قبل النهاية: ما وصل يُحسب في السجل
+            if parts:
+                self.ledger.record_chat(model_id, messages, ''.join(parts), None, time.perf_counter() - start,
+                                        conversation_id)
+
+    def _claude_chunks(self, model_id, messages, params):
+        with self.claude_client.messages.stream(**AnthropicAdapter._request(model_id, messages, params)) as stream:
+            yield from stream.text_stream
+
+    @staticmethod
+    def _echo_chunks(message):
+        words = EchoAdapter.words(message)
+        for word in words:
+            time.sleep(EchoAdapter.delay() / len(words))
+            yield word
+
+    @staticmethod
+    def request_params(max_tokens=None, temperature=None):
+        """معاملات التوليد المحددة فقط (الباقي على افتراضي المزود)"""
+        params = {}
+        if max_tokens is not None:
+            params['max_tokens'] = max_tokens
+        if temperature is not None:
+            params['temperature'] = temperature
+        return params
 
     def search(self, query):
         """البحث في الإنترنت"""
@@ -174,16 +360,18 @@ class AIWorkspace:
                     'X-API-KEY': self.serper_key,
                     'Content-Type': 'application/json'
                 }
-                response = requests.post(url, headers=headers, json={'q': query})
-                data = response.json()
-
-                for item in data.get('organic', [])[:3]:
-                    results.append(f"- {item['title']}: {item['snippet']}")
+                response = get_transport().post(url, headers=headers, json={'q': query})
+                results = self.serper_results(response.json())
             except:
                 pass
 
         return "\n".join(results) if results else None
 
+    @staticmethod
+    def serper_results(data):
+        """أسطر النتائج من رد Serper (يستخدمها وضع ASGI أيضاً)"""
+        return [f"- {item['title']}: {item['snippet']}" for item in data.get('organic', [])[:3]]
+
     def read_file(self, file_path):
         """قراءة محتوى ملف"""
         try:
@@ -211,13 +399,16 @@ class AIWorkspace:
         except Exception as e:
             return f"❌ خطأ في الكتابة: {str(e)}"
 
-    def analyze_code(self, file_path):
-        """تحليل كود من ملف"""
+    def analyze_code(self, file_path, model=None):
+        """تحليل كود من ملف (model لهذا الطلب فقط)"""
         content = self.read_file(file_path)
         if content.startswith("❌"):
             return content
+        return self.chat(self.analysis_prompt(content), model=model)
 
-        prompt = f"""حلل هذا الكود وأعطني:
+    @staticmethod
+    def analysis_prompt(content):
+        return f"""حلل هذا الكود وأعطني:
 1. ملخص عن وظيفة الكود
 2. المشاكل المحتملة
 3. اقتراحات للتحسين
@@ -227,7 +418,6 @@ class AIWorkspace:
 {content}
 ```
 """
-        return self.chat(prompt)
 
     def edit_code(self, file_path, instruction):
         """تعديل كود حسب التعليمات"""
@@ -268,6 +458,7 @@ class AIWorkspace:
   /write      - كتابة ملف
   /analyze    - تحليل كود
   /edit       - تعديل كود
+  /startup    - تكلفة تحميل المكتبات
   /help       - المساعدة
   /exit       - خروج
 
@@ -335,6 +526,9 @@ class AIWorkspace:
                         result = self.edit_code(file_path, instruction)
                         print(result)
 
+                    elif cmd == '/startup':
+                        STARTUP.print_report()
+
                     elif cmd == '/help':
                         print("""
 🆘 المساعدة:
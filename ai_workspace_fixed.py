@@ -13,26 +13,30 @@ from datetime import datetime
 from pathlib import Path
 import time
 import subprocess
-
-# مكتبات أساسية
-from openai import OpenAI
-from anthropic import Anthropic
-import requests
-
-# فحص Google
-try:
-    import google.generativeai as genai
-    GOOGLE_AVAILABLE = True
-except ImportError:
-    GOOGLE_AVAILABLE = False
-    genai = None
+import asyncio
+
+from ai_engine import ProviderEngine
+from ai_transport import get_transport
+from ai_cache import ResponseCache, SemanticCache
+from ai_lazy import STARTUP, LazyClients, LazyModule, module_available, timed_import
+from ai_profile import PROFILER, profile_startup
+from ai_router import AUTO_INFO, AUTO_MODEL, TIERS, LatencyRouter
+from ai_metrics import LABELS, CallMetrics, format_value
+from ai_conversations import ConversationStore
+from ai_archive import ConversationArchive, start_archiver
+from ai_context import ContextBuilder, context_budget
+from ai_stats import UsageStats
+from ai_ledger import Ledger, print_costs
+from ai_storage import SQLiteConversationStore, WorkspaceDB, migrate_json, storage_backend
+
+# مكتبات المزودين تُستورد عند أول استخدام فقط
+requests = LazyModule('requests')
+
+# فحص Google (بدون استيراد المكتبة)
+GOOGLE_AVAILABLE = module_available('google.generativeai')
 
 # فحص Flask
-try:
-    from flask import Flask
-    FLASK_AVAILABLE = True
-except ImportError:
-    FLASK_AVAILABLE = False
+FLASK_AVAILABLE = module_available('flask')
 
 class AIWorkspaceFixed:
     """🤖 النسخة المحسنة والثابتة من AI Workspace"""
@@ -40,18 +44,37 @@ class AIWorkspaceFixed:
     def __init__(self):
         """تهيئة محسنة وسريعة"""
         self.setup_theme()
-        self.load_keys()
-        self.init_models()
+        with PROFILER.phase('load_keys'):
+            self.load_keys()
+        with PROFILER.phase('init_models'):
+            self.init_models()
         self.conversations = {}
         self.current_chat_id = None
-        self.usage_stats = {}
+        self.last_model = None
+        self.usage_stats = None
         self.stats_file = Path.home() / "ai_workspace_stats.json"
         self.conversations_dir = Path.home() / "ai_workspace_conversations"
         self.conversations_dir.mkdir(exist_ok=True)
-        self.load_conversations()
-        self.load_usage_stats()
-
-        self.print_banner()
+        # قاعدة SQLite المشتركة (AI_WORKSPACE_STORAGE=json للعودة للملفات)
+        with PROFILER.phase('open_db'):
+            self.db = WorkspaceDB() if storage_backend() == 'sqlite' else None
+        # مدرجات قياس كل استدعاء بجانب ملف الإحصائيات
+        self.call_metrics = CallMetrics(self.stats_file.with_name("ai_workspace_metrics.json"))
+        self.engine.metrics = self.call_metrics
+        self.response_cache = ResponseCache()
+        # الطبقة الدلالية اختيارية: AI_SEMANTIC_CACHE=1
+        semantic_enabled = os.getenv('AI_SEMANTIC_CACHE', '').lower() in ('1', 'true', 'yes')
+        self.semantic_cache = SemanticCache() if semantic_enabled else None
+        self.chat_params = {'max_tokens': 2000, 'temperature': 0.7}
+        # سياق المحادثة: آخر الأدوار كما هي والأقدم كملخص متدحرج
+        self.context = ContextBuilder(self.summarize_history)
+        with PROFILER.phase('load_conversations'):
+            self.load_conversations()
+        with PROFILER.phase('load_usage_stats'):
+            self.load_usage_stats()
+
+        with PROFILER.phase('banner'):
+            self.print_banner()
 
     def setup_theme(self):
         """إعداد ألوان جميلة"""
@@ -118,13 +141,13 @@ class AIWorkspaceFixed:
     def init_models(self):
         """تهيئة النماذج مع معالجة قوية للأخطاء"""
         self.models = {}
-        self.clients = {}
+        self.clients = LazyClients()
         errors = []
 
         # OpenAI Models
         if self.keys['openai']:
             try:
-                self.clients['openai'] = OpenAI(api_key=self.keys['openai'])
+                self.clients.register('openai', lambda: timed_import('openai').OpenAI(api_key=self.keys['openai']))
                 self.models.update({
                     'gpt-4o-mini': {
                         'name': 'GPT-4o Mini',
@@ -152,8 +175,7 @@ class AIWorkspaceFixed:
         # Google Models
         if self.keys['google'] and GOOGLE_AVAILABLE:
             try:
-                genai.configure(api_key=self.keys['google'])
-                self.clients['google'] = genai
+                self.clients.register('google', self._google_client)
                 self.models.update({
                     'gemini-1.5-flash': {
                         'name': 'Gemini 1.5 Flash',
@@ -177,7 +199,9 @@ class AIWorkspaceFixed:
         # Anthropic Models
         if self.keys['anthropic']:
             try:
-                self.clients['anthropic'] = Anthropic(api_key=self.keys['anthropic'])
+                self.clients.register(
+                    'anthropic', lambda: timed_import('anthropic').Anthropic(api_key=self.keys['anthropic'])
+                )
                 self.models.update({
                     'claude-3-haiku-20240307': {
                         'name': 'Claude 3 Haiku',
@@ -199,10 +223,10 @@ class AIWorkspaceFixed:
         # Groq Models (مجاني وسريع جداً)
         if self.keys['groq']:
             try:
-                self.clients['groq'] = OpenAI(
+                self.clients.register('groq', lambda: timed_import('openai').OpenAI(
                     api_key=self.keys['groq'],
                     base_url="https://api.groq.com/openai/v1"
-                )
+                ))
                 self.models.update({
                     'llama-3.1-8b-instant': {
                         'name': 'Llama 3.1 8B',
@@ -239,10 +263,10 @@ class AIWorkspaceFixed:
         # Cohere Models
         if self.keys['cohere']:
             try:
-                self.clients['cohere'] = OpenAI(
+                self.clients.register('cohere', lambda: timed_import('openai').OpenAI(
                     api_key=self.keys['cohere'],
-                    base_url="https://api.cohere.ai/v1"
-                )
+                    base_url="https://api.cohere.ai/compatibility/v1"
+                ))
                 self.models.update({
                     'command-r': {
                         'name': 'Command R',
@@ -255,6 +279,18 @@ class AIWorkspaceFixed:
             except Exception as e:
                 errors.append(f"Cohere: {e}")
 
+        # محرك المزودين غير المتزامن (يستخدمه chat_with_model)
+        self.router = LatencyRouter(self.models)
+        self.auto_tier = os.getenv('AI_AUTO_TIER', 'standard')
+        self.ledger = Ledger()
+        self.engine = ProviderEngine(self.keys, self.models, router=self.router, ledger=self.ledger)
+
+        # مجموعات السباق: نماذج متكافئة يهمنا أسرعها فقط
+        fast_group = os.getenv('AI_RACE_MODELS', 'llama-3.1-8b-instant,gpt-4o-mini,claude-3-haiku-20240307')
+        self.race_groups = {
+            'fast': [model_id.strip() for model_id in fast_group.split(',') if model_id.strip()],
+        }
+
         # عرض الأخطاء إن وجدت
         if errors:
             print(f"\n{self.theme['warning']}⚠️ بعض النماذج لم يتم تحميلها:{self.theme['end']}")
@@ -267,51 +303,55 @@ class AIWorkspaceFixed:
         else:
             print(f"\n{self.theme['warning']}❌ لم يتم تحميل أي نماذج! تأكد من مفاتيح API{self.theme['end']}\n")
 
+    def _google_client(self):
+        """إعداد مكتبة Google عند أول استخدام"""
+        genai = timed_import('google.generativeai')
+        genai.configure(api_key=self.keys['google'])
+        return genai
+
+    def show_startup_report(self):
+        """عرض تكلفة استيراد المكتبات وإنشاء العملاء"""
+        STARTUP.print_report()
+
     def load_conversations(self):
-        """تحميل المحادثات"""
-        if self.conversations_dir.exists():
-            for file in self.conversations_dir.glob("*.json"):
-                try:
-                    with open(file, 'r', encoding='utf-8') as f:
-                        chat_data = json.load(f)
-                        chat_id = file.stem
-                        self.conversations[chat_id] = chat_data
-                except Exception as e:
-                    print(f"{self.theme['warning']}⚠️ خطأ في تحميل المحادثة {file}: {e}{self.theme['end']}")
+        """تحميل فهرس المحادثات (النصوص تُحمَّل عند الطلب)
+
+        المحادثات الخاملة تُنقل للأرشيف المضغوط في خيط خلفي (AI_ARCHIVE_DAYS=0 يعطلها).
+        """
+        self.archive = ConversationArchive()
+        if self.db is None:
+            self.conversations = ConversationStore(self.conversations_dir, archive=self.archive)
+        else:
+            # نقل الملفات القديمة مرة واحدة عند أول تشغيل
+            migrated, _ = migrate_json(self.db, self.conversations_dir, self.stats_file)
+            if migrated:
+                print(f"{self.theme['success']}✅ تم نقل {migrated} محادثة إلى {self.db.path}{self.theme['end']}")
+            self.conversations = SQLiteConversationStore(self.db, source='terminal', archive=self.archive)
+        start_archiver(self.conversations)
 
     def save_conversation(self, chat_id, conversation):
         """حفظ المحادثة"""
         try:
-            filename = self.conversations_dir / f"{chat_id}.json"
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(conversation, f, ensure_ascii=False, indent=2)
+            self.conversations.save(chat_id, conversation)
             return True
         except Exception as e:
             print(f"{self.theme['warning']}⚠️ خطأ في حفظ المحادثة: {e}{self.theme['end']}")
             return False
 
     def load_usage_stats(self):
-        """تحميل إحصائيات الاستخدام"""
-        if self.stats_file.exists():
-            try:
-                with open(self.stats_file, 'r') as f:
-                    self.usage_stats = json.load(f)
-            except:
-                self.usage_stats = {}
+        """تحميل إحصائيات الاستخدام (العدادات في الذاكرة وتُكتب مؤجلة)"""
+        self.usage_stats = UsageStats(self.stats_file, db=self.db)
 
     def update_usage_stats(self, model_id):
-        """تحديث الإحصائيات"""
-        if model_id not in self.usage_stats:
-            self.usage_stats[model_id] = {'count': 0, 'last_used': None}
-
-        self.usage_stats[model_id]['count'] += 1
-        self.usage_stats[model_id]['last_used'] = datetime.now().isoformat()
+        """تحديث الإحصائيات (بدون انتظار القرص)"""
+        self.usage_stats.increment(model_id)
 
     def save_usage_stats(self):
         """حفظ الإحصائيات"""
         try:
-            with open(self.stats_file, 'w') as f:
-                json.dump(self.usage_stats, f, indent=2)
+            self.usage_stats.flush()
+            self.call_metrics.save()
+            self.router.save()
         except Exception as e:
             print(f"{self.theme['warning']}⚠️ خطأ في حفظ الإحصائيات: {e}{self.theme['end']}")
 
@@ -348,110 +388,195 @@ class AIWorkspaceFixed:
         }
         return self.current_chat_id
 
-    def chat_with_model(self, model_id, prompt, save_to_history=True):
-        """دردشة مع نموذج محدد - إصدار محسن"""
-        if model_id not in self.models:
-            raise ValueError(f"النموذج {model_id} غير متوفر")
+    def summarize_history(self, prompt, max_tokens):
+        """تلخيص أدوار قديمة بأسرع نموذج سليم (يستدعيه ContextBuilder)"""
+        model_id = self.router.choose('fast')
+        messages = [{"role": "user", "content": prompt}]
+        return self.engine.chat(model_id, messages, max_tokens=max_tokens, temperature=0.2)['text']
+
+    def build_messages(self, model_ids, prompt, system=None):
+        """رسائل الطلب: سياق المحادثة الحالية ضمن ميزانية أصغر نافذة بين النماذج"""
+        conversation = self.conversations.get(self.current_chat_id) if self.current_chat_id else None
+        history = conversation.get('messages', []) if conversation else []
+        budget = min(context_budget(m, self.models.get(m), self.chat_params['max_tokens']) for m in model_ids)
+        return self.context.build(history, prompt, budget, system=system)
+
+    def chat_with_model(self, model_id, prompt, save_to_history=True, race=None, hedge=True, first_token=False,
+                        use_cache=True, tier=None, use_context=True, system=None):
+        """دردشة مع نموذج محدد - إصدار محسن
+
+        race: اسم مجموعة سباق أو قائمة نماذج متكافئة؛ يُرسل السؤال لها ويُعاد
+        أول رد (انظر ProviderEngine.arace) ويُسجَّل النموذج الفائز في التاريخ.
+        use_cache=False يتجاوز ذاكرة الردود لهذا الاستدعاء.
+        use_context=False يرسل السؤال وحده بدون أدوار المحادثة السابقة.
+        system: نص ثابت كبير (محتوى ملف أو تعليمات) يُرسل أولاً ليُخزن لدى المزود
+        بين الأسئلة المتكررة عنه؛ لا يُحفظ في تاريخ المحادثة.
+        model_id='auto' يختار أسرع نموذج سليم من المستوى tier (انظر LatencyRouter).
+        """
+        if model_id == AUTO_MODEL and not race:
+            return self.chat_auto(prompt, tier or self.auto_tier, save_to_history=save_to_history, use_cache=use_cache,
+                                  use_context=use_context, system=system)
 
-        model_info = self.models[model_id]
-        client_type = model_info['client']
+        race_models = self.race_candidates(race) if race else None
+        if race_models is None and model_id not in self.models:
+            raise ValueError(f"النموذج {model_id} غير متوفر")
 
         try:
-            # OpenAI
-            if client_type == 'openai':
-                response = self.clients['openai'].chat.completions.create(
-                    model=model_id,
-                    messages=[{"role": "user", "content": prompt}],
-                    max_tokens=2000,
-                    temperature=0.7
-                )
-                result = response.choices[0].message.content
-
-            # Google
-            elif client_type == 'google':
-                if not GOOGLE_AVAILABLE:
-                    raise Exception("مكتبة google-generativeai غير مثبتة")
-                model = self.clients['google'].GenerativeModel(model_id)
-                response = model.generate_content(prompt)
-                result = response.text
-
-            # Anthropic
-            elif client_type == 'anthropic':
-                response = self.clients['anthropic'].messages.create(
-                    model=model_id,
-                    max_tokens=2000,
-                    messages=[{"role": "user", "content": prompt}]
-                )
-                result = response.content[0].text
-
-            # Groq
-            elif client_type == 'groq':
-                response = self.clients['groq'].chat.completions.create(
-                    model=model_id,
-                    messages=[{"role": "user", "content": prompt}],
-                    max_tokens=2000,
-                    temperature=0.7
-                )
-                result = response.choices[0].message.content
-
-            # MiniMax
-            elif client_type == 'minimax':
-                headers = {
-                    'Authorization': f'Bearer {self.keys["minimax"]}',
-                    'Content-Type': 'application/json'
-                }
-                data = {
-                    'model': 'minimax-m2',
-                    'messages': [{"role": "user", "content": prompt}],
-                    'max_tokens': 2000,
-                    'temperature': 0.7
-                }
-                response = requests.post(
-                    f"https://api.minimax.io/v1/text/chatcompletion?GroupId={self.keys['minimax_group_id']}",
-                    headers=headers,
-                    json=data,
-                    timeout=30
-                )
-                result = response.json()['choices'][0]['message']['content']
-
-            # Cohere
-            elif client_type == 'cohere':
-                response = self.clients['cohere'].chat.completions.create(
-                    model=model_id,
-                    message=prompt,
-                    max_tokens=2000
+            if use_context:
+                messages = self.build_messages(race_models or [model_id], prompt, system)
+            else:
+                messages = [{"role": "system", "content": system}] if system else []
+                messages.append({"role": "user", "content": prompt})
+            race_info = None
+            cached = None
+            if race_models:
+                response = self.engine.race(
+                    race_models, messages, hedge=hedge, first_token=first_token,
+                    conversation_id=self.current_chat_id, **self.chat_params
                 )
-                result = response.text
-
+                model_id = response['model']
+                race_info = response['race']
             else:
-                raise Exception(f"نوع العميل غير مدعوم: {client_type}")
-
-            # تحديث الإحصائيات
-            self.update_usage_stats(model_id)
+                cache_key = ResponseCache.make_key(model_id, messages, **self.chat_params) if use_cache else None
+                cached = self.response_cache.get(cache_key) if cache_key else None
+                namespace = None
+                # المطابقة الدلالية على السؤال وحده لا تصح إن كان للمحادثة سياق
+                if use_cache and self.semantic_cache and cached is None and len(messages) == 1:
+                    namespace = SemanticCache.namespace(model_id, **self.chat_params)
+                    cached = self.semantic_cache.lookup(namespace, prompt)
+
+                if cached is not None:
+                    response = {'text': cached, 'model': model_id}
+                else:
+                    response = self.engine.chat(
+                        model_id, messages, conversation_id=self.current_chat_id, **self.chat_params
+                    )
+                    if cache_key:
+                        self.response_cache.set(cache_key, model_id, response['text'])
+                    if namespace:
+                        self.semantic_cache.add(namespace, prompt, response['text'])
+            result = response['text']
+            self.last_model = model_id
+
+            # تحديث الإحصائيات (الردود المخزنة لا تُحسب كاستدعاء للنموذج)
+            if cached is None:
+                self.update_usage_stats(model_id)
 
             # حفظ في التاريخ
             if save_to_history and self.current_chat_id:
-                self.conversations[self.current_chat_id]['messages'].append({
+                user_message = {
                     'role': 'user',
                     'content': prompt,
                     'timestamp': datetime.now().isoformat()
-                })
-                self.conversations[self.current_chat_id]['messages'].append({
+                }
+                assistant_message = {
                     'role': 'assistant',
                     'content': result,
                     'model': model_id,
                     'timestamp': datetime.now().isoformat()
-                })
+                }
+                if race_info:
+                    assistant_message['race'] = race_info
+                if cached is not None:
+                    assistant_message['cached'] = True
+                self.conversations.append_messages(self.current_chat_id, [user_message, assistant_message])
 
             return result
 
-        except requests.exceptions.Timeout:
+        except (asyncio.TimeoutError, requests.exceptions.Timeout):
             raise Exception("انتهت مهلة الاتصال، يرجى المحاولة مرة أخرى")
         except requests.exceptions.ConnectionError:
             raise Exception("خطأ في الاتصال، تحقق من الإنترنت")
         except Exception as e:
             raise Exception(f"خطأ في النموذج {model_id}: {str(e)}")
 
+    def chat_auto(self, prompt, tier='standard', attempts=2, **kwargs):
+        """النموذج التلقائي: أسرع نموذج سليم للمستوى، ثم التالي إن فشل"""
+        tried = []
+        last_error = None
+        for _ in range(attempts):
+            try:
+                model_id = self.router.choose(tier, exclude=tried)
+            except Exception as e:
+                last_error = last_error or e
+                break
+            try:
+                return self.chat_with_model(model_id, prompt, **kwargs)
+            except Exception as e:
+                tried.append(model_id)
+                last_error = e
+        raise last_error
+
+    def find_conversations(self, query, limit=10):
+        """البحث في المحادثات المحفوظة وعرض أفضل المقتطفات"""
+        start = time.perf_counter()
+        results = self.conversations.search(query, limit)
+        elapsed = (time.perf_counter() - start) * 1000
+
+        print(f"\n{self.theme['bold']}{self.theme['purple']}🔎 نتائج «{query}» ({len(results)} نتيجة، {elapsed:.0f}ms):{self.theme['end']}")
+        print("="*70)
+        if not results:
+            print(f"{self.theme['info']}لا توجد نتائج{self.theme['end']}")
+        for result in results:
+            who = '👤' if result['role'] == 'user' else f"🤖 {result['model'] or ''}"
+            print(f"{self.theme['cyan']}{result['title']}{self.theme['end']} "
+                  f"({result['conversation_id']}) {who}")
+            print(f"   {result['snippet']}")
+        return results
+
+    def export_conversation(self, chat_id, path=None):
+        """تصدير محادثة (من القاعدة أو الأرشيف) كملف Markdown"""
+        conversation = self.conversations.get(chat_id)
+        if conversation is None:
+            print(f"{self.theme['warning']}⚠️ محادثة غير موجودة: {chat_id}{self.theme['end']}")
+            return None
+        if path is None:
+            exports_dir = Path.home() / "ai_workspace_exports"
+            exports_dir.mkdir(exist_ok=True)
+            path = exports_dir / f"{chat_id}.md"
+
+        lines = [f"# {conversation.get('title', 'محادثة')}", "", f"_{conversation.get('timestamp', '')}_", ""]
+        for message in conversation.get('messages', []):
+            who = '👤 أنت' if message['role'] == 'user' else f"🤖 {message.get('model', '')}"
+            lines += [f"**{who}:**", "", message['content'], ""]
+        Path(path).write_text('\n'.join(lines), encoding='utf-8')
+        print(f"{self.theme['success']}✅ تم التصدير: {path}{self.theme['end']}")
+        return path
+
+    def show_archive_status(self, days=None):
+        """أرشفة المحادثات الخاملة الآن (إن حُددت days) وعرض حجم الأرشيف"""
+        if days is not None:
+            moved = self.conversations.archive_idle(days)
+            print(f"{self.theme['success']}✅ تمت أرشفة {moved} محادثة{self.theme['end']}")
+        stats = self.archive.stats()
+        print(f"{self.theme['info']}🧊 الأرشيف: {stats['conversations']} محادثة، {stats['messages']} رسالة، "
+              f"{stats['files']} ملف ({stats['bytes'] / 1024:.1f}KB){self.theme['end']}")
+
+    def show_costs(self, days=7, by='model'):
+        """عرض التوكنات والتكلفة من سجل الاستدعاءات"""
+        print(f"\n{self.theme['bold']}{self.theme['purple']}💰 التكلفة:{self.theme['end']}")
+        print("="*70)
+        print_costs(self.ledger, days, by)
+
+    def show_router_status(self):
+        """عرض حالة الموجّه: المستوى والأزمنة المتوقعة ونسبة الأخطاء"""
+        print(f"\n{self.theme['bold']}{self.theme['purple']}🧭 حالة الموجّه (المستوى الحالي: {self.auto_tier}):{self.theme['end']}")
+        print("="*70)
+        for row in sorted(self.router.snapshot(), key=lambda r: self.router.expected(r['model'])):
+            latency = f"{row['latency']:.2f}s" if row['latency'] is not None else '—'
+            ttft = f"{row['ttft']:.2f}s" if row['ttft'] is not None else '—'
+            health = '✅' if row['healthy'] else '⛔'
+            print(f"{health} {row['model']:<30} {row['tier']:<9} زمن: {latency:<8} أول قطعة: {ttft:<8}"
+                  f" أخطاء: {row['error_rate']:.0%}")
+
+    def race_candidates(self, race):
+        """النماذج المتاحة من مجموعة سباق (اسم مجموعة أو قائمة)"""
+        group = self.race_groups.get(race, []) if isinstance(race, str) else race
+        candidates = [model_id for model_id in group if model_id in self.models]
+        if not candidates:
+            raise ValueError(f"لا توجد نماذج متاحة في مجموعة السباق: {race}")
+        return candidates
+
     def generate_image(self, prompt, model='dall-e-3'):
         """توليد صورة - إصدار محسن"""
         if not self.keys['openai']:
@@ -462,20 +587,24 @@ class AIWorkspaceFixed:
         print(f"{self.theme['info']}الوصف: {prompt}{self.theme['end']}")
 
         try:
+            quality = 'hd' if model == 'dall-e-3' else 'standard'
+            start = time.perf_counter()
             response = self.clients['openai'].images.generate(
                 model=model,
                 prompt=prompt,
                 size='1024x1024',
                 n=1,
-                quality='hd' if model == 'dall-e-3' else 'standard'
+                quality=quality
             )
+            self.ledger.record(f"{model}:{quality}", 'image', units=1, latency=time.perf_counter() - start,
+                               conversation_id=self.current_chat_id)
 
             image_url = response.data[0].url
             print(f"\n{self.theme['success']}✅ تم توليد الصورة بنجاح!{self.theme['end']}")
             print(f"{self.theme['info']}رابط الصورة: {image_url}{self.theme['end']}")
 
             # تحميل الصورة
-            response_img = requests.get(image_url)
+            response_img = get_transport().get(image_url)
             if response_img.status_code == 200:
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                 filename = Path.home() / f"ai_image_{timestamp}.png"
@@ -515,7 +644,7 @@ class AIWorkspaceFixed:
                     'q': query,
                     'num': 5
                 }
-                response = requests.post(url, headers=headers, json=payload, timeout=10)
+                response = get_transport().post(url, headers=headers, json=payload, timeout=10)
                 data = response.json()
 
                 print(f"\n{self.theme['bold']}{self.theme['primary']}🔍 نتائج البحث:{self.theme['end']}")
@@ -533,7 +662,7 @@ class AIWorkspaceFixed:
                     'query': query,
                     'max_results': 5
                 }
-                response = requests.post(url, json=payload, timeout=10)
+                response = get_transport().post(url, json=payload, timeout=10)
                 data = response.json()
 
                 print(f"\n{self.theme['bold']}{self.theme['primary']}🔍 نتائج البحث:{self.theme['end']}")
@@ -587,6 +716,23 @@ class AIWorkspaceFixed:
         print(f"\n{self.theme['bold']}{self.theme['purple']}📊 إحصائيات الاستخدام:{self.theme['end']}")
         print("="*70)
 
+        cache = self.response_cache.stats()
+        session, total = cache['session'], cache['total']
+        print(f"{self.theme['cyan']}💾 ذاكرة الردود:{self.theme['end']} {cache['entries']} رد مخزن")
+        print(f"   الجلسة: {session['hits']} إصابة / {session['misses']} إخفاق")
+        print(f"   الإجمالي: {total.get('hits', 0)} إصابة / {total.get('misses', 0)} إخفاق"
+              f" / {total.get('evictions', 0)} طرد")
+        if self.semantic_cache:
+            semantic = self.semantic_cache.stats()
+            session = semantic['session']
+            print(f"{self.theme['cyan']}🧠 الذاكرة الدلالية:{self.theme['end']} {semantic['entries']} سؤال"
+                  f" (عتبة {semantic['threshold']})")
+            print(f"   الجلسة: {session['hits']} إصابة / {session['misses']} إخفاق"
+                  f" / {session['near_misses']} قريب من العتبة / {session['evictions']} طرد")
+            for hit in self.semantic_cache.audit(3):
+                print(f"   🔎 {hit['similarity']:.2f}: «{hit['prompt'][:30]}» ← «{hit['matched_prompt'][:30]}»")
+        print("-"*70)
+
         if not self.usage_stats:
             print(f"{self.theme['info']}📈 لا توجد إحصائيات بعد{self.theme['end']}")
             return
@@ -604,8 +750,28 @@ class AIWorkspaceFixed:
             last_used = stats.get('last_used', 'لم يُستخدم')
             print(f"{self.theme['cyan']}{model_name:<30}{self.theme['end']} - استخدام: {count} مرة")
             print(f"{self.theme['info']}آخر استخدام: {last_used}{self.theme['end']}")
+            ratio = self.call_metrics.cache_ratio(model_id)
+            if ratio is not None:
+                print(f"{self.theme['info']}💾 من ذاكرة المزود: {ratio:.0%} من توكنات السؤال{self.theme['end']}")
+            coalesced = self.call_metrics.coalesced(model_id)
+            if coalesced:
+                print(f"{self.theme['info']}🛫 طلبات مدموجة مع طلب مطابق جارٍ: {coalesced}{self.theme['end']}")
+            self.print_call_percentiles(model_id)
             print("-"*70)
 
+    def print_call_percentiles(self, model_id):
+        """جدول p50/p95/p99 لقياسات استدعاءات النموذج"""
+        summary = self.call_metrics.summary(model_id)
+        if not summary:
+            return
+        print(f"   {'':<14}{'p50':>9}{'p95':>9}{'p99':>9}{'العدد':>7}")
+        for metric in ('latency', 'ttft', 'queue_wait', 'tokens_per_sec', 'cached_tokens', 'completion_tokens',
+                       'response_bytes'):
+            row = summary.get(metric)
+            if row:
+                values = ''.join(f"{format_value(metric, row[q]):>9}" for q in ('p50', 'p95', 'p99'))
+                print(f"   {LABELS[metric]:<14}{values}{row['count']:>7}")
+
     def show_help(self):
         """عرض المساعدة"""
         help_text = f"""
@@ -621,11 +787,19 @@ class AIWorkspaceFixed:
 {self.theme['cyan']}إدارة النماذج:{self.theme['end']}
   models               - عرض النماذج
   change [model]       - تبديل النموذج
+  change auto [tier]   - اختيار تلقائي لأسرع نموذج سليم (fast/standard/advanced)
+  router               - حالة الموجّه: الأزمنة ونسبة الأخطاء لكل نموذج
+  race [group|off]     - وضع السباق: أسرع نموذج متكافئ يجيب
 
 {self.theme['cyan']}الميزات المتقدمة:{self.theme['end']}
   search [query]       - البحث في الإنترنت (مطلوب مفتاح)
+  find [query]         - البحث في المحادثات المحفوظة
+  export [id]          - تصدير محادثة (الحالية افتراضياً) كملف Markdown
+  archive [days]       - حجم الأرشيف، أو أرشفة ما خمل أكثر من days يوماً
   generate [prompt]    - توليد صورة (مطلوب OpenAI)
   stats                - عرض إحصائيات الاستخدام
+  costs [days] [by]    - التوكنات والتكلفة حسب model أو day أو conversation
+  startup              - تكلفة تحميل المكتبات والعملاء
 
 {self.theme['cyan']}أمثلة:{self.theme['end']}
   search أحدث أخبار الذكاء الاصطناعي
@@ -652,9 +826,13 @@ class AIWorkspaceFixed:
         if not model_list:
             return
 
+        print(f" a. {AUTO_INFO['name']:<25} - {AUTO_INFO['desc']}")
         choice = input(f"\n{self.theme['cyan']}اختر رقم النموذج: {self.theme['end']}").strip()
 
-        if choice.isdigit():
+        if choice.lower() in ('a', AUTO_MODEL):
+            current_model_id, current_model_info = AUTO_MODEL, AUTO_INFO
+            print(f"\n{self.theme['success']}✅ تم اختيار: {current_model_info['name']}{self.theme['end']}\n")
+        elif choice.isdigit():
             idx = int(choice) - 1
             if 0 <= idx < len(model_list):
                 current_model_id, current_model_info = model_list[idx]
@@ -666,6 +844,8 @@ class AIWorkspaceFixed:
             print(f"{self.theme['warning']}⚠️ يرجى إدخال رقم صحيح{self.theme['end']}")
             return
 
+        race_group = None
+
         # حلقة الدردشة
         print(f"{self.theme['bold']}{self.theme['primary']}💬 اكتب 'help' للمساعدة أو 'exit' للخروج{self.theme['end']}\n")
 
@@ -692,11 +872,29 @@ class AIWorkspaceFixed:
                     self.show_usage_stats()
                     continue
 
+                elif user_input.lower() == 'startup':
+                    self.show_startup_report()
+                    continue
+
                 elif user_input.lower() == 'clear':
                     os.system('clear' if os.name == 'posix' else 'cls')
                     self.print_banner()
                     continue
 
+                elif user_input.lower() == 'router':
+                    self.show_router_status()
+                    continue
+
+                elif user_input.lower().startswith('change auto'):
+                    tier = user_input[11:].strip() or self.auto_tier
+                    if tier not in TIERS:
+                        print(f"{self.theme['warning']}⚠️ المستويات المتاحة: {', '.join(TIERS)}{self.theme['end']}")
+                        continue
+                    current_model_id, current_model_info = AUTO_MODEL, AUTO_INFO
+                    self.auto_tier = tier
+                    print(f"\n{self.theme['success']}✅ تم التبديل إلى: {AUTO_INFO['name']} ({tier}){self.theme['end']}\n")
+                    continue
+
                 elif user_input.lower().startswith('change '):
                     new_model_name = user_input.split(' ', 1)[1]
                     # البحث عن النموذج بالاسم
@@ -713,6 +911,44 @@ class AIWorkspaceFixed:
                         print(f"{self.theme['warning']}⚠️ نموذج غير موجود{self.theme['end']}")
                     continue
 
+                elif user_input.lower() == 'race' or user_input.lower().startswith('race '):
+                    arg = user_input[5:].strip() or 'fast'
+                    if arg == 'off':
+                        race_group = None
+                        print(f"\n{self.theme['success']}✅ تم إيقاف وضع السباق{self.theme['end']}\n")
+                    else:
+                        try:
+                            names = [self.models[mid]['name'] for mid in self.race_candidates(arg)]
+                            race_group = arg
+                            print(f"\n{self.theme['success']}🏁 وضع السباق: {', '.join(names)}{self.theme['end']}\n")
+                        except ValueError as e:
+                            print(f"{self.theme['warning']}⚠️ {e}{self.theme['end']}")
+                    continue
+
+                elif user_input.lower().startswith('find '):
+                    self.find_conversations(user_input[5:].strip())
+                    continue
+
+                elif user_input.lower() == 'export' or user_input.lower().startswith('export '):
+                    self.export_conversation(user_input[7:].strip() or chat_id)
+                    continue
+
+                elif user_input.lower() == 'archive' or user_input.lower().startswith('archive '):
+                    arg = user_input[8:].strip()
+                    try:
+                        self.show_archive_status(float(arg) if arg else None)
+                    except ValueError:
+                        print(f"{self.theme['warning']}⚠️ يرجى إدخال عدد الأيام{self.theme['end']}")
+                    continue
+
+                elif user_input.lower() == 'costs' or user_input.lower().startswith('costs '):
+                    args = user_input[6:].split()
+                    try:
+                        self.show_costs(int(args[0]) if args else 7, args[1] if len(args) > 1 else 'model')
+                    except ValueError as e:
+                        print(f"{self.theme['warning']}⚠️ الاستخدام: costs [days] [day|model|conversation] ({e}){self.theme['end']}")
+                    continue
+
                 elif user_input.lower().startswith('search '):
                     query = user_input[7:]
                     self.search_web(query)
@@ -725,11 +961,17 @@ class AIWorkspaceFixed:
 
                 else:
                     # دردشة عادية
-                    print(f"\n{self.theme['cyan']}🤖 {current_model_info['name']}:{self.theme['end']}")
+                    label = f"🏁 سباق ({race_group})" if race_group else current_model_info['name']
+                    print(f"\n{self.theme['cyan']}🤖 {label}:{self.theme['end']}")
                     print(f"{self.theme['info']}⏳ جاري المعالجة...{self.theme['end']}")
 
                     try:
-                        response = self.chat_with_model(current_model_id, user_input)
+                        response = self.chat_with_model(current_model_id, user_input, race=race_group)
+                        if race_group:
+                            winner = self.conversations[chat_id]['messages'][-1]['model']
+                            print(f"{self.theme['info']}🏆 الفائز: {self.models[winner]['name']}{self.theme['end']}")
+                        elif current_model_id == AUTO_MODEL:
+                            print(f"{self.theme['info']}🧭 النموذج المختار: {self.models[self.last_model]['name']}{self.theme['end']}")
                         print(f"\n{response}\n")
                     except Exception as e:
                         print(f"\n{self.theme['warning']}⚠️ خطأ: {e}{self.theme['end']}\n")
@@ -749,6 +991,10 @@ class AIWorkspaceFixed:
 
 def main():
     """الدالة الرئيسية"""
+    if '--profile-startup' in sys.argv:
+        profile_startup(AIWorkspaceFixed)
+        return
+
     try:
         app = AIWorkspaceFixed()
         app.run()
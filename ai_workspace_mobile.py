@@ -5,7 +5,7 @@
 تطبيق ويب يعمل على الهاتف - PWA
 """
 
-from flask import Flask, render_template_string, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory, session, stream_with_context
 from flask_cors import CORS
 import os
 import json
@@ -13,6 +13,12 @@ from pathlib import Path
 from ai_workspace_pro import AIWorkspacePro
 import threading
 import socket
+import sys
+from ai_profile import profile_startup
+from ai_archive import ConversationArchive
+from ai_stats import UsageStats
+from ai_storage import SQLiteConversationStore, WorkspaceDB, new_chat_id, storage_backend
+from ai_web_templates import MANIFEST_ASSET, MOBILE_INDEX, SERVICE_WORKER_ASSET, asset_response
 
 app = Flask(__name__)
 app.secret_key = os.urandom(24)
@@ -21,6 +27,10 @@ CORS(app)
 # Global workspace
 workspace = None
 workspace_lock = threading.Lock()
+# المحادثات في قاعدة SQLite المشتركة مع تطبيق الطرفية والهاتف
+store = None
+# حالة الإحماء: يملؤها ai_serve.py في كل عامل بعد بناء العملاء والاتصال المسبق
+warm_info = None
 
 def load_saved_keys():
     """تحميل المفاتيح المحفوظة"""
@@ -44,589 +54,156 @@ def get_local_ip():
     except:
         return "localhost"
 
-# HTML Template - PWA Ready
-HTML_TEMPLATE = '''
-<!DOCTYPE html>
-<html dir="rtl" lang="ar">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0, maximum-scale=1.0, user-scalable=no">
-    <meta name="mobile-web-app-capable" content="yes">
-    <meta name="apple-mobile-web-app-capable" content="yes">
-    <meta name="apple-mobile-web-app-status-bar-style" content="black-translucent">
-    <meta name="theme-color" content="#667eea">
-    <title>🤖 AI Workspace Pro</title>
-
-    <!-- PWA Manifest -->
-    <link rel="manifest" href="/manifest.json">
-    <link rel="icon" href="data:image/svg+xml,<svg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 100 100'><text y='.9em' font-size='90'>🤖</text></svg>">
-
-    <style>
-        * {
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-            -webkit-tap-highlight-color: transparent;
-        }
-
-        body {
-            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            min-height: 100vh;
-            padding: 0;
-            overflow-x: hidden;
-        }
-
-        .app-container {
-            max-width: 100vw;
-            margin: 0 auto;
-            background: white;
-            min-height: 100vh;
-            display: flex;
-            flex-direction: column;
-        }
-
-        .header {
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            color: white;
-            padding: 15px;
-            text-align: center;
-            box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-            position: sticky;
-            top: 0;
-            z-index: 100;
-        }
-
-        .header h1 {
-            font-size: 1.5em;
-            margin-bottom: 5px;
-        }
-
-        .header p {
-            font-size: 0.9em;
-            opacity: 0.9;
-        }
-
-        .model-selector {
-            background: #f8f9fa;
-            padding: 10px;
-            overflow-x: auto;
-            white-space: nowrap;
-            -webkit-overflow-scrolling: touch;
-        }
-
-        .model-btn {
-            display: inline-block;
-            padding: 8px 15px;
-            margin: 5px;
-            border: 2px solid #dee2e6;
-            background: white;
-            border-radius: 20px;
-            cursor: pointer;
-            transition: all 0.3s;
-            font-size: 0.9em;
-        }
-
-        .model-btn.active {
-            border-color: #667eea;
-            background: #667eea;
-            color: white;
-        }
-
-        .messages {
-            flex: 1;
-            padding: 15px;
-            overflow-y: auto;
-            background: #ffffff;
-            -webkit-overflow-scrolling: touch;
-        }
-
-        .message {
-            margin: 10px 0;
-            padding: 12px 15px;
-            border-radius: 15px;
-            max-width: 85%;
-            word-wrap: break-word;
-            animation: slideIn 0.3s;
-        }
-
-        @keyframes slideIn {
-            from {
-                opacity: 0;
-                transform: translateY(10px);
-            }
-            to {
-                opacity: 1;
-                transform: translateY(0);
-            }
-        }
-
-        .message.user {
-            background: #667eea;
-            color: white;
-            margin-right: auto;
-            border-bottom-right-radius: 5px;
-        }
-
-        .message.ai {
-            background: #f1f3f5;
-            color: #212529;
-            margin-left: auto;
-            border-bottom-left-radius: 5px;
-        }
-
-        .message.system {
-            background: #fff3cd;
-            color: #856404;
-            text-align: center;
-            margin: 10px auto;
-            font-size: 0.9em;
-        }
-
-        .input-area {
-            padding: 10px;
-            background: #f8f9fa;
-            border-top: 1px solid #dee2e6;
-            position: sticky;
-            bottom: 0;
-        }
-
-        .input-group {
-            display: flex;
-            gap: 8px;
-        }
-
-        #userInput {
-            flex: 1;
-            padding: 12px;
-            border: 2px solid #dee2e6;
-            border-radius: 25px;
-            font-size: 16px;
-            font-family: inherit;
-        }
-
-        #userInput:focus {
-            outline: none;
-            border-color: #667eea;
-        }
-
-        .send-btn {
-            width: 50px;
-            height: 50px;
-            background: #667eea;
-            color: white;
-            border: none;
-            border-radius: 50%;
-            cursor: pointer;
-            font-size: 20px;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            transition: all 0.3s;
-        }
-
-        .send-btn:active {
-            transform: scale(0.95);
-        }
-
-        .send-btn:disabled {
-            background: #adb5bd;
-        }
-
-        .loading {
-            display: none;
-            text-align: center;
-            padding: 10px;
-            color: #667eea;
-        }
-
-        .loading.active {
-            display: block;
-        }
-
-        .tools-btn {
-            position: fixed;
-            bottom: 80px;
-            left: 20px;
-            width: 60px;
-            height: 60px;
-            background: #667eea;
-            color: white;
-            border: none;
-            border-radius: 50%;
-            font-size: 24px;
-            box-shadow: 0 4px 12px rgba(102, 126, 234, 0.4);
-            cursor: pointer;
-            z-index: 50;
-            transition: all 0.3s;
-        }
-
-        .tools-btn:active {
-            transform: scale(0.9);
-        }
-
-        .tools-menu {
-            position: fixed;
-            bottom: 0;
-            left: 0;
-            right: 0;
-            background: white;
-            border-radius: 20px 20px 0 0;
-            box-shadow: 0 -4px 20px rgba(0,0,0,0.1);
-            transform: translateY(100%);
-            transition: transform 0.3s;
-            z-index: 60;
-            max-height: 60vh;
-            overflow-y: auto;
-        }
-
-        .tools-menu.active {
-            transform: translateY(0);
-        }
-
-        .tools-menu h3 {
-            padding: 20px;
-            background: #f8f9fa;
-            border-radius: 20px 20px 0 0;
-            margin: 0;
-        }
-
-        .tool-item {
-            padding: 15px 20px;
-            border-bottom: 1px solid #f1f3f5;
-            cursor: pointer;
-            transition: background 0.2s;
-        }
-
-        .tool-item:active {
-            background: #f8f9fa;
-        }
-
-        @media (min-width: 768px) {
-            .app-container {
-                max-width: 768px;
-                border-radius: 20px;
-                margin: 20px auto;
-                min-height: calc(100vh - 40px);
-            }
-
-            .header {
-                border-radius: 20px 20px 0 0;
-            }
-        }
-
-        .install-prompt {
-            display: none;
-            position: fixed;
-            bottom: 80px;
-            left: 50%;
-            transform: translateX(-50%);
-            background: white;
-            padding: 15px 20px;
-            border-radius: 15px;
-            box-shadow: 0 4px 12px rgba(0,0,0,0.15);
-            z-index: 70;
-            max-width: 90%;
-        }
-
-        .install-prompt.active {
-            display: block;
-        }
-
-        .install-btn {
-            background: #667eea;
-            color: white;
-            border: none;
-            padding: 10px 20px;
-            border-radius: 8px;
-            margin: 5px;
-            cursor: pointer;
-        }
-    </style>
-</head>
-<body>
-    <div class="app-container">
-        <div class="header">
-            <h1>🤖 AI Workspace Pro</h1>
-            <p>مساحة عمل ذكية متقدمة</p>
-        </div>
-
-        <div class="model-selector" id="modelSelector">
-            <!-- Models will be loaded here -->
-        </div>
-
-        <div class="messages" id="messages">
-            <div class="message system">
-                مرحباً! اختر نموذج AI وابدأ المحادثة 🚀
-            </div>
-        </div>
-
-        <div class="loading" id="loading">
-            ⏳ جاري المعالجة...
-        </div>
-
-        <div class="input-area">
-            <div class="input-group">
-                <input
-                    type="text"
-                    id="userInput"
-                    placeholder="اكتب رسالتك هنا..."
-                    onkeypress="if(event.key==='Enter') sendMessage()"
-                >
-                <button class="send-btn" onclick="sendMessage()" id="sendBtn">
-                    ➤
-                </button>
-            </div>
-        </div>
-    </div>
-
-    <button class="tools-btn" onclick="toggleTools()">🛠️</button>
-
-    <div class="tools-menu" id="toolsMenu">
-        <h3>🛠️ الأدوات</h3>
-        <div class="tool-item" onclick="toolAction('search')">🔍 بحث في الإنترنت</div>
-        <div class="tool-item" onclick="toolAction('image')">🎨 توليد صورة</div>
-        <div class="tool-item" onclick="toolAction('voice')">🔊 تحويل لصوت</div>
-        <div class="tool-item" onclick="toolAction('compare')">📊 مقارنة نماذج</div>
-        <div class="tool-item" onclick="clearChat()">🗑️ مسح المحادثة</div>
-        <div class="tool-item" onclick="toggleTools()">❌ إغلاق</div>
-    </div>
-
-    <div class="install-prompt" id="installPrompt">
-        <p>📱 أضف التطبيق للشاشة الرئيسية؟</p>
-        <button class="install-btn" onclick="installApp()">تثبيت</button>
-        <button class="install-btn" style="background:#6c757d" onclick="hideInstallPrompt()">لاحقاً</button>
-    </div>
-
-    <script>
-        let currentModel = null;
-        let deferredPrompt = null;
-
-        // PWA Install
-        window.addEventListener('beforeinstallprompt', (e) => {
-            e.preventDefault();
-            deferredPrompt = e;
-            document.getElementById('installPrompt').classList.add('active');
-        });
-
-        function installApp() {
-            if (deferredPrompt) {
-                deferredPrompt.prompt();
-                deferredPrompt.userChoice.then((choiceResult) => {
-                    deferredPrompt = null;
-                    hideInstallPrompt();
-                });
-            }
-        }
-
-        function hideInstallPrompt() {
-            document.getElementById('installPrompt').classList.remove('active');
-        }
-
-        // Load models on start
-        window.onload = function() {
-            loadModels();
-        };
-
-        function loadModels() {
-            fetch('/api/models')
-                .then(r => r.json())
-                .then(data => {
-                    const selector = document.getElementById('modelSelector');
-                    selector.innerHTML = '';
-
-                    Object.keys(data.models).forEach(modelId => {
-                        const model = data.models[modelId];
-                        const btn = document.createElement('button');
-                        btn.className = 'model-btn';
-                        btn.textContent = model.name;
-                        btn.onclick = () => selectModel(modelId, btn);
-                        selector.appendChild(btn);
-                    });
-                });
-        }
-
-        function selectModel(modelId, btn) {
-            document.querySelectorAll('.model-btn').forEach(b => {
-                b.classList.remove('active');
-            });
-
-            btn.classList.add('active');
-            currentModel = modelId;
-
-            addMessage('system', `تم اختيار: ${btn.textContent}`);
-        }
-
-        function sendMessage() {
-            if (!currentModel) {
-                alert('اختر نموذج AI أولاً!');
-                return;
-            }
-
-            const input = document.getElementById('userInput');
-            const message = input.value.trim();
-
-            if (!message) return;
-
-            addMessage('user', message);
-            input.value = '';
-            setLoading(true);
-
-            fetch('/api/chat', {
-                method: 'POST',
-                headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify({
-                    model: currentModel,
-                    message: message
-                })
-            })
-            .then(r => r.json())
-            .then(data => {
-                setLoading(false);
-                addMessage('ai', data.response);
-            })
-            .catch(err => {
-                setLoading(false);
-                addMessage('system', '❌ حدث خطأ');
-            });
-        }
-
-        function addMessage(type, text) {
-            const messages = document.getElementById('messages');
-            const div = document.createElement('div');
-            div.className = `message ${type}`;
-            div.textContent = text;
-            messages.appendChild(div);
-            messages.scrollTop = messages.scrollHeight;
-        }
-
-        function setLoading(show) {
-            document.getElementById('loading').classList.toggle('active', show);
-            document.getElementById('sendBtn').disabled = show;
-        }
-
-        function toggleTools() {
-            document.getElementById('toolsMenu').classList.toggle('active');
-        }
-
-        function clearChat() {
-            document.getElementById('messages').innerHTML = '<div class="message system">تم مسح المحادثة ✨</div>';
-            toggleTools();
-        }
-
-        function toolAction(action) {
-            toggleTools();
-
-            if (action === 'search') {
-                const query = prompt('🔍 ما تريد البحث عنه؟');
-                if (query) {
-                    addMessage('user', `/search ${query}`);
-                    // Handle search...
-                }
-            } else if (action === 'image') {
-                const prompt = prompt('🎨 صف الصورة التي تريدها:');
-                if (prompt) {
-                    addMessage('user', `/image ${prompt}`);
-                    // Handle image generation...
-                }
-            } else if (action === 'voice') {
-                const text = prompt('📝 النص المراد تحويله لصوت:');
-                if (text) {
-                    addMessage('user', `/voice ${text}`);
-                    // Handle TTS...
-                }
-            } else if (action === 'compare') {
-                const question = prompt('❓ السؤال للمقارنة:');
-                if (question) {
-                    addMessage('user', `/compare ${question}`);
-                    // Handle comparison...
-                }
-            }
-        }
-
-        // Service Worker Registration
-        if ('serviceWorker' in navigator) {
-            navigator.serviceWorker.register('/sw.js');
-        }
-    </script>
-</body>
-</html>
-'''
-
-# Manifest JSON
-MANIFEST = '''{
-  "name": "AI Workspace Pro",
-  "short_name": "AI Workspace",
-  "description": "مساحة عمل ذكية متقدمة",
-  "start_url": "/",
-  "display": "standalone",
-  "background_color": "#667eea",
-  "theme_color": "#667eea",
-  "orientation": "portrait",
-  "icons": [
-    {
-      "src": "data:image/svg+xml,<svg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 100 100'><text y='.9em' font-size='90'>🤖</text></svg>",
-      "sizes": "512x512",
-      "type": "image/svg+xml"
-    }
-  ]
-}'''
-
-# Service Worker
-SERVICE_WORKER = '''
-self.addEventListener('install', (e) => {
-  e.waitUntil(
-    caches.open('ai-workspace-v1').then((cache) => {
-      return cache.addAll(['/']);
-    })
-  );
-});
-
-self.addEventListener('fetch', (e) => {
-  e.respondWith(
-    caches.match(e.request).then((response) => {
-      return response || fetch(e.request);
-    })
-  );
-});
-'''
-
 @app.before_request
 def init_workspace():
-    global workspace
+    global workspace, store
     if workspace is None:
         with workspace_lock:
             if workspace is None:
                 workspace = AIWorkspacePro()
+                if storage_backend() == 'sqlite':
+                    db = WorkspaceDB()
+                    store = SQLiteConversationStore(db, source='mobile', archive=ConversationArchive(),
+                                                    usage=UsageStats(db=db))
+
+@app.route('/api/ready')
+def ready():
+    # جاهز فقط بعد الإحماء الكامل (وضع ai_serve.py)؛ وضع التطوير الكسول لا يُعد جاهزاً
+    if warm_info is None:
+        return jsonify({'ready': False}), 503
+    return jsonify(dict(warm_info, ready=True))
+
+def static_response(asset):
+    """أصل ثابت مجهز مسبقاً بالضغط الذي يقبله المتصفح، أو 304 إن لم يتغير"""
+    status, body, headers = asset_response(
+        asset, request.headers.get('If-None-Match'), request.headers.get('Accept-Encoding')
+    )
+    return Response(body, status=status, headers=headers, content_type=asset['content_type'])
 
 @app.route('/')
 def index():
-    return render_template_string(HTML_TEMPLATE)
+    return static_response(MOBILE_INDEX)
 
 @app.route('/manifest.json')
 def manifest():
-    return MANIFEST, 200, {'Content-Type': 'application/json'}
+    return static_response(MANIFEST_ASSET)
 
 @app.route('/sw.js')
 def service_worker():
-    return SERVICE_WORKER, 200, {'Content-Type': 'application/javascript'}
+    return static_response(SERVICE_WORKER_ASSET)
 
 @app.route('/api/models')
 def get_models():
     return jsonify({'models': workspace.models})
 
+def chat_options(data):
+    """معاملات الطلب الاختيارية من جسم JSON (ValueError إن كانت غير صالحة)"""
+    options = {}
+    if data.get('max_tokens') is not None:
+        options['max_tokens'] = max(1, min(int(data['max_tokens']), 8192))
+    if data.get('temperature') is not None:
+        options['temperature'] = max(0.0, min(float(data['temperature']), 2.0))
+    return options
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     data = request.json
-    model = data.get('model')
     message = data.get('message')
 
-    workspace.current_model = model
-    response = workspace.chat(message)
+    # النموذج والمعاملات لهذا الطلب فقط (لا يُعدَّل workspace المشترك)
+    try:
+        model = workspace.resolve_model(data.get('model'))
+        options = chat_options(data)
+    except Exception as e:
+        return jsonify({'error': f"❌ {e}"}), 400
+    # سياق محادثة هذه الجلسة (لا يختلط تاريخ المستخدمين في العملية المشتركة)
+    chat_id = session.setdefault('chat_id', new_chat_id())
+    conversation = store.get(chat_id) if store is not None else None
+    response = workspace.chat(message, history=conversation['messages'] if conversation else [],
+                              conversation_id=chat_id, model=model, **options)
+
+    if store is not None and response and not response.startswith('❌'):
+        store.record_exchange(chat_id, message, response, model)
 
     return jsonify({'response': response})
 
+def sse(event, data):
+    """إطار Server-Sent Events واحد"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    # نفس /api/chat لكن كل قطعة من الرد تُرسل فور وصولها من المزود
+    data = request.json
+    message = data.get('message')
+    try:
+        model = workspace.resolve_model(data.get('model'))
+        options = chat_options(data)
+    except Exception as e:
+        return jsonify({'error': f"❌ {e}"}), 400
+    chat_id = session.setdefault('chat_id', new_chat_id())
+    conversation = store.get(chat_id) if store is not None else None
+    history = conversation['messages'] if conversation else []
+
+    def events():
+        parts = []
+        try:
+            for chunk in workspace.chat_stream(message, history=history, conversation_id=chat_id, model=model,
+                                               **options):
+                parts.append(chunk)
+                yield sse('token', {'text': chunk})
+        except Exception as e:
+            yield sse('error', {'error': f"❌ خطأ: {str(e)}"})
+            return
+        response = ''.join(parts)
+        if store is not None and response:
+            store.record_exchange(chat_id, message, response, model)
+        yield sse('done', {'model': model})
+
+    # بدون تخزين مؤقت في الوسطاء (nginx) حتى تصل القطع فوراً
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/conversations/search')
+def search_conversations():
+    query = request.args.get('q', '').strip()
+    try:
+        limit = max(1, min(int(request.args.get('limit', 20)), 100))
+    except ValueError:
+        return jsonify({'results': [], 'error': 'قيمة limit غير صالحة'}), 400
+    if store is None:
+        return jsonify({'results': [], 'error': 'البحث يتطلب التخزين في SQLite'}), 503
+    return jsonify({'results': store.search(query, limit)})
+
+@app.route('/api/conversations/<chat_id>/export')
+def export_conversation(chat_id):
+    # المحادثات المؤرشفة تُقرأ من الأرشيف المضغوط بشفافية
+    if store is None:
+        return jsonify({'error': 'التصدير يتطلب التخزين في SQLite'}), 503
+    conversation = store.get(chat_id)
+    if conversation is None:
+        return jsonify({'error': 'محادثة غير موجودة'}), 404
+    response = jsonify(dict(conversation, id=chat_id))
+    response.headers['Content-Disposition'] = f'attachment; filename="{chat_id}.json"'
+    return response
+
+@app.route('/api/costs')
+def costs():
+    # ?days=7&by=model|day|conversation من سجل التكلفة المشترك
+    by = request.args.get('by', 'model')
+    try:
+        days = min(max(int(request.args.get('days', 7)), 1), 366)
+        rows = workspace.ledger.aggregate(days, by)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'days': days, 'by': by, 'total': sum(row['cost'] for row in rows), 'rows': rows})
+
 if __name__ == '__main__':
+    if '--profile-startup' in sys.argv:
+        # نفس تهيئة أول طلب بدون تشغيل الخادم
+        profile_startup(init_workspace)
+        sys.exit(0)
+
     local_ip = get_local_ip()
     port = 5000
 
@@ -651,4 +228,5 @@ if __name__ == '__main__':
     print(f"   2. اضغط 'إضافة للشاشة الرئيسية'")
     print(f"\n⏹️  للإيقاف: Ctrl+C\n")
 
-    app.run(host='0.0.0.0', port=port, debug=False)
+    # الطلبات مستقلة عن بعضها فتعمل في خيوط متوازية
+    app.run(host='0.0.0.0', port=port, debug=False, threaded=True)
@@ -7,10 +7,18 @@
 
 import os
 import sys
-from openai import OpenAI
-import google.generativeai as genai
-from anthropic import Anthropic
-import requests
+import time
+from ai_lazy import STARTUP, LazyClients, timed_import
+from ai_transport import get_transport
+from ai_engine import AnthropicAdapter, GoogleAdapter, OpenAIAdapter, ProviderEngine
+from ai_compare import CompareView
+from ai_cache import ResponseCache
+from ai_context import ContextBuilder, context_budget
+from ai_flight import SingleFlight, flight_key
+from ai_ledger import Ledger
+from ai_metrics import CallMetrics
+from ai_router import model_tier
+from ai_profile import PROFILER, profile_startup
 import json
 from pathlib import Path
 import base64
@@ -23,10 +31,18 @@ class AIWorkspacePro:
         """تهيئة جميع النماذج والميزات"""
         print("🚀 جاري تحميل AI Workspace Pro...")
 
-        self.load_keys()
-        self.init_models()
-        self.init_search()
-        self.init_image_models()
+        with PROFILER.phase('load_keys'):
+            self.load_keys()
+        with PROFILER.phase('init_models'):
+            self.init_models()
+        with PROFILER.phase('init_search'):
+            self.init_search()
+            self.init_image_models()
+        with PROFILER.phase('response_cache'):
+            self.response_cache = ResponseCache()
+        # الطلبات المتطابقة المتزامنة (خيوط خادم الهاتف) تشترك في استدعاء واحد
+        self.flights = SingleFlight()
+        self.context = ContextBuilder(self.summarize_history)
         self.conversation = []
         self.current_model = None
 
@@ -65,8 +81,11 @@ class AIWorkspacePro:
         self.models = {}
 
         # OpenAI Models
+        # العملاء تُنشأ عند أول استخدام فقط
+        self.clients = LazyClients()
+
         if self.openai_key:
-            self.openai_client = OpenAI(api_key=self.openai_key)
+            self.clients.register('openai', lambda: timed_import('openai').OpenAI(api_key=self.openai_key))
             self.models.update({
                 'gpt-4': {'name': 'GPT-4', 'client': 'openai', 'desc': '🧠 الأقوى - للمهام المعقدة'},
                 'gpt-4-turbo': {'name': 'GPT-4 Turbo', 'client': 'openai', 'desc': '⚡ سريع وقوي'},
@@ -76,7 +95,7 @@ class AIWorkspacePro:
 
         # Google Models
         if self.google_key:
-            genai.configure(api_key=self.google_key)
+            self.clients.register('google', self._google_client)
             self.models.update({
                 'gemini-pro': {'name': 'Gemini Pro', 'client': 'google', 'desc': '🌟 قوي ومتعدد الوسائط'},
                 'gemini-1.5-pro': {'name': 'Gemini 1.5 Pro', 'client': 'google', 'desc': '🚀 الأحدث والأقوى'},
@@ -85,13 +104,35 @@ class AIWorkspacePro:
 
         # Anthropic Models
         if self.anthropic_key:
-            self.claude_client = Anthropic(api_key=self.anthropic_key)
+            self.clients.register('anthropic', lambda: timed_import('anthropic').Anthropic(api_key=self.anthropic_key))
             self.models.update({
                 'claude-3-opus-20240229': {'name': 'Claude 3 Opus', 'client': 'anthropic', 'desc': '👑 الأذكى'},
                 'claude-3-5-sonnet-20241022': {'name': 'Claude 3.5 Sonnet', 'client': 'anthropic', 'desc': '⭐ متوازن ومتطور'},
                 'claude-3-haiku-20240307': {'name': 'Claude 3 Haiku', 'client': 'anthropic', 'desc': '💨 سريع وفعال'},
             })
 
+        # محرك المزودين غير المتزامن (للمقارنة المتوازية) وسجل التكلفة والقياسات
+        self.ledger = Ledger()
+        self.call_metrics = CallMetrics(Path.home() / "ai_workspace_metrics.json")
+        self.engine = ProviderEngine(
+            {'openai': self.openai_key, 'google': self.google_key, 'anthropic': self.anthropic_key},
+            self.models, ledger=self.ledger, metrics=self.call_metrics
+        )
+
+    def _google_client(self):
+        """إعداد مكتبة Google عند أول استخدام"""
+        genai = timed_import('google.generativeai')
+        genai.configure(api_key=self.google_key)
+        return genai
+
+    @property
+    def openai_client(self):
+        return self.clients['openai']
+
+    @property
+    def claude_client(self):
+        return self.clients['anthropic']
+
     def init_search(self):
         """تهيئة محركات البحث"""
         self.search_engines = {}
@@ -154,108 +195,243 @@ class AIWorkspacePro:
 
             print("❌ اختيار غير صحيح، حاول مرة أخرى")
 
-    def chat(self, message, use_search=False, stream=False):
-        """الدردشة مع النموذج"""
-        if not self.current_model:
-            print("❌ لم يتم اختيار نموذج!")
-            return None
-
+    def summarize_history(self, prompt, max_tokens):
+        """تلخيص أدوار قديمة بنموذج سريع إن وُجد (يستدعيه ContextBuilder)"""
+        model_id = next(
+            (m for m, info in self.models.items() if model_tier(m, info) == 'fast'), self.current_model
+        )
+        messages = [{"role": "user", "content": prompt}]
+        return self.engine.chat(model_id, messages, max_tokens=max_tokens)['text']
+
+    def resolve_model(self, model=None):
+        """معرف النموذج للطلب: model إن مُرر وإلا النموذج الحالي للوضع التفاعلي"""
+        model_id = model or self.current_model
+        if not model_id:
+            raise Exception("لم يتم اختيار نموذج")
+        if model_id not in self.models:
+            raise Exception(f"النموذج {model_id} غير متوفر")
+        return model_id
+
+    def prepare_messages(self, model_id, message, use_search=False, history=None, system=None, max_tokens=None):
+        """(السؤال بعد إضافة البحث، رسائل الطلب، max_tokens، هل هو الوضع التفاعلي)"""
         # إضافة نتائج البحث
         if use_search:
             search_results = self.search(message)
             if search_results:
                 message = f"{message}\n\nنتائج البحث:\n{search_results}"
 
-        model_info = self.models[self.current_model]
-        client_type = model_info['client']
+        model_info = self.models[model_id]
+        if max_tokens is None and model_info['client'] == 'anthropic':
+            max_tokens = 4096
 
-        try:
-            # OpenAI
-            if client_type == 'openai':
-                if stream:
-                    return self._chat_openai_stream(message)
-                else:
-                    response = self.openai_client.chat.completions.create(
-                        model=self.current_model,
-                        messages=[{"role": "user", "content": message}]
-                    )
-                    return response.choices[0].message.content
-
-            # Google Gemini
-            elif client_type == 'google':
-                model = genai.GenerativeModel(self.current_model)
-                if stream:
-                    return self._chat_gemini_stream(model, message)
-                else:
-                    response = model.generate_content(message)
-                    return response.text
-
-            # Anthropic Claude
-            elif client_type == 'anthropic':
-                if stream:
-                    return self._chat_claude_stream(message)
-                else:
-                    response = self.claude_client.messages.create(
-                        model=self.current_model,
-                        max_tokens=4096,
-                        messages=[{"role": "user", "content": message}]
-                    )
-                    return response.content[0].text
+        # سياق المحادثة ضمن ميزانية النموذج
+        interactive = history is None
+        if interactive:
+            history = self.conversation
+        messages = self.context.build(
+            history, message, context_budget(model_id, model_info, max_tokens), system=system
+        )
+        return message, messages, max_tokens, interactive
+
+    @staticmethod
+    def request_params(max_tokens=None, temperature=None):
+        """معاملات التوليد المحددة فقط (الباقي على افتراضي المزود)"""
+        params = {}
+        if max_tokens is not None:
+            params['max_tokens'] = max_tokens
+        if temperature is not None:
+            params['temperature'] = temperature
+        return params
+
+    def chat(self, message, use_search=False, stream=False, use_cache=True, history=None, system=None,
+             conversation_id=None, model=None, max_tokens=None, temperature=None):
+        """الدردشة مع النموذج
+
+        history: رسائل المحادثة السابقة ({'role', 'content'}). إن لم تُمرر يُستخدم
+        تاريخ الوضع التفاعلي self.conversation ويُضاف إليه السؤال والرد.
+        system: محتوى ثابت كبير (ملف مثلاً) يُرسل أولاً ليُخزن لدى المزود.
+        conversation_id: معرف المحادثة في سجل التكلفة.
+        model/max_tokens/temperature: لهذا الطلب فقط؛ مع history لا يُلمس أي حالة
+        مشتركة فيصح الاستدعاء من عدة خيوط (خادما الويب).
+        stream=True يطبع الرد قطعة قطعة (انظر chat_stream).
+        """
+        if not (model or self.current_model):
+            print("❌ لم يتم اختيار نموذج!")
+            return None
 
+        try:
+            model_id = self.resolve_model(model)
         except Exception as e:
             return f"❌ خطأ: {str(e)}"
 
-    def _chat_openai_stream(self, message):
-        """دردشة OpenAI مع streaming"""
-        print(f"\n🤖 {self.models[self.current_model]['name']}: ", end='', flush=True)
+        if stream:
+            print(f"\n🤖 {self.models[model_id]['name']}: ", end='', flush=True)
+            result = ""
+            try:
+                for chunk in self.chat_stream(message, use_search, history, system, conversation_id,
+                                              model_id, max_tokens, temperature):
+                    print(chunk, end='', flush=True)
+                    result += chunk
+            except Exception as e:
+                result = f"❌ خطأ: {str(e)}"
+                print(result, end='')
+            print()  # newline
+            return result
 
-        stream = self.openai_client.chat.completions.create(
-            model=self.current_model,
-            messages=[{"role": "user", "content": message}],
-            stream=True
+        message, messages, max_tokens, interactive = self.prepare_messages(
+            model_id, message, use_search, history, system, max_tokens
         )
+        params = self.request_params(max_tokens, temperature)
+
+        # ذاكرة الردود (لا تنطبق على البث المباشر)
+        cache_key = None
+        if use_cache:
+            cache_key = ResponseCache.make_key(model_id, messages, max_tokens, temperature)
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                if interactive:
+                    self.remember(message, cached)
+                return cached
 
-        full_response = ""
-        for chunk in stream:
-            if chunk.choices[0].delta.content:
-                content = chunk.choices[0].delta.content
-                print(content, end='', flush=True)
-                full_response += content
-
-        print()  # newline
-        return full_response
+        try:
+            result, shared = self.flights.call(
+                flight_key(model_id, messages, params),
+                lambda: self._complete(model_id, messages, params, conversation_id),
+            )
+        except Exception as e:
+            return f"❌ خطأ: {str(e)}"
+        if result is None:
+            return None
+        if shared:
+            self.call_metrics.record_coalesced(model_id)
+
+        # الطلب الذي استدعى المزود فقط يخزن الرد
+        if cache_key and not shared:
+            self.response_cache.set(cache_key, model_id, result)
+        if interactive:
+            self.remember(message, result)
+        return result
+
+    def _complete(self, model_id, messages, params, conversation_id=None):
+        """استدعاء المزود الفعلي مع تسجيل التكلفة (الأخطاء تُرفع، None لعميل غير مدعوم)"""
+        client_type = self.models[model_id]['client']
+        usage = None
+        start = time.perf_counter()
+        # OpenAI
+        if client_type == 'openai':
+            response = self.openai_client.chat.completions.create(
+                model=model_id,
+                messages=messages,
+                **params
+            )
+            result = response.choices[0].message.content
+            usage = OpenAIAdapter._usage(response.usage)
+
+        # Google Gemini
+        elif client_type == 'google':
+            system, contents = GoogleAdapter.to_contents(messages)
+            gemini = self.clients['google'].GenerativeModel(model_id, system_instruction=system)
+            response = gemini.generate_content(contents, generation_config=GoogleAdapter._config(params))
+            result = response.text
+            usage = GoogleAdapter._usage(response)
+
+        # Anthropic Claude
+        elif client_type == 'anthropic':
+            response = self.claude_client.messages.create(
+                **AnthropicAdapter._request(model_id, messages, params)
+            )
+            result = response.content[0].text
+            usage = AnthropicAdapter._usage(response.usage)
 
-    def _chat_gemini_stream(self, model, message):
-        """دردشة Gemini مع streaming"""
-        print(f"\n🤖 {self.models[self.current_model]['name']}: ", end='', flush=True)
+        else:
+            return None
 
-        response = model.generate_content(message, stream=True)
+        self.ledger.record_chat(model_id, messages, result, usage, time.perf_counter() - start, conversation_id)
+        return result
 
-        full_response = ""
-        for chunk in response:
-            if chunk.text:
-                print(chunk.text, end='', flush=True)
-                full_response += chunk.text
+    def chat_stream(self, message, use_search=False, history=None, system=None, conversation_id=None,
+                    model=None, max_tokens=None, temperature=None):
+        """مولّد قطع الرد فور وصولها من المزود (للطرفية ونقطة SSE)
 
-        print()
-        return full_response
+        الأخطاء تُرفع كاستثناء. السجل يُكتب حتى لو توقف المستهلك قبل النهاية،
+        والرد يُضاف لتاريخ الوضع التفاعلي إن اكتمل فقط. المنضم لبث مطابق جارٍ
+        يبدأ بالقطع التي وصلت ثم يتابع معه.
+        """
+        model_id = self.resolve_model(model)
+        message, messages, max_tokens, interactive = self.prepare_messages(
+            model_id, message, use_search, history, system, max_tokens
+        )
+        params = self.request_params(max_tokens, temperature)
+        chunks, shared = self.flights.stream(
+            flight_key(model_id, messages, params),
+            lambda: self._stream_chunks(model_id, messages, params, conversation_id),
+        )
+        if shared:
+            self.call_metrics.record_coalesced(model_id)
+
+        parts = []
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+        if interactive:
+            self.remember(message, ''.join(parts))
+
+    def _stream_chunks(self, model_id, messages, params, conversation_id=None):
+        """بث المزود الفعلي؛ البث لا يرجع استهلاك التوكنات فيُقدّر محلياً في السجل"""
+        client_type = self.models[model_id]['client']
+        if client_type == 'openai':
+            chunks = self._chat_openai_stream(model_id, messages, params)
+        elif client_type == 'google':
+            system, contents = GoogleAdapter.to_contents(messages)
+            gemini = self.clients['google'].GenerativeModel(model_id, system_instruction=system)
+            chunks = self._chat_gemini_stream(gemini, contents, params)
+        elif client_type == 'anthropic':
+            chunks = self._chat_claude_stream(model_id, messages, params)
+        else:
+            raise Exception(f"نوع العميل غير مدعوم: {client_type}")
+
+        parts = []
+        start = time.perf_counter()
+        try:
+            for chunk in chunks:
+                parts.append(chunk)
+                yield chunk
+        finally:
+            if parts:
+                self.ledger.record_chat(model_id, messages, ''.join(parts), None, time.perf_counter() - start,
+                                        conversation_id)
+
+    def remember(self, message, response):
+        """إضافة سؤال ورده لتاريخ الوضع التفاعلي"""
+        self.conversation.append({"role": "user", "content": message})
+        self.conversation.append({"role": "assistant", "content": response})
+
+    def _chat_openai_stream(self, model_id, messages, params=None):
+        """بث OpenAI: مولّد قطع النص"""
+        stream = self.openai_client.chat.completions.create(
+            model=model_id,
+            messages=messages,
+            stream=True,
+            **(params or {})
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
 
-    def _chat_claude_stream(self, message):
-        """دردشة Claude مع streaming"""
-        print(f"\n🤖 {self.models[self.current_model]['name']}: ", end='', flush=True)
+    def _chat_gemini_stream(self, model, contents, params=None):
+        """بث Gemini: مولّد قطع النص"""
+        for chunk in model.generate_content(contents, generation_config=GoogleAdapter._config(params or {}),
+                                            stream=True):
+            if chunk.text:
+                yield chunk.text
 
-        full_response = ""
+    def _chat_claude_stream(self, model_id, messages, params=None):
+        """بث Claude: مولّد قطع النص"""
         with self.claude_client.messages.stream(
-            model=self.current_model,
-            max_tokens=4096,
-            messages=[{"role": "user", "content": message}]
+            **AnthropicAdapter._request(model_id, messages, params or {'max_tokens': 4096})
         ) as stream:
             for text in stream.text_stream:
-                print(text, end='', flush=True)
-                full_response += text
-
-        print()
-        return full_response
+                yield text
 
     def search(self, query):
         """البحث في الإنترنت"""
@@ -269,11 +445,8 @@ class AIWorkspacePro:
                     'X-API-KEY': self.serper_key,
                     'Content-Type': 'application/json'
                 }
-                response = requests.post(url, headers=headers, json={'q': query}, timeout=10)
-                data = response.json()
-
-                for item in data.get('organic', [])[:5]:
-                    results.append(f"📄 {item['title']}\n   {item['snippet']}\n   🔗 {item['link']}")
+                response = get_transport().post(url, headers=headers, json={'q': query}, timeout=10)
+                results = self.serper_results(response.json())
             except:
                 pass
 
@@ -291,6 +464,13 @@ class AIWorkspacePro:
 
         return "\n\n".join(results) if results else None
 
+    @staticmethod
+    def serper_results(data):
+        """أسطر النتائج من رد Serper (يستخدمها وضع ASGI أيضاً)"""
+        return [
+            f"📄 {item['title']}\n   {item['snippet']}\n   🔗 {item['link']}" for item in data.get('organic', [])[:5]
+        ]
+
     def generate_image(self, prompt, model='dall-e-3', size='1024x1024'):
         """توليد صورة"""
         if not self.openai_key:
@@ -299,18 +479,21 @@ class AIWorkspacePro:
         try:
             print(f"🎨 جاري توليد الصورة...")
 
+            quality = "standard" if model == "dall-e-2" else "hd"
+            start = time.perf_counter()
             response = self.openai_client.images.generate(
                 model=model,
                 prompt=prompt,
                 size=size,
-                quality="standard" if model == "dall-e-2" else "hd",
+                quality=quality,
                 n=1,
             )
+            self.ledger.record(f"{model}:{quality}", 'image', units=1, latency=time.perf_counter() - start)
 
             image_url = response.data[0].url
 
             # حفظ الصورة
-            img_response = requests.get(image_url)
+            img_response = get_transport().get(image_url)
             filename = f"generated_image_{hash(prompt)}.png"
 
             with open(filename, 'wb') as f:
@@ -329,11 +512,14 @@ class AIWorkspacePro:
         try:
             print(f"🔊 جاري تحويل النص لكلام...")
 
+            start = time.perf_counter()
             response = self.openai_client.audio.speech.create(
                 model="tts-1",
                 voice=voice,
                 input=text
             )
+            # تسعير الصوت بعدد الأحرف
+            self.ledger.record("tts-1", 'audio', units=len(text), latency=time.perf_counter() - start)
 
             filename = f"speech_{hash(text)}.mp3"
             response.stream_to_file(filename)
@@ -355,6 +541,7 @@ class AIWorkspacePro:
             with open(image_path, "rb") as image_file:
                 base64_image = base64.b64encode(image_file.read()).decode('utf-8')
 
+            start = time.perf_counter()
             response = self.openai_client.chat.completions.create(
                 model="gpt-4o",
                 messages=[
@@ -373,6 +560,11 @@ class AIWorkspacePro:
                 ],
                 max_tokens=1000
             )
+            usage = OpenAIAdapter._usage(response.usage) or {}
+            self.ledger.record(
+                "gpt-4o", 'vision', usage.get('prompt_tokens'), usage.get('completion_tokens'),
+                usage.get('cached_tokens') or 0, latency=time.perf_counter() - start,
+            )
 
             return response.choices[0].message.content
 
@@ -406,25 +598,25 @@ class AIWorkspacePro:
         except Exception as e:
             return f"❌ خطأ: {str(e)}"
 
+    @staticmethod
+    def file_prefix(file_path, content):
+        """محتوى الملف كمقدمة ثابتة: نفس النص لكل طلب عن الملف فيُقرأ من ذاكرة المزود"""
+        return f"الملف: {Path(file_path).name}\n\n```\n{content}\n```"
+
     def analyze_code(self, file_path):
         """تحليل كود"""
         content = self.read_file(file_path)
         if content.startswith("❌"):
             return content
 
-        prompt = f"""حلل هذا الكود بشكل شامل:
+        prompt = """حلل هذا الكود بشكل شامل:
 
 1. ملخص عن وظيفة الكود
 2. المشاكل والأخطاء المحتملة
 3. اقتراحات للتحسين
 4. أفضل الممارسات
-
-الكود:
-```
-{content}
-```
 """
-        return self.chat(prompt)
+        return self.chat(prompt, system=self.file_prefix(file_path, content))
 
     def edit_code(self, file_path, instruction):
         """تعديل كود"""
@@ -435,15 +627,10 @@ class AIWorkspacePro:
         prompt = f"""عدّل هذا الكود حسب التعليمات التالية:
 {instruction}
 
-الكود الحالي:
-```
-{content}
-```
-
 أعطني الكود المعدّل فقط، بدون شرح إضافي.
 """
 
-        new_code = self.chat(prompt)
+        new_code = self.chat(prompt, system=self.file_prefix(file_path, content))
 
         # حفظ نسخة احتياطية
         backup_path = f"{file_path}.backup"
@@ -453,35 +640,46 @@ class AIWorkspacePro:
         result = self.write_file(file_path, new_code)
         return f"{result}\n✅ نسخة احتياطية: {backup_path}"
 
-    def compare_models(self, question):
-        """مقارنة إجابات النماذج المختلفة"""
-        print("\n" + "="*70)
-        print("🔄 جاري المقارنة بين النماذج...")
-        print("="*70 + "\n")
-
-        original_model = self.current_model
-        results = {}
-
-        # جرب مع كل نموذج
-        for model_id, info in list(self.models.items())[:3]:  # أول 3 نماذج
-            self.current_model = model_id
-            print(f"⏳ {info['name']}...")
+    def compare_candidates(self):
+        """النماذج الافتراضية للمقارنة: AI_COMPARE_MODELS، وإلا أسرع نموذج من كل مزود
+
+        مقارنة كل النماذج تعني عدة نماذج متقدمة مكلفة لكل سؤال.
+        """
+        configured = [m.strip() for m in os.getenv('AI_COMPARE_MODELS', '').split(',') if m.strip()]
+        if configured:
+            return [m for m in configured if m in self.models]
+        picked = {}
+        for model_id, info in self.models.items():
+            current = picked.get(info['client'])
+            if current is None or (model_tier(model_id, info) == 'fast'
+                                   and model_tier(current, self.models[current]) != 'fast'):
+                picked[info['client']] = model_id
+        return list(picked.values())
+
+    def compare_models(self, question, model_ids=None, deadline=60, max_tokens=None):
+        """مقارنة إجابات النماذج المختلفة بالتوازي مع عرض مباشر
+
+        max_tokens محدود بـ AI_COMPARE_MAX_TOKENS (1024 افتراضياً) لكل نموذج.
+        """
+        model_ids = model_ids or self.compare_candidates()
+        if not model_ids:
+            raise Exception("لا توجد نماذج للمقارنة")
+        max_tokens = max_tokens or int(os.getenv('AI_COMPARE_MAX_TOKENS', 1024))
 
-            response = self.chat(question)
-            results[info['name']] = response
-
-        # عرض النتائج
         print("\n" + "="*70)
-        print("📊 النتائج:")
+        print(f"🔄 جاري المقارنة بين {len(model_ids)} نماذج بالتوازي...")
         print("="*70 + "\n")
 
-        for model_name, response in results.items():
-            print(f"🤖 {model_name}:")
-            print(f"{response[:200]}...")
-            print("\n" + "-"*70 + "\n")
-
-        # إرجاع النموذج الأصلي
-        self.current_model = original_model
+        view = CompareView({model_id: self.models[model_id]['name'] for model_id in model_ids})
+        results = self.engine.fanout(
+            model_ids,
+            [{"role": "user", "content": question}],
+            deadline=deadline,
+            on_token=view.on_token,
+            max_tokens=max_tokens
+        )
+        view.finish(results)
+        return results
 
     def interactive_mode(self):
         """الوضع التفاعلي المحسّن"""
@@ -503,6 +701,7 @@ class AIWorkspacePro:
   /write      - كتابة ملف
   /analyze    - تحليل كود
   /edit       - تعديل كود
+  /startup    - تكلفة تحميل المكتبات
   /help       - المساعدة
   /exit       - خروج
 
@@ -597,6 +796,9 @@ class AIWorkspacePro:
                         result = self.edit_code(file_path, instruction)
                         print(f"\n{result}")
 
+                    elif cmd == '/startup':
+                        STARTUP.print_report()
+
                     elif cmd == '/help':
                         print("""
 🆘 دليل الاستخدام:
@@ -605,7 +807,7 @@ class AIWorkspacePro:
   /image      - توليد صورة (DALL-E 3)
   /vision     - تحليل صورة (GPT-4 Vision)
   /voice      - تحويل نص لكلام
-  /compare    - مقارنة بين 3 نماذج
+  /compare    - مقارنة جميع النماذج بالتوازي
   /stream     - عرض الرد مباشرة أثناء الكتابة
 
 📋 أوامر أساسية:
@@ -643,6 +845,10 @@ def main():
     except:
         pass
 
+    if '--profile-startup' in sys.argv:
+        profile_startup(AIWorkspacePro)
+        return
+
     workspace = AIWorkspacePro()
     workspace.interactive_mode()
 
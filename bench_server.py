@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+📶 قياس سعة الخادم مع اتصالات متزامنة
+يشغّل الخادم مع نموذج 'echo' (يرد بعد AI_ECHO_DELAY ثانية بدون شبكة) ويرسل
+N طلب /api/chat متزامن، ثم يعرض المعدل والزمن وذروة الخيوط والذاكرة
+
+الخوادم:
+    asgi     ai_asgi.py web --builtin (حلقة أحداث واحدة)
+    threads  خيط لكل طلب فوق AIWorkspace.chat مثل خادم Flask مع threaded=True
+    flask    ai_workspace_web.py نفسه (إن كان Flask مثبتاً)
+
+الاستخدام:
+    python3 bench_server.py                          # asgi و threads مع 50/200/1000 اتصال
+    python3 bench_server.py -c 100 -c 2000 --delay 2 asgi
+    python3 bench_server.py --url http://host:5000   # خادم يعمل مسبقاً
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from bench_startup import percentile
+
+HERE = Path(__file__).parent
+SERVERS = ('asgi', 'threads', 'flask')
+
+# خادم الخيوط: نفس مسار /api/chat في ai_workspace_web.py بدون Flask
+THREADS_SERVER = '''
+import json, sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from ai_workspace import AIWorkspace
+
+workspace = AIWorkspace()
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        data = json.loads(self.rfile.read(int(self.headers.get('content-length', 0))) or b'{}')
+        model_id = workspace.resolve_model(data.get('model'))
+        body = json.dumps({'response': workspace.chat(data.get('message'), model=model_id),
+                           'model': model_id}).encode()
+        self.send_response(200)
+        self.send_header('content-type', 'application/json')
+        self.send_header('content-length', str(len(body)))
+        self.send_header('connection', 'close')
+        self.end_headers()
+        self.wfile.write(body)
+        self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+ThreadingHTTPServer.request_queue_size = 128
+ThreadingHTTPServer.daemon_threads = True
+ThreadingHTTPServer(('127.0.0.1', int(sys.argv[1])), Handler).serve_forever()
+'''
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def raise_fd_limit():
+    """كل اتصال واصف ملف في العميل والخادم"""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return hard
+
+
+def start_server(kind, port, delay, home):
+    env = dict(os.environ, HOME=home, AI_ECHO_MODEL='1', AI_ECHO_DELAY=str(delay), PYTHONUNBUFFERED='1')
+    if kind == 'asgi':
+        command = [sys.executable, str(HERE / 'ai_asgi.py'), 'web', '--builtin', '--host', '127.0.0.1',
+                   '--port', str(port)]
+    elif kind == 'threads':
+        command = [sys.executable, '-c', THREADS_SERVER, str(port)]
+    else:
+        command = [sys.executable, '-c', 'import sys, ai_workspace_web as w; '
+                   'w.app.run(host="127.0.0.1", port=int(sys.argv[1]), threaded=True)', str(port)]
+    process = subprocess.Popen(command, cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(process.stderr.read().decode('utf-8', 'replace').strip().splitlines()[-1])
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("الخادم لم يبدأ خلال 30 ثانية")
+
+
+def process_status(pid):
+    """(الخيوط، RSS بالميغابايت) من /proc، أو (None, None) خارج لينكس"""
+    try:
+        fields = dict(line.split(':', 1) for line in Path(f"/proc/{pid}/status").read_text().splitlines())
+    except (OSError, ValueError):
+        return None, None
+    return int(fields['Threads']), int(fields['VmRSS'].split()[0]) / 1024
+
+
+async def request(host, port, body, timeout):
+    """طلب POST واحد على اتصال جديد؛ يرجع الزمن أو None عند الفشل"""
+    start = time.perf_counter()
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        writer.write(b'POST /api/chat HTTP/1.1\r\nhost: %s\r\ncontent-type: application/json\r\n'
+                     b'content-length: %d\r\nconnection: close\r\n\r\n%s'
+                     % (host.encode(), len(body), body))
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), timeout - (time.perf_counter() - start))
+        writer.close()
+    except (OSError, asyncio.TimeoutError):
+        return None
+    return time.perf_counter() - start if response.startswith(b'HTTP/1.1 200') else None
+
+
+async def load(host, port, concurrency, timeout, pid=None):
+    body = json.dumps({'message': 'ping', 'model': 'echo'}).encode()
+    peak = {'threads': 0, 'rss_mb': 0.0}
+
+    async def sample():
+        while True:
+            threads, rss = process_status(pid)
+            if threads is not None:
+                peak['threads'] = max(peak['threads'], threads)
+                peak['rss_mb'] = max(peak['rss_mb'], rss)
+            await asyncio.sleep(0.05)
+
+    sampler = asyncio.ensure_future(sample()) if pid else None
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(request(host, port, body, timeout) for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+    if sampler:
+        sampler.cancel()
+    ok = [latency * 1000 for latency in latencies if latency is not None]
+    result = {'concurrency': concurrency, 'ok': len(ok), 'errors': concurrency - len(ok),
+              'rps': len(ok) / wall, 'wall_s': wall}
+    if ok:
+        result.update(p50_ms=percentile(ok, 0.5), p95_ms=percentile(ok, 0.95), max_ms=max(ok))
+    if pid:
+        result.update(peak)
+    return result
+
+
+def print_result(result):
+    latency = (f"{result['p50_ms']:>9.0f}{result['p95_ms']:>9.0f}{result['max_ms']:>9.0f}"
+               if result['ok'] else f"{'—':>9}{'—':>9}{'—':>9}")
+    process = (f"{result['threads']:>8}{result['rss_mb']:>9.1f}" if 'threads' in result else '')
+    print(f"  {result['concurrency']:>8}{result['ok']:>7}{result['errors']:>7}{result['rps']:>9.1f}{latency}{process}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='قياس سعة الخادم مع اتصالات متزامنة')
+    parser.add_argument('servers', nargs='*', default=['asgi', 'threads'], help=f"من {', '.join(SERVERS)}")
+    parser.add_argument('-c', '--concurrency', type=int, action='append', help='عدد الاتصالات (يتكرر)')
+    parser.add_argument('--delay', type=float, default=1.0, help='زمن رد نموذج echo بالثواني')
+    parser.add_argument('--rounds', type=int, default=1, help='تكرار كل مستوى')
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--url', help='قياس خادم يعمل مسبقاً (مع AI_ECHO_MODEL=1)')
+    parser.add_argument('--json', help='حفظ النتائج في ملف JSON')
+    args = parser.parse_args()
+
+    unknown = set(args.servers) - set(SERVERS)
+    if unknown:
+        parser.error(f"خادم غير معروف: {', '.join(sorted(unknown))}")
+    levels = args.concurrency or [50, 200, 1000]
+    limit = raise_fd_limit()
+    if max(levels) * 2 + 64 > limit:
+        print(f"⚠️ حد واصفات الملفات {limit} قد لا يكفي {max(levels)} اتصال")
+
+    results = {}
+    for name in [args.url] if args.url else args.servers:
+        process = None
+        if args.url:
+            address = args.url.split('://', 1)[-1].rstrip('/')
+            host, _, port = address.partition(':')
+            port = int(port or 80)
+        else:
+            host, port = '127.0.0.1', free_port()
+            try:
+                process = start_server(name, port, args.delay, tempfile.mkdtemp(prefix='bench_server_'))
+            except RuntimeError as e:
+                print(f"❌ {name}: {e}")
+                continue
+
+        print(f"\n📶 {name} (رد echo بعد {args.delay} ث)")
+        print(f"  {'اتصالات':>8}{'نجح':>7}{'فشل':>7}{'طلب/ث':>9}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}"
+              + (f"{'خيوط':>8}{'RSS MB':>9}" if process else ''))
+        try:
+            for concurrency in levels:
+                for _ in range(args.rounds):
+                    result = asyncio.run(load(host, port, concurrency, args.timeout,
+                                              process.pid if process else None))
+                    results.setdefault(name, []).append(result)
+                    print_result(result)
+        finally:
+            if process:
+                process.terminate()
+                process.wait()
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 حُفظت النتائج في {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+⏱️ قياس زمن الإقلاع المتكرر
+تشغيل --profile-startup عدة مرات لكل نقطة دخول وعرض الوسيط و p95
+
+الاستخدام:
+    python3 bench_startup.py                      # جميع نقاط الدخول، 10 مرات
+    python3 bench_startup.py -n 20 ai_workspace_fixed.py
+    python3 bench_startup.py --json results.json
+"""
+
+import argparse
+import json
+import statistics
+from pathlib import Path
+
+from ai_profile import run_profile
+
+ENTRY_POINTS = [
+    'ai_workspace_fixed.py',
+    'ai_phone_fixed.py',
+    'ai_workspace_pro.py',
+    'ai_workspace_web.py',
+    'ai_workspace_mobile.py',
+]
+
+
+def percentile(values, q):
+    """النسبة المئوية بالاستيفاء الخطي"""
+    values = sorted(values)
+    position = (len(values) - 1) * q
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+def collect(script, runs):
+    """تشغيل نقطة الدخول runs مرة وجمع كل مقياس في قائمة"""
+    metrics = {}
+    for _ in range(runs):
+        report = run_profile(script)
+        samples = {'process_wall': report['process_wall'], 'import_total': report['import_total']}
+        samples.update((phase['name'], phase['seconds']) for phase in report['phases'])
+        for name, seconds in samples.items():
+            metrics.setdefault(name, []).append(seconds * 1000)
+        if report['rss_kb']:
+            metrics.setdefault('rss_mb', []).append(report['rss_kb'] / 1024)
+    return metrics
+
+
+def summarize(metrics):
+    return {
+        name: {'median': statistics.median(values), 'p95': percentile(values, 0.95), 'runs': len(values)}
+        for name, values in metrics.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='قياس زمن الإقلاع المتكرر')
+    parser.add_argument('scripts', nargs='*', default=ENTRY_POINTS)
+    parser.add_argument('-n', '--runs', type=int, default=10)
+    parser.add_argument('--json', help='حفظ النتائج في ملف JSON')
+    args = parser.parse_args()
+
+    here = Path(__file__).parent
+    results = {}
+    for script in args.scripts:
+        path = Path(script) if Path(script).exists() else here / script
+        try:
+            results[path.name] = summarize(collect(str(path), args.runs))
+        except RuntimeError as e:
+            print(f"❌ {path.name}: {e}")
+            continue
+
+        print(f"\n📊 {path.name} ({args.runs} مرات)")
+        print(f"  {'المقياس':<24}{'الوسيط':>12}{'p95':>12}")
+        for name, summary in results[path.name].items():
+            unit = 'MB' if name == 'rss_mb' else 'ms'
+            print(f"  {name:<24}{summary['median']:>9.1f} {unit}{summary['p95']:>9.1f} {unit}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding='utf-8')
+        print(f"\n✅ تم حفظ النتائج: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def home(tmp_path, monkeypatch):
+    """كل ملفات الحالة (~/ai_workspace_*) في مجلد مؤقت لكل اختبار"""
+    monkeypatch.setenv('HOME', str(tmp_path))
+    return tmp_path
@@ -0,0 +1,85 @@
+import os
+import time
+
+import pytest
+
+from ai_archive import INDEX_NAME, ConversationArchive
+from ai_conversations import ConversationStore
+from ai_storage import SQLiteConversationStore, WorkspaceDB
+
+OLD = time.time() - 90 * 86400
+
+
+def conversation(title, *contents):
+    return {'title': title, 'timestamp': '2024-01-01',
+            'messages': [{'role': 'user', 'content': content} for content in contents]}
+
+
+def test_round_trip_and_random_access(tmp_path):
+    archive = ConversationArchive(tmp_path / 'archive')
+    archive.put_many([(f"c{i}", conversation(f"محادثة {i}", 'نص ' * i), OLD) for i in range(5)])
+    assert archive.get('c3') == conversation('محادثة 3', 'نص ' * 3)
+    assert archive.meta('c2')['messages'] == 1
+    assert len(archive) == 5 and archive.total_messages() == 5
+    assert dict(archive.conversations())['c4']['title'] == 'محادثة 4'
+
+    archive.remove('c3')
+    assert 'c3' not in archive
+    with pytest.raises(KeyError):
+        archive.get('c3')
+
+
+def test_index_is_rebuilt_and_torn_tail_is_dropped(tmp_path):
+    directory = tmp_path / 'archive'
+    archive = ConversationArchive(directory)
+    archive.put('a', conversation('أ', 'x'), OLD)
+    (name,) = archive.index['files']
+    with open(directory / name, 'ab') as f:
+        f.write(b'\x1f\x8b\x08\x00 torn')
+    os.remove(directory / INDEX_NAME)
+
+    rebuilt = ConversationArchive(directory)
+    assert rebuilt.keys() == ['a']
+    rebuilt.put('b', conversation('ب', 'y'), OLD)
+    assert ConversationArchive(directory).get('b')['title'] == 'ب'
+    assert ConversationArchive(directory).get('a')['title'] == 'أ'
+
+
+def test_other_process_writes_are_seen(tmp_path):
+    first = ConversationArchive(tmp_path / 'archive')
+    second = ConversationArchive(tmp_path / 'archive')
+    first.put('a', conversation('أ', 'x'), OLD)
+    second.put('b', conversation('ب', 'y'), OLD)
+    assert sorted(first.keys()) == sorted(second.keys()) == ['a', 'b']
+
+
+@pytest.mark.parametrize('backend', ['json', 'sqlite'])
+def test_idle_conversations_move_and_come_back_on_write(tmp_path, backend):
+    archive = ConversationArchive(tmp_path / 'archive')
+    if backend == 'json':
+        store = ConversationStore(tmp_path / 'conversations', archive=archive)
+    else:
+        store = SQLiteConversationStore(WorkspaceDB(tmp_path / 'workspace.db'), archive=archive)
+    store['old'] = conversation('قديمة', 'سؤال قديم عن البرمجة')
+    store['new'] = conversation('جديدة', 'سؤال جديد')
+    store.close()
+    if backend == 'json':
+        for name in ('old.json', 'old.jsonl'):
+            path = tmp_path / 'conversations' / name
+            if path.exists():
+                os.utime(path, (OLD, OLD))
+        store = ConversationStore(tmp_path / 'conversations', archive=archive)
+    else:
+        db = WorkspaceDB(tmp_path / 'workspace.db')
+        with db.transaction() as conn:
+            conn.execute("UPDATE conversations SET updated = ? WHERE id = 'old'", (OLD,))
+        store = SQLiteConversationStore(db, archive=archive)
+
+    assert store.archive_idle(30) == 1
+    assert 'old' in archive and 'old' in store and len(store) == 2
+    assert store['old']['title'] == 'قديمة'
+    assert store.search('البرمجه')[0]['conversation_id'] == 'old'
+
+    store.append_message('old', {'role': 'assistant', 'content': 'رد'})
+    assert 'old' not in archive
+    assert len(store['old']['messages']) == 2
@@ -0,0 +1,111 @@
+import asyncio
+import json
+from urllib.parse import quote
+
+import pytest
+
+from ai_asgi import WorkspaceApp
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setenv('AI_ECHO_MODEL', '1')
+    monkeypatch.setenv('AI_ECHO_DELAY', '0.01')
+    monkeypatch.setenv('AI_SESSION_SECRET', 'test')
+    app = WorkspaceApp('web')
+    yield app
+    if app.workspace is not None:
+        asyncio.run(app.shutdown())
+
+
+async def call(app, method, path, body=None, headers=()):
+    """طلب HTTP واحد عبر واجهة ASGI: (الحالة، الترويسات، الجسم)"""
+    path, _, query = path.partition('?')
+    payload = json.dumps(body).encode('utf-8') if isinstance(body, dict) else (body or b'')
+    scope = {
+        'type': 'http', 'method': method, 'path': path, 'query_string': quote(query, safe='=&').encode('latin-1'),
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+    }
+    pending = [{'type': 'http.request', 'body': payload, 'more_body': False}]
+
+    async def receive():
+        if pending:
+            return pending.pop(0)
+        await asyncio.Event().wait()
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    start = sent[0]
+    response_headers = {}
+    for name, value in start['headers']:
+        response_headers.setdefault(name.decode('latin-1'), []).append(value.decode('latin-1'))
+    return start['status'], response_headers, b''.join(m.get('body', b'') for m in sent[1:])
+
+
+def run(app, *args, **kwargs):
+    return asyncio.run(call(app, *args, **kwargs))
+
+
+def test_chat_remembers_the_exchange_for_search(app):
+    async def scenario():
+        status, headers, body = await call(app, 'POST', '/api/chat', {'message': 'مدرسة الحي', 'model': 'echo'})
+        assert status == 200
+        assert json.loads(body) == {'response': 'مدرسة الحي', 'model': 'echo'}
+        cookie = headers['set-cookie'][0].split(';')[0]
+
+        status, headers, body = await call(app, 'GET', '/api/conversations/search?q=مدرسه&limit=5')
+        results = json.loads(body)['results']
+        assert sorted(r['role'] for r in results) == ['assistant', 'user']
+        chat_id = results[0]['conversation_id']
+        assert cookie.startswith(f"ai_chat_id={chat_id}.")
+
+        status, headers, body = await call(app, 'GET', f"/api/conversations/{chat_id}/export")
+        assert status == 200 and len(json.loads(body)['messages']) == 2
+        assert 'attachment' in headers['content-disposition'][0]
+
+    asyncio.run(scenario())
+
+
+def test_stream_sends_sse_frames(app):
+    status, headers, body = run(app, 'POST', '/api/chat/stream', {'message': 'a b c', 'model': 'echo'})
+    assert status == 200
+    assert headers['content-type'] == ['text/event-stream']
+    assert headers['x-accel-buffering'] == ['no']
+    frames = [frame for frame in body.decode('utf-8').split('\n\n') if frame]
+    tokens = [json.loads(frame.split('data: ')[1])['text'] for frame in frames if frame.startswith('event: token')]
+    assert ''.join(tokens) == 'a b c'
+    assert frames[-1].startswith('event: done')
+
+
+def test_errors_are_json(app):
+    assert run(app, 'GET', '/nope')[0] == 404
+    assert run(app, 'GET', '/api/chat')[0] == 405
+    assert run(app, 'POST', '/api/chat', b'{not json')[0] == 400
+    status, _, body = run(app, 'POST', '/api/chat', {'message': 'x', 'model': 'missing'})
+    assert status == 400 and 'error' in json.loads(body)
+    assert run(app, 'POST', '/api/chat', {'message': 'x', 'model': 'echo', 'max_tokens': 'many'})[0] == 400
+    assert run(app, 'GET', '/api/conversations/search?q=x&limit=abc')[0] == 400
+    assert run(app, 'GET', '/api/costs?days=x')[0] == 400
+    assert run(app, 'GET', '/api/costs?by=nope')[0] == 400
+    assert run(app, 'POST', '/api/chat', b'x' * (2 << 20))[0] == 413
+
+
+def test_costs_include_the_chat(app):
+    run(app, 'POST', '/api/chat', {'message': 'كم التكلفة', 'model': 'echo'})
+    status, _, body = run(app, 'GET', '/api/costs?days=1&by=model')
+    assert status == 200
+    assert [row['key'] for row in json.loads(body)['rows']] == ['echo']
+
+
+def test_index_is_served_precompressed_and_revalidated(app):
+    status, headers, body = run(app, 'GET', '/', headers=[('Accept-Encoding', 'gzip')])
+    assert status == 200
+    assert headers['content-encoding'] == ['gzip']
+    assert headers['content-type'][0].startswith('text/html')
+    status, headers, body = run(app, 'GET', '/', headers=[('Accept-Encoding', 'gzip'),
+                                                          ('If-None-Match', headers['etag'][0])])
+    assert (status, body) == (304, b'')
@@ -0,0 +1,108 @@
+import time
+
+from ai_cache import ResponseCache
+
+MESSAGES = [{'role': 'user', 'content': 'ما هي عاصمة فرنسا؟'}]
+
+
+def test_key_ignores_whitespace_and_line_endings():
+    noisy = [{'role': 'USER', 'content': '  ما هي عاصمة فرنسا؟  \r\n'}]
+    assert ResponseCache.make_key('gpt-4o', noisy) == ResponseCache.make_key('gpt-4o', MESSAGES)
+    assert ResponseCache.make_key('gpt-4o', MESSAGES) != ResponseCache.make_key('gpt-4o-mini', MESSAGES)
+    assert ResponseCache.make_key('gpt-4o', MESSAGES, temperature=0.2) != ResponseCache.make_key('gpt-4o', MESSAGES)
+
+
+def test_hit_miss_and_persistent_counters(tmp_path):
+    path = tmp_path / 'cache.db'
+    cache = ResponseCache(path)
+    key = ResponseCache.make_key('gpt-4o', MESSAGES)
+    assert cache.get(key) is None
+    cache.set(key, 'gpt-4o', 'باريس')
+    assert cache.get(key) == 'باريس'
+    cache.close()
+
+    reopened = ResponseCache(path)
+    assert reopened.get(key) == 'باريس'
+    stats = reopened.stats()
+    assert stats['session'] == {'hits': 1, 'misses': 0, 'stores': 0, 'evictions': 0}
+    assert stats['total'] == {'misses': 1, 'stores': 1, 'hits': 2}
+    reopened.close()
+
+
+def test_expired_entries_are_dropped(tmp_path):
+    cache = ResponseCache(tmp_path / 'cache.db', ttl=0.01)
+    cache.set('k', 'gpt-4o', 'قديم')
+    time.sleep(0.02)
+    assert cache.get('k') is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_least_recently_used_is_evicted(tmp_path):
+    cache = ResponseCache(tmp_path / 'cache.db', max_entries=2)
+    cache.set('a', 'm', '1')
+    time.sleep(0.01)
+    cache.set('b', 'm', '2')
+    time.sleep(0.01)
+    cache.get('a')
+    cache.set('c', 'm', '3')
+    assert cache.get('b') is None
+    assert cache.get('a') == '1' and cache.get('c') == '3'
+    assert cache.stats()['session']['evictions'] == 1
+
+
+def test_semantic_cache_matches_close_questions_per_namespace(tmp_path):
+    from ai_cache import SemanticCache
+
+    cache = SemanticCache(tmp_path / 'cache.db', threshold=0.8)
+    namespace = SemanticCache.namespace('gpt-4o', temperature=0.7)
+    assert namespace == 'gpt-4o|temperature=0.7'
+    cache.add(namespace, 'ما هي عاصمة فرنسا؟', 'باريس')
+
+    assert cache.lookup(namespace, 'ما هي عاصمة فرنسا') == 'باريس'
+    assert cache.lookup(namespace, 'كيف أطبخ الأرز؟') is None
+    assert cache.lookup(SemanticCache.namespace('gpt-4o-mini'), 'ما هي عاصمة فرنسا؟') is None
+    assert cache.audit()[0]['matched_prompt'] == 'ما هي عاصمة فرنسا؟'
+    cache.close()
+
+    # الفهرس يُعاد بناؤه من القرص
+    reopened = SemanticCache(tmp_path / 'cache.db', threshold=0.8)
+    assert reopened.lookup(namespace, 'ما هي عاصمة فرنسا؟') == 'باريس'
+    reopened.close()
+
+
+def test_semantic_cache_evicts_per_namespace(tmp_path):
+    from ai_cache import SemanticCache
+
+    cache = SemanticCache(tmp_path / 'cache.db', max_per_model=2)
+    for i, prompt in enumerate(['سؤال عن الطقس', 'سؤال عن البرمجة', 'سؤال عن الرياضة']):
+        cache.add('m', prompt, str(i))
+    assert cache.stats()['entries'] == 2
+    assert cache.session['evictions'] == 1
+
+
+def test_reads_are_written_behind_in_one_batch(tmp_path):
+    import sqlite3
+
+    path = tmp_path / 'cache.db'
+    cache = ResponseCache(path, flush_every=1000, flush_interval=60)
+    cache.set('a', 'm', '1')
+    cache.set('b', 'm', '2')
+    changes = cache._db.total_changes
+    for _ in range(10):
+        assert cache.get('a') == '1'
+        assert cache.get('missing') is None
+    # القراءات لم تكتب شيئاً بعد
+    assert cache._db.total_changes == changes
+    assert cache.stats()['total'] == {'stores': 2, 'hits': 10, 'misses': 10}
+
+    # وقت الاستخدام المعلق يُكتب قبل الطرد فيبقى 'a' الأحدث استخداماً
+    cache.get('a')
+    cache.max_entries = 2
+    cache.set('c', 'm', '3')
+    assert cache.get('b') is None and cache.get('a') == '1'
+    cache.close()
+
+    with sqlite3.connect(str(path)) as db:
+        assert dict(db.execute("SELECT name, value FROM counters")) == {
+            'stores': 3, 'hits': 12, 'misses': 11, 'evictions': 1,
+        }
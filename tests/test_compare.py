@@ -0,0 +1,48 @@
+from types import SimpleNamespace
+
+import pytest
+
+from ai_engine import ECHO_INFO, ProviderEngine
+from ai_workspace_pro import AIWorkspacePro
+
+MODELS = {
+    'gpt-4o': {'name': 'GPT-4o', 'client': 'openai'},
+    'gpt-4o-mini': {'name': 'GPT-4o mini', 'client': 'openai'},
+    'gemini-1.5-pro': {'name': 'Gemini Pro', 'client': 'google'},
+    'gemini-1.5-flash': {'name': 'Gemini Flash', 'client': 'google'},
+    'claude-3-opus-20240229': {'name': 'Opus', 'client': 'anthropic'},
+}
+
+
+def test_default_candidates_are_one_fast_model_per_provider(monkeypatch):
+    monkeypatch.delenv('AI_COMPARE_MODELS', raising=False)
+    workspace = SimpleNamespace(models=MODELS)
+    assert AIWorkspacePro.compare_candidates(workspace) == ['gpt-4o-mini', 'gemini-1.5-flash', 'claude-3-opus-20240229']
+
+    monkeypatch.setenv('AI_COMPARE_MODELS', 'gpt-4o, missing ,gemini-1.5-pro')
+    assert AIWorkspacePro.compare_candidates(workspace) == ['gpt-4o', 'gemini-1.5-pro']
+
+
+def test_compare_models_caps_max_tokens(monkeypatch):
+    monkeypatch.setenv('AI_ECHO_DELAY', '0.01')
+    monkeypatch.setenv('AI_COMPARE_MAX_TOKENS', '256')
+    models = {'echo': ECHO_INFO, 'echo-2': dict(ECHO_INFO, name='Echo 2')}
+    engine = ProviderEngine({}, models)
+    calls = []
+    fanout = engine.fanout
+    monkeypatch.setattr(engine, 'fanout', lambda *a, **kw: calls.append(kw) or fanout(*a, **kw))
+    workspace = SimpleNamespace(models=models, engine=engine)
+    workspace.compare_candidates = lambda: AIWorkspacePro.compare_candidates(workspace)
+    try:
+        results = AIWorkspacePro.compare_models(workspace, 'مرحبا', deadline=5)
+    finally:
+        engine.close()
+    assert list(results) == ['echo']
+    assert results['echo']['text'] == 'مرحبا'
+    assert calls[0]['max_tokens'] == 256
+
+
+def test_compare_models_without_models_fails():
+    workspace = SimpleNamespace(models={}, compare_candidates=lambda: [])
+    with pytest.raises(Exception):
+        AIWorkspacePro.compare_models(workspace, 'x')
@@ -0,0 +1,74 @@
+import pytest
+
+from ai_context import SUMMARY_HEADER, ContextBuilder, context_budget, message_tokens, split_turns
+
+
+def history(turns):
+    messages = []
+    for i in range(turns):
+        messages.append({'role': 'user', 'content': f"سؤال رقم {i} " + 'كلمة ' * 30})
+        messages.append({'role': 'assistant', 'content': f"رد رقم {i} " + 'word ' * 60})
+    return messages
+
+
+@pytest.mark.parametrize('budget', [0, 150, 400, 800])
+def test_verbatim_tail_never_empty(tmp_path, budget):
+    builder = ContextBuilder(summary_tokens=100, fold_turns=4, path=tmp_path / 'summaries.json')
+    for count in range(1, 21):
+        messages = builder.build(history(count), 'سؤال جديد', budget)
+        assert messages[-1] == {'role': 'user', 'content': 'سؤال جديد'}
+        verbatim = [m for m in messages[:-1] if m['role'] != 'system']
+        # آخر دور كامل يصل كما هو
+        assert verbatim[-2:] == history(count)[-2:], count
+
+
+def test_fold_boundary_is_multiple_of_fold_turns(tmp_path):
+    builder = ContextBuilder(summary_tokens=100, fold_turns=4, path=tmp_path / 'summaries.json')
+    # ميزانية تتسع لمجموعة كاملة فلا يُحذف دور (الحذف لا يحدث إلا حين لا يبقى غير ذلك)
+    for count in range(1, 21):
+        messages = builder.build(history(count), 'سؤال', 800)
+        verbatim = [m for m in messages[:-1] if m['role'] != 'system']
+        folded = count - len(split_turns(verbatim))
+        assert folded % 4 == 0
+        assert any(m['content'].startswith(SUMMARY_HEADER) for m in messages) == (folded > 0)
+
+
+def test_short_history_is_kept_whole(tmp_path):
+    builder = ContextBuilder(path=tmp_path / 'summaries.json')
+    messages = builder.build(history(2), 'سؤال', 6000, system='نظام')
+    assert messages == [{'role': 'system', 'content': 'نظام'}] + history(2) + [{'role': 'user', 'content': 'سؤال'}]
+
+
+def test_summaries_are_reused_by_content(tmp_path):
+    calls = []
+
+    def summarize(prompt, max_tokens):
+        calls.append(prompt)
+        return f"ملخص {len(calls)}"
+
+    builder = ContextBuilder(summarize=summarize, summary_tokens=100, fold_turns=4, path=tmp_path / 'summaries.json')
+    builder.build(history(12), 'سؤال', 400)
+    first = len(calls)
+    builder.build(history(12), 'سؤال آخر', 400)
+    assert first >= 1 and len(calls) == first
+
+
+def long_history(turns, words=1500):
+    messages = []
+    for i in range(turns):
+        messages.append({'role': 'user', 'content': f"سؤال رقم {i} عن الموضوع"})
+        messages.append({'role': 'assistant', 'content': f"رد رقم {i} " + 'word ' * words})
+    return messages
+
+
+@pytest.mark.parametrize('summarize', [None, lambda prompt, max_tokens: 'ملخص طويل جداً ' * 500])
+@pytest.mark.parametrize('fold_turns', [1, 3, 4])
+def test_context_fits_the_budget(tmp_path, summarize, fold_turns):
+    budget = context_budget('gpt-4')
+    builder = ContextBuilder(summarize=summarize, summary_tokens=400, fold_turns=fold_turns,
+                             path=tmp_path / 'summaries.json')
+    for count in range(1, 21):
+        for words in (300, 1500):
+            messages = builder.build(long_history(count, words), 'سؤال جديد', budget, system='نظام')
+            assert sum(message_tokens(m) for m in messages) <= budget, (count, words)
+            assert messages[-3:-1] == long_history(count, words)[-2:]
@@ -0,0 +1,94 @@
+import json
+
+from ai_conversations import INDEX_NAME, ConversationStore
+
+
+def conversation(title, *contents, timestamp='2024-01-01T00:00:00'):
+    return {
+        'title': title,
+        'timestamp': timestamp,
+        'messages': [{'role': 'user', 'content': content, 'model': 'gpt-4o'} for content in contents],
+    }
+
+
+def test_index_answers_metadata_without_loading(tmp_path):
+    store = ConversationStore(tmp_path, max_resident=2)
+    for i in range(4):
+        store[f"c{i}"] = conversation(f"محادثة {i}", 'سؤال', timestamp=f"2024-01-0{i + 1}T00:00:00")
+    store.close()
+
+    reopened = ConversationStore(tmp_path, max_resident=2)
+    assert len(reopened) == 4 and 'c3' in reopened
+    assert reopened.resident() == []
+    assert reopened.meta('c1') == dict(reopened.meta('c1'), title='محادثة 1', messages=1, models=['gpt-4o'])
+    assert [row['id'] for row in reopened.recent(2)] == ['c3', 'c2']
+    assert reopened.total_messages() == 4
+
+    for chat_id in ('c0', 'c1', 'c2'):
+        reopened[chat_id]
+    assert reopened.resident() == ['c1', 'c2']
+
+
+def test_index_picks_up_files_written_by_older_versions(tmp_path):
+    store = ConversationStore(tmp_path)
+    store['a'] = conversation('أ', 'x')
+    store.close()
+    (tmp_path / 'legacy.json').write_text(json.dumps(conversation('قديمة', 'y', 'z'), ensure_ascii=False))
+
+    reopened = ConversationStore(tmp_path)
+    assert reopened.meta('legacy')['messages'] == 2
+    assert 'legacy' in json.loads((tmp_path / INDEX_NAME).read_text())
+    assert reopened['legacy']['title'] == 'قديمة'
+
+
+def test_search_scans_messages(tmp_path):
+    store = ConversationStore(tmp_path)
+    store['a'] = conversation('أ', 'كيف أتعلم البرمجة بلغة بايثون؟')
+    store['b'] = conversation('ب', 'وصفة الكبسة')
+    results = store.search('البرمجه بايثون')
+    assert [r['conversation_id'] for r in results] == ['a']
+    assert '«' in results[0]['snippet']
+    assert store.search('؟') == []
+
+
+def test_appended_messages_survive_without_close(tmp_path):
+    store = ConversationStore(tmp_path, fsync_every=1)
+    store['a'] = conversation('أ', 'أول')
+    store.append_message('a', {'role': 'assistant', 'content': 'رد'})
+    # بدون close: ما أُلحق موجود في السجل
+    reopened = ConversationStore(tmp_path)
+    assert [m['content'] for m in reopened['a']['messages']] == ['أول', 'رد']
+    assert reopened.meta('a')['messages'] == 2
+
+
+def test_torn_last_line_is_ignored_then_truncated(tmp_path):
+    store = ConversationStore(tmp_path)
+    store['a'] = conversation('أ', 'أول')
+    store.close()
+    journal = tmp_path / 'a.jsonl'
+    with open(journal, 'ab') as f:
+        f.write(b'{"op": "message", "seq": 1, "data": {"role": "assist')
+
+    reopened = ConversationStore(tmp_path)
+    assert len(reopened['a']['messages']) == 1
+    reopened.append_message('a', {'role': 'assistant', 'content': 'رد'})
+    reopened.close()
+    lines = journal.read_bytes().splitlines()
+    assert all(json.loads(line) for line in lines)
+    assert [m['content'] for m in ConversationStore(tmp_path)['a']['messages']] == ['أول', 'رد']
+
+
+def test_compaction_folds_journal_into_snapshot(tmp_path):
+    store = ConversationStore(tmp_path, compact_every=3)
+    store['a'] = conversation('أ', 'أول')
+    journal = tmp_path / 'a.jsonl'
+    before = journal.read_bytes()
+    # سجل meta ورسالتان = 3 سجلات فيُدمج
+    store.append_message('a', {'role': 'user', 'content': 'ثانية'})
+    store.close()
+    assert len(json.loads((tmp_path / 'a.json').read_text())['messages']) == 2
+    assert journal.read_bytes() == b''
+
+    # انقطاع بين كتابة اللقطة وتفريغ السجل: إعادة تشغيله لا تكرر الرسائل
+    journal.write_bytes(before)
+    assert [m['content'] for m in ConversationStore(tmp_path)['a']['messages']] == ['أول', 'ثانية']
@@ -0,0 +1,199 @@
+import asyncio
+
+import pytest
+
+from ai_engine import ECHO_INFO, ProviderEngine, make_usage
+from ai_metrics import CallMetrics
+
+MODELS = {'echo': ECHO_INFO, 'echo-2': dict(ECHO_INFO, name='Echo 2')}
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    monkeypatch.setenv('AI_ECHO_DELAY', '0.01')
+    engine = ProviderEngine({}, MODELS, timeout=5)
+    yield engine
+    engine.close()
+
+
+def test_make_usage():
+    assert make_usage(None, None) is None
+    assert make_usage(10, 5) == {'prompt_tokens': 10, 'completion_tokens': 5}
+    assert make_usage(10, 5, 8)['cached_tokens'] == 8
+
+
+def test_chat_runs_on_the_engine_loop(engine, tmp_path):
+    engine.metrics = CallMetrics(tmp_path / 'metrics.json')
+    result = engine.chat('echo', [{'role': 'user', 'content': 'مرحبا بك'}])
+    assert result['text'] == 'مرحبا بك'
+    assert result['client'] == 'echo'
+    assert engine.percentile('echo') is not None
+    summary = engine.metrics.summary('echo')
+    assert summary['latency']['count'] == 1
+    assert summary['queue_wait']['count'] == 1
+
+
+def test_unknown_model_and_client(engine):
+    with pytest.raises(ValueError):
+        engine.chat('missing', [{'role': 'user', 'content': 'x'}])
+    with pytest.raises(Exception):
+        engine.adapter_for('nope')
+
+
+def test_astream_yields_words(engine):
+    async def collect():
+        return [chunk async for chunk in engine.astream('echo', [{'role': 'user', 'content': 'a b c'}])]
+
+    assert engine.run(collect()) == ['a', ' b', ' c']
+
+
+def test_fanout_reports_each_model_and_timeouts(engine, monkeypatch):
+    seen = []
+    results = engine.fanout(['echo', 'echo-2'], [{'role': 'user', 'content': 'x y'}],
+                            on_token=lambda model_id, chunk: seen.append(model_id))
+    assert {model_id: r['text'] for model_id, r in results.items()} == {'echo': 'x y', 'echo-2': 'x y'}
+    assert set(seen) == {'echo', 'echo-2'}
+
+    monkeypatch.setenv('AI_ECHO_DELAY', '2')
+    results = engine.fanout(['echo'], [{'role': 'user', 'content': 'slow'}], deadline=0.05)
+    assert results['echo']['error'] and results['echo']['text'] == ''
+
+
+def test_sync_bridge_refuses_to_block_its_own_loop(engine):
+    async def nested():
+        inner = asyncio.sleep(0)
+        try:
+            engine.run(inner)
+        finally:
+            inner.close()
+
+    with pytest.raises(RuntimeError):
+        engine.run(nested())
+
+
+class FailingAdapter:
+    client_type = 'fail'
+
+    async def achat(self, model_id, messages, **params):
+        raise RuntimeError('upstream down')
+
+    async def astream(self, model_id, messages, **params):
+        raise RuntimeError('upstream down')
+        yield
+
+    async def aclose(self):
+        pass
+
+
+@pytest.fixture
+def race_engine(engine):
+    engine.models = dict(MODELS, broken={'name': 'Broken', 'client': 'fail'})
+    engine.adapters['fail'] = FailingAdapter()
+    return engine
+
+
+def test_race_all_returns_first_answer(race_engine):
+    result = race_engine.race(['echo', 'echo-2'], [{'role': 'user', 'content': 'سباق'}], hedge=False)
+    assert result['text'] == 'سباق'
+    assert result['race']['launched'] == ['echo', 'echo-2']
+    assert result['model'] in ('echo', 'echo-2')
+
+
+def test_hedged_race_only_launches_backup_when_first_is_slow(race_engine):
+    race_engine.default_hedge_delay = 5
+    result = race_engine.race(['echo', 'echo-2'], [{'role': 'user', 'content': 'x'}])
+    assert result['race']['launched'] == ['echo']
+
+    race_engine.samples['broken'] = {'latency': [0.001]}
+    result = race_engine.race(['broken', 'echo'], [{'role': 'user', 'content': 'x'}])
+    assert result['model'] == 'echo'
+    assert 'broken' in result['race']['errors']
+
+
+def test_first_token_race_completes_the_winning_stream(race_engine):
+    result = race_engine.race(['echo', 'echo-2'], [{'role': 'user', 'content': 'a b c'}], hedge=False,
+                              first_token=True)
+    assert result['text'] == 'a b c'
+
+
+def test_race_fails_when_every_model_fails(race_engine):
+    with pytest.raises(Exception, match='فشلت'):
+        race_engine.race(['broken'], [{'role': 'user', 'content': 'x'}])
+
+
+class TrackingAdapter:
+    """بث بطيء يسجل البث المفتوح حتى يُغلق"""
+    client_type = 'track'
+
+    def __init__(self, delays):
+        self.delays = delays
+        self.open = set()
+
+    async def astream(self, model_id, messages, **params):
+        self.open.add(model_id)
+        try:
+            for word in ('a', ' b'):
+                await asyncio.sleep(self.delays[model_id])
+                yield word
+        finally:
+            # إغلاق الاتصال يأخذ وقتاً يُنهي فيه خاسر آخر أول قطعة
+            await asyncio.sleep(0.05)
+            self.open.discard(model_id)
+
+    async def aclose(self):
+        pass
+
+
+def test_first_token_race_closes_every_losing_stream(engine):
+    from ai_flight import AsyncSingleFlight
+
+    adapter = TrackingAdapter({'quick': 0.01, 'tied': 0.01, 'late': 0.03, 'stuck': 5})
+    engine.adapters['track'] = adapter
+    engine.flights = AsyncSingleFlight(enabled=False)
+    engine.models = {model_id: {'name': model_id, 'client': 'track'} for model_id in adapter.delays}
+    engine.timeout = 0.2
+
+    async def race(model_ids):
+        # الفحص قبل أي await: البث المتروك لا يُغلق إلا لاحقاً عند جمع القمامة
+        try:
+            return (await engine.arace(model_ids, [{'role': 'user', 'content': 'x'}], hedge=False,
+                                       first_token=True))['text'], set(adapter.open)
+        except Exception:
+            return None, set(adapter.open)
+
+    assert engine.run(race(['quick', 'tied', 'late', 'stuck'])) == ('a b', set())
+    # كل النماذج تتجاوز المهلة قبل أول قطعة
+    assert engine.run(race(['stuck'])) == (None, set())
+
+
+def test_anthropic_request_marks_long_prefixes_for_caching():
+    from types import SimpleNamespace
+
+    from ai_engine import PROMPT_CACHE_MIN_TOKENS, AnthropicAdapter, OpenAIAdapter
+
+    long_text = 'word ' * (PROMPT_CACHE_MIN_TOKENS * 2)
+    short = AnthropicAdapter._request('claude', [{'role': 'system', 'content': 'قصير'},
+                                                 {'role': 'user', 'content': 'سؤال'}], {})
+    assert short['system'] == 'قصير'
+    assert short['messages'] == [{'role': 'user', 'content': 'سؤال'}]
+
+    messages = [
+        {'role': 'system', 'content': long_text},
+        {'role': 'system', 'content': 'ملخص يتغير'},
+        {'role': 'user', 'content': 'أول'},
+        {'role': 'assistant', 'content': 'رد'},
+        {'role': 'user', 'content': 'سؤال'},
+    ]
+    request = AnthropicAdapter._request('claude', messages, {'temperature': 0.2})
+    assert request['system'][0]['cache_control'] == {'type': 'ephemeral'}
+    assert 'cache_control' not in request['system'][1]
+    assert request['messages'][1]['content'][0]['cache_control'] == {'type': 'ephemeral'}
+    assert request['messages'][-1] == {'role': 'user', 'content': 'سؤال'}
+    assert request['temperature'] == 0.2
+
+    usage = SimpleNamespace(input_tokens=10, output_tokens=5, cache_read_input_tokens=1000,
+                            cache_creation_input_tokens=0)
+    assert AnthropicAdapter._usage(usage) == {'prompt_tokens': 1010, 'completion_tokens': 5, 'cached_tokens': 1000}
+    usage = SimpleNamespace(prompt_tokens=1200, completion_tokens=5,
+                            prompt_tokens_details=SimpleNamespace(cached_tokens=1024))
+    assert OpenAIAdapter._usage(usage)['cached_tokens'] == 1024
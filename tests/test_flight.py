@@ -0,0 +1,148 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from ai_engine import ECHO_INFO, ProviderEngine
+from ai_flight import AsyncSingleFlight, SingleFlight, flight_key
+from ai_metrics import CallMetrics
+
+MESSAGES = [{'role': 'user', 'content': 'سؤال'}]
+
+
+def test_key_ignores_bookkeeping_params_and_whitespace():
+    key = flight_key('gpt-4o', MESSAGES, {'temperature': 0.2})
+    assert flight_key('gpt-4o', [{'role': 'user', 'content': ' سؤال \r\n'}],
+                      {'temperature': 0.2, 'timeout': 5, 'conversation_id': 'c1'}) == key
+    assert flight_key('gpt-4o', MESSAGES, {'temperature': 0.3}) != key
+    assert flight_key('gpt-4o-mini', MESSAGES, {'temperature': 0.2}) != key
+
+
+def test_concurrent_calls_share_one_flight():
+    flights = SingleFlight(enabled=True)
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        return 'رد'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flights.call('k', slow))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    while flights.stats['flights'] + flights.stats['coalesced'] < 8:
+        time.sleep(0.005)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False] + [True] * 7
+    assert {text for text, _ in results} == {'رد'}
+    assert flights.stats == {'flights': 1, 'coalesced': 7}
+    # بعد الانتهاء يبدأ طلب جديد استدعاءً جديداً
+    release.set()
+    flights.call('k', slow)
+    assert len(calls) == 2
+
+
+def test_errors_reach_every_waiter():
+    flights = SingleFlight(enabled=True)
+    started = threading.Event()
+
+    def failing():
+        started.set()
+        time.sleep(0.05)
+        raise RuntimeError('down')
+
+    errors = []
+
+    def ask():
+        try:
+            flights.call('k', failing)
+        except RuntimeError as e:
+            errors.append(e)
+
+    first = threading.Thread(target=ask)
+    first.start()
+    started.wait()
+    second = threading.Thread(target=ask)
+    second.start()
+    first.join()
+    second.join()
+    assert len(errors) == 2
+
+
+def test_late_stream_subscriber_replays_from_first_chunk():
+    flights = SingleFlight(enabled=True)
+    gate = threading.Event()
+
+    def produce():
+        yield 'a'
+        gate.wait(5)
+        yield 'b'
+
+    first, shared = flights.stream('k', produce)
+    assert not shared and next(first) == 'a'
+    second, shared = flights.stream('k', produce)
+    assert shared
+    gate.set()
+    assert list(first) == ['b']
+    assert list(second) == ['a', 'b']
+
+
+def test_engine_coalesces_identical_async_requests(monkeypatch, tmp_path):
+    monkeypatch.setenv('AI_ECHO_DELAY', '0.05')
+    engine = ProviderEngine({}, {'echo': ECHO_INFO}, metrics=CallMetrics(tmp_path / 'metrics.json'))
+    engine.flights = AsyncSingleFlight(enabled=True)
+
+    async def burst():
+        chats = [engine.achat('echo', MESSAGES, conversation_id=f"c{i}") for i in range(5)]
+        streams = [collect(engine.astream('echo', [{'role': 'user', 'content': 'a b'}])) for _ in range(3)]
+        return await asyncio.gather(*chats), await asyncio.gather(*streams)
+
+    async def collect(chunks):
+        return ''.join([chunk async for chunk in chunks])
+
+    try:
+        chats, streams = engine.run(burst())
+    finally:
+        engine.close()
+    assert {result['text'] for result in chats} == {'سؤال'}
+    assert streams == ['a b'] * 3
+    assert engine.flights.stats == {'flights': 2, 'coalesced': 6}
+    assert engine.metrics.coalesced('echo') == 6
+    assert engine.metrics.models['echo']['calls'] == 2
+
+
+def test_cancelled_waiters_cancel_the_shared_call():
+    flights = AsyncSingleFlight(enabled=True)
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def scenario():
+        waiters = [asyncio.ensure_future(flights.call('k', slow)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0.01)
+
+    asyncio.run(scenario())
+    assert cancelled == [True]
+    assert flights._calls == {}
+
+
+def test_disabled_flight_calls_every_time():
+    flights = SingleFlight(enabled=False)
+    assert flights.call('k', lambda: 1) == (1, False)
+    with pytest.raises(ZeroDivisionError):
+        flights.call('k', lambda: 1 / 0)
@@ -0,0 +1,31 @@
+import sys
+import threading
+
+from ai_lazy import STARTUP, LazyClients, LazyModule, module_available
+
+
+def test_clients_are_built_once_on_first_use():
+    built = []
+    clients = LazyClients()
+    clients.register('openai', lambda: built.append('openai') or object())
+    assert 'openai' in clients and clients.loaded() == [] and clients.registered() == ['openai']
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(clients['openai'])) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert built == ['openai']
+    assert len({id(client) for client in results}) == 1
+    assert clients.get('missing') is None
+    assert any(entry['name'] == 'openai' and entry['kind'] == 'client' for entry in STARTUP.entries)
+
+
+def test_lazy_module_imports_on_attribute_access(monkeypatch):
+    monkeypatch.delitem(sys.modules, 'colorsys', raising=False)
+    proxy = LazyModule('colorsys')
+    assert 'colorsys' not in sys.modules
+    assert proxy.rgb_to_hsv(1, 0, 0)[0] == 0
+    assert 'colorsys' in sys.modules
+    assert module_available('colorsys') and not module_available('no_such_module_here')
@@ -0,0 +1,50 @@
+import time
+from datetime import date
+
+import pytest
+
+from ai_ledger import ROW, Ledger
+
+
+def test_cost_uses_longest_price_prefix_and_cached_rate(tmp_path):
+    ledger = Ledger(tmp_path)
+    assert ledger.cost('gpt-4o-mini-2024', prompt_tokens=1_000_000) == pytest.approx(0.15)
+    assert ledger.cost('gpt-4o', prompt_tokens=1_000_000, cached_tokens=1_000_000) == pytest.approx(1.25)
+    assert ledger.cost('gpt-4', prompt_tokens=1_000_000, cached_tokens=500_000) == pytest.approx(30.0)
+    assert ledger.cost('dall-e-3', kind='image', units=2) == pytest.approx(0.08)
+    assert ledger.cost('unknown-model', prompt_tokens=10) == 0.0
+
+
+def test_aggregate_by_model_and_conversation(tmp_path):
+    ledger = Ledger(tmp_path)
+    ledger.record('gpt-4o', prompt_tokens=1000, completion_tokens=100, conversation_id='c1', latency=1.0)
+    ledger.record('gpt-4o', prompt_tokens=1000, completion_tokens=100, conversation_id='c2', latency=3.0)
+    ledger.record_chat('gemini-1.5-flash', [{'role': 'user', 'content': 'مرحبا'}], 'أهلاً', conversation_id='c1')
+    ledger.close()
+
+    reopened = Ledger(tmp_path)
+    by_model = {row['key']: row for row in reopened.aggregate(by='model')}
+    assert by_model['gpt-4o']['calls'] == 2
+    assert by_model['gpt-4o']['avg_latency'] == pytest.approx(2.0)
+    assert by_model['gemini-1.5-flash']['prompt_tokens'] > 0
+    assert {row['key'] for row in reopened.aggregate(by='conversation')} == {'c1', 'c2'}
+    assert reopened.aggregate(by='day')[0]['key'] == date.today().isoformat()
+    assert reopened.total() == pytest.approx(sum(row['cost'] for row in by_model.values()))
+    with pytest.raises(ValueError):
+        reopened.aggregate(by='nope')
+
+
+def test_torn_row_is_skipped_then_truncated(tmp_path):
+    ledger = Ledger(tmp_path)
+    ledger.record('gpt-4o', prompt_tokens=10)
+    ledger.close()
+    path = tmp_path / f"{date.today().isoformat()}.bin"
+    with open(path, 'ab') as f:
+        f.write(b'\x00' * (ROW.size // 2))
+
+    reader = Ledger(tmp_path)
+    assert len(list(reader.rows())) == 1
+    reader.record('gpt-4o', prompt_tokens=20, when=time.time())
+    reader.close()
+    assert path.stat().st_size == 2 * ROW.size
+    assert [row[4] for row in Ledger(tmp_path).rows()] == [10, 20]
@@ -0,0 +1,52 @@
+import random
+
+import pytest
+
+from ai_metrics import SECONDS_BOUNDS, CallMetrics, new_histogram, observe, percentile
+
+
+def test_percentile_tracks_exact_values_within_a_bucket():
+    rng = random.Random(7)
+    values = sorted(rng.uniform(0.05, 5.0) for _ in range(5000))
+    hist = new_histogram()
+    for value in values:
+        observe(hist, SECONDS_BOUNDS, value)
+    for q in (0.5, 0.95, 0.99):
+        exact = values[int(q * len(values)) - 1]
+        # الخانات تتضاعف بمعامل 1.5، فالتقدير داخل خانة الرقم الصحيح
+        assert exact / 1.5 <= percentile(hist, SECONDS_BOUNDS, q) <= exact * 1.5
+    assert percentile(hist, SECONDS_BOUNDS, 1.0) == pytest.approx(values[-1])
+    assert percentile(new_histogram(), SECONDS_BOUNDS, 0.5) is None
+
+
+def test_summary_and_coalesced(tmp_path):
+    metrics = CallMetrics(tmp_path / 'metrics.json')
+    for latency in (0.1, 0.2, 0.3):
+        metrics.record('echo', latency=latency, ttft=None)
+    metrics.record_error('echo')
+    metrics.record_coalesced('echo')
+    summary = metrics.summary('echo')
+    assert set(summary) == {'latency'}
+    assert summary['latency']['count'] == 3
+    assert summary['latency']['mean'] == pytest.approx(0.2)
+    assert metrics.coalesced('echo') == 1
+    assert metrics.summary('missing') == {}
+
+
+def test_save_merges_counts_from_other_processes(tmp_path):
+    path = tmp_path / 'metrics.json'
+    a, b = CallMetrics(path), CallMetrics(path)
+    a.record('echo', latency=0.1, prompt_tokens=10)
+    b.record('echo', latency=1.0, prompt_tokens=30)
+    b.record_coalesced('echo')
+    a.save()
+    b.save()
+    a.save()
+    for metrics in (a, b, CallMetrics(path)):
+        model = metrics.models['echo']
+        assert model['calls'] == 2
+        assert model['coalesced'] == 1
+        assert model['histograms']['latency']['count'] == 2
+        assert sum(model['histograms']['latency']['buckets'].values()) == 2
+        assert model['histograms']['prompt_tokens']['sum'] == 40
+    assert not list(tmp_path.glob('*.tmp'))
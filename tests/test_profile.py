@@ -0,0 +1,27 @@
+from ai_profile import StartupProfiler, parse_importtime
+
+IMPORTTIME = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:       300 |       2500 | json
+import time:       900 |        900 |   json.decoder
+import time:      4000 |      10000 | requests
+"""
+
+
+def test_parse_importtime_keeps_top_level_modules():
+    total, imports = parse_importtime(IMPORTTIME)
+    assert [entry['module'] for entry in imports] == ['requests', 'json']
+    assert total == 0.0125
+    assert imports[0]['self'] == 0.004
+
+
+def test_profiler_records_phases_even_on_error():
+    profiler = StartupProfiler()
+    with profiler.phase('load_keys'):
+        pass
+    try:
+        with profiler.phase('init_models'):
+            raise ValueError
+    except ValueError:
+        pass
+    assert [phase['name'] for phase in profiler.phases] == ['load_keys', 'init_models']
@@ -0,0 +1,57 @@
+import pytest
+
+from ai_router import LatencyRouter
+
+MODELS = {
+    'gpt-4o-mini': {'name': 'mini'},
+    'gemini-1.5-flash': {'name': 'flash'},
+    'gpt-4o': {'name': '4o'},
+}
+
+
+def router(path, **kw):
+    return LatencyRouter(MODELS, path=path, flush_interval=3600, **kw)
+
+
+def test_choose_prefers_fastest_healthy_model(tmp_path):
+    r = router(tmp_path / 'router.json')
+    for _ in range(5):
+        r.record('gpt-4o-mini', latency=2.0)
+        r.record('gemini-1.5-flash', latency=0.5)
+    assert r.choose('fast') == 'gemini-1.5-flash'
+    for _ in range(5):
+        r.record('gemini-1.5-flash', error=True)
+    assert not r.healthy('gemini-1.5-flash')
+    assert r.choose('fast') == 'gpt-4o-mini'
+    assert r.choose('advanced') == 'gpt-4o'
+
+
+def test_no_healthy_model_raises(tmp_path):
+    r = LatencyRouter({'gpt-4o': {}}, path=tmp_path / 'router.json', flush_interval=3600)
+    r.record('gpt-4o', error=True)
+    with pytest.raises(Exception):
+        r.choose()
+
+
+def test_record_is_write_behind(tmp_path):
+    path = tmp_path / 'router.json'
+    r = router(path)
+    r.record('gpt-4o-mini', latency=1.0)
+    assert not path.exists()
+    r.close()
+    assert path.exists()
+    assert router(path).expected('gpt-4o-mini') == pytest.approx(1.0)
+
+
+def test_save_merges_workers_instead_of_overwriting(tmp_path):
+    path = tmp_path / 'router.json'
+    a, b = router(path), router(path)
+    for _ in range(3):
+        a.record('gpt-4o-mini', latency=1.0)
+        b.record('gpt-4o-mini', latency=3.0)
+    a.save()
+    b.save()
+    a.save()
+    for r in (a, b, router(path)):
+        assert r.expected('gpt-4o-mini') == pytest.approx(2.0, rel=1e-3)
+        assert r.stats['gpt-4o-mini']['latency'][1] == pytest.approx(6.0, rel=1e-3)
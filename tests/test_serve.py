@@ -0,0 +1,46 @@
+import json
+import os
+import socket
+
+from ai_serve import PreforkServer
+
+
+def make_server(tmp_path, workers=2):
+    server = PreforkServer(None, '127.0.0.1', 0, workers, ready_file=str(tmp_path / 'ready.json'))
+    server.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.sock.bind(('127.0.0.1', 0))
+    server.go_r, server.go_w = os.pipe()
+    return server
+
+
+def ready(pid, seconds=0.1):
+    return json.dumps({'pid': pid, 'warm_seconds': seconds, 'clients': [], 'preconnected': []})
+
+
+def test_listens_only_after_every_worker_is_warm(tmp_path):
+    server = make_server(tmp_path)
+    try:
+        server.on_message(ready(1))
+        assert not server.listening and not (tmp_path / 'ready.json').exists()
+        server.on_message(ready(2, 0.3))
+        assert server.listening
+        assert os.read(server.go_r, 10) == b'..'
+        assert [w['pid'] for w in json.loads((tmp_path / 'ready.json').read_text())['workers']] == [1, 2]
+        # بديل عامل سقط يبدأ فور جاهزيته
+        server.on_message(ready(3))
+        assert os.read(server.go_r, 10) == b'.'
+    finally:
+        server.sock.close()
+        os.close(server.go_r)
+        os.close(server.go_w)
+
+
+def test_warmup_error_before_listening_stops_the_server(tmp_path):
+    server = make_server(tmp_path)
+    try:
+        server.on_message(json.dumps({'pid': 1, 'error': 'مفتاح مفقود'}))
+        assert server.stopping and not server.listening
+    finally:
+        server.sock.close()
+        os.close(server.go_r)
+        os.close(server.go_w)
@@ -0,0 +1,47 @@
+import json
+import multiprocessing
+
+from ai_stats import UsageStats
+from ai_storage import WorkspaceDB
+
+
+def test_increments_stay_in_memory_until_flush(tmp_path):
+    path = tmp_path / 'stats.json'
+    stats = UsageStats(path, flush_every=1000, flush_interval=3600)
+    stats.increment('gpt-4o', when='2024-01-01T00:00:00')
+    stats.increment('gpt-4o', when='2024-01-02T00:00:00')
+    assert not path.exists()
+    assert stats['gpt-4o'] == {'count': 2, 'last_used': '2024-01-02T00:00:00'}
+    stats.close()
+    assert json.loads(path.read_text())['gpt-4o']['count'] == 2
+
+
+def _worker(path, model_id, count):
+    stats = UsageStats(path, flush_every=7, flush_interval=3600)
+    for _ in range(count):
+        stats.increment(model_id)
+    stats.close()
+
+
+def test_processes_merge_instead_of_overwriting(tmp_path):
+    path = str(tmp_path / 'stats.json')
+    processes = [multiprocessing.Process(target=_worker, args=(path, model_id, 50))
+                 for model_id in ('gpt-4o', 'gpt-4o', 'gemini-1.5-flash')]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    totals = json.loads(open(path).read())
+    assert totals['gpt-4o']['count'] == 100
+    assert totals['gemini-1.5-flash']['count'] == 50
+
+
+def test_database_backend_batches_increments(tmp_path):
+    db = WorkspaceDB(tmp_path / 'workspace.db')
+    stats = UsageStats(db=db, flush_every=1000, flush_interval=3600)
+    for _ in range(3):
+        stats.increment('gpt-4o')
+    assert db.usage_stats() == {}
+    stats.flush()
+    assert db.usage_stats()['gpt-4o']['count'] == 3
+    assert len(stats) == 1
@@ -0,0 +1,86 @@
+import json
+import threading
+
+from ai_conversations import ConversationStore
+from ai_storage import SQLiteConversationStore, WorkspaceDB, migrate_json, new_chat_id
+
+
+def test_two_processes_never_overwrite_each_others_messages(tmp_path):
+    path = tmp_path / 'workspace.db'
+    web = SQLiteConversationStore(WorkspaceDB(path), source='web')
+    mobile = SQLiteConversationStore(WorkspaceDB(path), source='mobile')
+    web['a'] = {'title': 'أ', 'timestamp': '2024-01-01', 'messages': []}
+
+    def writer(store, name):
+        for i in range(20):
+            store.append_message('a', {'role': 'user', 'content': f"{name} {i}", 'tokens': i})
+
+    threads = [threading.Thread(target=writer, args=(store, name)) for store, name in ((web, 'web'), (mobile, 'mobile'))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    messages = SQLiteConversationStore(WorkspaceDB(path))['a']['messages']
+    assert len(messages) == 40
+    assert {m['content'] for m in messages} == {f"{n} {i}" for n in ('web', 'mobile') for i in range(20)}
+    # الحقول الإضافية تعود كما كُتبت
+    assert all('tokens' in m for m in messages)
+    assert web.meta('a')['messages'] == 40
+
+
+def test_record_exchange_creates_conversation_and_counts_usage(tmp_path):
+    db = WorkspaceDB(tmp_path / 'workspace.db')
+    store = SQLiteConversationStore(db)
+    chat_id = new_chat_id()
+    store.record_exchange(chat_id, 'سؤال', 'جواب', 'gpt-4o')
+    store.record_exchange(chat_id, 'سؤال 2', 'جواب 2', 'gpt-4o')
+    assert [m['role'] for m in store[chat_id]['messages']] == ['user', 'assistant'] * 2
+    assert db.usage_stats()['gpt-4o']['count'] == 2
+    assert store.total_messages() == 4
+
+
+def test_migrate_json_runs_once(tmp_path):
+    directory = tmp_path / 'conversations'
+    old = ConversationStore(directory)
+    old['a'] = {'title': 'قديمة', 'timestamp': '2024-01-01', 'messages': [{'role': 'user', 'content': 'x'}]}
+    old.close()
+    stats = tmp_path / 'stats.json'
+    stats.write_text(json.dumps({'gpt-4o': {'count': 3, 'last_used': '2024-01-01'}}))
+
+    db = WorkspaceDB(tmp_path / 'workspace.db')
+    assert migrate_json(db, directory, stats) == (1, 1)
+    assert migrate_json(db, directory, stats) == (0, 0)
+    assert migrate_json(db, directory, stats, force=True) == (1, 0)
+    assert db.usage_stats()['gpt-4o']['count'] == 3
+
+
+def test_search_folds_arabic_spelling_and_diacritics(tmp_path):
+    store = SQLiteConversationStore(WorkspaceDB(tmp_path / 'workspace.db'))
+    store['a'] = {'title': 'مدرسة', 'timestamp': '2024-01-01', 'messages': []}
+    store.append_messages('a', [
+        {'role': 'user', 'content': 'أين تقع المدرسةُ الكبيرة؟'},
+        {'role': 'assistant', 'content': 'في وسط المدينة', 'model': 'gpt-4o'},
+    ])
+    store['b'] = {'title': 'طبخ', 'timestamp': '2024-01-01', 'messages': []}
+    store.append_message('b', {'role': 'user', 'content': 'وصفة الكبسة'})
+
+    for query in ('المدرسه', 'اين المدرس', 'الْمَدْرَسَة'):
+        results = store.search(query)
+        assert [(r['conversation_id'], r['seq']) for r in results] == [('a', 0)], query
+    assert '«المدرسةُ»' in store.search('المدرسه')[0]['snippet']
+    assert store.search('الكبيره المدرسه')[0]['seq'] == 0
+    assert store.search('...') == []
+
+
+def test_search_index_is_rebuilt_for_older_databases(tmp_path):
+    path = tmp_path / 'workspace.db'
+    db = WorkspaceDB(path)
+    store = SQLiteConversationStore(db)
+    store['a'] = {'title': 'أ', 'timestamp': '2024-01-01', 'messages': []}
+    store.append_message('a', {'role': 'user', 'content': 'برمجة بايثون'})
+    with db.transaction() as conn:
+        conn.execute("DELETE FROM message_search")
+        conn.execute("DELETE FROM meta WHERE key = 'search_index'")
+    db.close()
+    assert SQLiteConversationStore(WorkspaceDB(path)).search('بايثون')[0]['conversation_id'] == 'a'
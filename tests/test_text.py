@@ -0,0 +1,20 @@
+from ai_text import normalize_arabic, snippet, tokenize
+
+
+def test_normalize_folds_letters_diacritics_and_tatweel():
+    assert normalize_arabic('إِسْلامٌ') == normalize_arabic('اسلام')
+    assert normalize_arabic('مـــدرسة') == 'مدرسه'
+    assert normalize_arabic('مستشفى') == 'مستشفي'
+    assert normalize_arabic('Python') == 'python'
+
+
+def test_tokenize_drops_punctuation():
+    assert tokenize('مرحباً، كيف الحال؟ (Hello_world)') == ['مرحبا', 'كيف', 'الحال', 'hello_world']
+
+
+def test_snippet_marks_matches_in_original_text():
+    text = ' '.join(['كلمة'] * 20 + ['المدرسةُ', 'الكبيرة'] + ['نهاية'] * 20)
+    result = snippet(text, tokenize('المدرسه'), words=6)
+    assert '«المدرسةُ»' in result
+    assert result.startswith('… ') and result.endswith(' …')
+    assert snippet('', ['x']) == ''
@@ -0,0 +1,80 @@
+import pytest
+
+from ai_transport import HTTPTransport
+
+
+class FakeResponse:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession:
+    """جلسة بديلة لـ requests.Session (بدون شبكة)"""
+
+    def __init__(self):
+        self.adapters = {}
+        self.calls = []
+        self.closed = False
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, url))
+        if 'fail' in url:
+            raise OSError('connection refused')
+        return FakeResponse()
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def transport(monkeypatch):
+    transport = HTTPTransport(pool_maxsize=4, idle_timeout=60)
+    monkeypatch.setattr(transport, '_new_session', FakeSession)
+    return transport
+
+
+def expire(transport):
+    for entry in transport._sessions.values():
+        entry['last_used'] -= 3600
+
+
+def test_one_session_per_host_is_reused(transport):
+    transport.get('https://api.example.com/a')
+    transport.post('https://api.example.com/b')
+    transport.get('https://other.example.com/')
+    stats = transport.stats()
+    assert stats['api.example.com']['requests'] == 2
+    assert stats['api.example.com']['sessions'] == 1
+    assert len(transport._sessions) == 2
+
+
+def test_idle_sessions_are_evicted(transport):
+    session = transport.session_for('https://api.example.com/')
+    expire(transport)
+    transport.evict_idle()
+    assert session.closed
+    assert transport.stats()['api.example.com']['evictions'] == 1
+
+
+def test_open_stream_keeps_its_session(transport):
+    response = transport.get('https://api.example.com/stream', stream=True)
+    session = transport._sessions['api.example.com']['session']
+    expire(transport)
+    transport.evict_idle()
+    assert not session.closed
+
+    response.close()
+    response.close()
+    assert transport._sessions['api.example.com']['active'] == 0
+    expire(transport)
+    transport.evict_idle()
+    assert session.closed
+
+
+def test_failed_request_releases_its_session(transport):
+    with pytest.raises(OSError):
+        transport.get('https://api.example.com/fail')
+    assert transport._sessions['api.example.com']['active'] == 0
@@ -0,0 +1,55 @@
+import gzip
+import json
+
+from ai_web_templates import (MANIFEST_ASSET, WEB_HTML, WEB_INDEX, accepted_encodings, asset_response,
+                              compile_asset)
+
+
+def test_accepted_encodings_drop_q_zero():
+    assert accepted_encodings('gzip;q=0, br, deflate;q=0.5') == {'br', 'deflate'}
+    assert accepted_encodings(None) == set()
+
+
+def test_gzip_variant_round_trips_with_its_own_etag():
+    status, body, headers = asset_response(WEB_INDEX, accept_encoding='gzip, deflate')
+    headers = dict(headers)
+    assert status == 200
+    assert headers['Content-Encoding'] == 'gzip'
+    assert headers['Vary'] == 'Accept-Encoding'
+    assert gzip.decompress(body).decode('utf-8') == WEB_HTML
+    plain = dict(asset_response(WEB_INDEX)[2])
+    assert 'Content-Encoding' not in plain
+    assert plain['ETag'] != headers['ETag'] and not plain['ETag'].startswith('W/')
+
+
+def test_if_none_match_returns_304_without_body():
+    etag = dict(asset_response(WEB_INDEX, accept_encoding='gzip')[2])['ETag']
+    for header in (etag, f'W/{etag}', f'"other", {etag}', '*'):
+        status, body, headers = asset_response(WEB_INDEX, header, 'gzip')
+        assert (status, body) == (304, b'')
+        assert dict(headers)['ETag'] == etag
+    # نسخة مختلفة (بدون ضغط) لا تطابق ETag نسخة gzip
+    assert asset_response(WEB_INDEX, etag, 'identity')[0] == 200
+
+
+def test_tiny_assets_skip_compression():
+    asset = compile_asset('{}', 'application/json')
+    assert list(asset['variants']) == ['identity']
+    assert asset_response(asset, accept_encoding='gzip, br')[1] == b'{}'
+
+
+def test_manifest_is_valid_json_with_long_cache():
+    status, body, headers = asset_response(MANIFEST_ASSET)
+    assert status == 200
+    assert json.loads(body)['name']
+    assert dict(headers)['Cache-Control'] == 'public, max-age=86400'
+
+
+def test_service_worker_revalidates_the_page_over_the_network():
+    from ai_web_templates import SERVICE_WORKER, SERVICE_WORKER_ASSET
+
+    fetch_handler = SERVICE_WORKER[SERVICE_WORKER.index("addEventListener('fetch'"):]
+    # الشبكة أولاً والذاكرة للعمل بدون اتصال فقط
+    assert fetch_handler.index('fetch(e.request)') < fetch_handler.index('caches.match')
+    assert "'ai-workspace-v1'" not in SERVICE_WORKER and 'caches.delete' in SERVICE_WORKER
+    assert dict(asset_response(SERVICE_WORKER_ASSET)[2])['Cache-Control'] == 'no-cache'
@@ -0,0 +1,79 @@
+import threading
+import time
+
+import pytest
+
+from ai_router import AUTO_MODEL
+
+
+@pytest.fixture
+def workspace(monkeypatch):
+    monkeypatch.setenv('AI_ECHO_MODEL', '1')
+    monkeypatch.setenv('AI_ECHO_DELAY', '0')
+    from ai_workspace import AIWorkspace
+    return AIWorkspace()
+
+
+def test_stream_yields_chunks_and_records_the_call(workspace):
+    assert list(workspace.chat_stream('واحد اثنان ثلاثة', model='echo', conversation_id='c1')) == \
+        ['واحد', ' اثنان', ' ثلاثة']
+    rows = workspace.ledger.aggregate(by='conversation')
+    assert [(row['key'], row['calls']) for row in rows] == [('c1', 1)]
+
+
+def test_abandoned_stream_is_still_recorded(workspace):
+    chunks = workspace.chat_stream('a b c d', model='echo', conversation_id='c2')
+    assert next(chunks) == 'a'
+    chunks.close()
+    # البث الفعلي في خيط single-flight يتوقف ويُسجَّل بعد انصراف آخر مستمع
+    deadline = time.monotonic() + 5
+    while not workspace.ledger.aggregate(by='conversation') and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert workspace.ledger.aggregate(by='conversation')[0]['key'] == 'c2'
+
+
+def test_per_request_model_leaves_shared_state_alone(workspace):
+    workspace.current_model = 'claude-3-haiku'
+    results = {}
+
+    def ask(i):
+        results[i] = workspace.chat(f"سؤال {i}", model='echo', max_tokens=50, temperature=0.1)
+
+    threads = [threading.Thread(target=ask, args=(i,)) for i in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == {i: f"سؤال {i}" for i in range(16)}
+    assert workspace.current_model == 'claude-3-haiku'
+    assert workspace.last_model is None
+
+
+def test_resolve_model(workspace):
+    assert workspace.resolve_model('echo') == 'echo'
+    assert workspace.resolve_model(AUTO_MODEL) in workspace.models
+    with pytest.raises(Exception):
+        workspace.resolve_model('missing')
+    workspace.current_model = None
+    with pytest.raises(Exception):
+        workspace.resolve_model()
+    assert workspace.chat('x', model='missing').startswith('❌')
+
+
+def test_coalesced_chats_are_counted_in_call_metrics(workspace, monkeypatch):
+    monkeypatch.setenv('AI_ECHO_DELAY', '0.2')
+    workspace.flights.enabled = True
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(workspace.chat('نفس السؤال', model='echo')))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ['نفس السؤال'] * 4
+    assert workspace.flights.stats == {'flights': 1, 'coalesced': 3}
+    assert workspace.call_metrics.coalesced('echo') == 3
+
+    workspace.call_metrics.close()
+    from ai_metrics import CallMetrics
+    assert CallMetrics(workspace.call_metrics.path).coalesced('echo') == 3